@@ -0,0 +1,144 @@
+"""
+Module for caching the responses of the read endpoints of the videos API, which are requested on every page load of
+the frontend but change at most a few times a day.
+
+Every cached response is stored under the current version of the videos, which changes whenever a video is created,
+updated or deleted, and a marker of the videos table - the number of videos and the newest upload time. A new version
+or marker makes every response cached under the old one unreachable, so nothing has to be deleted. Responses carry an
+ETag from a hash of their data and a Last-Modified header from when they were built, so clients revalidating a
+response that hasn't changed get a 304 from the cached ETag without the response being built.
+
+The version is only changed by the process writing the videos, which with a local memory cache doesn't reach the
+other processes. The marker is how they find the videos added by the management commands, and is read at most every
+`constants.RESPONSE_CACHE_MARKER_SECONDS`. Edits that don't change the marker reach the other processes when the
+cached responses expire after `constants.RESPONSE_CACHE_TTL_SECONDS`.
+"""
+import hashlib
+import json
+import threading
+import time
+import uuid
+from datetime import datetime
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from django.apps import apps
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import BaseCache, caches
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from today import constants
+
+VERSION_KEY = "today:videos:version"
+
+_marker: Optional[Tuple[int, Optional[datetime]]] = None
+_marker_read_at = 0.0
+_marker_lock = threading.Lock()
+
+
+def get_response_cache() -> BaseCache:
+    """
+    Get the cache the responses are stored in, set by TODAY_RESPONSE_CACHE in the settings
+    :return: The cache
+    """
+    return caches[getattr(settings, "TODAY_RESPONSE_CACHE", constants.RESPONSE_CACHE_ALIAS)]
+
+
+def get_videos_version() -> Dict[str, Any]:
+    """
+    Get the current version of the videos, starting a new one if the cache doesn't have one
+    :return: The 'version' token
+    """
+    cache = get_response_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        version = {"version": uuid.uuid4().hex}
+        # Another process may have started a version at the same time, in which case use that one
+        if not cache.add(VERSION_KEY, version, timeout=None):
+            version = cache.get(VERSION_KEY, version)
+    return version
+
+
+def get_table_marker() -> Tuple[int, Optional[datetime]]:
+    """
+    Get the marker of the videos table, see `VideoQuerySet.table_marker`, reading it from the database at most every
+    `constants.RESPONSE_CACHE_MARKER_SECONDS`
+    :return: The number of videos and the newest upload time
+    """
+    global _marker, _marker_read_at
+    now = time.monotonic()
+    with _marker_lock:
+        if _marker is not None and now - _marker_read_at < constants.RESPONSE_CACHE_MARKER_SECONDS:
+            return _marker
+    # The models import this module, so the model is looked up rather than imported
+    marker = apps.get_model("today", "Video").objects.table_marker()
+    with _marker_lock:
+        _marker, _marker_read_at = marker, now
+    return marker
+
+
+def invalidate_video_cache() -> None:
+    """Start a new version of the videos, so every cached response is rebuilt"""
+    get_response_cache().set(VERSION_KEY, {"version": uuid.uuid4().hex}, timeout=None)
+
+
+@receiver(post_save, sender="today.Video")
+@receiver(post_delete, sender="today.Video")
+def _invalidate_on_change(sender, **kwargs) -> None:
+    # Wait for the change to be committed, or a request in between could cache the old videos under the new version
+    transaction.on_commit(invalidate_video_cache)
+
+
+def cached_response(view: Callable) -> Callable:
+    """
+    Decorate a GET view of a viewset to cache its successful responses, keyed by the path and query params and the
+    version and table marker of the videos, and to answer conditional requests with a 304
+    :param view: The view
+    :return: The decorated view
+    """
+    @wraps(view)
+    def wrapper(viewset, request: Request, *args, **kwargs):
+        version = (get_videos_version()["version"], get_table_marker())
+        params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+        fingerprint = hashlib.sha256(repr((request.path, params, version)).encode()).hexdigest()[:32]
+        cache = get_response_cache()
+        key = f"today:response:{fingerprint}"
+        cached = cache.get(key)
+        if cached is not None:
+            response = Response(cached["data"])
+            response["X-Cache"] = "HIT"
+        else:
+            response = view(viewset, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+            cached = {"data": response.data, "etag": _etag(response.data), "modified": int(time.time())}
+            cache.set(key, cached, timeout=constants.RESPONSE_CACHE_TTL_SECONDS)
+            response["X-Cache"] = "MISS"
+
+        not_modified = get_conditional_response(request, etag=cached["etag"], last_modified=cached["modified"])
+        if not_modified is not None:
+            response = not_modified
+        response["ETag"] = cached["etag"]
+        response["Last-Modified"] = http_date(cached["modified"])
+        # Let clients keep the response, but revalidate it on every use
+        response["Cache-Control"] = "no-cache"
+        return response
+
+    return wrapper
+
+
+def _etag(data: Any) -> str:
+    """
+    Create an ETag for the data of a response, so it only changes when the data does
+    :param data: The data
+    :return: The ETag, quoted
+    """
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, separators=(",", ":"))
+    return f'"{hashlib.sha256(content.encode()).hexdigest()[:32]}"'
@@ -1,2 +1,31 @@
 """Module with constants for the Django app"""
 YOUTUBE_CHANNEL_ID = "UCQjyvCIR9IkG02Q0Wmpz9sQ"
+# Videos are written to the database in batches of this size by fetch_youtube_videos
+SYNC_BATCH_SIZE = 200
+# fetch_youtube_videos re-fetches videos published up to this long before the newest video in the database, to pick up
+# videos published just before one saved by the pipeline
+SYNC_OVERLAP_HOURS = 24
+# The max number of videos accepted by one request to the bulk write-to-db endpoint
+BULK_WRITE_MAX_ITEMS = 1000
+# The Django cache the responses of the read endpoints are stored in, see today/caching.py. The default cache is in
+# local memory unless CACHES is set in the settings. Set TODAY_RESPONSE_CACHE in the settings to use another one.
+RESPONSE_CACHE_ALIAS = "default"
+# A local memory cache is per process, so it only sees invalidations made in the same process. Videos added or removed
+# by another process, e.g. the management commands, are found by checking the number of videos and the newest upload
+# time at most every RESPONSE_CACHE_MARKER_SECONDS. Other edits are picked up when the cached responses expire after
+# RESPONSE_CACHE_TTL_SECONDS.
+RESPONSE_CACHE_MARKER_SECONDS = 5
+RESPONSE_CACHE_TTL_SECONDS = 300
+# The fields of the videos searched by the search endpoint, and the weight of a match in each, see today/search.py
+SEARCH_FIELD_WEIGHTS = {"word": 4.0, "sentence": 2.0, "translated_sentence": 2.0, "description": 1.0}
+# Shorter prefixes match too many words to be useful, so only match whole words
+SEARCH_MIN_PREFIX_LENGTH = 2
+SEARCH_MAX_PREFIX_TERMS = 100
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+# How often a search checks whether another process has added or removed videos, which rebuilds the search index in
+# the background. The index is also rebuilt at least every SEARCH_INDEX_MAX_AGE_SECONDS, for edits to the videos.
+SEARCH_INDEX_CHECK_SECONDS = 10
+SEARCH_INDEX_MAX_AGE_SECONDS = 300
+# The 95th percentile search latency benchmark_search checks against
+SEARCH_LATENCY_TARGET_MS = 20
@@ -0,0 +1,115 @@
+import itertools
+import random
+import statistics
+import threading
+import time
+import tracemalloc
+from typing import Callable, Dict, Iterable, List
+
+from django.core.management.base import BaseCommand, CommandError
+
+from today import constants
+from today.search_index import SearchIndex, normalise
+from python.constants import Paths
+import base_config
+
+# Mixed into the word list, so some of the searches have to match ignoring accents
+ACCENTED_WORDS = [
+    "niño", "canción", "también", "corazón", "año", "está", "mañana", "después", "árbol", "música",
+]
+
+
+class Command(BaseCommand):
+    """
+    Django management command to benchmark the search index on a large synthetic table of videos.
+
+    Builds the index from synthetic videos made of words from the word list, without touching the database, then times
+    searches for a whole word, a word typed without its accents, a prefix and a phrase from a sentence. Then times
+    whole word searches while a new index is built in another thread, as it is when the index is refreshed in the
+    background (see `today.search`). Fails if the 95th percentile latency of any kind of search is over
+    `constants.SEARCH_LATENCY_TARGET_MS`.
+    """
+
+    help = "Benchmark the search index on synthetic videos"
+
+    def add_arguments(self, parser):
+        """
+        Add the command line arguments for the command
+        :param parser: The argument parser for the command
+        """
+        parser.add_argument("--rows", type=int, default=100000, help="The number of synthetic videos")
+        parser.add_argument("--queries", type=int, default=500, help="The number of searches of each kind")
+        parser.add_argument("--target-ms", type=float, default=constants.SEARCH_LATENCY_TARGET_MS,
+                            help="Fail if the 95th percentile latency is over this")
+        parser.add_argument("--seed", type=int, default=0, help="The seed for the synthetic videos and searches")
+
+    def handle(self, *args, **options):
+        """
+        Build the index, run the searches and output the latencies.
+
+        :param args: Positional arguments to pass to the command
+        :param options: Keyword arguments to pass to the command
+        """
+        rng = random.Random(options["seed"])
+        with open(f"{base_config.BASE_DIR}/{Paths.WORD_LIST_PATH}", "r") as file:
+            vocabulary = [line.strip() for line in file if line.strip()] + ACCENTED_WORDS * 20
+
+        videos = []
+        for number in range(options["rows"]):
+            word = rng.choice(vocabulary)
+            sentence = " ".join(rng.choices(vocabulary, k=7) + [word])
+            videos.append((f"video{number:08d}", {
+                "word": word,
+                "sentence": sentence,
+                "translated_sentence": " ".join(rng.choices(vocabulary, k=8)),
+                "description": f"Learn the Spanish word '{word}' - {sentence} #languages #education",
+            }, float(number)))
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        index = SearchIndex()
+        index.add_many(videos)
+        build_seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f"Indexed {len(index)} videos in {build_seconds:.1f}s, peak {peak / 1024 ** 2:.0f}MB "
+                          f"allocated")
+
+        def sample(make_query: Callable[[Dict[str, str]], str]) -> List[str]:
+            return [make_query(rng.choice(videos)[1]) for _ in range(options["queries"])]
+
+        searches = {
+            "word": sample(lambda video: video["word"]),
+            "unaccented": [normalise(word) for word in rng.choices(ACCENTED_WORDS, k=options["queries"])],
+            "prefix": sample(lambda video: video["word"][:3]),
+            "phrase": sample(lambda video: " ".join(video["sentence"].split()[2:4])),
+        }
+        failures = []
+        self.stdout.write(f"{'search':<12}{'p50 (ms)':>10}{'p95 (ms)':>10}{'max (ms)':>10}{'hits':>8}")
+
+        def time_searches(kind: str, queries: Iterable[str]) -> None:
+            latencies = []
+            hits = 0
+            for query in queries:
+                start = time.perf_counter()
+                hits += bool(index.search(query))
+                latencies.append((time.perf_counter() - start) * 1000)
+            p95 = statistics.quantiles(latencies, n=20)[-1]
+            self.stdout.write(f"{kind:<12}{statistics.median(latencies):>10.3f}{p95:>10.3f}{max(latencies):>10.3f}"
+                              f"{hits / len(latencies):>8.0%}")
+            if p95 > options["target_ms"]:
+                failures.append(f"{kind} searches took {p95:.1f}ms at the 95th percentile")
+
+        for kind, queries in searches.items():
+            time_searches(kind, queries)
+
+        # Search the old index until the new one is built, for at least as many searches as the other kinds
+        rebuild = threading.Thread(target=lambda: SearchIndex().add_many(videos))
+        rebuild.start()
+        queries = itertools.cycle(searches["word"])
+        counts = itertools.takewhile(lambda count: rebuild.is_alive() or count < options["queries"], itertools.count())
+        time_searches("rebuilding", (next(queries) for _ in counts))
+        rebuild.join()
+
+        if failures:
+            raise CommandError(f"Over the {options['target_ms']}ms target: {'; '.join(failures)}")
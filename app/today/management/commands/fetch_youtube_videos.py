@@ -1,4 +1,9 @@
+from collections import Counter
+from datetime import timedelta, timezone
+from typing import List
+
 from django.core.management.base import BaseCommand
+from django.db.models import Max
 from django.utils.dateparse import parse_datetime
 
 
@@ -11,44 +16,77 @@ class Command(BaseCommand):
     """
     Django management command to fetch YouTube Shorts videos and save them to the database.
 
-    This command connects to the YouTube API to retrieve videos from a specific channel,
-    parses their details (title, description, upload date), and updates or creates
-    corresponding video records in the database.
+    This command walks the uploads playlist of the channel a page at a time, newest first, parses the video details
+    (title, description, upload date), and upserts the videos into the database in batches. The sync is incremental:
+    it stops at the videos already in the database, using the newest upload time in the database as a high-water mark.
     """
 
     help = "Fetch YT Shorts videos and save them to the database"
 
+    def add_arguments(self, parser):
+        """
+        Add the command line arguments for the command
+        :param parser: The argument parser for the command
+        """
+        parser.add_argument("--full", action="store_true",
+                            help="Fetch every video on the channel rather than only those since the last sync")
+        parser.add_argument("--batch-size", type=int, default=constants.SYNC_BATCH_SIZE,
+                            help="The number of videos to write to the database per query")
+
     def handle(self, *args, **options):
         """
         Main logic of the command to fetch the videos and update the database.
 
         This method:
-        1. Fetches video details from YouTube using the YTConnector.
-        2. Parses video information (title, description, upload date).
-        3. Updates or creates video records in the database.
-        4. Outputs a success message for each video processed.
+        1. Finds the high-water mark - the upload time of the newest video in the database, less an overlap.
+        2. Walks the uploads playlist from the newest video back to the high-water mark using the YTConnector.
+        3. Parses video information (title, description, upload date).
+        4. Upserts the videos into the database in batches.
+        5. Outputs the number of videos added and updated.
 
         :param args: Positional arguments to pass to the command
         :param options: Keyword arguments to pass to the command
         """
+        published_after = None
+        if options["full"] is False:
+            newest_upload = Video.objects.aggregate(newest=Max("upload_time"))["newest"]
+            if newest_upload is not None:
+                high_water_mark = newest_upload - timedelta(hours=constants.SYNC_OVERLAP_HOURS)
+                published_after = high_water_mark.astimezone(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+                self.stdout.write(f"Fetching videos published after {published_after}")
 
         yt = YTConnector(credentials_env=True)
-        videos = yt.list_youtube_uploads(channel_id=constants.YOUTUBE_CHANNEL_ID)
-
-        for video_id, details in videos.items():
-            upload_date = parse_datetime(details["published_at"])
-            video, created = Video.objects.update_or_create(
-                video_id=video_id,
-                defaults={
-                    "title": details["title"],
-                    "description": details["description"],
-                    "thumbnail_url": details["thumbnail_url"],
-                    "upload_date": upload_date,
-                }
-            )
-
-            if created:
-                self.stdout.write(f"New video added: {video.title}")
-            else:
-                self.stdout.write(f"Video updated: {video.title}")
+        batch: List[Video] = []
+        totals: Counter = Counter()
+        for page in yt.iter_youtube_uploads(channel_id=constants.YOUTUBE_CHANNEL_ID, published_after=published_after):
+            for video_id, details in page.items():
+                batch.append(Video(
+                    video_id=video_id,
+                    title=details["title"],
+                    description=details["description"],
+                    thumbnail_url=details["thumbnail_url"],
+                    upload_time=parse_datetime(details["published_at"]),
+                ))
+            if len(batch) >= options["batch_size"]:
+                totals.update(self.write_batch(batch, options["batch_size"]))
+                batch = []
+        if batch:
+            totals.update(self.write_batch(batch, options["batch_size"]))
 
+        self.stdout.write(f"New videos added: {totals['created']}, videos updated: {totals['updated']}")
+
+    @staticmethod
+    def write_batch(videos: List[Video], batch_size: int) -> Counter:
+        """
+        Insert the videos, updating the YouTube details of those already in the database in the same query. The word
+        and sentences saved by the pipeline are left as they are.
+        :param videos: The videos to write
+        :param batch_size: The number of videos to write per statement
+        :return: The number of videos 'created' and 'updated'
+        """
+        statuses = Video.objects.upsert(
+            videos,
+            update_fields=["title", "description", "thumbnail_url", "upload_time"],
+            batch_size=batch_size,
+        )
+        return Counter(statuses.values())
@@ -1,9 +1,8 @@
-import datetime
-
 from django.core.management.base import BaseCommand
-from django.utils import timezone
 
 from today.models import Video
+from python.constants import RenderSettings
+from python.encoding import ENCODING_PROFILES
 from python.main import process_video_and_upload
 
 
@@ -11,22 +10,16 @@ class Command(BaseCommand):
 
     help = "Generate a word and sentence with audio and video for the sentence and upload the sentence to YT shorts"
 
+    def add_arguments(self, parser):
+        parser.add_argument("--encoding-profile", choices=list(ENCODING_PROFILES),
+                            default=RenderSettings.ENCODING_PROFILE,
+                            help="The speed and quality settings for encoding the video")
+
     def handle(self, *args, **options):
 
-        video_details = process_video_and_upload()
-
-        sentence, created = Video.objects.update_or_create(
-            video_id=video_details["video_id"],
-            defaults={
-                "word": video_details["word"],
-                "sentence": video_details["sentence"],
-                "translated_sentence": video_details["translated_sentence"],
-                "title": video_details["title"],
-                "description": video_details["description"],
-                "upload_date": timezone.make_aware(video_details["upload_time"], datetime.timezone.utc),
-                "thumbnail_url": video_details["thumbnail_url"],
-            }
-        )
+        video_details = process_video_and_upload(encoding_profile=options["encoding_profile"])
+
+        sentence, created = Video.objects.save_uploaded(video_details)
 
         if created:
             self.stdout.write(f"New video created with ID: {video_details['video_id']} "
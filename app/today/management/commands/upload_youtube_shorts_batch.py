@@ -0,0 +1,81 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from today.models import Video
+from python.batch import BatchPipeline
+from python.constants import BatchSettings, RenderSettings
+from python.encoding import ENCODING_PROFILES
+from python.render_farm import RenderFarm
+
+
+class Command(BaseCommand):
+    """
+    Django management command to generate and upload several YT shorts in one run, e.g. to build a week of videos.
+
+    Takes either a number of videos to create from the word list, or a list of words, and saves each uploaded video to
+    the database. A report with the outcome for every word is written to stdout.
+    """
+
+    help = "Generate and upload a batch of YT shorts, either for a number of random words or for the given words"
+
+    def add_arguments(self, parser):
+        """
+        Add the command line arguments for the command
+        :param parser: The argument parser for the command
+        """
+        group = parser.add_mutually_exclusive_group(required=True)
+        group.add_argument("--count", type=int, help="The number of videos to create from the word list")
+        group.add_argument("--words", nargs="+", help="The words to create videos for")
+        parser.add_argument("--audio-concurrency", type=int, default=BatchSettings.AUDIO_CONCURRENCY)
+        parser.add_argument("--image-concurrency", type=int, default=BatchSettings.IMAGE_CONCURRENCY)
+        parser.add_argument("--video-concurrency", type=int, default=BatchSettings.VIDEO_CONCURRENCY)
+        parser.add_argument("--upload-concurrency", type=int, default=BatchSettings.UPLOAD_CONCURRENCY)
+        parser.add_argument("--render-farm", action="store_true",
+                            help="Render the videos on a pool of processes rather than in the batch's threads")
+        parser.add_argument("--render-workers", type=int, default=None,
+                            help="The number of render processes, defaults to the number of cores / ffmpeg threads")
+        parser.add_argument("--ffmpeg-threads", type=int, default=RenderSettings.FFMPEG_THREADS,
+                            help="The number of threads ffmpeg uses to encode each video on the render farm")
+        parser.add_argument("--render-backend", choices=["moviepy", "ffmpeg"], default=RenderSettings.BACKEND,
+                            help="Render the videos by compositing frames with MoviePy or in one ffmpeg process")
+        parser.add_argument("--encoding-profile", choices=list(ENCODING_PROFILES),
+                            default=RenderSettings.ENCODING_PROFILE,
+                            help="The speed and quality settings for encoding the videos")
+
+    def handle(self, *args, **options):
+        """
+        Run the batch, save each uploaded video to the database and output the batch report.
+
+        :param args: Positional arguments to pass to the command
+        :param options: Keyword arguments to pass to the command
+        """
+        try:
+            render_farm = None
+            if options["render_farm"] is True:
+                render_farm = RenderFarm(
+                    workers=options["render_workers"],
+                    ffmpeg_threads=options["ffmpeg_threads"],
+                    backend=options["render_backend"],
+                )
+            pipeline = BatchPipeline(
+                audio_concurrency=options["audio_concurrency"],
+                image_concurrency=options["image_concurrency"],
+                video_concurrency=options["video_concurrency"],
+                upload_concurrency=options["upload_concurrency"],
+                render_farm=render_farm,
+                encoding_profile=options["encoding_profile"],
+            )
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+
+        report = pipeline.run(count=options["count"], words=options["words"])
+
+        for item in report.succeeded:
+            Video.objects.save_uploaded(item.video_details)
+            self.stdout.write(f"New video created with ID: {item.video_details['video_id']} for word: {item.word}")
+
+        for item in report.failed:
+            self.stderr.write(f"Failed to create the video for word: {item.word} at the {item.failed_stage} stage")
+
+        self.stdout.write(json.dumps(report.to_dict(), indent=2))
@@ -1,6 +1,88 @@
 """Contains Models (db tables) for storing data related to the video output"""
 
-from django.db import models
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from django.db import connections, models, transaction
+from django.db.models import Count, Max
+from django.dispatch import Signal
+from django.utils.dateparse import parse_datetime
+
+from today import constants
+from today.caching import invalidate_video_cache
+
+# Sent with the `video_ids` written by `VideoQuerySet.upsert` once they're committed, as bulk_create doesn't send
+# post_save for each video
+videos_upserted = Signal()
+
+
+class VideoQuerySet(models.QuerySet):
+    """QuerySet for the Video model, with a bulk upsert"""
+
+    def table_marker(self) -> Tuple[int, Optional[datetime]]:
+        """
+        Get a marker of the state of the videos which changes when videos are added or removed, without reading them
+        :return: The number of videos and the newest upload time
+        """
+        marker = self.aggregate(count=Count("pk"), newest=Max("upload_time"))
+        return marker["count"], marker["newest"]
+
+    def save_uploaded(self, video_details: Dict[str, str]) -> Tuple["Video", bool]:
+        """
+        Create or update the video for the details of a video uploaded to YouTube
+        :param video_details: The details returned by `python.main.build_video_details`
+        :return: The video, and whether it was created
+        """
+        return self.update_or_create(
+            video_id=video_details["video_id"],
+            defaults={
+                "word": video_details["word"],
+                "sentence": video_details["sentence"],
+                "translated_sentence": video_details["translated_sentence"],
+                "title": video_details["title"],
+                "description": video_details["description"],
+                "upload_time": parse_datetime(video_details["upload_time"]),
+                "thumbnail_url": video_details["thumbnail_url"],
+            }
+        )
+
+    def upsert(
+            self,
+            videos: Iterable["Video"],
+            update_fields: Sequence[str],
+            batch_size: int = constants.SYNC_BATCH_SIZE,
+    ) -> Dict[str, str]:
+        """
+        Insert the videos, updating the given fields of those already in the database. Each batch takes one query to
+        find the videos that exist and one INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE statement, all in one
+        transaction.
+        :param videos: The videos to write. If a video_id appears more than once the last video is written.
+        :param update_fields: The fields to update on the videos that exist, the other fields are left as they are
+        :param batch_size: The number of videos to write per statement
+        :return: Whether each video was 'created' or 'updated', keyed by video_id
+        """
+        unique_videos = list({video.video_id: video for video in videos}.values())
+        # MySQL upserts on any unique key, and doesn't accept the fields to check for conflicts
+        target = ["video_id"] if connections[self.db].features.supports_update_conflicts_with_target else None
+        statuses = {}
+        with transaction.atomic(using=self.db):
+            # bulk_create doesn't send post_save, which invalidates the cached responses for changes to a single video
+            transaction.on_commit(invalidate_video_cache, using=self.db)
+            for start in range(0, len(unique_videos), batch_size):
+                batch: List[Video] = unique_videos[start:start + batch_size]
+                video_ids = [video.video_id for video in batch]
+                existing = set(self.filter(video_id__in=video_ids).values_list("video_id", flat=True))
+                if update_fields:
+                    self.bulk_create(batch, update_conflicts=True, unique_fields=target, update_fields=update_fields)
+                else:
+                    self.bulk_create(batch, ignore_conflicts=True)
+                statuses.update({
+                    video_id: "updated" if video_id in existing else "created" for video_id in video_ids
+                })
+            transaction.on_commit(
+                lambda: videos_upserted.send(sender=Video, video_ids=list(statuses)), using=self.db
+            )
+        return statuses
 
 
 class Video(models.Model):
@@ -24,9 +106,15 @@ class Video(models.Model):
     upload_time = models.DateTimeField(null=True, blank=True)
     thumbnail_url = models.URLField(null=True, blank=True)
 
+    objects = VideoQuerySet.as_manager()
+
     def __str__(self):
         return self.video_id
 
     class Meta:
         db_table = "videos"
+        indexes = [
+            # For paging through the videos in upload order, see today/pagination.py
+            models.Index(fields=["upload_time", "video_id"], name="videos_upload_time_id_idx"),
+        ]
 
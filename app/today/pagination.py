@@ -0,0 +1,104 @@
+"""
+Module for keyset (cursor) pagination of the videos. Rather than skipping the rows of the earlier pages with an OFFSET,
+each page starts from the position of the last video of the previous page, which the index on
+(upload_time, video_id) finds directly. Pages take the same time to fetch however deep they are, and don't skip or
+repeat videos when new ones are added between requests.
+"""
+import base64
+import binascii
+import json
+from dataclasses import dataclass
+from typing import List, Optional
+
+from django.db.models import Q, QuerySet
+from django.utils import dateparse
+
+from today.models import Video
+
+NEXT = "next"
+PREVIOUS = "prev"
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor can't be decoded"""
+
+
+@dataclass
+class Cursor:
+    """The position of a video in the order of the pages, and the direction to read from it"""
+    upload_time: str
+    video_id: str
+    direction: str = NEXT
+
+
+@dataclass
+class KeysetPage:
+    """A page of videos, with the cursors of the pages either side of it"""
+    videos: List[Video]
+    next_cursor: Optional[str]
+    prev_cursor: Optional[str]
+
+
+def encode_cursor(video: Video, direction: str) -> str:
+    """
+    Create the cursor for the page after or before a video
+    :param video: The last video of the page for the next cursor, or the first video of the page for the previous one
+    :param direction: NEXT or PREVIOUS
+    :return: The cursor, an opaque URL safe string
+    """
+    position = {"t": video.upload_time.isoformat(), "id": video.video_id, "d": direction}
+    return base64.urlsafe_b64encode(json.dumps(position, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Cursor:
+    """
+    Decode a cursor created by `encode_cursor`
+    :param cursor: The cursor
+    :return: The position and direction of the cursor
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        decoded = Cursor(upload_time=position["t"], video_id=position["id"], direction=position["d"])
+    except (binascii.Error, ValueError, KeyError, TypeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+    if decoded.direction not in (NEXT, PREVIOUS) or dateparse.parse_datetime(decoded.upload_time) is None:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}")
+    return decoded
+
+
+def keyset_page(queryset: QuerySet, cursor: Optional[str], limit: int) -> KeysetPage:
+    """
+    Get a page of videos, newest first, ordered by (upload_time, video_id). Videos without an upload time aren't in
+    any page.
+    :param queryset: The videos to paginate, e.g. filtered by date
+    :param cursor: Optional. The cursor of the page to get, from a previous page. If None the first page is returned.
+    :param limit: The max number of videos on the page
+    :return: The page, with a cursor for the page after it if there are more videos, and one for the page before it if
+    it isn't the first page
+    """
+    queryset = queryset.filter(upload_time__isnull=False)
+    position = decode_cursor(cursor) if cursor is not None else None
+    if position is None:
+        rows = list(queryset.order_by("-upload_time", "-video_id")[:limit + 1])
+        has_more, has_before = len(rows) > limit, False
+    else:
+        upload_time, video_id = dateparse.parse_datetime(position.upload_time), position.video_id
+        # The bound on upload_time alone lets the database seek to the cursor in the index, where it would scan the
+        # table for the OR on its own
+        if position.direction == NEXT:
+            after = Q(upload_time__lte=upload_time) & (Q(upload_time__lt=upload_time) | Q(video_id__lt=video_id))
+            rows = list(queryset.filter(after).order_by("-upload_time", "-video_id")[:limit + 1])
+            has_more, has_before = len(rows) > limit, True
+        else:
+            # Read the page before backwards from the cursor, then put it back in newest first order
+            before = Q(upload_time__gte=upload_time) & (Q(upload_time__gt=upload_time) | Q(video_id__gt=video_id))
+            rows = list(queryset.filter(before).order_by("upload_time", "video_id")[:limit + 1])
+            has_before, has_more = len(rows) > limit, True
+            rows = rows[:limit][::-1]
+
+    videos = rows[:limit]
+    return KeysetPage(
+        videos=videos,
+        next_cursor=encode_cursor(videos[-1], NEXT) if has_more and videos else None,
+        prev_cursor=encode_cursor(videos[0], PREVIOUS) if has_before and videos else None,
+    )
@@ -0,0 +1,31 @@
+"""Module for parsing the bodies of API requests in formats DRF doesn't support out of the box"""
+import json
+from typing import Any, List
+
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    """Parses a newline delimited JSON body, with one JSON value per line, into a list of the values"""
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None) -> List[Any]:
+        """
+        Parse the request body a line at a time
+        :param stream: The request body
+        :param media_type: The media type of the body
+        :param parser_context: The context of the request, with the 'encoding' of the body if set
+        :return: The value on each line, skipping blank lines
+        """
+        encoding = (parser_context or {}).get("encoding", "utf-8")
+        values = []
+        for line_number, line in enumerate(stream, start=1):
+            line = line.decode(encoding).strip()
+            if not line:
+                continue
+            try:
+                values.append(json.loads(line))
+            except ValueError as e:
+                raise ParseError(f"NDJSON parse error on line {line_number} - {e}") from e
+        return values
@@ -0,0 +1,210 @@
+"""
+Module for keeping the search index of the videos in step with the database. The index is built from the database on
+the first search, then videos written by this process, one at a time or by a bulk upsert, are updated in the index as
+they're committed.
+
+Videos written by other processes, e.g. the management commands, are found by checking a cheap marker of the table -
+the number of videos and the newest upload time - at most every `constants.SEARCH_INDEX_CHECK_SECONDS`. When the
+marker has changed, or the index is older than `constants.SEARCH_INDEX_MAX_AGE_SECONDS`, which picks up edits that
+don't change the marker, a new index is built in a background thread and swapped in. Searches carry on using the old
+index meanwhile, so only the first search waits for an index to be built.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, List, Optional, Tuple
+
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from today import constants
+from today.models import Video, videos_upserted
+from today.search_index import SearchIndex
+
+logger = logging.getLogger(__name__)
+
+# A change to the index: the video ID, and the fields and upload time to index it with, or None to remove it
+Change = Tuple[str, Optional[Tuple[dict, float]]]
+
+_index: Optional[SearchIndex] = None
+_index_marker: Optional[Tuple[int, Optional[datetime]]] = None
+_index_built_at = 0.0
+_marker_checked_at = 0.0
+_refreshing = False
+# The changes made while a new index is being built, to apply to it before it's swapped in
+_pending: List[Change] = []
+_lock = threading.Lock()
+_build_lock = threading.Lock()
+
+
+def get_table_marker() -> Tuple[int, Optional[datetime]]:
+    """
+    Get a marker of the state of the videos table, see `VideoQuerySet.table_marker`
+    :return: The number of videos and the newest upload time
+    """
+    return Video.objects.table_marker()
+
+
+def build_search_index() -> SearchIndex:
+    """
+    Build a search index of every video in the database
+    :return: The index
+    """
+    index = SearchIndex()
+    rows = Video.objects.values_list("video_id", "upload_time", *index.fields).iterator(chunk_size=2000)
+    index.add_many(
+        (video_id, dict(zip(index.fields, texts)), upload_time.timestamp() if upload_time is not None else 0.0)
+        for video_id, upload_time, *texts in rows
+    )
+    return index
+
+
+def get_search_index() -> SearchIndex:
+    """
+    Get the search index, building it if it hasn't been built yet, and starting a refresh in the background if it may
+    be out of date
+    :return: The index
+    """
+    with _lock:
+        index = _index
+    if index is None:
+        with _build_lock:
+            return _index if _index is not None else _rebuild()
+    _refresh_in_background()
+    return index
+
+
+def refresh_search_index(force: bool = False) -> bool:
+    """
+    Rebuild the search index if the videos table has changed since it was built or it's older than
+    `constants.SEARCH_INDEX_MAX_AGE_SECONDS`. Searches use the current index until the new one is swapped in.
+    :param force: Whether to rebuild the index even if it looks up to date
+    :return: Whether the index was rebuilt
+    """
+    with _lock:
+        marker, built_at = _index_marker, _index_built_at
+    expired = time.monotonic() - built_at > constants.SEARCH_INDEX_MAX_AGE_SECONDS
+    if force is False and expired is False and get_table_marker() == marker:
+        return False
+    with _build_lock:
+        _rebuild()
+    return True
+
+
+def clear_search_index() -> None:
+    """Drop the search index, so it's built again by the next search"""
+    global _index, _index_marker, _index_built_at, _marker_checked_at
+    with _lock:
+        _index, _index_marker, _index_built_at, _marker_checked_at = None, None, 0.0, 0.0
+
+
+def _rebuild() -> SearchIndex:
+    """
+    Build a new index and swap it in, with any changes made while it was being built. Hold `_build_lock`.
+    :return: The new index
+    """
+    global _index, _index_marker, _index_built_at, _pending
+    with _lock:
+        _pending = []
+    # Take the marker first, so videos added while the index is built are picked up by the next refresh
+    marker = get_table_marker()
+    start = time.perf_counter()
+    index = build_search_index()
+    with _lock:
+        pending, _pending = _pending, []
+        for change in pending:
+            _apply_change(index, change)
+        _index, _index_marker, _index_built_at = index, marker, time.monotonic()
+    logger.info(f"Built the search index of {len(index)} videos in {time.perf_counter() - start:.1f}s")
+    if pending:
+        _update_marker()
+    return index
+
+
+def _refresh_in_background() -> None:
+    """Start refreshing the index in a background thread, if it's time to check it and it isn't being refreshed"""
+    global _refreshing, _marker_checked_at
+    now = time.monotonic()
+    with _lock:
+        if _refreshing or now - _marker_checked_at < constants.SEARCH_INDEX_CHECK_SECONDS:
+            return
+        _refreshing = True
+        _marker_checked_at = now
+    threading.Thread(target=_refresh, name="search-index-refresh", daemon=True).start()
+
+
+def _refresh() -> None:
+    global _refreshing
+    try:
+        refresh_search_index()
+    except Exception:
+        logger.exception("Failed to refresh the search index")
+    finally:
+        with _lock:
+            _refreshing = False
+        # Django opens a connection per thread, which isn't closed at the end of a request here
+        connections.close_all()
+
+
+def _apply(changes: List[Change]) -> None:
+    """
+    Apply changes made by this process to the index, and to the index being built if there is one
+    :param changes: The changes
+    """
+    with _lock:
+        if _index is None:
+            return
+        for change in changes:
+            _apply_change(_index, change)
+        if _build_lock.locked():
+            _pending.extend(changes)
+    # The videos written by this process shouldn't make the next refresh rebuild the index
+    _update_marker()
+
+
+def _apply_change(index: SearchIndex, change: Change) -> None:
+    video_id, document = change
+    if document is None:
+        index.remove(video_id)
+    else:
+        index.add(video_id, *document)
+
+
+def _update_marker() -> None:
+    global _index_marker
+    marker = get_table_marker()
+    with _lock:
+        _index_marker = marker
+
+
+def _changes(videos: Iterable[Video]) -> List[Change]:
+    fields = list(constants.SEARCH_FIELD_WEIGHTS)
+    return [
+        (video.video_id, (
+            {field: getattr(video, field) for field in fields},
+            video.upload_time.timestamp() if video.upload_time is not None else 0.0,
+        ))
+        for video in videos
+    ]
+
+
+@receiver(post_save, sender=Video)
+def _update_on_save(sender, instance: Video, **kwargs) -> None:
+    transaction.on_commit(lambda: _apply(_changes([instance])))
+
+
+@receiver(post_delete, sender=Video)
+def _update_on_delete(sender, instance: Video, **kwargs) -> None:
+    video_id = instance.video_id
+    transaction.on_commit(lambda: _apply([(video_id, None)]))
+
+
+@receiver(videos_upserted)
+def _update_on_upsert(sender, video_ids: List[str], **kwargs) -> None:
+    if _index is None:
+        return
+    # The upserted videos only hold the fields that were written, so read the whole videos back
+    fields = ["video_id", "upload_time", *constants.SEARCH_FIELD_WEIGHTS]
+    _apply(_changes(Video.objects.filter(video_id__in=video_ids).only(*fields)))
@@ -0,0 +1,208 @@
+"""
+Module with an in-memory inverted index for searching the text of the videos. Text is matched ignoring case and accents,
+so 'nino' finds 'niño' and 'Canción' finds 'cancion', and the last word of a query can match as a prefix for search as
+you type. The index has no Django dependencies, see `today.search` for keeping it in step with the database.
+"""
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from today import constants
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+
+def normalise(text: str) -> str:
+    """
+    Lower case text and strip its accents
+    :param text: The text
+    :return: The normalised text, e.g. 'el niño' for 'El Niño'
+    """
+    decomposed = unicodedata.normalize("NFKD", text.casefold())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+def tokenise(text: Optional[str]) -> List[str]:
+    """
+    Split text into normalised words
+    :param text: The text, may be None
+    :return: The words, in the order they appear
+    """
+    return TOKEN_PATTERN.findall(normalise(text)) if text else []
+
+
+@dataclass
+class SearchHit:
+    """A video matching a search, with its score"""
+    video_id: str
+    score: float
+
+
+class SearchIndex:
+    """
+    Maps each word to the videos containing it, and which of their fields it's in. Videos can be added, replaced and
+    removed one at a time, so the index is updated as videos are written rather than rebuilt. Safe to use from several
+    threads.
+    """
+
+    def __init__(self, field_weights: Mapping[str, float] = constants.SEARCH_FIELD_WEIGHTS):
+        """
+        Initialise a SearchIndex object
+        :param field_weights: The fields to index and the weight of a match in each, e.g. a match in 'word' counts
+        for more than one in 'description'
+        """
+        self.fields = list(field_weights)
+        # The score of a match in each combination of fields, indexed by the bit mask of the fields
+        self._mask_scores = [
+            sum(field_weights[field] for bit, field in enumerate(self.fields) if mask >> bit & 1)
+            for mask in range(1 << len(self.fields))
+        ]
+        # Videos are numbered, so the postings hold small ints rather than video IDs
+        self._doc_ids: Dict[str, int] = {}
+        self._video_ids: List[Optional[str]] = []
+        self._upload_times: List[float] = []
+        self._doc_tokens: List[Tuple[str, ...]] = []
+        # word -> {doc: bit mask of the fields the word is in}
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._sorted_tokens: List[str] = []
+        self._sorted = True
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._doc_ids)
+
+    def add(self, video_id: str, fields: Mapping[str, Optional[str]], upload_time: float = 0.0) -> None:
+        """
+        Add a video to the index, replacing it if it's already indexed
+        :param video_id: The ID of the video
+        :param fields: The text of each field of the video, fields not in the index are ignored
+        :param upload_time: The upload time of the video as a timestamp, newer videos rank first among equal matches
+        """
+        masks: Dict[str, int] = {}
+        for bit, field in enumerate(self.fields):
+            for token in tokenise(fields.get(field)):
+                masks[token] = masks.get(token, 0) | (1 << bit)
+
+        with self._lock:
+            doc = self._doc_ids.get(video_id)
+            if doc is None:
+                doc = len(self._video_ids)
+                self._doc_ids[video_id] = doc
+                self._video_ids.append(video_id)
+                self._upload_times.append(upload_time)
+                self._doc_tokens.append(())
+            else:
+                self._remove_postings(doc)
+                self._upload_times[doc] = upload_time
+            for token, mask in masks.items():
+                postings = self._postings.get(token)
+                if postings is None:
+                    postings = self._postings[token] = {}
+                    self._sorted = False
+                postings[doc] = mask
+            self._doc_tokens[doc] = tuple(masks)
+
+    def add_many(self, videos: Iterable[Tuple[str, Mapping[str, Optional[str]], float]]) -> None:
+        """
+        Add several videos to the index
+        :param videos: The video ID, fields and upload time of each video, see `add`
+        """
+        with self._lock:
+            for video_id, fields, upload_time in videos:
+                self.add(video_id, fields, upload_time)
+
+    def remove(self, video_id: str) -> None:
+        """
+        Remove a video from the index, if it's indexed
+        :param video_id: The ID of the video
+        """
+        with self._lock:
+            doc = self._doc_ids.pop(video_id, None)
+            if doc is not None:
+                self._remove_postings(doc)
+                self._video_ids[doc] = None
+                self._doc_tokens[doc] = ()
+
+    def _remove_postings(self, doc: int) -> None:
+        for token in self._doc_tokens[doc]:
+            postings = self._postings[token]
+            del postings[doc]
+            if not postings:
+                del self._postings[token]
+                self._sorted = False
+
+    def _expand(self, term: str, prefix: bool) -> List[str]:
+        """
+        Get the indexed words a query term matches
+        :param term: The normalised term
+        :param prefix: Whether the term matches the words starting with it, as well as the word itself
+        :return: The words, at most `constants.SEARCH_MAX_PREFIX_TERMS` for a prefix
+        """
+        if not prefix or len(term) < constants.SEARCH_MIN_PREFIX_LENGTH:
+            return [term] if term in self._postings else []
+        if not self._sorted:
+            self._sorted_tokens = sorted(self._postings)
+            self._sorted = True
+        matches: List[str] = []
+        for position in range(bisect_left(self._sorted_tokens, term), len(self._sorted_tokens)):
+            token = self._sorted_tokens[position]
+            if not token.startswith(term) or len(matches) == constants.SEARCH_MAX_PREFIX_TERMS:
+                break
+            matches.append(token)
+        return matches
+
+    def search(
+            self,
+            query: str,
+            fields: Optional[Sequence[str]] = None,
+            prefix: bool = True,
+            limit: int = constants.SEARCH_DEFAULT_LIMIT,
+    ) -> List[SearchHit]:
+        """
+        Find the videos containing every word of a query
+        :param query: The query, matched ignoring case and accents
+        :param fields: Optional. The fields to match in, defaults to all of them
+        :param prefix: Whether the last word of the query also matches the words starting with it
+        :param limit: The max number of videos to return
+        :return: The best matching videos, best first. A video scores the weight of each field a query word is in,
+        doubled for a whole word rather than a prefix. Equal scores are ordered newest first.
+        """
+        terms = tokenise(query)
+        if not terms or limit < 1:
+            return []
+        field_mask = sum(1 << self.fields.index(field) for field in fields) if fields else (1 << len(self.fields)) - 1
+
+        with self._lock:
+            scores: Optional[Dict[int, float]] = None
+            # Match the rarest terms first, so the candidates are narrowed down as quickly as possible
+            last = len(terms) - 1
+            expanded = [self._expand(term, prefix and position == last) for position, term in enumerate(terms)]
+            for term, tokens in sorted(zip(terms, expanded), key=lambda item: self._frequency(item[1])):
+                term_scores: Dict[int, float] = {}
+                for token in tokens:
+                    mask_scores = [score * (2.0 if token == term else 1.0) for score in self._mask_scores]
+                    postings: Iterable[Tuple[int, int]] = self._postings[token].items()
+                    if scores is not None:
+                        postings = [(doc, mask) for doc, mask in postings if doc in scores]
+                    for doc, mask in postings:
+                        score = mask_scores[mask & field_mask]
+                        if score > term_scores.get(doc, 0.0):
+                            term_scores[doc] = score
+                if scores is None:
+                    scores = term_scores
+                else:
+                    scores = {doc: scores[doc] + score for doc, score in term_scores.items()}
+                if not scores:
+                    return []
+
+            best = heapq.nlargest(
+                limit, (scores or {}).items(), key=lambda item: (item[1], self._upload_times[item[0]])
+            )
+            return [SearchHit(video_id=str(self._video_ids[doc]), score=score) for doc, score in best]
+
+    def _frequency(self, tokens: List[str]) -> int:
+        return sum(len(self._postings[token]) for token in tokens)
@@ -1,10 +1,25 @@
 """Module for defining serializers in the 'today' app to (de)serialize the data passed in API requests/responses"""
+from typing import Any, Dict, List, Optional, Sequence
+
 from rest_framework import serializers
 
 from today.models import Video
 
 
-class VideoDetailsSerializer(serializers.ModelSerializer):
+class ProjectedFieldsMixin:
+    """
+    Mixin for a ModelSerializer that can output a subset of its fields, passed as the `fields` keyword argument, e.g.
+    VideoDetailsSerializer(videos, many=True, fields=["video_id", "thumbnail_url"])
+    """
+
+    def __init__(self, *args, fields: Optional[Sequence[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):  # type: ignore[attr-defined]
+                self.fields.pop(name)  # type: ignore[attr-defined]
+
+
+class VideoDetailsSerializer(ProjectedFieldsMixin, serializers.ModelSerializer):
     """
     Serializer for the VideoDetails model, which handles video metadata and
     associated word/sentence data for use in API responses.
@@ -31,3 +46,30 @@ class VideoDetailsSerializer(serializers.ModelSerializer):
             "upload_time",
             "thumbnail_url",
         ]
+
+
+class VideoBulkWriteSerializer(VideoDetailsSerializer):
+    """
+    Serializer for the videos in a request to the bulk write-to-db endpoint. The videos may already exist, in which case
+    they are updated, so the video_id isn't checked for uniqueness. Used with many=True to validate every video.
+    """
+    class Meta(VideoDetailsSerializer.Meta):
+        extra_kwargs: Dict[str, Dict[str, Any]] = {"video_id": {"validators": []}}
+
+
+def serialize_columns(videos: Sequence[Video], fields: Sequence[str]) -> Dict[str, List[Any]]:
+    """
+    Serialize videos as columns, e.g. {"video_id": ["a", "b"], "thumbnail_url": ["https://...", "https://..."]}. Each
+    value is formatted as `VideoDetailsSerializer` would, but without building a serializer for every video, which is
+    much faster for large pages.
+    :param videos: The videos
+    :param fields: The fields to output, in order
+    :return: The list of values of each field, in the order of the videos
+    """
+    serializer_fields = VideoDetailsSerializer().fields
+    columns = {}
+    for name in fields:
+        to_representation = serializer_fields[name].to_representation
+        values = (getattr(video, name) for video in videos)
+        columns[name] = [to_representation(value) if value is not None else None for value in values]
+    return columns
@@ -1,3 +1,369 @@
-from django.test import TestCase
+"""Module for testing the API of the 'today' app"""
+import base64
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from unittest.mock import MagicMock, patch
 
-# Create your tests here.
+from django.test import SimpleTestCase, TestCase
+
+from today import constants, search
+from today.caching import get_response_cache
+from today.models import Video
+from today.pagination import InvalidCursorError, decode_cursor, encode_cursor, keyset_page
+from today.search_index import SearchIndex, normalise, tokenise
+
+
+@patch.dict(os.environ, {"EXPECTED_API_KEY": "key"})
+class TestBulkWrite(TestCase):
+    """Class for testing writing the metadata of several videos in one request"""
+
+    url = "/api/today/videos/write-to-db/bulk/"
+
+    def post(self, videos):
+        """Post videos to the bulk write endpoint"""
+        return self.client.post(self.url, videos, content_type="application/json", HTTP_X_API_KEY="key")
+
+    def test_bulk_write(self):
+        """Test that new videos are created, and only the given fields of existing videos are updated"""
+        Video.objects.create(video_id="old", title="Old title", word="palabra")
+        response = self.post([{"video_id": "new", "title": "New"}, {"video_id": "old", "title": "Updated title"}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["results"], [
+            {"video_id": "new", "status": "created"}, {"video_id": "old", "status": "updated"},
+        ])
+        old = Video.objects.get(video_id="old")
+        self.assertEqual((old.title, old.word), ("Updated title", "palabra"))
+
+    def test_duplicate_videos(self):
+        """Test that a video given more than once is written once, with the fields of every entry"""
+        response = self.post([
+            {"video_id": "dup", "title": "First"},
+            {"video_id": "other", "title": "Other"},
+            {"video_id": "dup", "word": "palabra", "title": "Second"},
+        ])
+
+        self.assertEqual(response.json(), {
+            "results": [{"video_id": "dup", "status": "created"}, {"video_id": "other", "status": "created"}],
+            "created": 2,
+            "updated": 0,
+        })
+        dup = Video.objects.get(video_id="dup")
+        self.assertEqual((dup.title, dup.word), ("Second", "palabra"))
+
+    def test_invalid_video(self):
+        """Test that no videos are written if any of them is invalid"""
+        response = self.post([{"video_id": "valid"}, {"video_id": "invalid", "thumbnail_url": "not a url"}])
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Video.objects.exists())
+
+
+class TestKeysetPagination(TestCase):
+    """Class for testing cursor pagination of the videos, including across videos uploaded at the same time"""
+
+    start = datetime(2024, 1, 1, 12, tzinfo=timezone.utc)
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create three videos uploaded at the same time, two an hour later, one two days later and one with no time"""
+        for video_id, hours in [("a", 0), ("b", 0), ("c", 0), ("d", 1), ("e", 1), ("f", 48)]:
+            Video.objects.create(video_id=video_id, upload_time=cls.start + timedelta(hours=hours))
+        Video.objects.create(video_id="z", upload_time=None)
+
+    def setUp(self):
+        """Clear the cached responses, as changes aren't committed within a test"""
+        get_response_cache().clear()
+
+    @staticmethod
+    def video_ids(page):
+        """Get the IDs of the videos on a page"""
+        return [video.video_id for video in page.videos]
+
+    def test_forward_and_back(self):
+        """Test paging forward to the last page and back to the first, with no videos skipped or repeated"""
+        first = keyset_page(Video.objects.all(), None, 2)
+        second = keyset_page(Video.objects.all(), first.next_cursor, 2)
+        third = keyset_page(Video.objects.all(), second.next_cursor, 2)
+        pages = [self.video_ids(page) for page in (first, second, third)]
+        self.assertEqual(pages, [["f", "e"], ["d", "c"], ["b", "a"]])
+        self.assertIsNone(first.prev_cursor)
+        self.assertIsNone(third.next_cursor)
+
+        back = keyset_page(Video.objects.all(), third.prev_cursor, 2)
+        self.assertEqual(self.video_ids(back), ["d", "c"])
+        back = keyset_page(Video.objects.all(), back.prev_cursor, 2)
+        self.assertEqual(self.video_ids(back), ["f", "e"])
+        self.assertIsNone(back.prev_cursor)
+        self.assertIsNotNone(back.next_cursor)
+
+    def test_single_page(self):
+        """Test that a page holding every video has no cursors, and videos without an upload time are left out"""
+        page = keyset_page(Video.objects.all(), None, 10)
+        self.assertEqual(self.video_ids(page), ["f", "e", "d", "c", "b", "a"])
+        self.assertIsNone(page.next_cursor)
+        self.assertIsNone(page.prev_cursor)
+
+    def test_invalid_cursor(self):
+        """Test that cursors which aren't valid or have been tampered with raise an InvalidCursorError"""
+        valid = encode_cursor(Video.objects.get(video_id="d"), "next")
+        self.assertEqual(decode_cursor(valid).video_id, "d")
+        tampered = [
+            "not a cursor!",
+            base64.urlsafe_b64encode(b"not json").decode(),
+            base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00+00:00", "id": "d"}').decode(),
+            base64.urlsafe_b64encode(b'{"t": "2024-01-01T00:00:00+00:00", "id": "d", "d": "sideways"}').decode(),
+            base64.urlsafe_b64encode(b'{"t": "yesterday", "id": "d", "d": "next"}').decode(),
+            base64.urlsafe_b64encode(b'["2024-01-01T00:00:00+00:00", "d", "next"]').decode(),
+        ]
+        for cursor in tampered:
+            with self.subTest(cursor=cursor), self.assertRaises(InvalidCursorError):
+                keyset_page(Video.objects.all(), cursor, 2)
+
+        response = self.client.get("/api/today/videos/paginated-videos/", {"cursor": "not a cursor!"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_date_filter_with_cursor(self):
+        """Test that the date filters apply to every page of the paginated-videos endpoint in cursor mode"""
+        url = "/api/today/videos/paginated-videos/"
+        params = {"mode": "cursor", "limit": 2, "start_date": "2024-01-01", "end_date": "2024-01-02"}
+        first = self.client.get(url, params).json()
+        self.assertEqual([video["video_id"] for video in first["videos"]], ["e", "d"])
+
+        second = self.client.get(url, {**params, "cursor": first["next_cursor"]}).json()
+        self.assertEqual([video["video_id"] for video in second["videos"]], ["c", "b"])
+        third = self.client.get(url, {**params, "cursor": second["next_cursor"], "include_total": "true"}).json()
+        self.assertEqual([video["video_id"] for video in third["videos"]], ["a"])
+        self.assertIsNone(third["next_cursor"])
+        self.assertEqual(third["total_videos"], 5)
+
+
+class TestResponseCache(TestCase):
+    """Class for testing caching the responses of the read endpoints, and revalidating them with ETags"""
+
+    url = "/api/today/videos/latest/"
+
+    def setUp(self):
+        """Clear the cached responses and create a video"""
+        get_response_cache().clear()
+        patch("today.caching._marker", None).start()
+        self.addCleanup(patch.stopall)
+        Video.objects.create(video_id="v1", title="Title", upload_time=datetime(2024, 1, 1, tzinfo=timezone.utc))
+
+    def test_revalidate(self):
+        """Test that a cached response is reused, and a client with its ETag gets a 304"""
+        first = self.client.get(self.url)
+        self.assertEqual((first.status_code, first["X-Cache"]), (200, "MISS"))
+        second = self.client.get(self.url)
+        self.assertEqual((second["X-Cache"], second["ETag"]), ("HIT", first["ETag"]))
+
+        not_modified = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(not_modified.status_code, 304)
+
+    def test_added_by_another_process(self):
+        """
+        Test that a video added without invalidating this process's cache (e.g. by a management command) is returned
+        once the table marker is read again, rather than the cached response or a 304
+        """
+        first = self.client.get(self.url)
+        # bulk_create doesn't send post_save, so the version in this process's cache isn't changed
+        Video.objects.bulk_create([Video(video_id="v2", upload_time=datetime(2024, 1, 2, tzinfo=timezone.utc))])
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        with patch.object(constants, "RESPONSE_CACHE_MARKER_SECONDS", 0):
+            changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual((changed.status_code, changed["X-Cache"]), (200, "MISS"))
+        self.assertEqual(changed.json()["video_id"], "v2")
+
+    def test_changed_by_another_process(self):
+        """
+        Test that once the cached response expires, videos edited without invalidating this process's cache or
+        changing the table marker are returned to a client revalidating its old copy, rather than a 304
+        """
+        first = self.client.get(self.url)
+        # update() doesn't send post_save, so the version in this process's cache isn't changed
+        Video.objects.filter(video_id="v1").update(title="Changed")
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"]).status_code, 304)
+
+        expired = time.time() + constants.RESPONSE_CACHE_TTL_SECONDS + 1
+        with patch("time.time", return_value=expired):
+            changed = self.client.get(self.url, HTTP_IF_NONE_MATCH=first["ETag"])
+            self.assertEqual(changed.status_code, 200)
+            self.assertEqual(changed.json()["title"], "Changed")
+            self.assertNotEqual(changed["ETag"], first["ETag"])
+
+            # A response rebuilt with the same videos keeps its ETag
+            unchanged = self.client.get(self.url, HTTP_IF_NONE_MATCH=changed["ETag"])
+            self.assertEqual(unchanged.status_code, 304)
+
+
+class TestSearchIndex(SimpleTestCase):
+    """Class for testing matching and ranking videos in the search index"""
+
+    def setUp(self):
+        """Index a few videos, the newest last"""
+        self.index = SearchIndex()
+        self.index.add_many([
+            ("nino", {"word": "niño", "sentence": "El niño juega", "description": "Learn niño"}, 1.0),
+            ("cancion", {"word": "canción", "sentence": "Una canción bonita", "description": "Learn canción"}, 2.0),
+            ("canal", {"word": "canal", "sentence": "El canal es largo", "description": "Learn canal"}, 3.0),
+            ("juego", {"word": "juego", "sentence": "Un juego para el niño", "description": "Learn juego"}, 4.0),
+        ])
+
+    def search(self, query, **kwargs):
+        """Search the index, returning the IDs of the matching videos"""
+        return [hit.video_id for hit in self.index.search(query, **kwargs)]
+
+    def test_normalise(self):
+        """Test that text is lower cased and stripped of accents, and split into words"""
+        self.assertEqual(normalise("El NIÑO cantó"), "el nino canto")
+        self.assertEqual(tokenise("¿Qué tal, señor?"), ["que", "tal", "senor"])
+        self.assertEqual(tokenise(None), [])
+
+    def test_accents_ignored(self):
+        """Test that a query matches with or without accents and in any case"""
+        for query in ("niño", "nino", "NIÑO"):
+            with self.subTest(query=query):
+                self.assertEqual(self.search(query, prefix=False), ["nino", "juego"])
+        self.assertEqual(self.search("Cancion", prefix=False), ["cancion"])
+
+    def test_prefix(self):
+        """Test that only the last word of a query matches as a prefix, and only when it's long enough"""
+        self.assertEqual(self.search("can"), ["canal", "cancion"])
+        self.assertEqual(self.search("can", prefix=False), [])
+        self.assertEqual(self.search("c"), [])
+        self.assertEqual(self.search("can largo"), [])
+        self.assertEqual(self.search("largo can"), ["canal"])
+
+    def test_fields(self):
+        """Test that a search can be limited to some of the fields"""
+        self.assertEqual(self.search("juega", prefix=False), ["nino"])
+        self.assertEqual(self.search("juega", fields=["word"], prefix=False), [])
+        self.assertEqual(self.search("nino", fields=["sentence"], prefix=False), ["juego", "nino"])
+
+    def test_ranking(self):
+        """Test that matches in the word rank first, whole words before prefixes, and newer videos among equals"""
+        hits = self.index.search("niño", prefix=False)
+        self.assertEqual([hit.video_id for hit in hits], ["nino", "juego"])
+        self.assertGreater(hits[0].score, hits[1].score)
+        self.assertEqual(self.search("can"), ["canal", "cancion"])
+        self.index.add("cana", {"word": "cana", "sentence": "Una cana", "description": "Learn cana"}, 0.0)
+        self.assertEqual(self.search("cana"), ["cana", "canal"])
+        self.assertEqual(self.search("learn", limit=2), ["juego", "canal"])
+        self.assertEqual(self.search("learn", limit=0), [])
+
+    def test_update_and_remove(self):
+        """Test that re-adding a video replaces its words, and removed videos aren't found"""
+        self.index.add("canal", {"word": "río"}, 3.0)
+        self.assertEqual(self.search("canal", prefix=False), [])
+        self.assertEqual(self.search("rio"), ["canal"])
+        self.index.remove("canal")
+        self.assertEqual(self.search("rio"), [])
+        self.assertEqual(len(self.index), 3)
+
+
+class TestSearchRefresh(TestCase):
+    """Class for testing keeping the search index in step with the database"""
+
+    def setUp(self):
+        """Drop the index built by other tests, and count the times it's built"""
+        search.clear_search_index()
+        self.addCleanup(search.clear_search_index)
+        Video.objects.create(video_id="v1", word="hola", upload_time=datetime(2024, 1, 1, tzinfo=timezone.utc))
+        self.build = patch("today.search.build_search_index", wraps=search.build_search_index).start()
+        # Run the refreshes when they're started rather than in another thread, which can't see the test's data, and
+        # keep the test's connection open
+        self.thread = patch("today.search.threading.Thread").start()
+        self.thread.side_effect = lambda target, **kwargs: MagicMock(start=target)
+        patch("today.search.connections").start()
+        self.addCleanup(patch.stopall)
+
+    def found(self, query):
+        """Search the index, returning the IDs of the matching videos"""
+        return [hit.video_id for hit in search.get_search_index().search(query)]
+
+    def test_incremental_updates(self):
+        """Test that videos written by this process, including by a bulk upsert, are updated without a rebuild"""
+        self.assertEqual(self.found("hola"), ["v1"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.create(video_id="v2", word="adios")
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.upsert([Video(video_id="v1", word="gracias"), Video(video_id="v3", word="hola")],
+                                 update_fields=["word"])
+        with self.captureOnCommitCallbacks(execute=True):
+            Video.objects.get(video_id="v2").delete()
+
+        self.assertEqual(self.found("hola"), ["v3"])
+        self.assertEqual(self.found("gracias"), ["v1"])
+        self.assertEqual(self.found("adios"), [])
+        self.assertEqual(self.build.call_count, 1)
+        self.assertFalse(search.refresh_search_index())
+
+    def test_refresh_in_background(self):
+        """Test that searches start a refresh in the background, which only rebuilds the index if the table changed"""
+        self.assertEqual(self.found("hola"), ["v1"])
+        self.thread.assert_not_called()
+        # Another process adds a video, which doesn't update this process's index
+        Video.objects.bulk_create([Video(video_id="v2", word="hola")])
+        # The search that starts the refresh uses the index it had
+        self.assertEqual(self.found("hola"), ["v1"])
+        self.thread.assert_called_once()
+        self.assertIs(self.thread.call_args.kwargs["daemon"], True)
+        self.assertEqual(self.build.call_count, 2)
+        self.assertEqual(set(self.found("hola")), {"v1", "v2"})
+        self.assertEqual(self.thread.call_count, 1, "Refreshes at most every SEARCH_INDEX_CHECK_SECONDS")
+
+        self.assertFalse(search.refresh_search_index())
+        self.assertTrue(search.refresh_search_index(force=True))
+        self.assertEqual(self.build.call_count, 3)
+
+
+class TestFieldProjection(TestCase):
+    """Class for testing returning some of the fields of the videos, and returning them as columns"""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create two videos, the second uploaded a day after the first"""
+        for number in range(2):
+            Video.objects.create(
+                video_id=f"v{number}",
+                word=f"palabra{number}",
+                thumbnail_url=f"https://example.com/{number}.jpg",
+                upload_time=datetime(2024, 1, 1 + number, tzinfo=timezone.utc),
+            )
+
+    def setUp(self):
+        """Clear the cached responses"""
+        get_response_cache().clear()
+        search.clear_search_index()
+        self.addCleanup(search.clear_search_index)
+
+    def test_fields(self):
+        """Test that only the requested fields are returned"""
+        response = self.client.get("/api/today/videos/latest/", {"fields": "thumbnail_url,video_id"})
+        self.assertEqual(response.json(), {"video_id": "v1", "thumbnail_url": "https://example.com/1.jpg"})
+
+        response = self.client.get("/api/today/videos/", {"fields": "word"})
+        self.assertEqual(sorted(response.json(), key=lambda video: video["word"]),
+                         [{"word": "palabra0"}, {"word": "palabra1"}])
+
+    def test_invalid_fields(self):
+        """Test that unknown or empty fields are rejected"""
+        for fields in ("video_id,views", ","):
+            with self.subTest(fields=fields):
+                response = self.client.get("/api/today/videos/latest/", {"fields": fields})
+                self.assertEqual(response.status_code, 400)
+
+    def test_compact(self):
+        """Test that the endpoints listing videos return columns when compact"""
+        params = {"fields": "video_id,word", "compact": "true"}
+        expected = {"video_id": ["v1", "v0"], "word": ["palabra1", "palabra0"]}
+        numbered = self.client.get("/api/today/videos/paginated-videos/", params).json()
+        self.assertEqual(numbered["videos"], expected)
+        self.assertEqual(numbered["total_videos"], 2)
+        cursor = self.client.get("/api/today/videos/paginated-videos/", {**params, "mode": "cursor"}).json()
+        self.assertEqual(cursor["videos"], expected)
+
+        searched = self.client.get("/api/today/videos/search/", {"q": "palabra1", "fields": "word", "compact": "true"})
+        self.assertEqual(searched.json()["results"], {"word": ["palabra1"], "score": [8.0]})
@@ -1,16 +1,25 @@
 """Module for defining API views in the 'today' app"""
-from typing import Optional
+from itertools import groupby
+from typing import Any, Dict, Iterable, List, Optional
 
 from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
+from django.db import transaction
 from django.utils import dateparse
 from django.core import paginator
 
+from today import constants
+from today.caching import cached_response
 from today.models import Video
-from today.serializers import VideoDetailsSerializer
+from today.pagination import InvalidCursorError, keyset_page
+from today.parsers import NDJSONParser
+from today.search import get_search_index
+from today.serializers import VideoBulkWriteSerializer, VideoDetailsSerializer, serialize_columns
 from video_host.permissions import HasValidApiKey
 
 
@@ -18,12 +27,72 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
     """
     API endpoint for retrieving and manipulating VideoDetails instances
 
-    Provides standard CRUD operations on Video data.
+    Provides standard CRUD operations on Video data. Every GET endpoint takes a 'fields' query parameter, a comma
+    separated list of the fields to return, e.g. 'fields=video_id,thumbnail_url', which also narrows the columns read
+    from the database. The endpoints listing videos also take 'compact=true', to return the videos as columns - a list
+    of the values of each field - rather than a list of objects, which is smaller and much faster to build for large
+    pages.
     """
     queryset = Video.objects.all()
     serializer_class = VideoDetailsSerializer
 
+    def requested_fields(self) -> Optional[List[str]]:
+        """
+        Get the fields requested by the 'fields' query parameter of a GET request
+        :return: The fields in the order requested, or None if the parameter isn't given
+        """
+        if self.request.method != "GET" or "fields" not in self.request.query_params:
+            return None
+        fields = [field.strip() for field in self.request.query_params["fields"].split(",") if field.strip()]
+        unknown_fields = sorted(set(fields) - set(VideoDetailsSerializer.Meta.fields))
+        if not fields or unknown_fields:
+            raise ValidationError(
+                {"fields": f"Unknown fields {unknown_fields}, expected some of {VideoDetailsSerializer.Meta.fields}"}
+            )
+        return list(dict.fromkeys(fields))
+
+    def get_queryset(self):
+        """Get the videos, loading only the requested fields from the database"""
+        queryset = super().get_queryset()
+        fields = self.requested_fields()
+        if fields is not None:
+            # upload_time orders the lists, and positions the cursors of cursor pagination
+            queryset = queryset.only(*fields, "upload_time")
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        """Get a serializer outputting only the requested fields"""
+        fields = self.requested_fields()
+        if fields is not None:
+            kwargs.setdefault("fields", fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def compact(self) -> bool:
+        """Whether the 'compact' query parameter asks for the videos to be returned as columns"""
+        return self.request.query_params.get("compact", "false").lower() == "true"
+
+    def serialize_videos(self, videos: Iterable[Video]) -> Any:
+        """
+        Serialize a list of videos with the requested fields
+        :param videos: The videos
+        :return: A list of the videos, or the columns of their fields if compact
+        """
+        if self.compact():
+            return serialize_columns(list(videos), self.requested_fields() or VideoDetailsSerializer.Meta.fields)
+        return self.get_serializer(videos, many=True).data
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """
+        Lists the videos, as columns if compact
+        :param request: The HTTP request containing query parameters.
+        :return: A JSON response with the videos
+        """
+        if self.compact():
+            return Response(self.serialize_videos(self.filter_queryset(self.get_queryset())))
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False, methods=["get"], url_path="latest")
+    @cached_response
     def latest_video(self, request: Request) -> Response:
         """
         Fetches the most recently uploaded video
@@ -37,24 +106,89 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
             return Response(serializer.data)
         return Response({"detail": "No videos available"}, status=404)
 
+    @action(detail=False, methods=["get"], url_path="search")
+    @cached_response
+    def search(self, request: Request) -> Response:
+        """
+        Searches the words, sentences and descriptions of the videos, e.g. for the video for a word or the videos whose
+        sentence uses it. Matching ignores case and accents, so 'nino' finds 'niño', and every word of the query must
+        match. See `today.search_index`.
+
+        Query Parameters:
+            - q (str): The words to search for.
+            - in (str, optional): A comma separated list of the fields to search - word, sentence,
+              translated_sentence and description (default is all of them).
+            - prefix (bool, optional): Whether the last word of the query matches the words starting with it, for
+              search as you type (default is true).
+            - limit (int, optional): The max number of videos to return (default is 20, at most 100).
+            - fields (str, optional): A comma separated list of the fields to return (default is all of them).
+            - compact (bool, optional): Whether to return the videos as columns, with a column of the scores
+              (default is false).
+
+        :param request: The HTTP request containing query parameters.
+        :return: A JSON response with the best matching videos first, each with its 'score', or a 400 if the query
+        parameters are invalid
+        """
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"detail": "A search query 'q' is required"}, status=400)
+
+        index = get_search_index()
+        fields = [field.strip() for field in request.query_params.get("in", "").split(",") if field.strip()]
+        unknown_fields = sorted(set(fields) - set(index.fields))
+        if unknown_fields:
+            return Response({"detail": f"Unknown fields {unknown_fields}, expected some of {index.fields}"}, status=400)
+        try:
+            limit = min(int(request.query_params.get("limit", constants.SEARCH_DEFAULT_LIMIT)),
+                        constants.SEARCH_MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "Limit must be an integer"}, status=400)
+        prefix = request.query_params.get("prefix", "true").lower() != "false"
+
+        hits = index.search(query, fields=fields or None, prefix=prefix, limit=limit)
+        videos = self.get_queryset().in_bulk([hit.video_id for hit in hits])
+        hits = [hit for hit in hits if hit.video_id in videos]
+        if self.compact():
+            results: Any = {
+                **self.serialize_videos(videos[hit.video_id] for hit in hits),
+                "score": [hit.score for hit in hits],
+            }
+        else:
+            results = [{**self.get_serializer(videos[hit.video_id]).data, "score": hit.score} for hit in hits]
+        return Response({"query": query, "count": len(hits), "results": results})
+
     @action(detail=False, methods=["get"], url_path="paginated-videos")
+    @cached_response
     def paginated_videos(self, request: Request) -> Response:
         """
         Fetches videos within a specified date range and paginates the results.
 
+        Pages are numbered by default, which counts the videos and skips the earlier pages with an OFFSET on every
+        request, so deep pages get slower as the table grows. Passing 'mode=cursor' (or a 'cursor') instead pages by
+        (upload_time, video_id) from an opaque cursor, which takes the same time for every page - see
+        `today.pagination`. Videos without an upload time are left out in cursor mode.
+
         Query Parameters:
             - start_date (str, optional): Filter videos uploaded on or after this date (YYYY-MM-DD).
             - end_date (str, optional): Filter videos uploaded on or before this date (YYYY-MM-DD).
             - page_num (int, optional): The page number to fetch (default is 1).
             - limit (int, optional): The number of videos per page (default is 7).
+            - mode (str, optional): 'cursor' for cursor pagination, defaults to numbered pages.
+            - cursor (str, optional): The 'next_cursor' or 'prev_cursor' of a page, to fetch the page after or before
+              it in cursor mode. Omit for the first page.
+            - include_total (bool, optional): Whether to count the videos in cursor mode (default is false).
+            - fields (str, optional): A comma separated list of the fields to return (default is all of them).
+            - compact (bool, optional): Whether to return the videos as columns (default is false).
 
         :param request: The HTTP request containing query parameters.
-        :return: A JSON response containing paginated video data and metadata
+        :return: A JSON response containing paginated video data and metadata. In cursor mode, the videos, the
+        'next_cursor' and 'prev_cursor' (null at either end), and 'total_videos' only if 'include_total' is true.
         """
         start_date = request.query_params.get("start_date")
         end_date = request.query_params.get("end_date")
         page_num = request.query_params.get("page_num", 1)
         limit = request.query_params.get("limit", 7)
+        cursor = request.query_params.get("cursor")
 
         queryset = self.get_queryset()
         if start_date is not None:
@@ -66,6 +200,11 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
             if end_date_parsed is not None:
                 queryset = queryset.filter(upload_time__lte=end_date_parsed)
 
+        if request.query_params.get("mode") == "cursor" or cursor is not None:
+            return self._cursor_page(
+                queryset, cursor, limit, request.query_params.get("include_total", "false").lower() == "true"
+            )
+
         queryset = queryset.order_by("-upload_time")
 
         pages = paginator.Paginator(queryset, limit)
@@ -75,7 +214,7 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
             return Response({"detail": "Page number must be an integer"}, status=400)
         except paginator.EmptyPage:
             return Response({
-                "videos": [],
+                "videos": self.serialize_videos([]),
                 "detail": "Page number out of range - it's likely that no older videos are available",
                 "total_videos": pages.count,
                 "total_pages": pages.num_pages,
@@ -84,9 +223,8 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
                 "has_previous": False,
             }, status=200)
 
-        serializer = self.get_serializer(videos_page, many=True)
         return Response({
-            "videos": serializer.data,
+            "videos": self.serialize_videos(videos_page),
             "total_videos": pages.count,
             "total_pages": pages.num_pages,
             "current_page": videos_page.number,
@@ -94,6 +232,37 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
             "has_previous": videos_page.has_previous(),
         })
 
+    def _cursor_page(self, queryset, cursor: Optional[str], limit: int | str, include_total: bool) -> Response:
+        """
+        Fetch a page of videos in cursor mode, see `paginated_videos`
+        :param queryset: The videos to paginate, filtered by date
+        :param cursor: Optional. The cursor of the page, None for the first page
+        :param limit: The number of videos per page
+        :param include_total: Whether to count the videos
+        :return: A JSON response with the page, or a 400 if the cursor or limit is invalid
+        """
+        try:
+            page_size = int(limit)
+        except ValueError:
+            return Response({"detail": "Limit must be an integer"}, status=400)
+        if page_size < 1:
+            return Response({"detail": "Limit must be at least 1"}, status=400)
+        try:
+            page = keyset_page(queryset, cursor, page_size)
+        except InvalidCursorError:
+            return Response({"detail": "Invalid cursor"}, status=400)
+
+        data = {
+            "videos": self.serialize_videos(page.videos),
+            "next_cursor": page.next_cursor,
+            "prev_cursor": page.prev_cursor,
+            "has_next": page.next_cursor is not None,
+            "has_previous": page.prev_cursor is not None,
+        }
+        if include_total is True:
+            data["total_videos"] = queryset.filter(upload_time__isnull=False).count()
+        return Response(data)
+
     @action(detail=False, methods=["post"], url_path="write-to-db", permission_classes=[HasValidApiKey])
     def write_video_metadata(self, request: Request):
         """
@@ -122,3 +291,62 @@ class VideoDetailsViewSet(viewsets.ModelViewSet):
                 status=status_code,
             )
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="write-to-db/bulk",
+        permission_classes=[HasValidApiKey],
+        parser_classes=[JSONParser, NDJSONParser],
+    )
+    def write_video_metadata_bulk(self, request: Request) -> Response:
+        """
+        Verify the user has permission to write data to the DB, then write the metadata of several videos to the DB.
+
+        The body is either a JSON array of videos (Content-Type application/json) or one video per line
+        (Content-Type application/x-ndjson), each in the format accepted by the write-to-db endpoint. Every video is
+        validated before any are written. A video given more than once is merged into one, with the fields of later
+        entries overriding earlier ones. The videos are then upserted in batches, each batch in a single statement,
+        updating only the fields given for the videos that already exist.
+
+        :param request: The HTTP request containing the videos to write to the DB
+        :return: A JSON response with the 'status' of each video - 'created' or 'updated' - in the order they were
+        first given, and the number 'created' and 'updated'. The response has the status code:
+                 - HTTP 200 OK if the videos were written.
+                 - HTTP 400 BAD REQUEST if the body isn't a list of videos, has more than
+                   `constants.BULK_WRITE_MAX_ITEMS` videos, or any of the videos is invalid. The errors for each video
+                   are returned in the order they were given, and no videos are written.
+        """
+        if not isinstance(request.data, list):
+            return Response({"detail": "Expected a list of videos"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > constants.BULK_WRITE_MAX_ITEMS:
+            return Response(
+                {"detail": f"Too many videos - at most {constants.BULK_WRITE_MAX_ITEMS} can be written per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = VideoBulkWriteSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Only the fields given are updated, so videos are upserted in groups with the same fields
+        def given_fields(video_data: Dict) -> List[str]:
+            return sorted(field for field in video_data if field != "video_id")
+
+        # Merge the entries for each video first, so each video is written once and its status is from that write
+        merged: Dict[str, Dict] = {}
+        for video_data in serializer.validated_data:
+            merged.setdefault(video_data["video_id"], {}).update(video_data)
+
+        statuses: Dict[str, str] = {}
+        with transaction.atomic():
+            for fields, group in groupby(sorted(merged.values(), key=given_fields), key=given_fields):
+                videos = [Video(**video_data) for video_data in group]
+                statuses.update(Video.objects.upsert(videos, update_fields=fields))
+
+        results = [{"video_id": video_id, "status": statuses[video_id]} for video_id in merged]
+        return Response({
+            "results": results,
+            "created": sum(result["status"] == "created" for result in results),
+            "updated": sum(result["status"] == "updated" for result in results),
+        }, status=status.HTTP_200_OK)
@@ -0,0 +1,567 @@
+"""
+Module for caching the artifacts generated for a video (example sentences, translations, audio, images and rendered
+videos), so re-running the pipeline for the same word, e.g. to retry a failed upload, doesn't pay for the API calls or
+the render again.
+
+Artifacts are content addressed: the key is a hash of the stage, the model and everything sent to it, so changing a
+prompt, model or setting gives a new key rather than a stale result.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Protocol
+
+from botocore.exceptions import ClientError
+
+from python.constants import BUCKET_NAME, CacheSettings, Paths
+from python.s3_organiser import BucketSort
+from python import custom_logging
+import base_config
+
+logger = custom_logging.get_logger(__name__)
+
+
+@dataclass
+class CacheEntry:
+    """An artifact stored in the cache, with the times it was created and last used as Unix timestamps"""
+    key: str
+    size: int
+    created: float
+    last_used: float
+
+
+def cache_key(
+        stage: str,
+        model: str,
+        content: Any,
+        language: Optional[str] = None,
+        settings: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """
+    Build the key for an artifact from everything that determines its content
+    :param stage: The pipeline stage producing the artifact, e.g. 'sentence' or 'image'. Used as a prefix for the key
+    so hits and misses can be counted per stage
+    :param model: The model or service producing the artifact
+    :param content: The prompt or text sent to the model. Values which aren't JSON serialisable are converted with
+    str()
+    :param language: Optional. The language the artifact is in
+    :param settings: Optional. Any other settings that change the artifact, e.g. the image size
+    :return: The key, in the form '<stage>/<sha256 hex digest>'
+    """
+    payload = json.dumps(
+        {"model": model, "content": content, "language": language, "settings": dict(settings or {})},
+        sort_keys=True,
+        ensure_ascii=False,
+        default=str,
+    )
+    return f"{stage}/{hashlib.sha256(payload.encode('utf-8')).hexdigest()}"
+
+
+def through_cache(cache: Optional["ArtifactCache"], key: str, create: Callable[[], bytes]) -> bytes:
+    """
+    Get an artifact from the cache if there is one, creating it otherwise
+    :param cache: The cache to use, or None to always create the artifact
+    :param key: The key for the artifact, see `cache_key`
+    :param create: The function creating the artifact on a cache miss
+    :return: The artifact
+    """
+    if cache is None:
+        return create()
+    return cache.get_or_create(key, create)
+
+
+class CacheBackend(Protocol):
+    """The storage used by an ArtifactCache"""
+
+    def stat(self, key: str) -> Optional[CacheEntry]:
+        ...
+
+    def read(self, key: str) -> bytes:
+        ...
+
+    def write(self, key: str, data: bytes) -> None:
+        ...
+
+    def copy_in(self, key: str, path: str) -> None:
+        ...
+
+    def copy_out(self, key: str, path: str) -> None:
+        ...
+
+    def touch(self, key: str) -> None:
+        ...
+
+    def delete(self, key: str) -> None:
+        ...
+
+    def entries(self) -> List[CacheEntry]:
+        ...
+
+    def fingerprint(self, path: str) -> str:
+        ...
+
+
+@custom_logging.log_all_methods
+class LocalCacheBackend:
+    """
+    Stores artifacts as files in a local directory. A file's modification time is when the artifact was created and
+    its access time is set whenever the artifact is used.
+    """
+
+    def __init__(self, directory: str):
+        """
+        Initialise a LocalCacheBackend object
+        :param directory: The absolute path to the directory to store the artifacts in
+        """
+        self.directory = directory
+
+    def stat(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get the size and times of an artifact
+        :param key: The key of the artifact
+        :return: The entry for the artifact, or None if it isn't in the cache
+        """
+        try:
+            stats = os.stat(self._path(key))
+        except FileNotFoundError:
+            return None
+        return CacheEntry(key=key, size=stats.st_size, created=stats.st_mtime, last_used=stats.st_atime)
+
+    def read(self, key: str) -> bytes:
+        """
+        Read an artifact
+        :param key: The key of the artifact
+        :return: The artifact
+        """
+        with open(self._path(key), "rb") as file:
+            return file.read()
+
+    def write(self, key: str, data: bytes) -> None:
+        """
+        Store an artifact, replacing the file atomically so readers never see a partial artifact
+        :param key: The key of the artifact
+        :param data: The artifact
+        """
+        with self._replace(key) as file:
+            file.write(data)
+
+    def copy_in(self, key: str, path: str) -> None:
+        """
+        Store a copy of a local file as an artifact
+        :param key: The key of the artifact
+        :param path: The path of the file to copy
+        """
+        with self._replace(key) as file, open(path, "rb") as source:
+            shutil.copyfileobj(source, file)
+
+    def copy_out(self, key: str, path: str) -> None:
+        """
+        Copy an artifact to a local file
+        :param key: The key of the artifact
+        :param path: The path to copy the artifact to
+        """
+        shutil.copyfile(self._path(key), path)
+
+    def touch(self, key: str) -> None:
+        """
+        Record that an artifact has just been used
+        :param key: The key of the artifact
+        """
+        path = self._path(key)
+        os.utime(path, (time.time(), os.stat(path).st_mtime))
+
+    def delete(self, key: str) -> None:
+        """
+        Remove an artifact, if it is still in the cache
+        :param key: The key of the artifact
+        """
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def entries(self) -> List[CacheEntry]:
+        """
+        List every artifact in the cache
+        :return: The entry for each artifact
+        """
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".tmp"):
+                    continue
+                entry = self.stat(os.path.relpath(os.path.join(root, name), self.directory))
+                if entry is not None:
+                    entries.append(entry)
+        return entries
+
+    @staticmethod
+    def fingerprint(path: str) -> str:
+        """
+        Get a fingerprint of a local file's content, for use in the key of an artifact made from the file
+        :param path: The path to the file
+        :return: The SHA-256 hex digest of the file
+        """
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        """
+        Get the path an artifact is stored at
+        :param key: The key of the artifact
+        :return: The absolute path to the artifact
+        """
+        return os.path.join(self.directory, key)
+
+    def _replace(self, key: str):
+        """
+        Open a temporary file which replaces the artifact when closed
+        :param key: The key of the artifact
+        :return: A context manager giving a writable binary file
+        """
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return _ReplaceOnClose(path)
+
+
+class _ReplaceOnClose:
+    """Context manager writing to a temporary file and moving it into place if no exception was raised"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = tempfile.NamedTemporaryFile(dir=os.path.dirname(path), suffix=".tmp", delete=False)
+
+    def __enter__(self):
+        return self.file
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.file.close()
+        if exc_type is None:
+            os.replace(self.file.name, self.path)
+        else:
+            os.remove(self.file.name)
+
+
+@custom_logging.log_all_methods
+class S3CacheBackend:
+    """
+    Stores artifacts as objects under a prefix in an S3 bucket. S3 doesn't record when an object was last read, so
+    artifacts are evicted in the order they were created rather than the order they were last used.
+    """
+
+    def __init__(self, bucket: str = BUCKET_NAME, prefix: str = Paths.CACHE_DIR_PATH):
+        """
+        Initialise an S3CacheBackend object. The S3 client is created when the cache is first used.
+        :param bucket: The S3 bucket to store the artifacts in
+        :param prefix: The prefix for the keys of the artifacts in the bucket
+        """
+        self.bucket = bucket
+        self.prefix = prefix
+        self._s3_bucket: Optional[BucketSort] = None
+
+    @property
+    def s3_bucket(self) -> BucketSort:
+        """The BucketSort object used to access S3"""
+        if self._s3_bucket is None:
+            self._s3_bucket = BucketSort(bucket=self.bucket)
+        return self._s3_bucket
+
+    def stat(self, key: str) -> Optional[CacheEntry]:
+        """
+        Get the size and creation time of an artifact
+        :param key: The key of the artifact
+        :return: The entry for the artifact, or None if it isn't in the cache
+        """
+        try:
+            metadata = self.s3_bucket.get_object_metadata(self._s3_key(key))
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+        created = metadata["LastModified"].timestamp()
+        return CacheEntry(key=key, size=metadata["ContentLength"], created=created, last_used=created)
+
+    def read(self, key: str) -> bytes:
+        """
+        Read an artifact
+        :param key: The key of the artifact
+        :return: The artifact
+        """
+        return self.s3_bucket.get_object_from_s3(self._s3_key(key))
+
+    def write(self, key: str, data: bytes) -> None:
+        """
+        Store an artifact
+        :param key: The key of the artifact
+        :param data: The artifact
+        """
+        self.s3_bucket.push_object_to_s3(data, self._s3_key(key))
+
+    def copy_in(self, key: str, path: str) -> None:
+        """
+        Store a copy of an object in the bucket as an artifact. The copy happens in S3, so nothing is downloaded.
+        :param key: The key of the artifact
+        :param path: The S3 key of the object to copy
+        """
+        self.s3_bucket.copy_object(path, self._s3_key(key))
+
+    def copy_out(self, key: str, path: str) -> None:
+        """
+        Copy an artifact to an S3 key in the bucket
+        :param key: The key of the artifact
+        :param path: The S3 key to copy the artifact to
+        """
+        self.s3_bucket.copy_object(self._s3_key(key), path)
+
+    def touch(self, key: str) -> None:
+        """
+        S3 has no cheap way to record that an object was read, so this does nothing
+        :param key: The key of the artifact
+        """
+
+    def delete(self, key: str) -> None:
+        """
+        Remove an artifact
+        :param key: The key of the artifact
+        """
+        self.s3_bucket.delete_file(self._s3_key(key))
+
+    def entries(self) -> List[CacheEntry]:
+        """
+        List every artifact in the cache
+        :return: The entry for each artifact
+        """
+        entries = []
+        paginator = self.s3_bucket.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=f"{self.prefix}/"):
+            for item in page.get("Contents", []):
+                created = item["LastModified"].timestamp()
+                key = item["Key"][len(self.prefix) + 1:]
+                entries.append(CacheEntry(key=key, size=item["Size"], created=created, last_used=created))
+        return entries
+
+    def fingerprint(self, path: str) -> str:
+        """
+        Get a fingerprint of an object's content, for use in the key of an artifact made from the object
+        :param path: The S3 key of the object
+        :return: The ETag of the object
+        """
+        return self.s3_bucket.get_object_metadata(path)["ETag"].strip('"')
+
+    def _s3_key(self, key: str) -> str:
+        """
+        Get the S3 key an artifact is stored at
+        :param key: The key of the artifact
+        :return: The S3 key
+        """
+        return f"{self.prefix}/{key}"
+
+
+@custom_logging.log_all_methods
+class ArtifactCache:
+    """
+    A cache of generated artifacts, with a time to live for each artifact and limits on the number and total size of
+    the artifacts kept. When a limit is exceeded the least recently used artifacts are evicted. Evicting lists every
+    artifact in the backend, so writes only evict once every `evict_interval_seconds`, and the cache may go over its
+    limits in between. Expired artifacts are never returned, whether or not they have been evicted yet.
+
+    The cache counts hits and misses for each stage. File artifacts (`get_file`, `put_file`) are copied within the
+    backend's storage, so the backend must use the same storage as the files: local paths for a LocalCacheBackend and
+    S3 keys in the same bucket for an S3CacheBackend.
+    """
+
+    def __init__(
+            self,
+            backend: CacheBackend,
+            ttl_seconds: Optional[float] = CacheSettings.TTL_SECONDS,
+            max_entries: Optional[int] = CacheSettings.MAX_ENTRIES,
+            max_bytes: Optional[int] = CacheSettings.MAX_BYTES,
+            evict_interval_seconds: float = CacheSettings.EVICT_INTERVAL_SECONDS,
+    ):
+        """
+        Initialise an ArtifactCache object
+        :param backend: The storage for the artifacts
+        :param ttl_seconds: Optional. How long an artifact is kept after it was created, None to keep it forever
+        :param max_entries: Optional. The max number of artifacts to keep, None for no limit
+        :param max_bytes: Optional. The max total size of the artifacts to keep, None for no limit
+        :param evict_interval_seconds: The min time between evictions triggered by writes, 0 to evict on every write.
+        The first write evicts.
+        """
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._counts: Dict[str, Dict[str, int]] = {}
+        self._counts_lock = threading.Lock()
+        self.evict_interval_seconds = evict_interval_seconds
+        self._last_evicted: Optional[float] = None
+        self._evict_lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        """
+        Get an artifact
+        :param key: The key of the artifact, see `cache_key`
+        :return: The artifact, or None if it isn't in the cache or has expired
+        """
+        if self._lookup(key) is False:
+            return None
+        return self.backend.read(key)
+
+    def put(self, key: str, data: bytes) -> None:
+        """
+        Store an artifact, then evict any artifacts that have expired or are over the limits if it's time to
+        :param key: The key of the artifact, see `cache_key`
+        :param data: The artifact
+        """
+        self.backend.write(key, data)
+        self._evict_if_due()
+
+    def get_or_create(self, key: str, create: Callable[[], bytes]) -> bytes:
+        """
+        Get an artifact, creating and storing it if it isn't in the cache
+        :param key: The key of the artifact, see `cache_key`
+        :param create: The function creating the artifact on a cache miss
+        :return: The artifact
+        """
+        data = self.get(key)
+        if data is None:
+            data = create()
+            self.put(key, data)
+        return data
+
+    def get_file(self, key: str, path: str) -> bool:
+        """
+        Copy an artifact to a file
+        :param key: The key of the artifact, see `cache_key`
+        :param path: The local path or S3 key (depending on the backend) to copy the artifact to
+        :return: True if the artifact was in the cache and has been copied, else False
+        """
+        if self._lookup(key) is False:
+            return False
+        self.backend.copy_out(key, path)
+        return True
+
+    def put_file(self, key: str, path: str) -> None:
+        """
+        Store a copy of a file as an artifact, then evict any artifacts that have expired or are over the limits if it's
+        time to
+        :param key: The key of the artifact, see `cache_key`
+        :param path: The local path or S3 key (depending on the backend) of the file
+        """
+        self.backend.copy_in(key, path)
+        self._evict_if_due()
+
+    def fingerprint(self, path: str) -> str:
+        """
+        Get a fingerprint of a file's content, to include in the key of an artifact made from the file
+        :param path: The local path or S3 key (depending on the backend) of the file
+        :return: The fingerprint
+        """
+        return self.backend.fingerprint(path)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get the number of hits and misses for each stage since the cache was created
+        :return: A dictionary of {'hits': int, 'misses': int} keyed by stage
+        """
+        with self._counts_lock:
+            return {stage: dict(counts) for stage, counts in self._counts.items()}
+
+    def evict(self) -> int:
+        """
+        Remove the artifacts that have expired, then the least recently used artifacts until the cache is within
+        `max_entries` and `max_bytes`
+        :return: The number of artifacts removed
+        """
+        now = time.time()
+        to_remove = []
+        kept_count = 0
+        kept_bytes = 0
+        over_limit = False
+        for entry in sorted(self.backend.entries(), key=lambda item: item.last_used, reverse=True):
+            if over_limit is False and self._is_expired(entry, now) is False:
+                within_entries = self.max_entries is None or kept_count < self.max_entries
+                within_bytes = self.max_bytes is None or kept_bytes + entry.size <= self.max_bytes
+                if within_entries and within_bytes:
+                    kept_count += 1
+                    kept_bytes += entry.size
+                    continue
+                over_limit = True
+            to_remove.append(entry.key)
+
+        for key in to_remove:
+            self.backend.delete(key)
+        if len(to_remove) > 0:
+            logger.info(f"Evicted {len(to_remove)} artifacts from the cache")
+        return len(to_remove)
+
+    def _evict_if_due(self) -> None:
+        """Evict if `evict_interval_seconds` have passed since the last eviction triggered by a write"""
+        now = time.monotonic()
+        with self._evict_lock:
+            due = self._last_evicted is None or now - self._last_evicted >= self.evict_interval_seconds
+            if due is True:
+                self._last_evicted = now
+        if due is True:
+            self.evict()
+
+    def _lookup(self, key: str) -> bool:
+        """
+        Check whether an artifact is in the cache and hasn't expired, counting the hit or miss
+        :param key: The key of the artifact
+        :return: True on a hit, else False
+        """
+        entry = self.backend.stat(key)
+        if entry is not None and self._is_expired(entry, time.time()):
+            self.backend.delete(key)
+            entry = None
+
+        stage = key.split("/", 1)[0]
+        with self._counts_lock:
+            counts = self._counts.setdefault(stage, {"hits": 0, "misses": 0})
+            counts["hits" if entry is not None else "misses"] += 1
+
+        if entry is None:
+            return False
+        self.backend.touch(key)
+        return True
+
+    def _is_expired(self, entry: CacheEntry, now: float) -> bool:
+        """
+        Check whether an artifact has outlived the time to live
+        :param entry: The entry for the artifact
+        :param now: The current Unix timestamp
+        :return: True if the artifact has expired, else False
+        """
+        return self.ttl_seconds is not None and now - entry.created > self.ttl_seconds
+
+
+_default_caches: Dict[bool, ArtifactCache] = {}
+_default_caches_lock = threading.Lock()
+
+
+def get_default_cache(cloud_storage: bool) -> Optional[ArtifactCache]:
+    """
+    Get the cache shared by the pipeline, stored alongside the other generated files
+    :param cloud_storage: Whether the generated files are stored in S3 (True) or locally (False)
+    :return: The cache, or None if caching is disabled in `CacheSettings`
+    """
+    if CacheSettings.ENABLED is False:
+        return None
+    with _default_caches_lock:
+        if cloud_storage not in _default_caches:
+            backend: CacheBackend
+            if cloud_storage is True:
+                backend = S3CacheBackend()
+            else:
+                backend = LocalCacheBackend(f"{base_config.BASE_DIR}/{Paths.CACHE_DIR_PATH}")
+            _default_caches[cloud_storage] = ArtifactCache(backend)
+        return _default_caches[cloud_storage]
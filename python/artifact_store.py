@@ -0,0 +1,201 @@
+"""
+Module for passing the files generated by a pipeline run (audio, images and the rendered video) between stages.
+
+In cloud mode each file is kept on local disk for the rest of the run, and is uploaded to S3 in the background as soon
+as it is created. Later stages read the local copy rather than downloading the file back from S3, so each artifact is
+transferred to S3 at most once and never downloaded again within the same run.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional
+
+from python.constants import BUCKET_NAME
+from python.s3_organiser import BucketSort
+from python import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+
+@custom_logging.log_all_methods
+class ArtifactStore:
+    """
+    The local copies of the artifacts of a pipeline run, keyed by their S3 keys. Stages still pass S3 keys to each
+    other (so they can be saved to a checkpoint), and use the store to get a local file for a key.
+
+    If `cloud_storage` is False the artifacts are already local files, so the store only hands back the paths it is
+    given.
+    """
+
+    def __init__(
+            self,
+            cloud_storage: bool = True,
+            bucket: str = BUCKET_NAME,
+            directory: Optional[str] = None,
+            max_uploads: int = 4,
+    ):
+        """
+        Initialise an ArtifactStore object
+        :param cloud_storage: Whether the artifacts are persisted to S3
+        :param bucket: The S3 bucket to persist the artifacts to, only used if `cloud_storage` is True
+        :param directory: Optional. The directory to keep the local copies in. If None a temporary directory is created,
+        which is removed when the store is closed
+        :param max_uploads: The max number of artifacts being uploaded to S3 at once
+        """
+        self.cloud_storage = cloud_storage
+        self.bucket = bucket
+        self._owns_directory = directory is None
+        self.directory = directory if directory is not None else tempfile.mkdtemp(prefix="artifacts_")
+        self.max_uploads = max_uploads
+        self.uploads = 0
+        self.downloads = 0
+        self.local_hits = 0
+        self._local: Dict[str, str] = {}
+        self._pending: Dict[str, Future] = {}
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._s3_bucket: Optional[BucketSort] = None
+
+    def __enter__(self) -> "ArtifactStore":
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        # Don't hide the exception being raised behind an upload error
+        self.close(raise_errors=exc_type is None)
+
+    @property
+    def s3_bucket(self) -> BucketSort:
+        """The BucketSort object used to access S3, created on first use"""
+        with self._lock:
+            if self._s3_bucket is None:
+                self._s3_bucket = BucketSort(bucket=self.bucket)
+            return self._s3_bucket
+
+    def path_for(self, s3_key: str) -> str:
+        """
+        Get the local path to write a new artifact to before adding it with `put_file`
+        :param s3_key: The S3 key the artifact will be persisted to
+        :return: A path in the store's directory, whose parent directory exists
+        """
+        path = os.path.join(self.directory, s3_key.lstrip("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        return path
+
+    def put_file(self, local_path: str, s3_key: str, after_upload: Optional[Callable[[], None]] = None) -> str:
+        """
+        Add a local file as an artifact and start persisting it to S3 in the background
+        :param local_path: The path to the file. It must not be modified or removed until the store is closed.
+        :param s3_key: The S3 key to persist the file to
+        :param after_upload: Optional. Called in the background once the file is in S3, e.g. to copy it into the
+        artifact cache
+        :return: The S3 key in cloud mode, otherwise the local path
+        """
+        if self.cloud_storage is False:
+            if after_upload is not None:
+                after_upload()
+            return local_path
+
+        def upload() -> None:
+            self.s3_bucket.push_file_to_s3(file_path=local_path, s3_key=s3_key)
+            if after_upload is not None:
+                after_upload()
+
+        with self._lock:
+            self._local[s3_key] = local_path
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_uploads, thread_name_prefix="artifact-upload")
+            self._pending[s3_key] = self._executor.submit(upload)
+            self.uploads += 1
+        return s3_key
+
+    def put_bytes(self, data: bytes, s3_key: str, after_upload: Optional[Callable[[], None]] = None) -> str:
+        """
+        Write bytes to a local file and add it as an artifact, see `put_file`
+        :param data: The content of the artifact
+        :param s3_key: The S3 key to persist the artifact to
+        :param after_upload: Optional. Called in the background once the artifact is in S3
+        :return: The S3 key in cloud mode, otherwise the local path
+        """
+        path = self.path_for(s3_key)
+        with open(path, "wb") as file:
+            file.write(data)
+        return self.put_file(path, s3_key, after_upload=after_upload)
+
+    def local_path(self, key: str) -> str:
+        """
+        Get a local file with the content of an artifact. Artifacts created in this run are read from their local
+        copy, other artifacts (e.g. restored from a checkpoint or copied from the artifact cache) are downloaded once
+        and kept for the rest of the run.
+        :param key: The S3 key of the artifact in cloud mode, otherwise its local path
+        :return: The local path to the artifact
+        """
+        if self.cloud_storage is False:
+            return key
+
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            with self._lock:
+                local_path = self._local.get(key)
+                if local_path is not None:
+                    self.local_hits += 1
+                    return local_path
+
+            path = self.path_for(key)
+            self.s3_bucket.download_to(key, path)
+            with self._lock:
+                self._local[key] = path
+                self.downloads += 1
+            return path
+
+    def wait(self, keys: Iterable[str]) -> None:
+        """
+        Wait for artifacts to be persisted to S3, e.g. before saving their keys to a checkpoint. An upload error is
+        only raised by the first call waiting for the artifact.
+        :param keys: The S3 keys of the artifacts. Keys that aren't being uploaded are ignored.
+        """
+        with self._lock:
+            pending = [(key, self._pending[key]) for key in keys if key in self._pending]
+        for key, future in pending:
+            try:
+                future.result()
+            finally:
+                with self._lock:
+                    if self._pending.get(key) is future:
+                        del self._pending[key]
+
+    def flush(self) -> None:
+        """Wait for every artifact added so far to be persisted to S3, raising the first upload error"""
+        with self._lock:
+            keys = list(self._pending)
+        self.wait(keys)
+
+    def close(self, raise_errors: bool = True) -> None:
+        """
+        Wait for the uploads to finish, then remove the local copies if the store created their directory
+        :param raise_errors: If True the first upload error is raised, otherwise upload errors are only logged
+        """
+        try:
+            self.flush()
+        except Exception as e:
+            if raise_errors is True:
+                raise
+            logger.warning(f"Failed to persist an artifact to S3: {e}")
+        finally:
+            with self._lock:
+                executor, self._executor = self._executor, None
+            if executor is not None:
+                executor.shutdown(wait=True)
+            if self._owns_directory is True:
+                shutil.rmtree(self.directory, ignore_errors=True)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of artifacts uploaded and downloaded, and the number of reads served by a local copy
+        :return: A dictionary of counts
+        """
+        with self._lock:
+            return {"uploads": self.uploads, "downloads": self.downloads, "local_hits": self.local_hits}
@@ -0,0 +1,301 @@
+"""Module for generating and uploading several videos in one run, sharing API clients between the videos"""
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from dataclasses import dataclass, field, asdict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from python import main
+from python import custom_logging
+from python.constants import BatchSettings, Paths, RenderSettings, LANGUAGE_TO_LEARN
+from python.word_list_validation import validated_word_list_path
+from python.word_pool import WordPool
+from python.yt_uploader import YTConnector
+from python.task_graph import StageFailedError
+from python.artifact_cache import ArtifactCache, get_default_cache
+from python.artifact_store import ArtifactStore
+from python.encoding import get_encoding_profile
+from python.render_farm import RenderFarm, RenderJob
+from python.lazy_imports import lazy_import
+from python.word_generator import Audio
+
+if TYPE_CHECKING:
+    from openai import OpenAI
+else:
+    OpenAI = lazy_import("openai", "OpenAI")
+
+logger = custom_logging.get_logger(__name__)
+
+
+@dataclass
+class BatchItemResult:
+    """The outcome of creating and uploading the video for one word in a batch"""
+    word: str
+    status: str = "pending"
+    video_details: Optional[Dict[str, str]] = None
+    failed_stage: Optional[str] = None
+    error: Optional[str] = None
+    stage_durations: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class BatchReport:
+    """The outcome of every item in a batch, plus the total time taken to run the batch"""
+    items: List[BatchItemResult]
+    duration: float = 0.0
+    cache_stats: Dict[str, Dict[str, int]] = field(default_factory=dict)
+    render_stats: Optional[Dict[str, Any]] = None
+
+    @property
+    def videos_per_minute(self) -> float:
+        """The number of videos successfully created and uploaded per minute over the whole batch"""
+        if self.duration <= 0:
+            return 0.0
+        return len(self.succeeded) / self.duration * 60
+
+    @property
+    def succeeded(self) -> List[BatchItemResult]:
+        """The items whose videos were uploaded successfully"""
+        return [item for item in self.items if item.status == "success"]
+
+    @property
+    def failed(self) -> List[BatchItemResult]:
+        """The items that failed at some stage"""
+        return [item for item in self.items if item.status == "failed"]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the report to a dictionary, e.g. to return from a Lambda or print as JSON
+        :return: A dictionary with summary counts and the result for every item
+        """
+        return {
+            "total": len(self.items),
+            "succeeded": len(self.succeeded),
+            "failed": len(self.failed),
+            "duration": round(self.duration, 2),
+            "videos_per_minute": round(self.videos_per_minute, 2),
+            "cache_stats": self.cache_stats,
+            "render_stats": self.render_stats,
+            "items": [asdict(item) for item in self.items],
+        }
+
+
+@custom_logging.log_all_methods
+class BatchPipeline:
+    """
+    Runs the Audio -> ImageGenerator -> VideoGenerator -> YTConnector chain for several words at once.
+
+    The OpenAI client is shared by every item, and YouTube connectors are reused between uploads. Items run
+    concurrently, each as a graph of stages (see `main.build_video_graph`), but each group of stages has its own limit
+    on how many stages from that group can run at the same time, so e.g. several items can be waiting on the OpenAI
+    API while only a couple of videos are being rendered.
+    """
+
+    def __init__(
+            self,
+            write_to_rds: bool = False,
+            audio_concurrency: int = BatchSettings.AUDIO_CONCURRENCY,
+            image_concurrency: int = BatchSettings.IMAGE_CONCURRENCY,
+            video_concurrency: int = BatchSettings.VIDEO_CONCURRENCY,
+            upload_concurrency: int = BatchSettings.UPLOAD_CONCURRENCY,
+            openai_client: Optional[OpenAI] = None,
+            cache: Optional[ArtifactCache] = None,
+            render_farm: Optional[RenderFarm] = None,
+            encoding_profile: str = RenderSettings.ENCODING_PROFILE,
+    ):
+        """
+        Initialise a BatchPipeline object
+        :param write_to_rds: Write the metadata for each uploaded video to the database
+        :param audio_concurrency: The max number of sentence, translation and audio stages running at once
+        :param image_concurrency: The max number of items generating images at once
+        :param video_concurrency: The max number of videos being rendered at once
+        :param upload_concurrency: The max number of videos being uploaded to YouTube at once
+        :param openai_client: Optional. The OpenAI client to share between items, created if not provided
+        :param cache: Optional. The cache for the generated artifacts, defaults to the shared cache in S3
+        :param render_farm: Optional. A pool of processes to render the videos on. If None videos are rendered in the
+        batch's threads. `video_concurrency` should be at least the farm's number of workers to keep them all busy
+        :param encoding_profile: The name of the encoding profile for the videos, see `ENCODING_PROFILES`
+        """
+        self.write_to_rds = write_to_rds
+        self.stage_limits = {
+            "audio": audio_concurrency,
+            "image": image_concurrency,
+            "video": video_concurrency,
+            "upload": upload_concurrency,
+        }
+        for stage, limit in self.stage_limits.items():
+            if limit < 1:
+                raise ValueError(f"The concurrency for the {stage} stage must be at least 1, got {limit}")
+        self._semaphores = {stage: threading.BoundedSemaphore(limit) for stage, limit in self.stage_limits.items()}
+        self.openai_client = openai_client if openai_client is not None else OpenAI(api_key=os.getenv("openai_key"))
+        self._yt_connectors: queue.Queue = queue.Queue()
+        self.cache = cache if cache is not None else get_default_cache(cloud_storage=True)
+        self.render_farm = render_farm
+        self.encoding_profile = get_encoding_profile(encoding_profile).name
+
+    def run(self, count: Optional[int] = None, words: Optional[Sequence[str]] = None) -> BatchReport:
+        """
+        Create and upload a video for each word in the batch
+        :param count: The number of videos to create, using words drawn from the validated word list
+        :param words: The words to create videos for. Exactly one of `count` and `words` must be given.
+        :return: A report with the outcome for each word
+        """
+        if (count is None) == (words is None):
+            raise ValueError("Provide exactly one of count or words")
+        if words is None:
+            words = self.draw_words(count)  # type: ignore[arg-type]
+        else:
+            self.consume_words(words)
+
+        start = time.perf_counter()
+        items = [BatchItemResult(word=word) for word in words]
+        try:
+            if len(items) > 0:
+                with ThreadPoolExecutor(max_workers=sum(self.stage_limits.values())) as executor:
+                    list(executor.map(self._process_item, items))
+        finally:
+            if self.render_farm is not None:
+                self.render_farm.shutdown()
+        report = BatchReport(
+            items=items,
+            duration=time.perf_counter() - start,
+            cache_stats=self.cache.stats() if self.cache is not None else {},
+            render_stats=self.render_farm.stats() if self.render_farm is not None else None,
+        )
+
+        logger.info(f"Batch finished in {report.duration:.1f}s: {len(report.succeeded)} succeeded, "
+                    f"{len(report.failed)} failed, {report.videos_per_minute:.2f} videos/minute")
+        return report
+
+    @staticmethod
+    def draw_words(count: int) -> List[str]:
+        """
+        Draw unused words from the validated word list up front, so concurrent items never pick the same word
+        :param count: The number of words to draw
+        :return: The words
+        """
+        pool = BatchPipeline._word_pool()
+        words = []
+        for _ in range(count):
+            word = pool.draw()
+            pool.consume(word)
+            words.append(word)
+        return words
+
+    @staticmethod
+    def consume_words(words: Sequence[str]) -> None:
+        """
+        Mark given words as used in the validated word list, so they aren't drawn for a later batch
+        :param words: The words, those not in the word list are ignored
+        """
+        pool = BatchPipeline._word_pool()
+        for word in words:
+            try:
+                pool.consume(word)
+            except KeyError:
+                logger.info(f"'{word}' is not in the word list, so it can't be marked as used")
+
+    @staticmethod
+    def _word_pool() -> WordPool:
+        """
+        Get the pool of words from the validated word list
+        :return: The word pool
+        """
+        return WordPool(
+            word_list_path=validated_word_list_path(Paths.WORD_LIST_PATH, LANGUAGE_TO_LEARN),
+            cloud_storage=True,
+        )
+
+    def _process_item(self, item: BatchItemResult) -> None:
+        """
+        Run the graph of stages for one item, recording the result or the stage that failed on the item
+        :param item: The item to process
+        """
+        artifacts = ArtifactStore(cloud_storage=True)
+        graph = main.build_video_graph(
+            word=item.word,
+            openai_client=self.openai_client,
+            write_to_rds=self.write_to_rds,
+            semaphores=self._semaphores,
+            upload=partial(self._upload, artifacts=artifacts),
+            cache=self.cache,
+            render=partial(self._render, artifacts=artifacts) if self.render_farm is not None else None,
+            encoding_profile=self.encoding_profile,
+            artifacts=artifacts,
+        )
+        try:
+            results = graph.run()
+            item.video_details = results["details"]
+            item.status = "success"
+        except StageFailedError as e:
+            item.status = "failed"
+            item.failed_stage = e.stage
+            item.error = "".join(traceback.format_exception(e.__cause__ or e))
+            logger.error(f"Failed to create the video for '{item.word}' at the {item.failed_stage} stage: "
+                         f"{item.error}")
+        finally:
+            item.stage_durations = {timing.name: round(timing.duration, 3) for timing in graph.timings}
+            # The video has been uploaded to YouTube by now, so failing to persist the files to S3 isn't a failure
+            # of the item
+            artifacts.close(raise_errors=False)
+
+    def _render(
+            self,
+            audio_generator: Audio,
+            image_paths: List[str],
+            artifacts: Optional[ArtifactStore] = None,
+    ) -> Tuple[str, Dict]:
+        """
+        Render a video on the render farm, waiting for it to finish
+        :param audio_generator: The Audio object for the video
+        :param image_paths: The S3 keys of the images for the video
+        :param artifacts: Optional. The store for the files of the item. The render farm's processes read the audio
+        and images from S3, so they must have been persisted first.
+        :return: The path to the rendered video and the video metadata
+        """
+        if audio_generator.audio_cloud_path is None:
+            raise TypeError("audio_cloud_path must be a string")
+        if audio_generator.sentence is None or audio_generator.translated_sentence is None:
+            raise TypeError("sentence and translated_sentence must be strings")
+        if artifacts is not None:
+            artifacts.wait([audio_generator.audio_cloud_path, *image_paths])
+        job = RenderJob(
+            word=audio_generator.word,
+            sentence=audio_generator.sentence,
+            translated_sentence=audio_generator.translated_sentence,
+            image_paths=list(image_paths),
+            audio_filepath=audio_generator.audio_cloud_path,
+            use_cache=self.cache is not None,
+            encoding_profile=self.encoding_profile,
+        )
+        result = self.render_farm.submit(job).result()  # type: ignore[union-attr]
+        return result["video_filepath"], result["video_metadata"]
+
+    def _upload(
+            self,
+            video_filepath: str,
+            video_metadata: Dict,
+            artifacts: Optional[ArtifactStore] = None,
+    ) -> Dict:
+        """
+        Upload a video using a YouTube connector from the pool, creating one if they are all in use. The upload
+        semaphore means no more than `upload_concurrency` connectors are ever created.
+        :param video_filepath: The path to the rendered video
+        :param video_metadata: The title, description and tags for the video
+        :param artifacts: Optional. The store for the files of the item, see `ArtifactStore`
+        :return: The response from the YouTube API
+        """
+        try:
+            yt = self._yt_connectors.get_nowait()
+        except queue.Empty:
+            yt = YTConnector(credentials_env=True, cloud_storage=True)
+        try:
+            return main.upload_video(video_filepath, video_metadata, yt=yt, artifacts=artifacts)
+        finally:
+            self._yt_connectors.put(yt)
@@ -0,0 +1,108 @@
+"""
+Benchmark for the encoding profiles. Renders the same video with each profile and reports the encode time and the size
+of the output, e.g.
+
+    python -m python.benchmarks.encoding_profiles --duration 8 --backend ffmpeg
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import soundfile
+from PIL import Image
+
+from python.constants import RenderSettings, VideoSettings
+from python.encoding import ENCODING_PROFILES
+from python.word_generator import VideoGenerator
+
+
+def create_sample_job(directory: str, duration: float = 8.0, image_count: int = 3) -> Dict[str, Any]:
+    """
+    Create images and audio like a real job's, so the benchmark doesn't call any APIs
+    :param directory: The directory to write the files to
+    :param duration: The length of the audio in seconds
+    :param image_count: The number of images
+    :return: The arguments for a `VideoGenerator`
+    """
+    width, height = (int(side) for side in VideoSettings.VERTICAL.split("x"))
+    rng = np.random.default_rng(0)
+    image_paths = []
+    for index in range(image_count):
+        # A smooth gradient with some grain compresses like the generated images, unlike flat colour or pure noise
+        gradient = np.add.outer(np.linspace(0, 160, height), np.linspace(0, 80, width))[..., None]
+        gradient = gradient + [index * 30, 40, 90]
+        pixels = np.clip(gradient + rng.normal(0, 6, (height, width, 3)), 0, 255).astype(np.uint8)
+        image_path = os.path.join(directory, f"image_{index}.jpg")
+        Image.fromarray(pixels).save(image_path, quality=90)
+        image_paths.append(image_path)
+
+    audio_filepath = os.path.join(directory, "audio.wav")
+    t = np.arange(0, duration, 1 / 44100)
+    soundfile.write(audio_filepath, 0.2 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 3 * t)) / 2, 44100)
+    return {
+        "word": "palabra",
+        "sentence": "Esta es una frase de ejemplo con la palabra del día",
+        "translated_sentence": "This is an example sentence with the word of the day",
+        "image_paths": image_paths,
+        "audio_filepath": audio_filepath,
+    }
+
+
+def benchmark_encoding_profiles(
+        profiles: Optional[Sequence[str]] = None,
+        duration: float = 8.0,
+        backend: str = RenderSettings.BACKEND,
+        repeats: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Render the same sample video with each encoding profile
+    :param profiles: Optional. The names of the profiles to benchmark, defaults to all of `ENCODING_PROFILES`
+    :param duration: The length of the video in seconds
+    :param backend: The backend to render with, see `VideoGenerator.generate_video`
+    :param repeats: The number of times to render with each profile, the fastest time is reported
+    :return: The 'profile', the fastest 'encode_seconds', the output 'size_bytes' and 'kbps', and the encode time as a
+    multiple of real time for each profile
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        video_generator = VideoGenerator(**create_sample_job(directory, duration=duration))
+        for name in profiles if profiles is not None else list(ENCODING_PROFILES):
+            output_filepath = os.path.join(directory, f"{name}.mp4")
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                video_generator.generate_video(output_filepath=output_filepath, backend=backend, encoding_profile=name)
+                timings.append(time.perf_counter() - start)
+            size = os.path.getsize(output_filepath)
+            results.append({
+                "profile": name,
+                "backend": backend,
+                "encode_seconds": round(min(timings), 3),
+                "realtime_factor": round(min(timings) / duration, 3),
+                "size_bytes": size,
+                "kbps": round(size * 8 / duration / 1000, 1),
+            })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the encode time and output size of the encoding profiles")
+    parser.add_argument("--profiles", nargs="+", choices=list(ENCODING_PROFILES), default=None)
+    parser.add_argument("--duration", type=float, default=8.0, help="The length of the sample video in seconds")
+    parser.add_argument("--backend", choices=["moviepy", "ffmpeg"], default=RenderSettings.BACKEND)
+    parser.add_argument("--repeats", type=int, default=1, help="Report the fastest of this many renders per profile")
+    parser.add_argument("--json", action="store_true", help="Output the results as JSON rather than a table")
+    args = parser.parse_args()
+
+    benchmark = benchmark_encoding_profiles(args.profiles, args.duration, args.backend, args.repeats)
+    if args.json is True:
+        print(json.dumps(benchmark))
+    else:
+        print(f"{'profile':<18}{'encode (s)':>12}{'x realtime':>12}{'size (KB)':>12}{'kbps':>10}")
+        for result in benchmark:
+            print(f"{result['profile']:<18}{result['encode_seconds']:>12.2f}{result['realtime_factor']:>12.2f}"
+                  f"{result['size_bytes'] / 1024:>12.0f}{result['kbps']:>10.0f}")
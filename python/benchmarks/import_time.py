@@ -0,0 +1,126 @@
+"""
+Benchmark for the cold start of the Lambda function. Imports the entry point in a fresh interpreter with
+`python -X importtime`, reports the import time of each module, and exits with status 1 if the import takes longer than
+`ColdStartSettings.IMPORT_BUDGET_MS` or loads any of the dependencies that should be imported on first use, e.g.
+
+    python -m python.benchmarks.import_time --repeats 5
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence
+
+from python.constants import ColdStartSettings
+import base_config
+
+
+@dataclass
+class ImportTiming:
+    """The time taken to import a module, as reported by `python -X importtime`"""
+    module: str
+    self_us: int
+    cumulative_us: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """
+    Parse the output of `python -X importtime`
+    :param output: The stderr of the interpreter
+    :return: The timing of each module imported, in the order the imports finished
+    """
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, module = line.removeprefix("import time:").split("|")
+        timings.append(ImportTiming(module.strip(), int(self_us), int(cumulative_us)))
+    return timings
+
+
+def profile_import(module: str = ColdStartSettings.ENTRY_POINT, repeats: int = 3) -> Dict[str, Any]:
+    """
+    Import a module in a fresh interpreter several times
+    :param module: The name of the module to import
+    :param repeats: The number of interpreters to import the module in, the median of the times is reported
+    :return: The median 'total_ms' to import the module, the median 'self_ms' and 'cumulative_ms' of every module it
+    imported (keyed by module name), and the top level 'packages' it imported
+    """
+    runs = []
+    for _ in range(repeats):
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            cwd=base_config.BASE_DIR,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"Failed to import {module}:\n{result.stderr[-2000:]}")
+        runs.append({timing.module: timing for timing in parse_importtime(result.stderr)})
+
+    modules = {
+        name: {
+            "self_ms": statistics.median(run[name].self_us for run in runs if name in run) / 1000,
+            "cumulative_ms": statistics.median(run[name].cumulative_us for run in runs if name in run) / 1000,
+        }
+        for name in runs[0]
+    }
+    return {
+        "module": module,
+        "total_ms": modules[module]["cumulative_ms"],
+        "modules": modules,
+        "packages": sorted({name.split(".")[0] for name in modules}),
+    }
+
+
+def check_budget(
+        profile: Dict[str, Any],
+        budget_ms: float = ColdStartSettings.IMPORT_BUDGET_MS,
+        lazy_modules: Sequence[str] = ColdStartSettings.LAZY_MODULES,
+) -> List[str]:
+    """
+    Check an import profile against the cold start budget
+    :param profile: The output of `profile_import`
+    :param budget_ms: The max time to import the module in milliseconds
+    :param lazy_modules: The top level packages which should only be imported on first use
+    :return: A description of each regression, empty if the import is within budget
+    """
+    failures = []
+    if profile["total_ms"] > budget_ms:
+        failures.append(f"Importing {profile['module']} took {profile['total_ms']:.1f}ms, over the budget of "
+                        f"{budget_ms}ms")
+    for package in sorted(set(lazy_modules) & set(profile["packages"])):
+        slowest = max(
+            (name for name in profile["modules"] if name.split(".")[0] == package),
+            key=lambda name: profile["modules"][name]["cumulative_ms"],
+        )
+        failures.append(f"{package} should be imported on first use, but is imported by {profile['module']} "
+                        f"({profile['modules'][slowest]['cumulative_ms']:.1f}ms)")
+    return failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check the time taken to import the Lambda entry point")
+    parser.add_argument("--module", default=ColdStartSettings.ENTRY_POINT, help="The module to import")
+    parser.add_argument("--repeats", type=int, default=3, help="Report the median of this many imports")
+    parser.add_argument("--budget-ms", type=float, default=ColdStartSettings.IMPORT_BUDGET_MS,
+                        help="Fail if the import takes longer than this")
+    parser.add_argument("--top", type=int, default=15, help="The number of slowest modules to report")
+    parser.add_argument("--json", action="store_true", help="Output the profile as JSON rather than a table")
+    args = parser.parse_args()
+
+    import_profile = profile_import(args.module, args.repeats)
+    regressions = check_budget(import_profile, args.budget_ms)
+    if args.json is True:
+        print(json.dumps({**import_profile, "budget_ms": args.budget_ms, "failures": regressions}))
+    else:
+        print(f"{'module':<50}{'self (ms)':>12}{'cumulative (ms)':>18}")
+        slowest_modules = sorted(import_profile["modules"].items(), key=lambda item: item[1]["self_ms"], reverse=True)
+        for name, timing in slowest_modules[:args.top]:
+            print(f"{name:<50}{timing['self_ms']:>12.1f}{timing['cumulative_ms']:>18.1f}")
+        print(f"\nImporting {args.module} took {import_profile['total_ms']:.1f}ms (budget {args.budget_ms}ms)")
+        for regression in regressions:
+            print(f"FAIL: {regression}")
+    sys.exit(1 if regressions else 0)
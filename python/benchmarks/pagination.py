@@ -0,0 +1,141 @@
+"""
+Benchmark for paging through the videos table. Fills a SQLite copy of the table, with the index on
+(upload_time, video_id), with synthetic rows and times fetching pages at increasing depths with the queries Django runs
+for the numbered pages of `paginated-videos` (a COUNT(*) and an OFFSET) and for its cursor mode, e.g.
+
+    python -m python.benchmarks.pagination --rows 1000000 --limit 7
+
+Numbered pages get slower the deeper they are, where cursor pages take the same time at any depth.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import statistics
+import tempfile
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+SCHEMA = """
+CREATE TABLE videos (
+    video_id VARCHAR(255) PRIMARY KEY,
+    title VARCHAR(100),
+    description TEXT,
+    upload_time DATETIME
+);
+CREATE INDEX videos_upload_time_id_idx ON videos (upload_time, video_id);
+"""
+COLUMNS = "video_id, title, description, upload_time"
+ORDER = "ORDER BY upload_time DESC, video_id DESC"
+
+
+def create_table(path: str, rows: int, batch_size: int = 50000) -> sqlite3.Connection:
+    """
+    Create the videos table with synthetic rows, one video an hour with a few uploaded at the same time
+    :param path: The path of the database file
+    :param rows: The number of rows
+    :param batch_size: The number of rows to insert per statement
+    :return: A connection to the database
+    """
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    start = time.mktime((2020, 1, 1, 0, 0, 0, 0, 0, 0))
+    for batch_start in range(0, rows, batch_size):
+        connection.executemany(
+            "INSERT INTO videos VALUES (?, ?, ?, ?)",
+            (
+                (f"{number:011d}", f"Video {number}", "Description",
+                 time.strftime("%Y-%m-%d %H:%M:%S", time.gmtime(start + 3600 * (number - number % 3))))
+                for number in range(batch_start, min(rows, batch_start + batch_size))
+            ),
+        )
+    connection.commit()
+    connection.execute("ANALYZE")
+    return connection
+
+
+def time_query(connection: sqlite3.Connection, queries: Sequence[Tuple[str, tuple]], repeats: int) -> float:
+    """
+    Time running a sequence of queries
+    :param connection: The connection to the database
+    :param queries: The SQL and parameters of each query
+    :param repeats: The number of times to run the queries, the median time is reported
+    :return: The median time in milliseconds
+    """
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for sql, params in queries:
+            connection.execute(sql, params).fetchall()
+        times.append((time.perf_counter() - start) * 1000)
+    return statistics.median(times)
+
+
+def benchmark_pagination(
+        rows: int = 1000000,
+        limit: int = 7,
+        depths: Sequence[int] = (1, 10, 100, 1000, 10000, 100000),
+        repeats: int = 5,
+) -> List[Dict[str, Any]]:
+    """
+    Time fetching a page at each depth with numbered and cursor pagination
+    :param rows: The number of rows in the table
+    :param limit: The number of videos per page
+    :param depths: The page numbers to fetch, those past the last page are skipped
+    :param repeats: The number of times to fetch each page, the median time is reported
+    :return: The 'page', and the 'offset_ms' and 'cursor_ms' taken to fetch it
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        connection = create_table(os.path.join(directory, "videos.sqlite3"), rows)
+        try:
+            for page in depths:
+                offset = (page - 1) * limit
+                if offset >= rows:
+                    continue
+                numbered = [
+                    ("SELECT COUNT(*) FROM videos", ()),
+                    (f"SELECT {COLUMNS} FROM videos {ORDER} LIMIT ? OFFSET ?", (limit, offset)),
+                ]
+                # The cursor of the page is the last video of the page before it
+                cursor: List[Tuple[str, tuple]]
+                if page > 1:
+                    upload_time, video_id = connection.execute(
+                        f"SELECT upload_time, video_id FROM videos {ORDER} LIMIT 1 OFFSET ?", (offset - 1,)
+                    ).fetchone()
+                    # The query Django builds for keyset_page, fetching one extra row to tell if there's another page
+                    cursor = [(
+                        f"SELECT {COLUMNS} FROM videos WHERE upload_time IS NOT NULL AND "
+                        f"upload_time <= ? AND (upload_time < ? OR video_id < ?) {ORDER} LIMIT ?",
+                        (upload_time, upload_time, video_id, limit + 1),
+                    )]
+                else:
+                    cursor = [(f"SELECT {COLUMNS} FROM videos WHERE upload_time IS NOT NULL {ORDER} LIMIT ?",
+                               (limit + 1,))]
+                results.append({
+                    "page": page,
+                    "offset_ms": round(time_query(connection, numbered, repeats), 3),
+                    "cursor_ms": round(time_query(connection, cursor, repeats), 3),
+                })
+        finally:
+            connection.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare numbered and cursor pagination of the videos table")
+    parser.add_argument("--rows", type=int, default=1000000, help="The number of rows in the table")
+    parser.add_argument("--limit", type=int, default=7, help="The number of videos per page")
+    parser.add_argument("--depths", type=int, nargs="+", default=[1, 10, 100, 1000, 10000, 100000],
+                        help="The page numbers to fetch")
+    parser.add_argument("--repeats", type=int, default=5, help="Report the median of this many fetches per page")
+    parser.add_argument("--json", action="store_true", help="Output the results as JSON rather than a table")
+    args = parser.parse_args()
+
+    benchmark = benchmark_pagination(args.rows, args.limit, args.depths, args.repeats)
+    if args.json is True:
+        print(json.dumps(benchmark))
+    else:
+        print(f"{'page':>10}{'numbered (ms)':>16}{'cursor (ms)':>14}")
+        for result in benchmark:
+            print(f"{result['page']:>10}{result['offset_ms']:>16.3f}{result['cursor_ms']:>14.3f}")
@@ -0,0 +1,133 @@
+"""
+Benchmark for transfers to and from S3. Uploads and downloads objects of each size with the in-memory methods of
+`BucketSort` and with the streaming ones, and reports the time taken and the peak memory allocated by Python, e.g.
+
+    python -m python.benchmarks.s3_transfers --sizes 10 50 200 --part-size 8 --concurrency 4
+
+The objects are written to the bucket under `benchmarks/s3_transfers/` and deleted afterwards.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Sequence
+
+from python.constants import BUCKET_NAME, S3Settings
+from python.s3_organiser import BucketSort
+
+MB = 1024 ** 2
+KEY_PREFIX = "benchmarks/s3_transfers"
+
+
+def measure(func: Callable[[], Any]) -> Dict[str, float]:
+    """
+    Time a call and record the peak memory it allocates
+    :param func: The function to call
+    :return: The 'seconds' taken and the 'peak_mb' allocated
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        func()
+        seconds = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {"seconds": seconds, "peak_mb": peak / MB}
+
+
+def write_sample_file(path: str, size: int) -> None:
+    """
+    Write a file of random bytes, which don't compress, a block at a time
+    :param path: The path to write to
+    :param size: The size of the file in bytes
+    """
+    with open(path, "wb") as file:
+        for start in range(0, size, MB):
+            file.write(os.urandom(min(MB, size - start)))
+
+
+def benchmark_s3_transfers(
+        sizes_mb: Sequence[int] = (10, 50, 200),
+        bucket: str = BUCKET_NAME,
+        part_size: int = S3Settings.PART_SIZE,
+        max_concurrency: int = S3Settings.MAX_CONCURRENCY,
+        repeats: int = 1,
+) -> List[Dict[str, Any]]:
+    """
+    Upload and download an object of each size with each method
+    :param sizes_mb: The sizes of the objects in MiB
+    :param bucket: The bucket to upload the objects to
+    :param part_size: The part size for the streaming methods in bytes
+    :param max_concurrency: The max number of parts in flight for the streaming methods
+    :param repeats: The number of times to run each transfer, the fastest time is reported
+    :return: The 'method', object 'size_mb', fastest 'seconds', 'mb_per_second' and 'peak_mb' of each transfer
+    """
+    s3_bucket = BucketSort(bucket=bucket)
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for size_mb in sizes_mb:
+            path = os.path.join(directory, f"{size_mb}.bin")
+            download_path = os.path.join(directory, f"{size_mb}_download.bin")
+            write_sample_file(path, size_mb * MB)
+            s3_key = f"{KEY_PREFIX}/{size_mb}.bin"
+
+            def push_object() -> None:
+                with open(path, "rb") as file:
+                    s3_bucket.push_object_to_s3(file.read(), s3_key)
+
+            def upload_stream() -> None:
+                with open(path, "rb") as file:
+                    s3_bucket.upload_stream(file, s3_key, part_size=part_size, max_concurrency=max_concurrency)
+
+            def get_object() -> None:
+                with open(download_path, "wb") as file:
+                    file.write(s3_bucket.get_object_from_s3(s3_key))
+
+            def download_to() -> None:
+                s3_bucket.download_to(s3_key, download_path, part_size=part_size, max_concurrency=max_concurrency)
+
+            transfers = {
+                "push_object_to_s3": push_object,
+                "upload_stream": upload_stream,
+                "get_object_from_s3": get_object,
+                "download_to": download_to,
+            }
+            try:
+                for method, transfer in transfers.items():
+                    measurements = [measure(transfer) for _ in range(repeats)]
+                    seconds = min(measurement["seconds"] for measurement in measurements)
+                    results.append({
+                        "method": method,
+                        "size_mb": size_mb,
+                        "seconds": round(seconds, 3),
+                        "mb_per_second": round(size_mb / seconds, 1),
+                        "peak_mb": round(max(measurement["peak_mb"] for measurement in measurements), 1),
+                    })
+            finally:
+                s3_bucket.delete_file(s3_key)
+            os.remove(path)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the in-memory and streaming S3 transfers of BucketSort")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 50, 200], help="The object sizes in MiB")
+    parser.add_argument("--bucket", default=BUCKET_NAME, help="The bucket to upload the objects to")
+    parser.add_argument("--part-size", type=int, default=S3Settings.PART_SIZE // MB, help="The part size in MiB")
+    parser.add_argument("--concurrency", type=int, default=S3Settings.MAX_CONCURRENCY,
+                        help="The max number of parts in flight")
+    parser.add_argument("--repeats", type=int, default=1, help="Report the fastest of this many runs per transfer")
+    parser.add_argument("--json", action="store_true", help="Output the results as JSON rather than a table")
+    args = parser.parse_args()
+
+    benchmark = benchmark_s3_transfers(args.sizes, args.bucket, args.part_size * MB, args.concurrency, args.repeats)
+    if args.json is True:
+        print(json.dumps(benchmark))
+    else:
+        print(f"{'method':<20}{'size (MB)':>10}{'seconds':>10}{'MB/s':>10}{'peak (MB)':>12}")
+        for result in benchmark:
+            print(f"{result['method']:<20}{result['size_mb']:>10}{result['seconds']:>10.2f}"
+                  f"{result['mb_per_second']:>10.1f}{result['peak_mb']:>12.1f}")
@@ -0,0 +1,328 @@
+"""
+Module for recording the progress of a pipeline run, so a retried run can skip the stages that already finished. For
+example, if the upload to YouTube succeeds but writing to the database fails, the retry only writes to the database
+rather than generating, rendering and uploading a second video.
+
+The manifests of runs that didn't complete are stored under `Paths.CHECKPOINT_DIR_PATH`, and are moved to its
+`complete` directory when the run completes, so finding a run to resume only lists the runs that didn't complete. Both
+are deleted once they're older than the retention periods in `CheckpointSettings`.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from botocore.exceptions import ClientError
+
+from python.constants import BUCKET_NAME, CheckpointSettings, Paths
+from python.s3_organiser import BucketSort
+from python import custom_logging
+import base_config
+
+logger = custom_logging.get_logger(__name__)
+
+COMPLETE_DIR = "complete"
+
+
+def new_run_id() -> str:
+    """
+    Create an ID for a new pipeline run
+    :return: The run ID, starting with the time the run was started
+    """
+    return f"{time.strftime('%Y-%m-%d_%H-%M-%S', time.gmtime())}_{uuid.uuid4().hex[:8]}"
+
+
+@custom_logging.log_all_methods
+class RunCheckpoint:
+    """
+    A manifest recording the output of each completed stage of a pipeline run, stored as JSON under
+    `Paths.CHECKPOINT_DIR_PATH` alongside the generated files. The manifest is rewritten as each stage completes.
+    """
+
+    def __init__(self, run_id: str, cloud_storage: bool = False, bucket: str = BUCKET_NAME):
+        """
+        Initialise a RunCheckpoint object. Nothing is read or written until the checkpoint is used.
+        :param run_id: The ID of the run, see `new_run_id`
+        :param cloud_storage: Whether the manifest is stored in S3
+        :param bucket: The S3 bucket the manifest is stored in, only used if `cloud_storage` is True
+        """
+        self.run_id = run_id
+        self.cloud_storage = cloud_storage
+        self.bucket = bucket
+        self.path = self.manifest_path(run_id, cloud_storage)
+        self.complete_path = self.manifest_path(run_id, cloud_storage, complete=True)
+        self._s3_bucket = BucketSort(bucket=bucket) if cloud_storage is True else None
+        self._manifest: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def manifest_dir(cloud_storage: bool, complete: bool = False) -> str:
+        """
+        Get the directory the manifests are stored in
+        :param cloud_storage: Whether the manifests are stored in S3
+        :param complete: Whether to get the directory of the runs that completed
+        :return: The S3 prefix, without a trailing slash, or absolute local path of the directory
+        """
+        directory = f"{Paths.CHECKPOINT_DIR_PATH}/{COMPLETE_DIR}" if complete is True else Paths.CHECKPOINT_DIR_PATH
+        return directory if cloud_storage is True else f"{base_config.BASE_DIR}/{directory}"
+
+    @classmethod
+    def manifest_path(cls, run_id: str, cloud_storage: bool, complete: bool = False) -> str:
+        """
+        Get the path the manifest for a run is stored at
+        :param run_id: The ID of the run
+        :param cloud_storage: Whether the manifest is stored in S3
+        :param complete: Whether to get the path the manifest is moved to when the run completes
+        :return: The S3 key or absolute local path of the manifest
+        """
+        return f"{cls.manifest_dir(cloud_storage, complete)}/{run_id}.json"
+
+    @classmethod
+    def latest_incomplete(
+            cls,
+            cloud_storage: bool = False,
+            bucket: str = BUCKET_NAME,
+            max_runs: int = 20,
+    ) -> Optional["RunCheckpoint"]:
+        """
+        Find the most recent run that didn't complete, e.g. to resume it when the run ID isn't known
+        :param cloud_storage: Whether the manifests are stored in S3
+        :param bucket: The S3 bucket the manifests are stored in, only used if `cloud_storage` is True
+        :param max_runs: The number of most recent runs to check
+        :return: The checkpoint of the run, or None if the recent runs all completed
+        """
+        manifests = cls._list_manifests(cloud_storage, bucket, complete=False)
+        expired = cls._delete_expired(manifests, cloud_storage, bucket, CheckpointSettings.INCOMPLETE_RETENTION_SECONDS)
+        # Sort by modified time rather than ID, as only the IDs made by `new_run_id` sort by time
+        recent = sorted(set(manifests) - set(expired), key=manifests.__getitem__, reverse=True)
+        for run_id in recent[:max_runs]:
+            checkpoint = cls(run_id, cloud_storage=cloud_storage, bucket=bucket)
+            if checkpoint.load().get("status") != "complete":
+                return checkpoint
+        return None
+
+    @classmethod
+    def _list_manifests(cls, cloud_storage: bool, bucket: str, complete: bool) -> Dict[str, float]:
+        """
+        List the manifests of the runs that did or didn't complete
+        :param cloud_storage: Whether the manifests are stored in S3
+        :param bucket: The S3 bucket the manifests are stored in, only used if `cloud_storage` is True
+        :param complete: Whether to list the runs that completed
+        :return: The time each manifest was last modified, as a Unix timestamp, keyed by run ID
+        """
+        directory = cls.manifest_dir(cloud_storage, complete)
+        if cloud_storage is True:
+            paginator = BucketSort(bucket=bucket).s3_client.get_paginator("list_objects_v2")
+            # The delimiter stops the runs that completed being listed with the runs that didn't
+            return {
+                os.path.basename(item["Key"])[:-len(".json")]: item["LastModified"].timestamp()
+                for page in paginator.paginate(Bucket=bucket, Prefix=f"{directory}/", Delimiter="/")
+                for item in page.get("Contents", [])
+                if item["Key"].endswith(".json")
+            }
+        if not os.path.isdir(directory):
+            return {}
+        with os.scandir(directory) as entries:
+            return {
+                entry.name[:-len(".json")]: entry.stat().st_mtime
+                for entry in entries
+                if entry.is_file() and entry.name.endswith(".json")
+            }
+
+    @classmethod
+    def _delete_expired(
+            cls,
+            manifests: Dict[str, float],
+            cloud_storage: bool,
+            bucket: str,
+            retention_seconds: float,
+            complete: bool = False,
+    ) -> List[str]:
+        """
+        Delete the manifests that haven't been modified within the retention period
+        :param manifests: The time each manifest was last modified, keyed by run ID, see `_list_manifests`
+        :param cloud_storage: Whether the manifests are stored in S3
+        :param bucket: The S3 bucket the manifests are stored in, only used if `cloud_storage` is True
+        :param retention_seconds: How long to keep a manifest after it was last modified
+        :param complete: Whether the manifests are of runs that completed
+        :return: The IDs of the runs whose manifests were deleted
+        """
+        cutoff = time.time() - retention_seconds
+        expired = [run_id for run_id, modified in manifests.items() if modified < cutoff]
+        s3_bucket = BucketSort(bucket=bucket) if cloud_storage is True and len(expired) > 0 else None
+        for run_id in expired:
+            cls._delete_manifest(cls.manifest_path(run_id, cloud_storage, complete), s3_bucket)
+        if len(expired) > 0:
+            logger.info(f"Deleted {len(expired)} expired checkpoints from {cls.manifest_dir(cloud_storage, complete)}")
+        return expired
+
+    @staticmethod
+    def _delete_manifest(path: str, s3_bucket: Optional[BucketSort]) -> None:
+        """
+        Delete a manifest if it exists
+        :param path: The S3 key or absolute local path of the manifest
+        :param s3_bucket: The bucket the manifest is stored in, or None if it's stored locally
+        """
+        if s3_bucket is not None:
+            s3_bucket.delete_file(path)
+            return
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def load(self) -> Dict[str, Any]:
+        """
+        Load the manifest, reading it from storage on first use
+        :return: The manifest, with the run's status and the output of each completed stage under 'stages'
+        """
+        with self._lock:
+            return self._load()
+
+    def completed_stages(self) -> Dict[str, Any]:
+        """
+        Get the output of each completed stage
+        :return: The output recorded for each stage, keyed by stage name
+        """
+        return {name: stage["output"] for name, stage in self.load()["stages"].items()}
+
+    def save_stage(self, stage: str, output: Any) -> None:
+        """
+        Record that a stage has completed
+        :param stage: The name of the stage
+        :param output: The output of the stage. Must be JSON serialisable.
+        """
+        with self._lock:
+            manifest = self._load()
+            manifest["stages"][stage] = {"output": output, "completed_at": time.time()}
+            manifest.setdefault("progress", {}).pop(stage, None)
+            self._save(manifest)
+
+    def save_progress(self, stage: str, progress: Any) -> None:
+        """
+        Record the progress of a stage that hasn't completed, e.g. the session of a resumable upload, so a retried run
+        can continue from it. The progress is dropped when the stage completes.
+        :param stage: The name of the stage
+        :param progress: The progress of the stage. Must be JSON serialisable.
+        """
+        with self._lock:
+            manifest = self._load()
+            manifest.setdefault("progress", {})[stage] = progress
+            self._save(manifest)
+
+    def get_progress(self, stage: str) -> Optional[Any]:
+        """
+        Get the progress recorded for a stage that hasn't completed
+        :param stage: The name of the stage
+        :return: The progress saved with `save_progress`, or None if there is none
+        """
+        return self.load().get("progress", {}).get(stage)
+
+    def start_attempt(self) -> Tuple[int, List[str]]:
+        """
+        Record the start of an attempt at the run
+        :return: The attempt number, starting at 1, and the stages completed by previous attempts
+        """
+        with self._lock:
+            manifest = self._load()
+            manifest["attempts"] += 1
+            manifest["status"] = "running"
+            self._save(manifest)
+            if len(manifest["stages"]) > 0:
+                logger.info(f"Resuming run {self.run_id} (attempt {manifest['attempts']}), skipping the completed "
+                            f"stages: {', '.join(manifest['stages'])}")
+            return manifest["attempts"], list(manifest["stages"])
+
+    def mark_failed(self, stage: str) -> None:
+        """
+        Record that the run failed
+        :param stage: The name of the stage that failed
+        """
+        self._set_status("failed", failed_stage=stage)
+
+    def mark_complete(self) -> None:
+        """
+        Record that every stage of the run has completed, moving the manifest out of the runs that can be resumed. The
+        completed runs older than `CheckpointSettings.COMPLETE_RETENTION_SECONDS` are deleted.
+        """
+        with self._lock:
+            manifest = self._load()
+            manifest["status"] = "complete"
+            manifest["failed_stage"] = None
+            self._save(manifest, self.complete_path)
+            self._delete_manifest(self.path, self._s3_bucket)
+        completed = self._list_manifests(self.cloud_storage, self.bucket, complete=True)
+        completed.pop(self.run_id, None)
+        self._delete_expired(
+            completed, self.cloud_storage, self.bucket, CheckpointSettings.COMPLETE_RETENTION_SECONDS, complete=True
+        )
+
+    def _set_status(self, status: str, failed_stage: Optional[str]) -> None:
+        """
+        Update the status of the run
+        :param status: The new status, 'running' or 'failed'
+        :param failed_stage: The stage that failed, if any
+        """
+        with self._lock:
+            manifest = self._load()
+            manifest["status"] = status
+            manifest["failed_stage"] = failed_stage
+            self._save(manifest)
+
+    def _load(self) -> Dict[str, Any]:
+        """
+        Load the manifest, or create an empty one for a new run. Must be called while holding `self._lock`.
+        :return: The manifest
+        """
+        if self._manifest is None:
+            # A run that completed is only attempted again if its event is delivered twice
+            data = self._read_if_exists(self.path)
+            if data is None:
+                data = self._read_if_exists(self.complete_path)
+            if data is not None:
+                self._manifest = json.loads(data.decode("utf-8"))
+            else:
+                self._manifest = {
+                    "run_id": self.run_id,
+                    "status": "running",
+                    "failed_stage": None,
+                    "attempts": 0,
+                    "stages": {},
+                    "progress": {},
+                }
+        return self._manifest
+
+    def _save(self, manifest: Dict[str, Any], path: Optional[str] = None) -> None:
+        """
+        Write the manifest to storage
+        :param manifest: The manifest to write
+        :param path: Optional. The path to write the manifest to, defaults to the path of a run that didn't complete
+        """
+        path = path if path is not None else self.path
+        data = json.dumps(manifest, ensure_ascii=False).encode("utf-8")
+        if self._s3_bucket is not None:
+            self._s3_bucket.push_object_to_s3(data, path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(data)
+
+    def _read_if_exists(self, path: str) -> Optional[bytes]:
+        """
+        Read the manifest from storage if it exists
+        :param path: The S3 key or absolute local path of the manifest
+        :return: The contents of the manifest, or None if it doesn't exist
+        """
+        try:
+            if self._s3_bucket is not None:
+                return self._s3_bucket.get_object_from_s3(path)
+            with open(path, "rb") as file:
+                return file.read()
+        except FileNotFoundError:
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
@@ -1,7 +1,7 @@
 """Module for storing constants for the project"""
 
 from dataclasses import dataclass
-from typing import Literal, Final, Dict
+from typing import Literal, Final, Dict, Optional
 
 LANGUAGE_TO_LEARN = "es"
 NATIVE_LANGUAGE = "en"
@@ -87,6 +87,8 @@ class ModelTypes:
 class VideoSettings:
     SQUARE: Literal["1024x1024"] = "1024x1024"
     VERTICAL: Literal["1024x1792"] = "1024x1792"
+    FPS = 24
+    WORD_STYLE: Optional[str] = None
     TAGS = ["languages", "education", "language learning"]
 
 
@@ -97,7 +99,100 @@ class Paths:
     IMAGE_DIR_PATH = "images"
     NODE_SUBS_FILE_PATH = "node/sync_subtitles.js"
     VIDEO_DIR_PATH = "video"
+    CACHE_DIR_PATH = "cache"
+    CHECKPOINT_DIR_PATH = "checkpoints"
     GOOGLE_CREDS_PATH = "google_creds.json"
     YT_TOKEN_PATH = "python/token.json"
     PYTHON_ENV_FILE = ".env"
     FONT_PATH = "/usr/share/fonts/liberation/LiberationSans-Regular.ttf"
+
+
+@dataclass
+class BatchSettings:
+    AUDIO_CONCURRENCY = 4
+    IMAGE_CONCURRENCY = 4
+    VIDEO_CONCURRENCY = 2
+    UPLOAD_CONCURRENCY = 2
+
+
+@dataclass
+class ImageSettings:
+    MAX_IN_FLIGHT = 4
+    RATE_LIMIT_RETRIES = 5
+    RATE_LIMIT_BACKOFF_SECONDS = 2.0
+    DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+@dataclass
+class S3Settings:
+    # S3 rejects multipart uploads with parts (other than the last) smaller than 5 MiB
+    MIN_PART_SIZE = 5 * 1024 ** 2
+    PART_SIZE = 8 * 1024 ** 2
+    MAX_CONCURRENCY = 4
+    # Shared by every thread using the S3 client, so enough for the upload threads of several transfers at once
+    MAX_POOL_CONNECTIONS = 32
+    TCP_KEEPALIVE = True
+    RETRY_MODE = "standard"
+    MAX_ATTEMPTS = 5
+
+
+@dataclass
+class CacheSettings:
+    ENABLED = True
+    TTL_SECONDS = 30 * 24 * 60 * 60
+    MAX_ENTRIES = 10000
+    MAX_BYTES = 5 * 1024 ** 3
+    # Evicting lists every artifact, so it's done at most this often rather than on every write
+    EVICT_INTERVAL_SECONDS = 60 * 60
+
+
+@dataclass
+class CheckpointSettings:
+    # Completed runs are kept for a day, so a repeated delivery of a Lambda event doesn't make a second video
+    COMPLETE_RETENTION_SECONDS = 24 * 60 * 60
+    # Runs that didn't complete are resumed for a week, then deleted
+    INCOMPLETE_RETENTION_SECONDS = 7 * 24 * 60 * 60
+
+
+@dataclass
+class UploadSettings:
+    # YouTube needs every chunk but the last to be a multiple of 256 KiB
+    CHUNK_ALIGNMENT = 256 * 1024
+    INITIAL_CHUNK_SIZE = 4 * 1024 ** 2
+    MIN_CHUNK_SIZE = 1024 ** 2
+    MAX_CHUNK_SIZE = 64 * 1024 ** 2
+    # The chunk size is adapted to the throughput so each chunk takes about this long
+    TARGET_CHUNK_SECONDS = 5.0
+    MAX_RETRIES = 5
+    BACKOFF_SECONDS = 1.0
+
+
+@dataclass
+class ApiSettings:
+    # The videos sent per request to the bulk write-to-db endpoint, which accepts at most 1000
+    BULK_WRITE_BATCH_SIZE = 200
+    POOL_MAXSIZE = 10
+    TIMEOUT_SECONDS = 30
+    # Retries of failed connections and 502/503/504 responses. Writes are upserts, so are safe to repeat.
+    MAX_RETRIES = 3
+    BACKOFF_SECONDS = 0.5
+
+
+@dataclass
+class ColdStartSettings:
+    ENTRY_POINT = "python.lambda_handler"
+    # The entry point imports in well under 100ms once the heavy dependencies are imported on first use, against
+    # around a second before. The budget leaves room for slower machines.
+    IMPORT_BUDGET_MS = 300
+    # Imported on first use, see python/lazy_imports.py
+    LAZY_MODULES = [
+        "boto3", "deep_translator", "enchant", "googleapiclient", "gtts", "httpx", "moviepy", "MySQLdb", "numpy",
+        "openai", "PIL", "requests", "soundfile",
+    ]
+
+
+@dataclass
+class RenderSettings:
+    FFMPEG_THREADS = 1
+    BACKEND = "moviepy"
+    ENCODING_PROFILE = "shorts-standard"
@@ -1,5 +1,6 @@
 """Module with custom logic for logging function/method calls - intended to be used with AWS CloudWatch"""
 from typing import Callable, Type, Any
+import inspect
 import logging
 from functools import wraps
 
@@ -30,10 +31,19 @@ def get_logger(module_name: str) -> logging.Logger:
 def log_execution(func: Callable[..., Any]) -> Callable[..., Any]:
     """
     Higher-order function which can be used to log the execution of a function or method. Preserves the signature of the
-    wrapped function.
+    wrapped function, and awaits coroutine functions so that the exit is logged once the coroutine has finished.
     :param func: A function or method to wrap and log the call for
     :returns: Wrapper function which wraps around the `func` passed as an argument
     """
+    if inspect.iscoroutinefunction(func):
+        @wraps(func)
+        async def async_wrapper(*args, **kwargs):
+            logger.info(f"Entering: {func.__qualname__}")
+            result = await func(*args, **kwargs)
+            logger.info(f"Exiting: {func.__qualname__}")
+            return result
+        return async_wrapper
+
     @wraps(func)
     def wrapper(*args, **kwargs):
         logger.info(f"Entering: {func.__qualname__}")
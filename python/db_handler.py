@@ -1,36 +1,158 @@
 """Module for establishing and handling MySQL DB connection"""
+from __future__ import annotations
+
 import os
-import requests
-from typing import Dict
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterable, List, Optional, Tuple
 
-import MySQLdb
 import dotenv
 
+from python.constants import ApiSettings
+from python.lazy_imports import lazy_import
+from python import custom_logging
 from python import utils
 
+if TYPE_CHECKING:
+    import requests
+else:
+    requests = lazy_import("requests")
+
 dotenv.load_dotenv()
 
+logger = custom_logging.get_logger(__name__)
 
-def write_to_db(video_details: Dict[str, str]) -> requests.Response:
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_api_session() -> requests.Session:
     """
-    Writes video metadata to a MySQL database by calling an API endpoint, which writes the data to the DB.
-    :param video_details: Dictionary containing the data to write to the DB
+    Get the session shared by every request to the API, created on first use. The session keeps its connections open
+    between requests, and retries failed connections and 502/503/504 responses with backoff.
+    :return: The shared session
     """
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = requests.adapters.Retry(
+                total=ApiSettings.MAX_RETRIES,
+                backoff_factor=ApiSettings.BACKOFF_SECONDS,
+                status_forcelist=(502, 503, 504),
+                allowed_methods=None,
+            )
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=ApiSettings.POOL_MAXSIZE, max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
 
+
+def _get_api_config() -> Tuple[str, Dict[str, Any]]:
+    """
+    Get the URL of the API and the headers to send with each request from the environment
+    :return: The base URL of the API, without a trailing slash, and the headers
+    """
     base_url = os.getenv('API_BASE_URL')
     if base_url is None:
         raise ValueError("No 'API_BASE_URL' env variable could be found")
-    base_url = utils.remove_trailing_slash(base_url)
-    api_url = f"{base_url}/today/videos/write-to-db/"
-    api_key = os.getenv("EXPECTED_API_KEY")
-
     headers = {
         "Content-Type": "application/json",
-        "X-API-KEY": api_key,
+        "X-API-KEY": os.getenv("EXPECTED_API_KEY"),
     }
+    return utils.remove_trailing_slash(base_url), headers
+
 
-    response = requests.post(api_url, json=video_details, headers=headers)
+def write_to_db(video_details: Dict[str, str]) -> requests.Response:
+    """
+    Writes video metadata to a MySQL database by calling an API endpoint, which writes the data to the DB.
+    :param video_details: Dictionary containing the data to write to the DB
+    """
+    base_url, headers = _get_api_config()
+    api_url = f"{base_url}/today/videos/write-to-db/"
+
+    response = get_api_session().post(api_url, json=video_details, headers=headers, timeout=ApiSettings.TIMEOUT_SECONDS)
     response.raise_for_status()
 
     return response
 
+
+def write_many_to_db(
+        videos: Iterable[Dict[str, Any]],
+        batch_size: int = ApiSettings.BULK_WRITE_BATCH_SIZE,
+) -> List[Dict[str, str]]:
+    """
+    Writes the metadata of several videos to the DB, sending them to the bulk write-to-db endpoint in batches
+    :param videos: The metadata of each video, in the format accepted by `write_to_db`
+    :param batch_size: The number of videos to send per request
+    :return: The 'video_id' and 'status' ('created' or 'updated') of each video
+    """
+    with BulkVideoWriter(batch_size=batch_size) as writer:
+        for video_details in videos:
+            writer.add(video_details)
+    return writer.results
+
+
+@custom_logging.log_all_methods
+class BulkVideoWriter:
+    """
+    Collects video metadata and writes it to the DB through the bulk write-to-db endpoint, one request per batch. The
+    videos left over are written when the writer is closed, e.g.
+
+        with BulkVideoWriter() as writer:
+            for video_details in backfill:
+                writer.add(video_details)
+    """
+
+    def __init__(self, batch_size: int = ApiSettings.BULK_WRITE_BATCH_SIZE, session: Optional[requests.Session] = None):
+        """
+        Initialise a BulkVideoWriter object
+        :param batch_size: The number of videos to send per request
+        :param session: Optional. The session to send the requests with, defaults to the shared `get_api_session`
+        """
+        if batch_size < 1:
+            raise ValueError(f"The batch size must be at least 1, got {batch_size}")
+        self.batch_size = batch_size
+        self.session = session or get_api_session()
+        self.base_url, self.headers = _get_api_config()
+        self.pending: List[Dict[str, Any]] = []
+        self.results: List[Dict[str, str]] = []
+        self.requests_sent = 0
+
+    def add(self, video_details: Dict[str, Any]) -> None:
+        """
+        Add a video to write, writing the batch if it's full
+        :param video_details: The metadata of the video
+        """
+        self.pending.append(video_details)
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> List[Dict[str, str]]:
+        """
+        Write the videos added since the last flush
+        :return: The 'video_id' and 'status' of each video written
+        """
+        if not self.pending:
+            return []
+        batch, self.pending = self.pending, []
+        response = self.session.post(
+            f"{self.base_url}/today/videos/write-to-db/bulk/",
+            json=batch,
+            headers=self.headers,
+            timeout=ApiSettings.TIMEOUT_SECONDS,
+        )
+        if response.status_code == 400:
+            logger.error(f"The API rejected a batch of {len(batch)} videos: {response.text}")
+        response.raise_for_status()
+        self.requests_sent += 1
+        results = response.json()["results"]
+        self.results.extend(results)
+        return results
+
+    def __enter__(self) -> BulkVideoWriter:
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if exc_type is None:
+            self.flush()
@@ -0,0 +1,110 @@
+"""
+Module containing named animation effects for overlay layers. Each effect computes its offset and opacity tracks for
+every frame of a layer up front as NumPy arrays, see `OverlayLayer`, so drawing an animated layer is an array lookup
+rather than a Python function called for every frame.
+"""
+from __future__ import annotations
+
+import math
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Callable, Dict, Optional
+
+from python.constants import VideoSettings
+from python.lazy_imports import lazy_import
+
+if TYPE_CHECKING:
+    import numpy as np
+else:
+    np = lazy_import("numpy")
+
+
+@dataclass
+class EffectTracks:
+    """The animation tracks of an effect, with one value per frame. A track is None if the effect doesn't change it."""
+    offsets: Optional[np.ndarray] = None
+    opacities: Optional[np.ndarray] = None
+
+
+def frame_times(duration: float, fps: float = VideoSettings.FPS) -> np.ndarray:
+    """
+    Get the time of each frame of a layer
+    :param duration: The duration of the layer in seconds
+    :param fps: The frame rate of the video
+    :return: The time of each frame from the start of the layer, in seconds
+    """
+    return np.arange(max(math.ceil(duration * fps), 1)) / fps
+
+
+def bounce(t: np.ndarray, amplitude: float = 20, frequency: float = 1.0) -> EffectTracks:
+    """
+    Move up and down
+    :param t: The time of each frame, see `frame_times`
+    :param amplitude: The distance moved above and below the layer's position in pixels
+    :param frequency: The number of bounces per second
+    :return: The tracks of the effect
+    """
+    dy = np.rint(amplitude * np.sin(2 * np.pi * frequency * t))
+    return EffectTracks(offsets=np.column_stack([np.zeros_like(dy), dy]).astype(np.int32))
+
+
+def fade(t: np.ndarray, minimum: float = 0.4, frequency: float = 1.0) -> EffectTracks:
+    """
+    Fade out and back in smoothly
+    :param t: The time of each frame, see `frame_times`
+    :param minimum: The lowest opacity, from 0 to 1
+    :param frequency: The number of fades per second
+    :return: The tracks of the effect
+    """
+    middle, amplitude = (1 + minimum) / 2, (1 - minimum) / 2
+    return EffectTracks(opacities=middle + amplitude * np.sin(2 * np.pi * frequency * t))
+
+
+def pulse(t: np.ndarray, minimum: float = 0.6, decay: float = 4.0, frequency: float = 1.0) -> EffectTracks:
+    """
+    Flash to full opacity on each beat, then fade away quickly
+    :param t: The time of each frame, see `frame_times`
+    :param minimum: The opacity faded to between beats, from 0 to 1
+    :param decay: How quickly the opacity fades after a beat
+    :param frequency: The number of beats per second
+    :return: The tracks of the effect
+    """
+    since_beat = np.mod(t * frequency, 1) / frequency
+    return EffectTracks(opacities=minimum + (1 - minimum) * np.exp(-decay * since_beat))
+
+
+def slide(t: np.ndarray, distance: float = 300, duration: float = 0.5) -> EffectTracks:
+    """
+    Slide in from the left while fading in, slowing down as the layer reaches its position
+    :param t: The time of each frame, see `frame_times`
+    :param distance: The distance to the left of its position that the layer starts at in pixels
+    :param duration: The time taken to slide in, in seconds
+    :return: The tracks of the effect
+    """
+    progress = np.clip(t / duration, 0, 1) if duration > 0 else np.ones_like(t)
+    dx = np.rint(-distance * (1 - progress) ** 3)
+    return EffectTracks(
+        offsets=np.column_stack([dx, np.zeros_like(dx)]).astype(np.int32),
+        opacities=progress,
+    )
+
+
+EFFECTS: Dict[str, Callable[..., EffectTracks]] = {
+    "bounce": bounce,
+    "fade": fade,
+    "pulse": pulse,
+    "slide": slide,
+}
+
+
+def effect_tracks(name: str, duration: float, fps: float = VideoSettings.FPS, **params: float) -> EffectTracks:
+    """
+    Compute the tracks of a named effect for every frame of a layer
+    :param name: The name of the effect, one of the keys of `EFFECTS`
+    :param duration: The duration of the layer in seconds
+    :param fps: The frame rate of the video
+    :param params: Optional. Parameters for the effect, e.g. the `amplitude` of a bounce
+    :return: The tracks of the effect
+    """
+    if name not in EFFECTS:
+        raise ValueError(f"{name} is not a recognised effect. Use one of {', '.join(EFFECTS)}")
+    return EFFECTS[name](frame_times(duration, fps), **params)
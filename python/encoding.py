@@ -0,0 +1,73 @@
+"""
+Module containing the encoding profiles for rendered videos. A profile trades encoding speed against quality and file
+size with settings that mean the same on any machine (the x264 preset and CRF, the frame rate, the resolution and the
+audio bitrate), rather than e.g. a target encode time.
+"""
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from python.constants import RenderSettings
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    """
+    Settings for encoding a video with libx264 and AAC
+    """
+    name: str
+    preset: str = "medium"
+    crf: int = 23
+    fps: int = 24
+    scale: float = 1.0
+    audio_bitrate: str = "128k"
+    threads: Optional[int] = None
+
+    def frame_size(self, source_size: Tuple[int, int]) -> Tuple[int, int]:
+        """
+        Get the size of the encoded video
+        :param source_size: The width and height of the images the video is made from
+        :return: The width and height scaled by `scale`, rounded down to even numbers as yuv420p needs
+        """
+        width, height = (max(2, int(side * self.scale) // 2 * 2) for side in source_size)
+        return width, height
+
+    def x264_params(self) -> List[str]:
+        """
+        Get the ffmpeg output options for the profile's quality. The preset, frame rate and audio bitrate are passed
+        separately, as MoviePy has its own arguments for them.
+        :return: The options
+        """
+        return ["-crf", str(self.crf)]
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the profile to a dictionary, e.g. for a cache key
+        :return: The profile as a JSON serialisable dictionary
+        """
+        return asdict(self)
+
+
+ENCODING_PROFILES: Dict[str, EncodingProfile] = {
+    profile.name: profile
+    for profile in [
+        # Quick previews while working on the look of the videos
+        EncodingProfile("draft", preset="ultrafast", crf=32, fps=15, scale=0.5, audio_bitrate="64k"),
+        # What is uploaded to YouTube, which re-encodes it anyway. The x264 and AAC defaults MoviePy always used.
+        EncodingProfile("shorts-standard", preset="medium", crf=23, fps=24, scale=1.0, audio_bitrate="128k"),
+        # A high quality copy to keep
+        EncodingProfile("archive", preset="slow", crf=18, fps=30, scale=1.0, audio_bitrate="192k"),
+    ]
+}
+
+
+def get_encoding_profile(profile: str | EncodingProfile = RenderSettings.ENCODING_PROFILE) -> EncodingProfile:
+    """
+    Look up an encoding profile by name
+    :param profile: The name of the profile, one of the keys of `ENCODING_PROFILES`, or a profile to use as is
+    :return: The profile
+    """
+    if isinstance(profile, EncodingProfile):
+        return profile
+    if profile not in ENCODING_PROFILES:
+        raise ValueError(f"{profile} is not a recognised encoding profile. Use one of {', '.join(ENCODING_PROFILES)}")
+    return ENCODING_PROFILES[profile]
@@ -0,0 +1,214 @@
+"""
+Module for rendering videos with a single ffmpeg process. A video is a slideshow of still images with audio and timed
+overlays, which ffmpeg can produce in one pass with a filter graph of `concat` and `overlay` filters, rather than
+MoviePy decoding, compositing and piping every frame through Python.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Sequence, Tuple
+
+from python.constants import VideoSettings
+from python.encoding import EncodingProfile, get_encoding_profile
+from python.lazy_imports import lazy_import
+from python.overlays import OverlayLayer, resolve_position
+from python import custom_logging
+
+if TYPE_CHECKING:
+    import numpy as np
+    from moviepy.config import get_setting
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    from PIL import Image
+else:
+    np = lazy_import("numpy")
+    get_setting = lazy_import("moviepy.config", "get_setting")
+    VideoFileClip = lazy_import("moviepy.video.io.VideoFileClip", "VideoFileClip")
+    ffmpeg_parse_infos = lazy_import("moviepy.video.io.ffmpeg_reader", "ffmpeg_parse_infos")
+    Image = lazy_import("PIL.Image")
+
+logger = custom_logging.get_logger(__name__)
+
+
+def media_duration(filepath: str) -> float:
+    """
+    Get the duration of an audio or video file
+    :param filepath: The path to the file
+    :return: The duration in seconds
+    """
+    return float(ffmpeg_parse_infos(filepath)["duration"])
+
+
+def _static_track_value(track: Optional[np.ndarray], default: Any, name: str) -> Any:
+    """
+    Get the value of an animation track that doesn't change, as the filter graph only draws layers at a fixed position
+    and opacity
+    :param track: The track, see `OverlayLayer`
+    :param default: The value if there is no track
+    :param name: The name of the track, for the error message
+    :return: The value of the track
+    """
+    if track is None or len(track) == 0:
+        return default
+    if not (track == track[0]).all():
+        raise ValueError(f"The ffmpeg backend can't draw layers with an animated {name} track, use the moviepy backend")
+    return track[0]
+
+
+def build_filter_graph(
+        frame_counts: Sequence[int],
+        frame_size: Tuple[int, int],
+        overlays: Sequence[Tuple[int, int, float, float]],
+        fps: int = VideoSettings.FPS,
+        output_size: Optional[Tuple[int, int]] = None,
+) -> str:
+    """
+    Build the filter graph that joins the images into a slideshow and draws the overlays on it. The images are inputs
+    0 to `len(frame_counts) - 1`, the audio is the input after them and the overlays are the inputs after the audio.
+    Each image is decoded and scaled once and then repeated, rather than decoded again for every frame.
+    :param frame_counts: The number of frames each image is shown for
+    :param frame_size: The width and height of the video, every image is scaled to it
+    :param overlays: The x and y coordinates of the top left corner and the start and end time of each overlay, in
+    order from bottom to top
+    :param fps: The frame rate of the video
+    :param output_size: Optional. The width and height to scale the video to once the overlays are drawn
+    :return: The filter graph, with the video output labelled [video]
+    """
+    width, height = frame_size
+    image_count = len(frame_counts)
+    filters = [
+        f"[{index}:v]scale={width}:{height},setsar=1,format=rgb24,"
+        f"loop=loop={max(frame_count, 1) - 1}:size=1:start=0,setpts=N/{fps}/TB[image{index}]"
+        for index, frame_count in enumerate(frame_counts)
+    ]
+    labels = "".join(f"[image{index}]" for index in range(image_count))
+    # Passing the last frame through at the end of the stream keeps it, rather than rounding it away
+    filters.append(f"{labels}concat=n={image_count}:v=1:a=0,fps={fps}:eof_action=pass[layer0]")
+
+    for index, (x, y, start, end) in enumerate(overlays):
+        filters.append(
+            f"[layer{index}][{image_count + 1 + index}:v]overlay=x={x}:y={y}:format=rgb:eof_action=repeat"
+            f":enable='gte(t,{start:.6f})*lt(t,{end:.6f})'[layer{index + 1}]"
+        )
+    scale = f"scale={output_size[0]}:{output_size[1]}," if output_size is not None and output_size != frame_size else ""
+    filters.append(f"[layer{len(overlays)}]{scale}format=yuv420p[video]")
+    return ";".join(filters)
+
+
+def render_with_ffmpeg(
+        image_files: Sequence[str],
+        audio_file: str,
+        layers: Sequence[OverlayLayer],
+        output_filepath: str,
+        profile: Optional[EncodingProfile] = None,
+        ffmpeg_threads: Optional[int] = None,
+) -> str:
+    """
+    Render a video of images shown for an equal share of the audio, with overlay layers drawn on top, in one ffmpeg
+    process. Produces the same video as `VideoGenerator.generate_video` with the moviepy backend.
+    :param image_files: The paths to the images, the video is the size of the first image
+    :param audio_file: The path to the audio, the video is as long as the audio
+    :param layers: The layers to draw, in order from bottom to top. Their offset and opacity tracks must not change.
+    :param output_filepath: The path to write the video to
+    :param profile: Optional. The encoding profile, defaults to `RenderSettings.ENCODING_PROFILE`
+    :param ffmpeg_threads: Optional. The number of threads ffmpeg uses to encode the video, if None the profile's
+    threads are used
+    :return: The path to the video
+    """
+    if len(image_files) == 0:
+        raise ValueError("At least one image is needed to render a video")
+    if profile is None:
+        profile = get_encoding_profile()
+    if ffmpeg_threads is None:
+        ffmpeg_threads = profile.threads
+    fps = profile.fps
+    placements = [
+        (_static_track_value(layer.offsets, (0, 0), "offsets"),
+         layer.opacity * float(_static_track_value(layer.opacities, 1.0, "opacities")))
+        for layer in layers
+    ]
+    duration = media_duration(audio_file)
+    boundaries = [round(duration * fps * index / len(image_files)) for index in range(len(image_files) + 1)]
+    frame_counts = [end - start for start, end in zip(boundaries, boundaries[1:])]
+    with Image.open(image_files[0]) as first_image:
+        frame_size = first_image.size
+
+    with tempfile.TemporaryDirectory() as layer_dir:
+        command: List[str] = [get_setting("FFMPEG_BINARY"), "-y", "-loglevel", "error"]
+        for image_file in image_files:
+            command += ["-i", image_file]
+        command += ["-i", audio_file]
+
+        overlays = []
+        for index, (layer, ((dx, dy), opacity)) in enumerate(zip(layers, placements)):
+            image = layer.image.copy()
+            image[..., 3] = (image[..., 3].astype(np.float32) * opacity + 0.5).astype(np.uint8)
+            layer_path = os.path.join(layer_dir, f"layer_{index}.png")
+            Image.fromarray(image, mode="RGBA").save(layer_path)
+            command += ["-i", layer_path]
+
+            x, y = resolve_position(layer.position, (image.shape[1], image.shape[0]), frame_size)
+            overlays.append((x + int(dx), y + int(dy), layer.start, layer.end))
+
+        command += [
+            "-filter_complex", build_filter_graph(
+                frame_counts, frame_size, overlays, fps=fps, output_size=profile.frame_size(frame_size)
+            ),
+            "-map", "[video]",
+            "-map", f"{len(image_files)}:a",
+            "-c:v", "libx264",
+            "-preset", profile.preset,
+            *profile.x264_params(),
+            "-c:a", "aac",
+            "-b:a", profile.audio_bitrate,
+            "-t", f"{duration:.6f}",
+        ]
+        if ffmpeg_threads is not None:
+            command += ["-threads", str(ffmpeg_threads)]
+        command.append(output_filepath)
+
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True)
+        except subprocess.CalledProcessError as e:
+            raise subprocess.CalledProcessError(
+                e.returncode, e.cmd, stderr=f"Command failed with exit code {e.returncode}. stderr {e.stderr}"
+            ) from e
+
+    return output_filepath
+
+
+def compare_videos(reference_filepath: str, candidate_filepath: str, samples: int = 5) -> Dict[str, Any]:
+    """
+    Compare two renders of the same video, e.g. to check the ffmpeg backend matches the moviepy backend. Frames are
+    compared at evenly spaced times.
+    :param reference_filepath: The path to the video to compare against
+    :param candidate_filepath: The path to the video to compare
+    :param samples: The number of frames to compare
+    :return: A dictionary with whether the videos have the same 'size', the 'duration_difference' in seconds, and the
+    'mean_absolute_error' and lowest 'psnr' in dB of the compared frames
+    """
+    reference = VideoFileClip(reference_filepath)
+    candidate = VideoFileClip(candidate_filepath)
+    try:
+        duration = min(reference.duration, candidate.duration)
+        errors, psnrs = [], []
+        if tuple(reference.size) == tuple(candidate.size):
+            # Sample the middle of frames, as times on the boundary between frames can be decoded as either frame
+            frame_times = [(int(duration * reference.fps * (i + 0.5) / samples) + 0.5) / reference.fps
+                           for i in range(samples)]
+            for t in frame_times:
+                difference = reference.get_frame(t).astype(np.float32) - candidate.get_frame(t).astype(np.float32)
+                errors.append(float(np.abs(difference).mean()))
+                mse = float((difference ** 2).mean())
+                psnrs.append(float("inf") if mse == 0 else 10 * np.log10(255 ** 2 / mse))
+        return {
+            "size": tuple(reference.size) == tuple(candidate.size),
+            "duration_difference": abs(reference.duration - candidate.duration),
+            "mean_absolute_error": float(np.mean(errors)) if errors else None,
+            "psnr": min(psnrs) if psnrs else None,
+        }
+    finally:
+        reference.close()
+        candidate.close()
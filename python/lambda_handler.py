@@ -2,12 +2,16 @@
 import os
 import logging
 import traceback
-from typing import Dict, Any
-
-import MySQLdb
+from typing import TYPE_CHECKING, Dict, Any
 
+from python.lazy_imports import lazy_import
 from python.main import process_video_and_upload
 
+if TYPE_CHECKING:
+    import MySQLdb
+else:
+    MySQLdb = lazy_import("MySQLdb")
+
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
@@ -26,7 +30,9 @@ def lambda_handler(event: Dict[str, Any], context: Dict[str, Any]) -> Dict[str,
         if len(missing_vars) > 0:
             raise EnvironmentError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
-        video_details = process_video_and_upload(write_to_rds=True)
+        # Lambda keeps the request ID when it retries a failed async invocation, so a retry resumes the failed run
+        run_id = event.get("run_id") or getattr(context, "aws_request_id", None)
+        video_details = process_video_and_upload(write_to_rds=True, run_id=run_id)
 
         return {
             "statusCode": 200,
@@ -1,12 +1,66 @@
 """Module for verifying language using LLMs to verify that a word/sentence is real"""
+from __future__ import annotations
 
+import contextlib
 import os
-from typing import Dict
-
-import requests
-import enchant
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Tuple
 
 from python.constants import URLs
+from python.lazy_imports import lazy_import
+from python import custom_logging
+
+if TYPE_CHECKING:
+    import enchant
+    import httpx
+    import requests
+else:
+    enchant = lazy_import("enchant")
+    httpx = lazy_import("httpx")
+    requests = lazy_import("requests")
+
+logger = custom_logging.get_logger(__name__)
+
+DICTIONARY_CACHE_SIZE = 4
+
+_dictionary_cache: "OrderedDict[str, Tuple[enchant.Dict, threading.Lock]]" = OrderedDict()
+_dictionary_cache_lock = threading.Lock()
+
+
+def get_enchant_dictionary(language: str) -> Tuple[enchant.Dict, threading.Lock]:
+    """
+    Get the enchant dictionary for a language from the process-wide cache, loading it on first use. The least recently
+    used dictionary is dropped once more than `DICTIONARY_CACHE_SIZE` languages are cached.
+    :param language: The language tag for the dictionary, e.g. 'es'
+    :return: The dictionary and the lock that must be held while using it, as enchant handles aren't thread-safe
+    """
+    with _dictionary_cache_lock:
+        if language in _dictionary_cache:
+            _dictionary_cache.move_to_end(language)
+            return _dictionary_cache[language]
+
+        logger.info(f"Loading enchant dictionary for '{language}'")
+        handle = (enchant.Dict(language), threading.Lock())
+        _dictionary_cache[language] = handle
+        while len(_dictionary_cache) > DICTIONARY_CACHE_SIZE:
+            _dictionary_cache.popitem(last=False)
+        return handle
+
+
+def warm_up_dictionaries(languages: Iterable[str]) -> None:
+    """
+    Load the enchant dictionaries for the given languages into the cache ahead of time
+    :param languages: The language tags to load dictionaries for
+    """
+    for language in languages:
+        get_enchant_dictionary(language)
+
+
+def clear_dictionary_cache() -> None:
+    """Remove every dictionary from the cache"""
+    with _dictionary_cache_lock:
+        _dictionary_cache.clear()
 
 
 class LanguageVerification:
@@ -48,8 +102,19 @@ class LanguageVerification:
         :param word: The word to test
         :return: True if the word exists for the given language, False if not
         """
-        thesaurus = enchant.Dict(self.language)
-        return thesaurus.check(word)
+        thesaurus, lock = get_enchant_dictionary(self.language)
+        with lock:
+            return thesaurus.check(word)
+
+    def check_many(self, words: Iterable[str]) -> List[bool]:
+        """
+        Test a batch of words are real using enchant, loading the dictionary at most once for the whole batch
+        :param words: The words to test
+        :return: A list with True for each word that exists for the given language, else False, in the order given
+        """
+        thesaurus, lock = get_enchant_dictionary(self.language)
+        with lock:
+            return [thesaurus.check(word) for word in words]
 
     def get_spanish_dictionary_definition(self, word: str) -> Dict:
         """
@@ -57,6 +122,15 @@ class LanguageVerification:
         :param word: the word to check for
         :return: A dict with the status code and definitions if successful
         """
+        response = requests.get(self._spanish_dictionary_url(word))
+        return self._parse_dictionary_response(response)
+
+    def _spanish_dictionary_url(self, word: str) -> str:
+        """
+        Build the URL to look up a word in the Merriam-Webster Spanish dictionary
+        :param word: the word to look up
+        :return: The URL, including the API key
+        """
         if str.lower(self.language) not in ("spanish", "es", "spa"):
             raise ValueError("The get_spanish_dictionary_definition only works with Spanish words")
 
@@ -65,12 +139,40 @@ class LanguageVerification:
             raise ValueError("Couldn't get the required API key, make sure that your API key is configured as an "
                              "environment variable with the key 'MARIAM_WEBSTER_KEY'")
 
-        url = f"https://www.dictionaryapi.com/api/v3/references/spanish/json/{word}?key={api_key}"
-        response = requests.get(url)
+        return f"https://www.dictionaryapi.com/api/v3/references/spanish/json/{word}?key={api_key}"
+
+    @staticmethod
+    def _parse_dictionary_response(response: requests.Response | httpx.Response) -> Dict:
+        """
+        Get the definitions from a dictionary API response
+        :param response: The response from the dictionary API, from requests or httpx
+        :return: A dict with the status code and definitions if successful
+        """
         if response.status_code == 200:
             data = response.json()
             return data
         else:
             return {"Error getting dictionary definition": response.status_code}
 
+    async def get_spanish_dictionary_definition_async(
+            self,
+            word: str,
+            http_client: Optional[httpx.AsyncClient] = None,
+    ) -> Dict:
+        """
+        Async version of `get_spanish_dictionary_definition`
+        :param word: the word to check for
+        :param http_client: Optional. An httpx client to reuse for the request, if None one is created for the call
+        :return: A dict with the status code and definitions if successful
+        """
+        url = self._spanish_dictionary_url(word)
+        client_context: contextlib.AbstractAsyncContextManager[httpx.AsyncClient]
+        if http_client is not None:
+            client_context = contextlib.nullcontext(http_client)
+        else:
+            client_context = httpx.AsyncClient()
+        async with client_context as client:
+            response = await client.get(url)
+        return self._parse_dictionary_response(response)
+
 
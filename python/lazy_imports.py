@@ -0,0 +1,85 @@
+"""
+Module for importing heavy dependencies (moviepy, numpy, openai, boto3, ...) when they are first used rather than when
+the module using them is imported. Importing them all takes around a second, which the Lambda function would otherwise
+pay on every cold start, including for invocations that fail before they need them.
+
+Modules bind the dependency to a name as they would with an import, keeping the real import for type checkers:
+
+    if TYPE_CHECKING:
+        import numpy as np
+        from openai import OpenAI
+    else:
+        np = lazy_import("numpy")
+        OpenAI = lazy_import("openai", "OpenAI")
+
+See `python/benchmarks/import_time.py` for the cold start budget.
+"""
+import importlib
+import threading
+from typing import Any, Callable, Optional
+
+_NOT_LOADED = object()
+
+
+class LazyImport:
+    """
+    Stands in for a module, or an attribute of a module, until it is used. Getting an attribute of it or calling it
+    imports the module. An `except` clause needs the exception class itself, so exceptions must be caught through a
+    lazily imported module, e.g. `except openai.RateLimitError`, rather than bound to a name with `lazy_import`.
+    """
+
+    def __init__(self, module: str, attribute: Optional[str] = None, after_import: Optional[Callable[[], None]] = None):
+        """
+        Initialise a LazyImport object
+        :param module: The name of the module to import, e.g. "moviepy.video.VideoClip"
+        :param attribute: Optional. The name of the attribute of the module to stand in for, e.g. "ImageClip". If None
+        this stands in for the module itself.
+        :param after_import: Optional. Called once after the module is imported, e.g. to patch it
+        """
+        self._module = module
+        self._attribute = attribute
+        self._after_import = after_import
+        self._target: Any = _NOT_LOADED
+        self._lock = threading.Lock()
+
+    def resolve(self) -> Any:
+        """
+        Import the module, if it hasn't been imported yet
+        :return: The module, or its attribute
+        """
+        target = self._target
+        if target is _NOT_LOADED:
+            with self._lock:
+                if self._target is _NOT_LOADED:
+                    module = importlib.import_module(self._module)
+                    if self._after_import is not None:
+                        self._after_import()
+                    self._target = getattr(module, self._attribute) if self._attribute is not None else module
+                target = self._target
+        return target
+
+    @property
+    def loaded(self) -> bool:
+        """Whether the module has been imported through this object"""
+        return self._target is not _NOT_LOADED
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.resolve(), name)
+
+    def __call__(self, *args: Any, **kwargs: Any) -> Any:
+        return self.resolve()(*args, **kwargs)
+
+    def __repr__(self) -> str:
+        name = self._module if self._attribute is None else f"{self._module}.{self._attribute}"
+        return f"<lazy import of {name}{'' if self.loaded else ' (not loaded)'}>"
+
+
+def lazy_import(module: str, attribute: Optional[str] = None, after_import: Optional[Callable[[], None]] = None) -> Any:
+    """
+    Get an object standing in for a module, or an attribute of a module, that imports the module on first use
+    :param module: The name of the module to import
+    :param attribute: Optional. The name of the attribute of the module, if None the module itself is stood in for
+    :param after_import: Optional. Called once after the module is imported
+    :return: The stand in, see `LazyImport`
+    """
+    return LazyImport(module, attribute, after_import)
@@ -1,29 +1,97 @@
 """Module combining the logic from ../word_generator.py and ../yt_uploader.py to implement a video upload"""
-from typing import Dict, Callable, Optional
+from __future__ import annotations
+
+import threading
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
 from datetime import datetime
 
 from python.word_generator import Audio, ImageGenerator, VideoGenerator
 from python.yt_uploader import YTConnector
-from python.constants import Paths, LANGUAGE_TO_LEARN, NATIVE_LANGUAGE, Prompts
+from python.constants import Paths, LANGUAGE_TO_LEARN, NATIVE_LANGUAGE, Prompts, RenderSettings
 from python.db_handler import write_to_db
+from python.word_list_validation import validated_word_list_path
+from python.task_graph import TaskGraph, StageFailedError
+from python.artifact_cache import ArtifactCache, get_default_cache
+from python.artifact_store import ArtifactStore
+from python.checkpoint import RunCheckpoint, new_run_id
+from python.s3_organiser import get_client_registry
+from python.encoding import get_encoding_profile
+from python import custom_logging
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
+logger = custom_logging.get_logger(__name__)
 
-def process_video_and_upload(write_to_rds: bool = False) -> Dict[str, str]:
+
+def generate_audio(
+        word: Optional[str] = None,
+        openai_client: Optional[OpenAI] = None,
+        generate_content: bool = True,
+        cache: Optional[ArtifactCache] = None,
+        artifacts: Optional[ArtifactStore] = None,
+) -> Audio:
     """
-    Combines the main functionality to generate audio and video for a random word and upload it to YouTube.
-    Optionally writes metadata to a database using `db_write_function`.
-    :param write_to_rds: Write video metadata to MySQL instance hosted in RDS
+    Pick a word (unless one is given), then generate an example sentence, its translation and the audio for it
+    :param word: Optional. The word to generate the content for, if None a word is drawn from the validated word list
+    :param openai_client: Optional. An OpenAI client to reuse
+    :param generate_content: If False only the word is picked, see `build_video_graph`
+    :param cache: Optional. The cache for the sentence, translation and audio
+    :param artifacts: Optional. The store for the files of the run, see `ArtifactStore`
+    :return: The Audio object holding the word, sentences and audio paths
     """
-    audio_generator = Audio(
-        word_list_path=Paths.WORD_LIST_PATH,
+    return Audio(
+        word_list_path=validated_word_list_path(Paths.WORD_LIST_PATH, LANGUAGE_TO_LEARN),
         language_to_learn=LANGUAGE_TO_LEARN,
         native_language=NATIVE_LANGUAGE,
         cloud_storage=True,
+        prevalidated=True,
+        word=word,
+        openai_client=openai_client,
+        generate_content=generate_content,
+        cache=cache,
+        artifacts=artifacts,
     )
 
+
+def generate_images(
+        audio_generator: Audio,
+        openai_client: Optional[OpenAI] = None,
+        cache: Optional[ArtifactCache] = None,
+        artifacts: Optional[ArtifactStore] = None,
+) -> ImageGenerator:
+    """
+    Generate the images to match the example sentence
+    :param audio_generator: The Audio object for the video
+    :param openai_client: Optional. An OpenAI client to reuse
+    :param cache: Optional. The cache for the images
+    :param artifacts: Optional. The store for the files of the run, see `ArtifactStore`
+    :return: The ImageGenerator object holding the image paths
+    """
+    if audio_generator.sentence is None:
+        raise TypeError("sentence must be a string")
     prompt = Prompts.IMAGE_GENERATOR + audio_generator.sentence
-    image_generator = ImageGenerator(prompts=prompt, cloud_storage=True)
+    return ImageGenerator(prompts=prompt, cloud_storage=True, openai_client=openai_client, cache=cache,
+                          artifacts=artifacts)
+
 
+def generate_video(
+        audio_generator: Audio,
+        image_paths: List[str],
+        cache: Optional[ArtifactCache] = None,
+        encoding_profile: str = RenderSettings.ENCODING_PROFILE,
+        artifacts: Optional[ArtifactStore] = None,
+) -> Tuple[str, Dict[str, str | Sequence[str]]]:
+    """
+    Render the video from the audio and images, and generate its metadata
+    :param audio_generator: The Audio object for the video
+    :param image_paths: The S3 keys of the images for the video
+    :param cache: Optional. The cache for the rendered video
+    :param encoding_profile: The name of the encoding profile, see `ENCODING_PROFILES`
+    :param artifacts: Optional. The store for the files of the run, see `ArtifactStore`
+    :return: The path to the rendered video and the video metadata
+    """
     if audio_generator.cloud_storage is True:
         audio_file = audio_generator.audio_cloud_path
     else:
@@ -31,41 +99,300 @@ def process_video_and_upload(write_to_rds: bool = False) -> Dict[str, str]:
 
     if audio_file is None:
         raise TypeError(f"audio_file must be a string")
+    if audio_generator.sentence is None or audio_generator.translated_sentence is None:
+        raise TypeError("sentence and translated_sentence must be strings")
     video_generator = VideoGenerator(
         word=audio_generator.word,
         sentence=audio_generator.sentence,
         translated_sentence=audio_generator.translated_sentence,
-        image_paths=image_generator.image_paths,
+        image_paths=image_paths,
         audio_filepath=audio_file,
         cloud_storage=True,
+        cache=cache,
+        artifacts=artifacts,
     )
 
-    video_filepath = video_generator.generate_video()
+    video_filepath = video_generator.generate_video(encoding_profile=encoding_profile)
     video_metadata = video_generator.generate_video_metadata(language_code=LANGUAGE_TO_LEARN)
+    return video_filepath, video_metadata
 
-    yt = YTConnector(credentials_env=True, cloud_storage=True)
-    upload_details = yt.upload_youtube_short(
+
+def upload_video(
+        video_filepath: str,
+        video_metadata: Dict[str, str | Sequence[str]],
+        yt: Optional[YTConnector] = None,
+        artifacts: Optional[ArtifactStore] = None,
+        checkpoint: Optional[RunCheckpoint] = None,
+) -> Dict:
+    """
+    Upload a rendered video to YouTube
+    :param video_filepath: The path to the rendered video
+    :param video_metadata: The title, description and tags for the video
+    :param yt: Optional. A YTConnector to reuse, if None a new one is created from the environment credentials
+    :param artifacts: Optional. The store for the files of the run, see `ArtifactStore`
+    :param checkpoint: Optional. The checkpoint of the run, to save the upload session to after every chunk so a retried
+    run can continue the upload rather than starting it again
+    :return: The response from the YouTube API
+    """
+    if yt is None:
+        yt = YTConnector(credentials_env=True, cloud_storage=True)
+    return yt.upload_youtube_short(
         video_path=video_filepath,
         title=str(video_metadata["title"]),
         description=str(video_metadata["description"]),
         tags=video_metadata["tags"],
+        artifacts=artifacts,
+        upload_session=checkpoint.get_progress("upload") if checkpoint is not None else None,
+        on_upload_session=partial(checkpoint.save_progress, "upload") if checkpoint is not None else None,
     )
 
-    video_id = upload_details["id"]
-    upload_time = datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ")
 
-    response = {
-        "video_id": video_id,
+def build_video_details(
+        audio_generator: Audio,
+        video_metadata: Dict[str, str | Sequence[str]],
+        upload_details: Dict,
+) -> Dict[str, str]:
+    """
+    Combine the content of a video and the response from YouTube into the record stored for the video
+    :param audio_generator: The Audio object for the video
+    :param video_metadata: The title, description and tags for the video
+    :param upload_details: The response from the YouTube API
+    :return: A dictionary with the video metadata
+    """
+    if audio_generator.sentence is None or audio_generator.translated_sentence is None:
+        raise TypeError("sentence and translated_sentence must be strings")
+    return {
+        "video_id": upload_details["id"],
         "word": audio_generator.word,
         "sentence": audio_generator.sentence,
         "translated_sentence": audio_generator.translated_sentence,
-        "title": video_metadata["title"],
-        "description": video_metadata["description"],
-        "upload_time": upload_time,
+        "title": str(video_metadata["title"]),
+        "description": str(video_metadata["description"]),
+        "upload_time": datetime.utcnow().strftime("%Y-%m-%dT%H:%M:%SZ"),
         "thumbnail_url": upload_details["snippet"]["thumbnails"]["default"]["url"],
     }
 
+
+def _generate_sentence(results: Dict[str, Any]) -> str:
+    """Graph stage generating the example sentence for the word"""
+    audio_generator = results["word"]
+    audio_generator.sentence = audio_generator.generate_example_sentence()
+    return audio_generator.sentence
+
+
+def _translate_sentence(results: Dict[str, Any]) -> str:
+    """Graph stage translating the example sentence to the native language"""
+    audio_generator = results["word"]
+    audio_generator.translated_sentence = audio_generator.google_translate(
+        source_language=LANGUAGE_TO_LEARN, target_language=NATIVE_LANGUAGE
+    )
+    return audio_generator.translated_sentence
+
+
+def _generate_speech(results: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Graph stage generating the audio for the example sentence"""
+    audio_generator = results["word"]
+    audio_generator.audio_path, audio_generator.audio_cloud_path = audio_generator.text_to_speech(
+        language=LANGUAGE_TO_LEARN
+    )
+    return audio_generator.audio_path, audio_generator.audio_cloud_path
+
+
+def _restore_attribute(attribute: str) -> Callable[[Any, Dict[str, Any]], Any]:
+    """
+    Build the function restoring a graph stage that sets an attribute of the Audio object
+    :param attribute: The name of the attribute
+    :return: The function, which sets the attribute to the output saved to the checkpoint
+    """
+    def restore(saved: Any, results: Dict[str, Any]) -> Any:
+        setattr(results["word"], attribute, saved)
+        return saved
+    return restore
+
+
+def _restore_speech(saved: List[Optional[str]], results: Dict[str, Any]) -> Tuple[Optional[str], Optional[str]]:
+    """Restore the 'speech' graph stage, setting the audio paths of the Audio object"""
+    audio_generator = results["word"]
+    audio_generator.audio_path, audio_generator.audio_cloud_path = saved
+    return audio_generator.audio_path, audio_generator.audio_cloud_path
+
+
+def _restore_as_saved(saved: Any, results: Dict[str, Any]) -> Any:
+    """Restore a graph stage whose result is saved to the checkpoint as it is"""
+    return saved
+
+
+def build_video_graph(
+        word: Optional[str] = None,
+        openai_client: Optional[OpenAI] = None,
+        yt: Optional[YTConnector] = None,
+        write_to_rds: bool = False,
+        semaphores: Optional[Mapping[str, threading.Semaphore]] = None,
+        upload: Optional[Callable[[str, Dict[str, str | Sequence[str]]], Dict]] = None,
+        cache: Optional[ArtifactCache] = None,
+        checkpoint: Optional[RunCheckpoint] = None,
+        render: Optional[Callable[[Audio, List[str]], Tuple[str, Dict[str, str | Sequence[str]]]]] = None,
+        encoding_profile: str = RenderSettings.ENCODING_PROFILE,
+        artifacts: Optional[ArtifactStore] = None,
+) -> TaskGraph:
+    """
+    Build the graph of stages needed to create and upload a video. The translation, audio and images only depend on
+    the example sentence, so they run in parallel once it has been generated.
+
+    Stages (group in brackets):
+        word (audio) -> sentence (audio) -> translation (audio), speech (audio), image (image)
+        translation, speech, image -> video (video) -> upload (upload) -> details -> write
+
+    :param word: Optional. The word to create the video for, if None a random word is used
+    :param openai_client: Optional. An OpenAI client to reuse
+    :param yt: Optional. A YTConnector to reuse
+    :param write_to_rds: Write the video metadata to MySQL instance hosted in RDS
+    :param semaphores: Optional. Semaphores limiting how many stages in each group run at once
+    :param upload: Optional. The function to upload the video with, called with the video path and metadata.
+    Defaults to `upload_video` using `yt`
+    :param cache: Optional. The cache for the generated artifacts, so a rerun for the same word doesn't call the APIs
+    or render the video again
+    :param checkpoint: Optional. The checkpoint to save the output of each stage to. Stages already saved to it are
+    restored rather than run again, in which case `word` is ignored in favour of the saved word
+    :param render: Optional. The function to render the video with, called with the Audio object and the image paths.
+    Defaults to `generate_video` using `cache` and `encoding_profile`
+    :param encoding_profile: The name of the encoding profile for the video, see `ENCODING_PROFILES`. Not used if
+    `render` is given.
+    :param artifacts: Optional. The store for the files of the run. The audio, images and video are passed to the
+    stages that use them as local files and persisted to S3 in the background, rather than each stage downloading its
+    inputs from S3. Stages wait for their files to be persisted before being saved to `checkpoint`.
+    :return: The graph. The 'details' stage returns the video metadata.
+    """
+    # Check the profile exists before any stage calls the APIs
+    get_encoding_profile(encoding_profile)
+
+    def restore_word(saved: str, results: Dict[str, Any]) -> Audio:
+        return generate_audio(word=saved, openai_client=openai_client, generate_content=False, cache=cache,
+                              artifacts=artifacts)
+
+    def persisted(keys: Callable[[Any], List[str]]) -> Callable[[Any], Any]:
+        # A checkpoint must only refer to files in S3, so wait for the stage's files to be uploaded before saving it
+        def to_checkpoint(result: Any) -> Any:
+            if artifacts is not None:
+                artifacts.wait(keys(result))
+            return result
+        return to_checkpoint
+
+    graph = TaskGraph(semaphores=semaphores, checkpoint=checkpoint)
+    graph.add_stage(
+        "word",
+        lambda results: generate_audio(word=word, openai_client=openai_client, generate_content=False, cache=cache,
+                                       artifacts=artifacts),
+        group="audio",
+        to_checkpoint=lambda audio_generator: audio_generator.word,
+        from_checkpoint=restore_word,
+    )
+    graph.add_stage("sentence", _generate_sentence, depends_on=["word"], group="audio",
+                    from_checkpoint=_restore_attribute("sentence"))
+    graph.add_stage("translation", _translate_sentence, depends_on=["sentence"], group="audio",
+                    from_checkpoint=_restore_attribute("translated_sentence"))
+    graph.add_stage("speech", _generate_speech, depends_on=["sentence"], group="audio",
+                    to_checkpoint=persisted(lambda paths: [paths[1]]), from_checkpoint=_restore_speech)
+    graph.add_stage(
+        "image",
+        lambda results: generate_images(results["word"], openai_client=openai_client, cache=cache,
+                                        artifacts=artifacts).image_paths,
+        depends_on=["sentence"],
+        group="image",
+        to_checkpoint=persisted(list),
+        from_checkpoint=_restore_as_saved,
+    )
+    graph.add_stage(
+        "video",
+        lambda results: (
+            render or partial(generate_video, cache=cache, encoding_profile=encoding_profile, artifacts=artifacts)
+        )(results["word"], results["image"]),
+        depends_on=["translation", "speech", "image"],
+        group="video",
+        to_checkpoint=persisted(lambda video: [video[0]]),
+        from_checkpoint=lambda saved, results: tuple(saved),
+    )
+    graph.add_stage(
+        "upload",
+        lambda results: (upload or partial(upload_video, yt=yt, artifacts=artifacts, checkpoint=checkpoint))(
+            results["video"][0], results["video"][1]
+        ),
+        depends_on=["video"],
+        group="upload",
+        from_checkpoint=_restore_as_saved,
+    )
+    graph.add_stage(
+        "details",
+        lambda results: build_video_details(results["word"], results["video"][1], results["upload"]),
+        depends_on=["upload"],
+        from_checkpoint=_restore_as_saved,
+    )
     if write_to_rds is True:
-        write_to_db(response)
+        graph.add_stage("write", lambda results: write_to_db(results["details"]), depends_on=["details"])
+    return graph
+
+
+def process_video_and_upload(
+        write_to_rds: bool = False,
+        word: Optional[str] = None,
+        openai_client: Optional[OpenAI] = None,
+        yt: Optional[YTConnector] = None,
+        cache: Optional[ArtifactCache] = None,
+        run_id: Optional[str] = None,
+        resume: bool = False,
+        encoding_profile: str = RenderSettings.ENCODING_PROFILE,
+) -> Dict[str, str]:
+    """
+    Combines the main functionality to generate audio and video for a random word and upload it to YouTube.
+    Optionally writes metadata to a database using `db_write_function`. The stages are run with `build_video_graph`,
+    so the translation, audio and images are generated in parallel and the timing of each stage is logged.
+
+    The output of each stage is saved to a checkpoint in S3 as it completes, so a failed run can be resumed from the
+    stage that failed by passing its `run_id`, or with `resume` to resume the most recent run that didn't complete.
+    :param write_to_rds: Write video metadata to MySQL instance hosted in RDS
+    :param word: Optional. The word to create the video for, if None a random word is used
+    :param openai_client: Optional. An OpenAI client to reuse
+    :param yt: Optional. A YTConnector to reuse
+    :param cache: Optional. The cache for the generated artifacts, defaults to the shared cache in S3
+    :param run_id: Optional. The ID of the run, used to find its checkpoint. If a run with this ID has already been
+    attempted, the stages it completed are skipped
+    :param resume: If True and no `run_id` is given, resume the most recent run that didn't complete (if any)
+    :param encoding_profile: The name of the encoding profile for the video, see `ENCODING_PROFILES`
+    """
+    if cache is None:
+        cache = get_default_cache(cloud_storage=True)
+
+    checkpoint: Optional[RunCheckpoint] = None
+    if run_id is None and resume is True:
+        checkpoint = RunCheckpoint.latest_incomplete(cloud_storage=True)
+    if checkpoint is None:
+        checkpoint = RunCheckpoint(run_id if run_id is not None else new_run_id(), cloud_storage=True)
+    checkpoint.start_attempt()
 
-    return response
+    with ArtifactStore(cloud_storage=True) as artifacts:
+        graph = build_video_graph(
+            word=word,
+            openai_client=openai_client,
+            yt=yt,
+            write_to_rds=write_to_rds,
+            cache=cache,
+            checkpoint=checkpoint,
+            encoding_profile=encoding_profile,
+            artifacts=artifacts,
+        )
+        try:
+            results = graph.run()
+            artifacts.flush()
+        except StageFailedError as e:
+            checkpoint.mark_failed(e.stage)
+            logger.error(f"The {e.stage} stage of run {checkpoint.run_id} failed. Stage timings:\n"
+                         f"{graph.format_timings()}")
+            raise e.__cause__ if e.__cause__ is not None else e
+        finally:
+            if cache is not None:
+                logger.info(f"Artifact cache hits and misses: {cache.stats()}")
+            logger.info(f"Artifact uploads, downloads and local reads: {artifacts.stats()}")
+            logger.info(f"S3 clients and connections: {get_client_registry().stats()}")
+    checkpoint.mark_complete()
+    logger.info(f"Stage timings:\n{graph.format_timings()}")
+    return results["details"]
@@ -0,0 +1,211 @@
+"""
+Module for drawing the text overlays of a video (subtitles and the word badge) onto its frames.
+
+Each overlay is rasterised once to an RGBA NumPy array, then blended onto every frame it is shown on with a few
+vectorised array operations, rather than being recomposited by MoviePy from TextClips and ColorClips on every frame.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Sequence, Tuple
+
+from python.lazy_imports import lazy_import
+from python import custom_logging
+
+if TYPE_CHECKING:
+    import numpy as np
+    from PIL import Image, ImageDraw, ImageFont
+else:
+    np = lazy_import("numpy")
+    Image = lazy_import("PIL.Image")
+    ImageDraw = lazy_import("PIL.ImageDraw")
+    ImageFont = lazy_import("PIL.ImageFont")
+
+logger = custom_logging.get_logger(__name__)
+
+Position = Tuple[str | int, str | int]
+
+
+def load_font(font: str, font_size: int) -> ImageFont.FreeTypeFont | ImageFont.ImageFont:
+    """
+    Load a TrueType font, falling back to Pillow's default font if the font file can't be found
+    :param font: The path to the font file
+    :param font_size: The size of the font in pixels
+    :return: The font
+    """
+    try:
+        return ImageFont.truetype(font, font_size)
+    except OSError:
+        logger.warning(f"Could not load the font {font}, using the default font instead")
+        return ImageFont.load_default(size=font_size)
+
+
+def rasterize_text(
+        text: str,
+        font_size: int = 50,
+        colour: str = "white",
+        font: str = "",
+        stroke_colour: Optional[str] = None,
+        stroke_width: int = 0,
+        background_colour: Optional[Tuple[int, int, int]] = None,
+        background_opacity: float = 1.0,
+        padding: Tuple[int, int] = (0, 0),
+) -> np.ndarray:
+    """
+    Draw text, optionally on a background box, to an RGBA image
+    :param text: The text to draw
+    :param font_size: The size of the font in pixels
+    :param colour: The colour of the text
+    :param font: The path to the font file
+    :param stroke_colour: Optional. The colour of the outline of the text
+    :param stroke_width: The width of the outline of the text in pixels
+    :param background_colour: Optional. The RGB colour of the box behind the text, if None there is no box
+    :param background_opacity: The opacity of the box behind the text, from 0 to 1
+    :param padding: The horizontal and vertical space between the text and the edge of the image in pixels
+    :return: The image as a (height, width, 4) uint8 array
+    """
+    pil_font = load_font(font, font_size)
+    left, top, right, bottom = ImageDraw.Draw(Image.new("RGBA", (1, 1))).textbbox(
+        (0, 0), text, font=pil_font, stroke_width=stroke_width
+    )
+    width = int(right - left) + 2 * padding[0]
+    height = int(bottom - top) + 2 * padding[1]
+
+    image = Image.new("RGBA", (max(width, 1), max(height, 1)), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    if background_colour is not None:
+        draw.rectangle((0, 0, width, height), fill=(*background_colour, round(255 * background_opacity)))
+    draw.text(
+        (padding[0] - left, padding[1] - top),
+        text,
+        font=pil_font,
+        fill=colour,
+        stroke_width=stroke_width,
+        stroke_fill=stroke_colour,
+    )
+    return np.asarray(image)
+
+
+@dataclass
+class OverlayLayer:
+    """
+    An RGBA image drawn on top of the video between two times.
+
+    The position is given like MoviePy positions, with 'left', 'center' or 'right' for x, 'top', 'center' or 'bottom'
+    for y, or a number of pixels from the top left corner. Animations are given as tracks with one value per frame of
+    the layer: `offsets` moves the layer from its position by (dx, dy) pixels and `opacities` multiplies its opacity.
+    If a track is shorter than the layer its last value is held.
+    """
+    image: np.ndarray
+    start: float
+    end: float
+    position: Position = ("center", "center")
+    opacity: float = 1.0
+    offsets: Optional[np.ndarray] = None
+    opacities: Optional[np.ndarray] = None
+
+
+@dataclass
+class _PreparedLayer:
+    """A layer with its colour premultiplied by its alpha, ready to be blended"""
+    layer: OverlayLayer
+    premultiplied: np.ndarray
+    alpha: np.ndarray
+    x: int
+    y: int
+    size: Tuple[int, int]
+
+
+def resolve_position(position: Position, layer_size: Tuple[int, int], frame_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Convert a position to the pixel coordinates of the top left corner of a layer
+    :param position: The position of the layer, see `OverlayLayer`
+    :param layer_size: The width and height of the layer
+    :param frame_size: The width and height of the frame
+    :return: The x and y coordinates of the top left corner of the layer
+    """
+    anchors = (("left", "center", "right"), ("top", "center", "bottom"))
+    coordinates = []
+    for axis, value in enumerate(position):
+        if isinstance(value, str):
+            if value not in anchors[axis]:
+                raise ValueError(f"{value} is not a valid position, use one of {', '.join(anchors[axis])}")
+            free_space = frame_size[axis] - layer_size[axis]
+            coordinates.append({0: 0, 1: free_space // 2, 2: free_space}[anchors[axis].index(value)])
+        else:
+            coordinates.append(int(value))
+    return coordinates[0], coordinates[1]
+
+
+class LayerCompositor:
+    """
+    Blends overlay layers onto the frames of a video. The layers are prepared once, so drawing a layer on a frame is a
+    slice of the frame, a multiply and an add.
+    """
+
+    def __init__(self, layers: Sequence[OverlayLayer], frame_size: Tuple[int, int], fps: float):
+        """
+        Initialise a LayerCompositor object
+        :param layers: The layers to draw, in order from bottom to top
+        :param frame_size: The width and height of the video
+        :param fps: The frame rate of the video, used to pick the value of a layer's tracks for a time
+        """
+        self.frame_size = frame_size
+        self.fps = fps
+        self._layers: List[_PreparedLayer] = []
+        for layer in layers:
+            alpha = layer.image[..., 3:4].astype(np.float32) / 255 * layer.opacity
+            premultiplied = layer.image[..., :3].astype(np.float32) * alpha
+            height, width = layer.image.shape[:2]
+            x, y = resolve_position(layer.position, (width, height), frame_size)
+            self._layers.append(_PreparedLayer(layer, premultiplied, alpha, x, y, (width, height)))
+
+    def composite(self, frame: np.ndarray, t: float) -> np.ndarray:
+        """
+        Draw the layers shown at a time onto a frame
+        :param frame: The (height, width, 3) uint8 frame. It isn't modified.
+        :param t: The time of the frame in seconds
+        :return: A new frame with the layers drawn on it
+        """
+        output = frame.copy()
+        for prepared in self._layers:
+            layer = prepared.layer
+            if not layer.start <= t < layer.end:
+                continue
+            index = int(round((t - layer.start) * self.fps))
+            x, y = prepared.x, prepared.y
+            if layer.offsets is not None:
+                dx, dy = layer.offsets[min(index, len(layer.offsets) - 1)]
+                x, y = x + int(dx), y + int(dy)
+            opacity = 1.0
+            if layer.opacities is not None:
+                opacity = float(layer.opacities[min(index, len(layer.opacities) - 1)])
+            self._blend(output, prepared, x, y, opacity)
+        return output
+
+    @staticmethod
+    def _blend(frame: np.ndarray, prepared: _PreparedLayer, x: int, y: int, opacity: float) -> None:
+        """
+        Alpha blend a layer onto a frame in place, clipping the layer to the edges of the frame
+        :param frame: The frame to draw on
+        :param prepared: The layer to draw
+        :param x: The x coordinate of the top left corner of the layer
+        :param y: The y coordinate of the top left corner of the layer
+        :param opacity: The opacity to draw the layer with, multiplying its alpha
+        """
+        width, height = prepared.size
+        frame_height, frame_width = frame.shape[:2]
+        x0, y0 = max(x, 0), max(y, 0)
+        x1, y1 = min(x + width, frame_width), min(y + height, frame_height)
+        if x0 >= x1 or y0 >= y1 or opacity <= 0:
+            return
+
+        layer_slice = (slice(y0 - y, y1 - y), slice(x0 - x, x1 - x))
+        alpha = prepared.alpha[layer_slice]
+        premultiplied = prepared.premultiplied[layer_slice]
+        if opacity < 1:
+            alpha = alpha * opacity
+            premultiplied = premultiplied * opacity
+
+        region = frame[y0:y1, x0:x1]
+        region[...] = (premultiplied + region * (1 - alpha) + 0.5).astype(np.uint8)
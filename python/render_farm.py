@@ -0,0 +1,223 @@
+"""
+Module for rendering videos on a pool of processes. Rendering is CPU bound (MoviePy compositing and libx264 encoding),
+so in batch runs each video is rendered by its own process, one per core, rather than by threads sharing the GIL.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from python.artifact_cache import get_default_cache
+from python.constants import LANGUAGE_TO_LEARN, Paths, RenderSettings, VideoSettings
+from python.word_generator import VideoGenerator
+from python import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+
+@dataclass
+class RenderJob:
+    """
+    Everything needed to render a video. Jobs only contain plain values, so they can be converted to a dictionary with
+    `to_dict` and sent to another process or machine.
+    """
+    word: str
+    sentence: str
+    translated_sentence: str
+    image_paths: List[str]
+    audio_filepath: str
+    cloud_storage: bool = True
+    language_code: str = LANGUAGE_TO_LEARN
+    word_font: str = Paths.FONT_PATH
+    word_style: Optional[str] = VideoSettings.WORD_STYLE
+    encoding_profile: str = RenderSettings.ENCODING_PROFILE
+    ffmpeg_threads: Optional[int] = RenderSettings.FFMPEG_THREADS
+    backend: str = RenderSettings.BACKEND
+    use_cache: bool = True
+    job_id: str = field(default_factory=lambda: uuid.uuid4().hex)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Convert the job to a dictionary
+        :return: The job as a JSON serialisable dictionary
+        """
+        return asdict(self)
+
+    @classmethod
+    def from_dict(cls, job: Dict[str, Any]) -> "RenderJob":
+        """
+        Create a job from a dictionary made by `to_dict`
+        :param job: The job as a dictionary
+        :return: The job
+        """
+        return cls(**job)
+
+
+def render_video_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Render the video for a job and generate its metadata. Run in the worker processes of a RenderFarm, so it takes and
+    returns plain dictionaries.
+    :param job: The job, see `RenderJob.to_dict`
+    :return: A dictionary with the 'job_id', the 'video_filepath' of the rendered video, its 'video_metadata' and the
+    'duration' of the render in seconds
+    """
+    render_job = RenderJob.from_dict(job)
+    start = time.perf_counter()
+    video_generator = VideoGenerator(
+        word=render_job.word,
+        sentence=render_job.sentence,
+        translated_sentence=render_job.translated_sentence,
+        image_paths=render_job.image_paths,
+        audio_filepath=render_job.audio_filepath,
+        cloud_storage=render_job.cloud_storage,
+        cache=get_default_cache(render_job.cloud_storage) if render_job.use_cache is True else None,
+    )
+    video_filepath = video_generator.generate_video(
+        word_font=render_job.word_font,
+        ffmpeg_threads=render_job.ffmpeg_threads,
+        backend=render_job.backend,
+        word_style=render_job.word_style,
+        encoding_profile=render_job.encoding_profile,
+    )
+    return {
+        "job_id": render_job.job_id,
+        "video_filepath": video_filepath,
+        "video_metadata": video_generator.generate_video_metadata(language_code=render_job.language_code),
+        "duration": time.perf_counter() - start,
+    }
+
+
+@custom_logging.log_all_methods
+class RenderFarm:
+    """
+    A pool of processes rendering videos, each running one ffmpeg encoder with a fixed number of threads. Jobs are
+    queued until a process is free. Tracks how many videos have been rendered to report throughput.
+    """
+
+    def __init__(
+            self,
+            workers: Optional[int] = None,
+            ffmpeg_threads: Optional[int] = RenderSettings.FFMPEG_THREADS,
+            backend: str = RenderSettings.BACKEND,
+            executor: Optional[Executor] = None,
+            clock: Callable[[], float] = time.perf_counter,
+    ):
+        """
+        Initialise a RenderFarm object. The processes are started when the first job is submitted.
+        :param workers: Optional. The number of processes, defaults to the number of cores divided by `ffmpeg_threads`
+        :param ffmpeg_threads: Optional. The number of threads each ffmpeg encoder uses, None to let ffmpeg decide
+        :param backend: The backend rendering the videos, see `VideoGenerator.generate_video`
+        :param executor: Optional. The executor to run the jobs on instead of a pool of `workers` processes. It's shut
+        down with the farm.
+        :param clock: The clock the throughput is measured with
+        """
+        if ffmpeg_threads is not None and ffmpeg_threads < 1:
+            raise ValueError(f"ffmpeg_threads must be at least 1, got {ffmpeg_threads}")
+        if workers is None:
+            workers = max(1, (os.cpu_count() or 1) // (ffmpeg_threads or 1))
+        if workers < 1:
+            raise ValueError(f"workers must be at least 1, got {workers}")
+        self.workers = workers
+        self.ffmpeg_threads = ffmpeg_threads
+        self.backend = backend
+        self.rendered = 0
+        self.failed = 0
+        self.render_seconds = 0.0
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = executor
+
+    def __enter__(self) -> "RenderFarm":
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback) -> None:
+        self.shutdown()
+
+    def submit(self, job: RenderJob) -> Future:
+        """
+        Queue a job to be rendered. The job's `ffmpeg_threads` and `backend` are set to the farm's.
+        :param job: The job to render
+        :return: A future resolving to the result of `render_video_job`
+        """
+        job.ffmpeg_threads = self.ffmpeg_threads
+        job.backend = self.backend
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            if self._started is None:
+                self._started = self._clock()
+            future = self._executor.submit(render_video_job, job.to_dict())
+        future.add_done_callback(self._record)
+        return future
+
+    def render_all(self, jobs: Sequence[RenderJob]) -> List[Dict[str, Any]]:
+        """
+        Render several jobs, waiting for them all to finish
+        :param jobs: The jobs to render
+        :return: The result of each job in the same order as `jobs`, see `render_video_job`. Failed jobs have an
+        'error' instead of a 'video_filepath'
+        """
+        futures = [self.submit(job) for job in jobs]
+        results = []
+        for job, future in zip(jobs, futures):
+            try:
+                results.append(future.result())
+            except Exception as e:
+                results.append({"job_id": job.job_id, "error": repr(e)})
+        logger.info(f"Render farm stats: {self.stats()}")
+        return results
+
+    def videos_per_minute(self) -> float:
+        """
+        Get the throughput of the farm, from the first job being submitted to the last job finishing
+        :return: The number of videos rendered per minute
+        """
+        with self._lock:
+            if self._started is None or self._finished is None or self.rendered == 0:
+                return 0.0
+            return self.rendered / max(self._finished - self._started, 1e-9) * 60
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Get the numbers of videos rendered and failed, the throughput and the average render time
+        :return: A JSON serialisable dictionary of stats
+        """
+        videos_per_minute = self.videos_per_minute()
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "ffmpeg_threads": self.ffmpeg_threads,
+                "backend": self.backend,
+                "rendered": self.rendered,
+                "failed": self.failed,
+                "videos_per_minute": round(videos_per_minute, 2),
+                "average_render_seconds": round(self.render_seconds / self.rendered, 2) if self.rendered else 0.0,
+            }
+
+    def shutdown(self) -> None:
+        """Wait for the queued jobs to finish and stop the processes"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+    def _record(self, future: Future) -> None:
+        """
+        Record the outcome of a finished job
+        :param future: The future of the job
+        """
+        with self._lock:
+            self._finished = self._clock()
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                self.rendered += 1
+                self.render_seconds += future.result()["duration"]
@@ -1,45 +1,242 @@
 """Module for managing file storage in S3"""
+from __future__ import annotations
 
+import asyncio
 import os
+import threading
 import dotenv
-from typing import Union, IO
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Union, IO, Dict, Any, Deque, Iterator, Optional
 
-import boto3
 from botocore.exceptions import ClientError
 
+from python.constants import S3Settings
+from python.lazy_imports import lazy_import
 from python import utils
 from python import custom_logging
 
+if TYPE_CHECKING:
+    import boto3
+    import urllib3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.client import BaseClient
+    from botocore.config import Config
+else:
+    boto3 = lazy_import("boto3")
+    urllib3 = lazy_import("urllib3")
+    TransferConfig = lazy_import("boto3.s3.transfer", "TransferConfig")
+    Config = lazy_import("botocore.config", "Config")
+
 dotenv.load_dotenv()
 
-if utils.is_running_on_aws() is True:
-    session = boto3.Session()
-elif (public_key := os.getenv("AWS_PUBLIC_KEY") is not None) and (
-        secret_key := os.getenv("AWS_SECRET_KEY") is not None):
-    session = boto3.Session(
-        aws_access_key_id=public_key,
-        aws_secret_access_key=secret_key,
-    )
-elif os.getenv("AWS_PROFILE_NAME") is not None:
-    session = boto3.Session(
-        profile_name=os.getenv("AWS_PROFILE_NAME")
+_session: Optional[boto3.Session] = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> boto3.Session:
+    """
+    Get the boto3 session for the environment, created on first use rather than on import as importing boto3 is slow
+    :return: The session
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            if utils.is_running_on_aws() is True:
+                _session = boto3.Session()
+            elif (public_key := os.getenv("AWS_PUBLIC_KEY")) is not None and (
+                    secret_key := os.getenv("AWS_SECRET_KEY")) is not None:
+                _session = boto3.Session(
+                    aws_access_key_id=public_key,
+                    aws_secret_access_key=secret_key,
+                )
+            elif os.getenv("AWS_PROFILE_NAME") is not None:
+                _session = boto3.Session(
+                    profile_name=os.getenv("AWS_PROFILE_NAME")
+                )
+            else:
+                _session = boto3.Session()
+        return _session
+
+
+def client_config() -> Config:
+    """
+    Get the config for the shared boto3 clients, see `S3Settings`
+    :return: The config
+    """
+    return Config(
+        max_pool_connections=S3Settings.MAX_POOL_CONNECTIONS,
+        tcp_keepalive=S3Settings.TCP_KEEPALIVE,
+        retries={"mode": S3Settings.RETRY_MODE, "max_attempts": S3Settings.MAX_ATTEMPTS},
     )
 
 
+@custom_logging.log_all_methods
+class ClientRegistry:
+    """
+    The boto3 clients of the process, created once per service and shared by every thread (boto3 clients are
+    thread-safe), so their connection pools are reused across `BucketSort` objects and warm Lambda invocations.
+    Resources aren't thread-safe, so one is created per thread and service.
+    """
+
+    def __init__(
+            self,
+            boto3_session: Optional[boto3.Session] = None,
+            config: Optional[Config] = None,
+            endpoint_url: Optional[str] = None,
+    ):
+        """
+        Initialise a ClientRegistry object
+        :param boto3_session: Optional. The session to create the clients from, defaults to `get_session()`
+        :param config: Optional. The config for the clients, defaults to `client_config()`
+        :param endpoint_url: Optional. The URL to send requests to instead of AWS, e.g. for an S3 compatible store
+        """
+        self._session = boto3_session
+        self.config = config if config is not None else client_config()
+        self.endpoint_url = endpoint_url
+        self.clients_created = 0
+        self.resources_created = 0
+        self.client_requests = 0
+        self._clients: Dict[str, BaseClient] = {}
+        self._resources = threading.local()
+        self._lock = threading.Lock()
+
+    @property
+    def session(self) -> boto3.Session:
+        """The session the clients are created from"""
+        return self._session if self._session is not None else get_session()
+
+    def client(self, service: str = "s3") -> BaseClient:
+        """
+        Get the shared client for a service, creating it on first use
+        :param service: The name of the AWS service
+        :return: The client
+        """
+        with self._lock:
+            self.client_requests += 1
+            if service not in self._clients:
+                self._clients[service] = self.session.client(
+                    service, config=self.config, endpoint_url=self.endpoint_url
+                )
+                self.clients_created += 1
+            return self._clients[service]
+
+    def resource(self, service: str = "s3") -> Any:
+        """
+        Get the calling thread's resource for a service, creating it on first use
+        :param service: The name of the AWS service
+        :return: The resource
+        """
+        resources = self._resources.__dict__
+        if service not in resources:
+            resources[service] = self.session.resource(service, config=self.config, endpoint_url=self.endpoint_url)
+            with self._lock:
+                self.resources_created += 1
+        return resources[service]
+
+    def clear(self) -> None:
+        """Drop the clients, e.g. after the credentials have changed. Other threads' resources are kept."""
+        with self._lock:
+            self._clients.clear()
+        self._resources = threading.local()
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the number of clients created and requested, and how many HTTP requests reused an open connection
+        :return: A dictionary of counts
+        """
+        with self._lock:
+            clients = list(self._clients.values())
+            stats = {
+                "clients_created": self.clients_created,
+                "client_requests": self.client_requests,
+                "resources_created": self.resources_created,
+            }
+        connections, requests = 0, 0
+        for client in clients:
+            for pool in _connection_pools(client):
+                connections += pool.num_connections
+                requests += pool.num_requests
+        stats["connections_created"] = connections
+        stats["http_requests"] = requests
+        stats["connections_reused"] = max(0, requests - connections)
+        return stats
+
+
+def _connection_pools(client: BaseClient) -> Iterator[urllib3.HTTPConnectionPool]:
+    """
+    Get the connection pools of a client. These are internals of botocore, so nothing is returned if they change.
+    :param client: The boto3 client
+    :return: The urllib3 connection pools, one per host the client has connected to
+    """
+    http_session = getattr(getattr(client, "_endpoint", None), "http_session", None)
+    proxy_managers = getattr(http_session, "_proxy_managers", None)
+    managers = [getattr(http_session, "_manager", None)]
+    managers += list(proxy_managers.values()) if isinstance(proxy_managers, dict) else []
+    for manager in managers:
+        if isinstance(manager, urllib3.PoolManager):
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is not None:
+                    yield pool
+
+
+_client_registry: Optional[ClientRegistry] = None
+_client_registry_lock = threading.Lock()
+
+
+def get_client_registry() -> ClientRegistry:
+    """
+    Get the client registry shared by the process
+    :return: The registry
+    """
+    global _client_registry
+    with _client_registry_lock:
+        if _client_registry is None:
+            _client_registry = ClientRegistry()
+        return _client_registry
+
+
+def _reset_client_registry() -> None:
+    """Drop the registry in a forked child process, e.g. on the render farm, so it doesn't share the parent's sockets"""
+    global _client_registry, _client_registry_lock, _session_lock
+    _client_registry = None
+    _client_registry_lock = threading.Lock()
+    _session_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_reset_client_registry)
+
+
 @custom_logging.log_all_methods
 class BucketSort:
     """
-    Class for reading and writing to S3
+    Class for reading and writing to S3. Creating one is cheap, as the S3 client is shared through a `ClientRegistry`.
     """
 
     def __init__(
             self,
-            bucket: str
+            bucket: str,
+            registry: Optional[ClientRegistry] = None,
     ):
-        self.s3_client = session.client("s3")
-        self.s3_resource = session.resource("s3")
+        """
+        Initialise a BucketSort object
+        :param bucket: The name of the S3 bucket
+        :param registry: Optional. The registry to get the S3 client from, defaults to the process's registry
+        """
+        self.registry = registry if registry is not None else get_client_registry()
+        self.s3_client = self.registry.client("s3")
         self.s3_bucket = bucket
-        self.bucket_resource = self.s3_resource.Bucket(self.s3_bucket)
+
+    @property
+    def s3_resource(self) -> Any:
+        """The calling thread's S3 resource"""
+        return self.registry.resource("s3")
+
+    @property
+    def bucket_resource(self) -> Any:
+        """The bucket as an S3 resource, for the calling thread"""
+        return self.s3_resource.Bucket(self.s3_bucket)
 
     def check_file_exists(self, path_to_check: str, filename: str) -> bool:
         """
@@ -68,7 +265,7 @@ class BucketSort:
             "Bucket": self.s3_bucket,
             "Key": current_directory
         }
-        self.bucket_resource.copy(CopySource=copy_source, Key=new_path)
+        self.s3_client.copy(CopySource=copy_source, Bucket=self.s3_bucket, Key=new_path)
         return new_path
 
     def delete_file(self, path: str) -> None:
@@ -76,7 +273,7 @@ class BucketSort:
         Delete a file from the S3 bucket
         :param path: the absolute path to the file to be deleted
         """
-        self.s3_resource.Object(Bucket=self.s3_bucket, Key=path).delete()
+        self.s3_client.delete_object(Bucket=self.s3_bucket, Key=path)
 
     def get_object_from_s3(self, s3_key: str) -> bytes:
         """
@@ -87,21 +284,146 @@ class BucketSort:
         response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=s3_key)
         return response['Body'].read()
 
+    def get_object_range_from_s3(self, s3_key: str, start: int, end: int) -> bytes:
+        """
+        Fetch a byte range of an object from the S3 bucket without downloading the whole object.
+        :param s3_key: The key of the file in the S3 bucket
+        :param start: The offset of the first byte to fetch
+        :param end: The offset of the last byte to fetch (inclusive)
+        :return: The requested bytes of the file
+        """
+        response = self.s3_client.get_object(Bucket=self.s3_bucket, Key=s3_key, Range=f"bytes={start}-{end}")
+        return response['Body'].read()
+
+    def get_object_metadata(self, s3_key: str) -> Dict[str, Any]:
+        """
+        Get the metadata of an object in the S3 bucket without downloading it
+        :param s3_key: The key of the file in the S3 bucket
+        :return: The response from the HEAD request, including the 'ContentLength' and 'ETag' of the object
+        """
+        return self.s3_client.head_object(Bucket=self.s3_bucket, Key=s3_key)
+
+    def copy_object(self, source_key: str, destination_key: str) -> str:
+        """
+        Copy an object to a new key within the S3 bucket. The copy happens in S3, so nothing is downloaded.
+        :param source_key: The key of the object to copy
+        :param destination_key: The key to copy the object to
+        :return: The destination key
+        """
+        self.s3_client.copy_object(
+            Bucket=self.s3_bucket,
+            Key=destination_key,
+            CopySource={"Bucket": self.s3_bucket, "Key": source_key},
+        )
+        return destination_key
+
+    @staticmethod
+    def transfer_config(
+            part_size: int = S3Settings.PART_SIZE,
+            max_concurrency: int = S3Settings.MAX_CONCURRENCY,
+    ) -> TransferConfig:
+        """
+        Get the config for a multipart upload
+        :param part_size: The size of each part in bytes, objects smaller than this are uploaded in one request
+        :param max_concurrency: The max number of parts uploaded at once
+        :return: The config, which holds no more than `max_concurrency` parts in memory at once
+        """
+        if part_size < S3Settings.MIN_PART_SIZE:
+            raise ValueError(f"part_size must be at least {S3Settings.MIN_PART_SIZE} bytes, got {part_size}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        config = TransferConfig(
+            multipart_threshold=part_size,
+            multipart_chunksize=part_size,
+            max_concurrency=max_concurrency,
+        )
+        # Parts read from a stream are buffered in memory until uploaded, 10 by default
+        config.max_in_memory_upload_chunks = max_concurrency
+        return config
+
     def push_file_to_s3(self, file_path: str, s3_key: str) -> str:
         """
-        Upload a file to the S3 bucket.
+        Upload a file to the S3 bucket, as a multipart upload if it is larger than `S3Settings.PART_SIZE`.
         :param file_path: The local file path to the file to be uploaded.
         :param s3_key: The key (path and name) for the file in the S3 bucket.
         :return: The bucket path that the file is written to.
         """
         try:
-            self.s3_client.upload_file(file_path, self.s3_bucket, s3_key)
+            self.s3_client.upload_file(file_path, self.s3_bucket, s3_key, Config=self.transfer_config())
             print(f"Successfully uploaded {file_path} to {self.s3_bucket}/{s3_key}")
             return s3_key
         except ClientError as e:
             print(f"Failed to upload {file_path} to {self.s3_bucket}/{s3_key}. Error: {e}")
             raise
 
+    def upload_stream(
+            self,
+            fileobj: IO[bytes],
+            s3_key: str,
+            part_size: int = S3Settings.PART_SIZE,
+            max_concurrency: int = S3Settings.MAX_CONCURRENCY,
+    ) -> str:
+        """
+        Upload a file-like object to the S3 bucket as a multipart upload, reading it in parts so the whole object is
+        never held in memory. At most `max_concurrency` parts are held in memory at once.
+        :param fileobj: A readable binary file-like object, e.g. the raw body of a streamed HTTP response
+        :param s3_key: The key (path and name) for the file in the S3 bucket.
+        :param part_size: The size of each part in bytes, at least `S3Settings.MIN_PART_SIZE`
+        :param max_concurrency: The max number of parts uploaded at once
+        :return: The S3 key of the uploaded object.
+        """
+        self.s3_client.upload_fileobj(
+            fileobj, self.s3_bucket, s3_key, Config=self.transfer_config(part_size, max_concurrency)
+        )
+        return s3_key
+
+    def download_to(
+            self,
+            s3_key: str,
+            destination: str | IO[bytes],
+            part_size: int = S3Settings.PART_SIZE,
+            max_concurrency: int = S3Settings.MAX_CONCURRENCY,
+    ) -> int:
+        """
+        Download an object from the S3 bucket with parallel ranged GET requests. The parts are written in order, so
+        the destination doesn't need to be seekable, and at most `max_concurrency` parts are held in memory at once.
+        :param s3_key: The key of the file in the S3 bucket
+        :param destination: The local path to write the object to, or a writable binary file-like object
+        :param part_size: The size of each ranged request in bytes
+        :param max_concurrency: The max number of parts downloaded at once
+        :return: The size of the object in bytes
+        """
+        if part_size < 1:
+            raise ValueError(f"part_size must be at least 1, got {part_size}")
+        if max_concurrency < 1:
+            raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+        size = self.get_object_metadata(s3_key)["ContentLength"]
+        if isinstance(destination, str):
+            with open(destination, "wb") as file:
+                self._download_parts(s3_key, size, file, part_size, max_concurrency)
+        else:
+            self._download_parts(s3_key, size, destination, part_size, max_concurrency)
+        return size
+
+    def _download_parts(self, s3_key: str, size: int, fileobj: IO[bytes], part_size: int, max_concurrency: int) -> None:
+        """
+        Download an object in parts, starting a part as soon as the oldest part in flight has been written
+        :param s3_key: The key of the file in the S3 bucket
+        :param size: The size of the object in bytes
+        :param fileobj: The file-like object to write the parts to
+        :param part_size: The size of each part in bytes
+        :param max_concurrency: The max number of parts in flight
+        """
+        with ThreadPoolExecutor(max_workers=max_concurrency) as executor:
+            in_flight: Deque[Future] = deque()
+            for start in range(0, size, part_size):
+                if len(in_flight) == max_concurrency:
+                    fileobj.write(in_flight.popleft().result())
+                end = min(start + part_size, size) - 1
+                in_flight.append(executor.submit(self.get_object_range_from_s3, s3_key, start, end))
+            while len(in_flight) > 0:
+                fileobj.write(in_flight.popleft().result())
+
     def push_object_to_s3(self, file: Union[str, bytes, IO], s3_key: str) -> str:
         """
         Upload an in-memory object to the S3 bucket.
@@ -111,6 +433,18 @@ class BucketSort:
         """
         if isinstance(file, str):
             file = file.encode("utf-8")
-        self.bucket_resource.put_object(Body=file, Key=s3_key)
+        self.s3_client.put_object(Bucket=self.s3_bucket, Body=file, Key=s3_key)
         return s3_key
 
+    async def push_object_to_s3_async(self, file: Union[str, bytes, IO], s3_key: str) -> str:
+        """
+        Upload an in-memory object to the S3 bucket without blocking the event loop. boto3 clients (unlike resources)
+        are thread-safe, so the upload is run with the client in a worker thread.
+        :param file: The content to upload. Can be a string, bytes, or a file-like object.
+        :param s3_key: The key (path and name) for the file in the S3 bucket.
+        :return: The S3 key of the uploaded object.
+        """
+        if isinstance(file, str):
+            file = file.encode("utf-8")
+        await asyncio.to_thread(self.s3_client.put_object, Bucket=self.s3_bucket, Body=file, Key=s3_key)
+        return s3_key
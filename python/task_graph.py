@@ -0,0 +1,207 @@
+"""Module for running the stages of the video pipeline concurrently, based on the dependencies between stages"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from python.checkpoint import RunCheckpoint
+
+StageFunction = Callable[[Dict[str, Any]], Any]
+ToCheckpoint = Callable[[Any], Any]
+FromCheckpoint = Callable[[Any, Dict[str, Any]], Any]
+
+
+class _Stage(NamedTuple):
+    """A stage in a TaskGraph"""
+    func: StageFunction
+    depends_on: Tuple[str, ...]
+    group: Optional[str]
+    to_checkpoint: Optional[ToCheckpoint]
+    from_checkpoint: Optional[FromCheckpoint]
+
+
+@dataclass
+class StageTiming:
+    """When a stage started and finished, in seconds relative to the start of the run"""
+    name: str
+    start: float
+    end: float
+
+    @property
+    def duration(self) -> float:
+        """The time taken to run the stage in seconds"""
+        return self.end - self.start
+
+
+class StageFailedError(RuntimeError):
+    """Raised when a stage of a TaskGraph raises an exception. The original exception is chained as the cause."""
+
+    def __init__(self, stage: str, timings: List[StageTiming]):
+        """
+        Initialise a StageFailedError
+        :param stage: The name of the stage that failed
+        :param timings: The timings of every stage that had finished, including the failed stage
+        """
+        super().__init__(f"Stage '{stage}' failed")
+        self.stage = stage
+        self.timings = timings
+
+
+class TaskGraph:
+    """
+    A set of stages with dependencies between them. When run, each stage starts as soon as all of the stages it
+    depends on have finished, so independent stages run in parallel.
+
+    Each stage is a function which takes a dictionary of the results of the stages that have finished so far, keyed
+    by stage name. Stages can be put in a group to limit how many stages from that group run at once, across graphs,
+    by passing a semaphore for the group.
+
+    If the graph has a checkpoint, the output of each stage that can be restored is saved to it as soon as the stage
+    finishes, and on the next run those stages are restored from the checkpoint instead of being run again.
+    """
+
+    def __init__(
+            self,
+            semaphores: Optional[Mapping[str, threading.Semaphore]] = None,
+            checkpoint: Optional[RunCheckpoint] = None,
+    ):
+        """
+        Initialise a TaskGraph object
+        :param semaphores: Optional. A semaphore for each group name, held while a stage in that group is running
+        :param checkpoint: Optional. The checkpoint to save the output of stages to and restore them from
+        """
+        self.semaphores = semaphores or {}
+        self.checkpoint = checkpoint
+        self.timings: List[StageTiming] = []
+        self.restored: List[str] = []
+        self._stages: Dict[str, _Stage] = {}
+
+    def add_stage(
+            self,
+            name: str,
+            func: StageFunction,
+            depends_on: Sequence[str] = (),
+            group: Optional[str] = None,
+            to_checkpoint: Optional[ToCheckpoint] = None,
+            from_checkpoint: Optional[FromCheckpoint] = None,
+    ) -> None:
+        """
+        Add a stage to the graph. Dependencies must be added before the stages that depend on them, so the graph can
+        never contain a cycle.
+        :param name: The unique name of the stage
+        :param func: The function to run for the stage, called with the results of the finished stages
+        :param depends_on: The names of the stages which must finish before this stage starts
+        :param group: Optional. The group the stage belongs to, used to limit concurrency with `self.semaphores`
+        :param to_checkpoint: Optional. Converts the result of the stage to the JSON serialisable output saved to the
+        checkpoint. Defaults to saving the result as it is
+        :param from_checkpoint: Optional. Rebuilds the result of the stage from its saved output and the results of the
+        stages it depends on. Only stages with this function are saved to and restored from the checkpoint
+        """
+        if name in self._stages:
+            raise ValueError(f"A stage named '{name}' has already been added")
+        unknown = [dependency for dependency in depends_on if dependency not in self._stages]
+        if len(unknown) > 0:
+            raise ValueError(f"Stage '{name}' depends on stages that haven't been added: {', '.join(unknown)}")
+        if to_checkpoint is not None and from_checkpoint is None:
+            raise ValueError(f"Stage '{name}' has a to_checkpoint function but no from_checkpoint function")
+        self._stages[name] = _Stage(func, tuple(depends_on), group, to_checkpoint, from_checkpoint)
+
+    def run(self, max_workers: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Run every stage in the graph, starting each as soon as its dependencies have finished.
+        If a stage fails no further stages are started, and a StageFailedError is raised once running stages finish.
+        :param max_workers: Optional. The max number of stages to run at once, defaults to the number of stages
+        :return: The result of each stage, keyed by stage name
+        """
+        self.timings = []
+        results = self._restore()
+        remaining = {name: stage for name, stage in self._stages.items() if name not in results}
+        running: Dict[Future, str] = {}
+        failure: Optional[Tuple[str, BaseException]] = None
+        run_start = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=max_workers or max(len(self._stages), 1)) as executor:
+            while True:
+                if failure is None:
+                    ready = [
+                        name for name, stage in remaining.items()
+                        if all(dependency in results for dependency in stage.depends_on)
+                    ]
+                    for name in ready:
+                        future = executor.submit(self._run_stage, name, remaining.pop(name), dict(results), run_start)
+                        running[future] = name
+
+                if len(running) == 0:
+                    break
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        results[name] = future.result()
+                    elif failure is None:
+                        failure = (name, error)
+
+        self.timings.sort(key=lambda timing: timing.start)
+        if failure is not None:
+            raise StageFailedError(failure[0], self.timings) from failure[1]
+        return results
+
+    def format_timings(self) -> str:
+        """
+        Describe the timings from the last run
+        :return: A line per stage with its start time and duration
+        """
+        lines = [f"{name}: restored from checkpoint" for name in self.restored]
+        lines.extend(
+            f"{timing.name}: started at {timing.start:.2f}s, took {timing.duration:.2f}s" for timing in self.timings
+        )
+        return "\n".join(lines)
+
+    def _restore(self) -> Dict[str, Any]:
+        """
+        Restore the results of the stages saved to the checkpoint. Stages are restored in the order they were added,
+        so the results of a stage's dependencies are always restored before it.
+        :return: The restored result of each stage, keyed by stage name
+        """
+        self.restored = []
+        results: Dict[str, Any] = {}
+        if self.checkpoint is None:
+            return results
+
+        completed = self.checkpoint.completed_stages()
+        for name, stage in self._stages.items():
+            if stage.from_checkpoint is None or name not in completed:
+                continue
+            if all(dependency in results for dependency in stage.depends_on):
+                results[name] = stage.from_checkpoint(completed[name], results)
+                self.restored.append(name)
+        return results
+
+    def _run_stage(self, name: str, stage: _Stage, results: Dict[str, Any], run_start: float) -> Any:
+        """
+        Run a single stage, holding the semaphore for its group and recording when it started and finished. The
+        output is saved to the checkpoint before the stages depending on it are started.
+        :param name: The name of the stage
+        :param stage: The stage to run
+        :param results: The results of the stages which had finished when this stage was started
+        :param run_start: The time the run started, from time.perf_counter()
+        :return: The result of the stage
+        """
+        semaphore = self.semaphores.get(stage.group) if stage.group is not None else None
+        if semaphore is not None:
+            semaphore.acquire()
+        start = time.perf_counter()
+        try:
+            result = stage.func(results)
+        finally:
+            self.timings.append(StageTiming(name, start - run_start, time.perf_counter() - run_start))
+            if semaphore is not None:
+                semaphore.release()
+
+        if self.checkpoint is not None and stage.from_checkpoint is not None:
+            output = stage.to_checkpoint(result) if stage.to_checkpoint is not None else result
+            self.checkpoint.save_stage(name, output)
+        return result
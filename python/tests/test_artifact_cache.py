@@ -0,0 +1,103 @@
+"""Module for testing the cache for generated artifacts"""
+
+import os
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock, patch
+
+from python.artifact_cache import ArtifactCache, LocalCacheBackend, cache_key
+
+
+class TestArtifactCache(unittest.TestCase):
+    """Class for testing caching artifacts in a local directory"""
+
+    def setUp(self):
+        """Create a cache in a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache = ArtifactCache(LocalCacheBackend(self.directory.name), max_entries=None, max_bytes=None)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.directory.cleanup()
+
+    def test_cache_key(self):
+        """Test that the key changes with everything that determines the artifact, and is prefixed with the stage"""
+        key = cache_key("sentence", "gpt", "prompt", "es")
+        self.assertTrue(key.startswith("sentence/"))
+        self.assertEqual(key, cache_key("sentence", "gpt", "prompt", "es"))
+        self.assertNotEqual(key, cache_key("sentence", "gpt-4", "prompt", "es"))
+        self.assertNotEqual(key, cache_key("sentence", "gpt", "other prompt", "es"))
+        self.assertNotEqual(key, cache_key("sentence", "gpt", "prompt", "fr"))
+        self.assertNotEqual(key, cache_key("sentence", "gpt", "prompt", "es", {"size": "1024x1792"}))
+
+    def test_get_or_create(self):
+        """Test that an artifact is only created on a miss, and that hits and misses are counted per stage"""
+        create = MagicMock(return_value=b"una frase")
+        key = cache_key("sentence", "gpt", "prompt")
+
+        self.assertEqual(self.cache.get_or_create(key, create), b"una frase")
+        self.assertEqual(self.cache.get_or_create(key, create), b"una frase")
+        create.assert_called_once()
+        self.assertIsNone(self.cache.get(cache_key("speech", "gtts", "prompt")))
+        self.assertEqual(self.cache.stats(), {"sentence": {"hits": 1, "misses": 1}, "speech": {"hits": 0, "misses": 1}})
+
+    def test_files(self):
+        """Test copying a file into the cache and back out"""
+        source = os.path.join(self.directory.name, "image.jpg")
+        destination = os.path.join(self.directory.name, "copy.jpg")
+        with open(source, "wb") as file:
+            file.write(b"image bytes")
+        key = cache_key("image", "dall-e-3", "prompt")
+
+        self.assertFalse(self.cache.get_file(key, destination))
+        self.cache.put_file(key, source)
+        self.assertTrue(self.cache.get_file(key, destination))
+        with open(destination, "rb") as file:
+            self.assertEqual(file.read(), b"image bytes")
+        self.assertEqual(self.cache.fingerprint(source), self.cache.fingerprint(destination))
+
+    def test_ttl(self):
+        """Test that expired artifacts are treated as misses and removed"""
+        self.cache.ttl_seconds = 60
+        key = cache_key("translation", "google", "frase")
+        self.cache.put(key, b"sentence")
+        path = os.path.join(self.directory.name, key)
+        os.utime(path, (time.time(), time.time() - 120))
+
+        self.assertIsNone(self.cache.get(key))
+        self.assertFalse(os.path.exists(path))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used artifacts are evicted once the cache is over its limits"""
+        self.cache.max_entries = 2
+        self.cache.evict_interval_seconds = 0
+        keys = [cache_key("sentence", "gpt", str(i)) for i in range(3)]
+        for age, key in zip([30, 20], keys):
+            self.cache.put(key, b"sentence")
+            path = os.path.join(self.directory.name, key)
+            os.utime(path, (time.time() - age, time.time() - age))
+
+        self.cache.get(keys[0])
+        self.cache.put(keys[2], b"sentence")
+
+        self.assertIsNotNone(self.cache.get(keys[0]))
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[2]))
+
+    def test_evict_interval(self):
+        """Test that writes within the eviction interval don't list the artifacts again"""
+        self.cache.max_entries = 1
+        with patch.object(self.cache.backend, "entries", wraps=self.cache.backend.entries) as mock_entries:
+            for i in range(3):
+                self.cache.put(cache_key("sentence", "gpt", str(i)), b"sentence")
+            self.assertEqual(mock_entries.call_count, 1)
+
+            self.cache.evict_interval_seconds = 0
+            self.cache.put(cache_key("sentence", "gpt", "3"), b"sentence")
+            self.assertEqual(mock_entries.call_count, 2)
+        self.assertEqual(len(self.cache.backend.entries()), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
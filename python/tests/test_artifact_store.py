@@ -0,0 +1,89 @@
+"""Module for testing passing the files of a pipeline run between stages"""
+
+import os
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+from python.artifact_store import ArtifactStore
+
+
+class TestArtifactStore(unittest.TestCase):
+    """Class for testing the local copies of artifacts and their background uploads to S3"""
+
+    def setUp(self):
+        """Create a store with a mock bucket"""
+        self.store = ArtifactStore(cloud_storage=True, bucket="bucket")
+        self.s3_bucket = MagicMock()
+        self.s3_bucket.download_to.side_effect = lambda key, path: open(path, "wb").write(b"s3")
+        self.store._s3_bucket = self.s3_bucket
+
+    def tearDown(self):
+        """Remove the store's directory"""
+        self.store.close(raise_errors=False)
+
+    def test_put_file(self):
+        """Test that an artifact is uploaded once in the background, and later stages read the local copy"""
+        key = self.store.put_bytes(b"audio", "audio/clip.wav")
+        self.assertEqual(key, "audio/clip.wav")
+        self.store.wait([key])
+        self.s3_bucket.push_file_to_s3.assert_called_once_with(file_path=self.store.path_for(key), s3_key=key)
+
+        with open(self.store.local_path(key), "rb") as file:
+            self.assertEqual(file.read(), b"audio")
+        self.s3_bucket.download_to.assert_not_called()
+        self.assertEqual(self.store.stats(), {"uploads": 1, "downloads": 0, "local_hits": 1})
+
+    def test_after_upload(self):
+        """Test that the callback only runs once the artifact is in S3"""
+        uploaded = threading.Event()
+        self.s3_bucket.push_file_to_s3.side_effect = lambda file_path, s3_key: uploaded.wait(5)
+        after_upload = MagicMock()
+        key = self.store.put_bytes(b"image", "images/image.jpg", after_upload=after_upload)
+
+        after_upload.assert_not_called()
+        uploaded.set()
+        self.store.wait([key])
+        after_upload.assert_called_once()
+
+    def test_download_once(self):
+        """Test that artifacts from outside the run are downloaded once, even by concurrent readers"""
+        threads = [threading.Thread(target=self.store.local_path, args=("video/old.mp4",)) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.s3_bucket.download_to.assert_called_once()
+        self.assertEqual(self.store.stats()["downloads"], 1)
+        self.assertEqual(self.store.stats()["local_hits"], 3)
+
+    def test_upload_error(self):
+        """Test that an upload error is raised by the first wait for the artifact"""
+        self.s3_bucket.push_file_to_s3.side_effect = RuntimeError("S3 error")
+        key = self.store.put_bytes(b"video", "video/clip.mp4")
+
+        with self.assertRaises(RuntimeError):
+            self.store.flush()
+        self.store.wait([key])
+
+    def test_close(self):
+        """Test that closing the store waits for the uploads and removes the local copies"""
+        uploaded = threading.Event()
+        self.s3_bucket.push_file_to_s3.side_effect = lambda file_path, s3_key: uploaded.set()
+        self.store.put_bytes(b"video", "video/clip.mp4")
+
+        self.store.close()
+        self.assertTrue(uploaded.is_set())
+        self.assertFalse(os.path.exists(self.store.directory))
+
+    def test_local_storage(self):
+        """Test that without cloud storage the paths are passed through"""
+        with ArtifactStore(cloud_storage=False) as store:
+            self.assertEqual(store.put_file("/videos/clip.mp4", "video/clip.mp4"), "/videos/clip.mp4")
+            self.assertEqual(store.local_path("/videos/clip.mp4"), "/videos/clip.mp4")
+            self.assertEqual(store.stats()["uploads"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
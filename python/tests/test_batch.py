@@ -0,0 +1,110 @@
+"""Module for testing the batch pipeline used to create several videos in one run"""
+
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from python.batch import BatchPipeline
+
+
+class TestBatchPipeline(unittest.TestCase):
+    """Class for testing running the video pipeline for several words at once"""
+
+    def setUp(self):
+        """Mock each stage of the pipeline"""
+        self.mock_audio = patch("python.batch.main.generate_audio").start()
+        self.mock_images = patch("python.batch.main.generate_images").start()
+        self.mock_video = patch("python.batch.main.generate_video").start()
+        self.mock_upload = patch("python.batch.main.upload_video").start()
+        self.mock_details = patch("python.batch.main.build_video_details").start()
+        self.mock_yt = patch("python.batch.YTConnector").start()
+        self.mock_pool = patch("python.batch.WordPool").start()
+
+        self.mock_audio.side_effect = self.audio_generator
+        self.mock_video.return_value = ("video/path.mp4", {"title": "title"})
+        self.mock_details.side_effect = lambda audio, metadata, upload: {"video_id": f"id_{audio.word}"}
+
+    def tearDown(self):
+        """Stop the mocks"""
+        patch.stopall()
+
+    def test_run_words(self):
+        """Test that every word gets a result, with failures reported against the stage they happened in"""
+        self.mock_images.side_effect = lambda audio, openai_client, cache, artifacts: self.fail_for(audio.word, "dos")
+        report = BatchPipeline(openai_client=MagicMock()).run(words=["uno", "dos", "tres"])
+
+        self.assertEqual([item.word for item in report.items], ["uno", "dos", "tres"])
+        self.assertEqual([item.status for item in report.items], ["success", "failed", "success"])
+        self.assertEqual(report.items[0].video_details, {"video_id": "id_uno"})
+        self.assertEqual(report.items[1].failed_stage, "image")
+        self.assertIn("RuntimeError", report.items[1].error)
+        self.assertEqual(report.to_dict()["failed"], 1)
+        self.assertLessEqual(self.mock_yt.call_count, 2)
+        self.assertEqual([call.args for call in self.mock_pool.return_value.consume.call_args_list],
+                         [("uno",), ("dos",), ("tres",)])
+
+    def test_stage_concurrency(self):
+        """Test that no more than the configured number of videos are rendered at once"""
+        lock = threading.Lock()
+        in_stage = []
+        max_in_stage = []
+
+        def render(audio, images, cache, encoding_profile, artifacts):
+            with lock:
+                in_stage.append(audio.word)
+                max_in_stage.append(len(in_stage))
+            time.sleep(0.01)
+            with lock:
+                in_stage.remove(audio.word)
+            return "video/path.mp4", {"title": "title"}
+
+        self.mock_video.side_effect = render
+        pipeline = BatchPipeline(video_concurrency=1, openai_client=MagicMock())
+        report = pipeline.run(words=[str(i) for i in range(6)])
+
+        self.assertEqual(len(report.succeeded), 6)
+        self.assertEqual(max(max_in_stage), 1)
+
+    def test_run_requires_count_or_words(self):
+        """Test that exactly one of count and words must be given"""
+        with self.assertRaises(ValueError):
+            BatchPipeline(openai_client=MagicMock()).run()
+        with self.assertRaises(ValueError):
+            BatchPipeline(openai_client=MagicMock()).run(count=1, words=["uno"])
+
+    def test_render_farm(self):
+        """Test that videos are rendered on the render farm when one is given, and its stats are reported"""
+        render_farm = MagicMock()
+        render_farm.submit.return_value.result.return_value = {
+            "video_filepath": "video/farm.mp4", "video_metadata": {"title": "title"}
+        }
+        render_farm.stats.return_value = {"rendered": 2}
+        report = BatchPipeline(openai_client=MagicMock(), render_farm=render_farm).run(words=["uno", "dos"])
+
+        self.assertEqual(len(report.succeeded), 2)
+        self.mock_video.assert_not_called()
+        jobs = [call.args[0] for call in render_farm.submit.call_args_list]
+        self.assertEqual(sorted(job.word for job in jobs), ["dos", "uno"])
+        self.assertEqual(jobs[0].audio_filepath, "cloud_path")
+        self.assertEqual(self.mock_upload.call_args.args[0], "video/farm.mp4")
+        self.assertEqual(report.to_dict()["render_stats"], {"rendered": 2})
+        render_farm.shutdown.assert_called_once()
+
+    @staticmethod
+    def audio_generator(word, openai_client, generate_content, cache, artifacts):
+        """Return a mock Audio object for the word"""
+        audio = MagicMock(word=word)
+        audio.text_to_speech.return_value = ("local_path", "cloud_path")
+        return audio
+
+    @staticmethod
+    def fail_for(word, failing_word):
+        """Raise an error for `failing_word`, else return a mock image generator"""
+        if word == failing_word:
+            raise RuntimeError("DALL-E error")
+        return MagicMock()
+
+
+if __name__ == "__main__":
+    unittest.main()
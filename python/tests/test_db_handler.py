@@ -0,0 +1,51 @@
+"""Module for testing writing video metadata to the DB through the API"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from python.db_handler import BulkVideoWriter, get_api_session, write_many_to_db
+
+
+class TestBulkVideoWriter(unittest.TestCase):
+    """Class for testing sending video metadata to the bulk write-to-db endpoint in batches"""
+
+    def setUp(self):
+        """Point the writer at a mock session"""
+        patch.dict("os.environ", {"API_BASE_URL": "https://api.example.com/", "EXPECTED_API_KEY": "key"}).start()
+        self.addCleanup(patch.stopall)
+        self.session = MagicMock()
+        self.session.post.side_effect = self.post
+
+    @staticmethod
+    def post(url, json, headers, timeout):
+        """Answer like the endpoint, with every video created"""
+        response = MagicMock(status_code=200)
+        response.json.return_value = {"results": [{"video_id": video["video_id"], "status": "created"}
+                                                  for video in json]}
+        return response
+
+    def test_batches(self):
+        """Test that full batches are sent as they fill up, and the rest when the writer is closed"""
+        with BulkVideoWriter(batch_size=2, session=self.session) as writer:
+            for video_id in "abcde":
+                writer.add({"video_id": video_id})
+            self.assertEqual(writer.requests_sent, 2)
+
+        self.assertEqual(writer.requests_sent, 3)
+        self.assertEqual([result["video_id"] for result in writer.results], list("abcde"))
+        url = self.session.post.call_args.args[0]
+        self.assertEqual(url, "https://api.example.com/today/videos/write-to-db/bulk/")
+        self.assertEqual(self.session.post.call_args.kwargs["json"], [{"video_id": "e"}])
+        self.assertEqual(self.session.post.call_args.kwargs["headers"]["X-API-KEY"], "key")
+
+    def test_write_many_to_db(self):
+        """Test writing videos with the shared session, which is created once"""
+        with patch("python.db_handler.get_api_session", return_value=self.session):
+            results = write_many_to_db(({"video_id": str(number)} for number in range(450)), batch_size=200)
+        self.assertEqual(len(results), 450)
+        self.assertEqual(self.session.post.call_count, 3)
+        self.assertIs(get_api_session(), get_api_session())
+
+
+if __name__ == "__main__":
+    unittest.main()
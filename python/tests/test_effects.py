@@ -0,0 +1,72 @@
+"""Module for testing the animation effects for overlay layers"""
+
+import unittest
+
+import numpy as np
+
+from python.effects import EFFECTS, effect_tracks
+from python.ffmpeg_renderer import render_with_ffmpeg
+from python.overlays import LayerCompositor
+from python.word_generator import VideoGenerator
+
+
+class TestEffects(unittest.TestCase):
+    """Class for testing computing effect tracks and drawing animated layers"""
+
+    def test_track_lengths(self):
+        """Test that every effect has a value for each frame of the layer"""
+        for name in EFFECTS:
+            tracks = effect_tracks(name, duration=2.5, fps=24)
+            for track in [tracks.offsets, tracks.opacities]:
+                if track is not None:
+                    self.assertEqual(len(track), 60)
+
+    def test_effects(self):
+        """Test the range of each effect's tracks"""
+        bounce = effect_tracks("bounce", duration=1, fps=24, amplitude=20)
+        self.assertEqual(bounce.offsets.shape, (24, 2))
+        self.assertFalse(bounce.offsets[:, 0].any())
+        self.assertEqual(bounce.offsets[:, 1].max(), 20)
+        self.assertEqual(bounce.offsets[:, 1].min(), -20)
+        self.assertIsNone(bounce.opacities)
+
+        fade = effect_tracks("fade", duration=1, fps=24, minimum=0.4)
+        self.assertAlmostEqual(fade.opacities.max(), 1.0)
+        self.assertAlmostEqual(fade.opacities.min(), 0.4)
+
+        pulse = effect_tracks("pulse", duration=2, fps=24)
+        self.assertEqual(pulse.opacities[0], 1.0)
+        self.assertEqual(pulse.opacities[24], 1.0)
+        self.assertTrue((np.diff(pulse.opacities[:24]) < 0).all())
+
+        slide = effect_tracks("slide", duration=1, fps=24, distance=300)
+        self.assertEqual(slide.offsets[0, 0], -300)
+        self.assertFalse(slide.offsets[12:].any())
+        self.assertEqual(slide.opacities[0], 0)
+        self.assertTrue((slide.opacities[12:] == 1).all())
+
+    def test_unknown_effect(self):
+        """Test that an unknown effect is rejected"""
+        with self.assertRaises(ValueError):
+            effect_tracks("spin", duration=1)
+
+    def test_animated_word(self):
+        """Test that the word badge and its shadow move together, and are drawn where the tracks say for each frame"""
+        shadow, badge = VideoGenerator.create_word_layers("hola", duration=1, font_size=20, style="bounce")
+        np.testing.assert_array_equal(shadow.offsets, badge.offsets + [0, 10])
+
+        frame = np.zeros((200, 200, 3), dtype=np.uint8)
+        compositor = LayerCompositor([badge], frame_size=(200, 200), fps=24)
+        rows = [np.flatnonzero(compositor.composite(frame, index / 24).any(axis=(1, 2)))[0] for index in range(24)]
+        top = (200 - badge.image.shape[0]) // 2
+        self.assertEqual(rows, list(top + badge.offsets[:, 1]))
+
+    def test_ffmpeg_rejects_animated_layers(self):
+        """Test that the ffmpeg backend rejects animated layers rather than drawing them still"""
+        layers = VideoGenerator.create_word_layers("hola", duration=1, font_size=20, style="fade")
+        with self.assertRaises(ValueError):
+            render_with_ffmpeg(["image.jpg"], "audio.wav", layers, "video.mp4")
+
+
+if __name__ == "__main__":
+    unittest.main()
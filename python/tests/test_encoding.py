@@ -0,0 +1,54 @@
+"""Module for testing the encoding profiles for rendered videos"""
+
+import os
+import tempfile
+import unittest
+
+import imageio_ffmpeg
+import numpy as np
+import soundfile
+from PIL import Image
+
+from python.encoding import ENCODING_PROFILES, EncodingProfile, get_encoding_profile
+from python.word_generator import VideoGenerator
+
+
+class TestEncodingProfiles(unittest.TestCase):
+    """Class for testing looking up encoding profiles and rendering with them"""
+
+    def test_get_encoding_profile(self):
+        """Test looking up profiles by name, and that unknown names are rejected"""
+        self.assertEqual(get_encoding_profile("draft").preset, "ultrafast")
+        custom = EncodingProfile("custom", crf=40)
+        self.assertIs(get_encoding_profile(custom), custom)
+        self.assertEqual(set(ENCODING_PROFILES), {"draft", "shorts-standard", "archive"})
+        with self.assertRaises(ValueError):
+            get_encoding_profile("lossless")
+
+    def test_frame_size(self):
+        """Test that scaled frame sizes are rounded down to even numbers"""
+        self.assertEqual(EncodingProfile("half", scale=0.5).frame_size((1024, 1792)), (512, 896))
+        self.assertEqual(EncodingProfile("third", scale=1 / 3).frame_size((1024, 1792)), (340, 596))
+
+    def test_render_with_profile(self):
+        """Test that both backends encode with the profile's frame rate and resolution"""
+        with tempfile.TemporaryDirectory() as directory:
+            image_path = os.path.join(directory, "image.jpg")
+            Image.new("RGB", (320, 560), (40, 120, 40)).save(image_path)
+            audio_filepath = os.path.join(directory, "audio.wav")
+            soundfile.write(audio_filepath, np.zeros(44100), 44100)
+            video_generator = VideoGenerator("hola", "hola", "hello", [image_path], audio_filepath)
+
+            for backend in ["moviepy", "ffmpeg"]:
+                output_filepath = os.path.join(directory, f"{backend}.mp4")
+                video_generator.generate_video(output_filepath=output_filepath, backend=backend,
+                                               encoding_profile="draft")
+                frames = imageio_ffmpeg.read_frames(output_filepath)
+                metadata = next(frames)
+                self.assertEqual(metadata["size"], (160, 280))
+                self.assertEqual(metadata["fps"], 15)
+                self.assertEqual(sum(1 for _ in frames), 15)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Module for testing rendering videos with a single ffmpeg process"""
+
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import soundfile
+from PIL import Image
+
+from python.ffmpeg_renderer import build_filter_graph, compare_videos, media_duration
+from python.word_generator import VideoGenerator
+
+
+class TestFFmpegRenderer(unittest.TestCase):
+    """Class for testing the ffmpeg render backend against the moviepy backend"""
+
+    def setUp(self):
+        """Create two images and a short audio file in a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.image_paths = []
+        for index, colour in enumerate([(200, 40, 40), (40, 40, 200)]):
+            path = os.path.join(self.directory.name, f"image_{index}.jpg")
+            Image.new("RGB", (320, 560), colour).save(path, quality=95)
+            self.image_paths.append(path)
+
+        self.audio_filepath = os.path.join(self.directory.name, "audio.wav")
+        t = np.arange(0, 2.0, 1 / 44100)
+        soundfile.write(self.audio_filepath, 0.2 * np.sin(2 * np.pi * 440 * t), 44100)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        self.directory.cleanup()
+
+    def test_build_filter_graph(self):
+        """Test that the images are joined before the overlays are drawn in order, each only during its time"""
+        graph = build_filter_graph([24, 24], (320, 560), [(10, 20, 0.0, 1.0), (0, 0, 1.0, 2.0)], fps=24)
+        filters = graph.split(";")
+        self.assertIn("loop=loop=23:size=1", filters[0])
+        self.assertEqual(filters[2], "[image0][image1]concat=n=2:v=1:a=0,fps=24:eof_action=pass[layer0]")
+        self.assertTrue(filters[3].startswith("[layer0][3:v]overlay=x=10:y=20"))
+        self.assertIn("enable='gte(t,1.000000)*lt(t,2.000000)'", filters[4])
+        self.assertEqual(filters[-1], "[layer2]format=yuv420p[video]")
+
+    def test_parity_with_moviepy(self):
+        """Test that both backends render the same video"""
+        video_generator = VideoGenerator(
+            word="hola",
+            sentence="hola mundo que tal estas",
+            translated_sentence="hello world how are you",
+            image_paths=self.image_paths,
+            audio_filepath=self.audio_filepath,
+        )
+        outputs = {}
+        for backend in ["moviepy", "ffmpeg"]:
+            outputs[backend] = os.path.join(self.directory.name, f"{backend}.mp4")
+            video_generator.generate_video(output_filepath=outputs[backend], backend=backend)
+
+        self.assertAlmostEqual(media_duration(outputs["ffmpeg"]), 2.0, delta=0.1)
+        parity = compare_videos(outputs["moviepy"], outputs["ffmpeg"])
+        self.assertTrue(parity["size"])
+        self.assertLess(parity["duration_difference"], 0.1)
+        self.assertLess(parity["mean_absolute_error"], 2)
+        self.assertGreater(parity["psnr"], 35)
+
+    def test_unknown_backend(self):
+        """Test that an unknown backend is rejected before anything is rendered"""
+        video_generator = VideoGenerator("hola", "hola", "hello", self.image_paths, self.audio_filepath)
+        with self.assertRaises(ValueError):
+            video_generator.generate_video(output_filepath=os.path.join(self.directory.name, "x.mp4"), backend="gpu")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,6 @@
 """Module for testing the main functionality"""
 
+import asyncio
 import unittest
 import os
 from unittest.mock import patch
@@ -37,15 +38,7 @@ class TestWordGenerator(unittest.TestCase):
     @classmethod
     def tearDownClass(cls) -> None:
         """Tear down class method to stop mocks once tests have run"""
-        cls.mock_get.stop()
-        cls.mock_google_translator.stop()
-        cls.mock_sentence_generator.stop()
-        cls.mock_remove_word_from_file.stop()
-        cls.mock_enchant.stop()
-
-        cls.mock_tts.stop()
-        cls.mock_get_audio_duration()
-        cls.mock_generate_srt_file.stop()
+        patch.stopall()
 
     def test_read_text_file(self):
         """Test reading a text file with a valid path and valid inputs"""
@@ -61,6 +54,19 @@ class TestWordGenerator(unittest.TestCase):
                 native_language="en"
             )
 
+    def test_without_generating_content(self):
+        """Test that the content set by the stages is None until they have run"""
+        audio = Audio(
+            word_list_path="python/tests/test_word_list.txt",
+            language_to_learn="es",
+            native_language="en",
+            word="apple",
+            generate_content=False,
+        )
+        self.assertEqual(audio.word, "apple")
+        for attribute in ("sentence", "translated_sentence", "audio_path", "audio_cloud_path"):
+            self.assertIsNone(getattr(audio, attribute))
+
     def test_get_random_word(self):
         """Test getting a random word from the text file where the text file and its contents are valid"""
         random_word = self.audio.get_random_word()
@@ -89,6 +95,11 @@ class TestWordGenerator(unittest.TestCase):
         mock_get.return_value.json.return_value = {"n_results": 0}
         self.assertFalse(self.audio.test_real_word("blah"))
 
+    def test_google_translate_async(self):
+        """Test the async translation returns the same result as the blocking translation"""
+        translated = asyncio.run(self.audio.google_translate_async(target_language="en", source_language="es"))
+        self.assertEqual(translated, "Translated sentence")
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,87 @@
+"""Module for testing generating and saving images with the ImageGenerator class"""
+
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+import httpx
+from openai import RateLimitError
+
+from python.word_generator import ImageGenerator
+
+
+def rate_limit_error() -> RateLimitError:
+    """Build the error raised by the OpenAI client when the rate limit is hit"""
+    request = httpx.Request("POST", "https://api.openai.com/v1/images/generations")
+    return RateLimitError("Rate limit reached", response=httpx.Response(429, request=request), body=None)
+
+
+class TestImageGenerator(unittest.TestCase):
+    """Class for testing generating several images at once"""
+
+    def setUp(self):
+        """Mock the OpenAI client, the image downloads and S3"""
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.openai_client = MagicMock()
+        self.openai_client.images.generate.side_effect = self.generate
+
+        self.mock_get = patch("python.word_generator.requests.get").start()
+        self.mock_get.side_effect = self.download
+        self.mock_bucket = patch("python.word_generator.BucketSort").start()
+        self.mock_bucket.return_value.upload_stream.side_effect = lambda fileobj, s3_key: s3_key
+
+    def tearDown(self):
+        """Stop the mocks"""
+        patch.stopall()
+
+    def generate(self, prompt, **kwargs):
+        """Stand in for the DALL-E API, taking longer for earlier prompts so they finish out of order"""
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.01 * (5 - int(prompt)))
+        with self.lock:
+            self.in_flight -= 1
+        return MagicMock(data=[MagicMock(url=f"url_{prompt}")])
+
+    @staticmethod
+    def download(url, stream):
+        """Stand in for a streamed download, returning a response usable as a context manager"""
+        response = MagicMock()
+        response.raw.url = url
+        response.__enter__.return_value = response
+        return response
+
+    def test_prompt_order(self):
+        """Test that images generated in parallel are returned in prompt order, with no more than max_in_flight at once"""
+        images = ImageGenerator(
+            prompts=["0", "1", "2", "3", "4"], cloud_storage=True, openai_client=self.openai_client, max_in_flight=2,
+        )
+        self.assertEqual(images.image_urls, [f"url_{i}" for i in range(5)])
+        self.assertEqual([path.rsplit("_", 1)[1] for path in images.image_paths], [f"{i}.jpg" for i in range(5)])
+        self.assertEqual(self.max_in_flight, 2)
+
+        uploads = self.mock_bucket.return_value.upload_stream.call_args_list
+        uploaded = {call.args[0].url: call.args[1] for call in uploads}
+        self.assertEqual([uploaded[f"url_{i}"] for i in range(5)], images.image_paths)
+
+    def test_rate_limit_backoff(self):
+        """Test that a DALL-E call is retried after hitting the rate limit"""
+        self.openai_client.images.generate.side_effect = [rate_limit_error(), self.generate("4")]
+        with patch("python.word_generator.time.sleep") as mock_sleep:
+            images = ImageGenerator(prompts="4", cloud_storage=True, openai_client=self.openai_client)
+        self.assertEqual(images.image_urls, ["url_4"])
+        self.assertEqual(self.openai_client.images.generate.call_count, 2)
+        mock_sleep.assert_called_once()
+
+    def test_invalid_max_in_flight(self):
+        """Test that max_in_flight must be positive"""
+        with self.assertRaises(ValueError):
+            ImageGenerator(prompts="0", openai_client=self.openai_client, max_in_flight=0)
+
+
+if __name__ == "__main__":
+    unittest.main()
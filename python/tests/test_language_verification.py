@@ -0,0 +1,74 @@
+"""Module for testing the language verification functionality"""
+
+import asyncio
+import os
+import unittest
+from unittest.mock import patch
+
+import httpx
+
+from python import language_verification
+from python.language_verification import LanguageVerification
+
+
+class TestEnchantDictionaryCache(unittest.TestCase):
+    """Class for testing that enchant dictionaries are cached and reused"""
+
+    def setUp(self):
+        """Clear the dictionary cache and mock enchant so that only 'hola' is a real word"""
+        language_verification.clear_dictionary_cache()
+        self.mock_dict = patch("python.language_verification.enchant.Dict").start()
+        self.mock_dict.return_value.check.side_effect = lambda word: word == "hola"
+
+    def tearDown(self):
+        """Stop the mocks and clear the dictionary cache"""
+        patch.stopall()
+        language_verification.clear_dictionary_cache()
+
+    def test_enchant_real_word_reuses_dictionary(self):
+        """Test that checking several words only loads the dictionary once"""
+        self.assertTrue(LanguageVerification("es").enchant_real_word("hola"))
+        self.assertFalse(LanguageVerification("es").enchant_real_word("blah"))
+        self.mock_dict.assert_called_once_with("es")
+
+    def test_check_many(self):
+        """Test checking a batch of words returns a result per word in order"""
+        results = LanguageVerification("es").check_many(["hola", "blah", "hola"])
+        self.assertEqual(results, [True, False, True])
+        self.mock_dict.assert_called_once_with("es")
+
+    def test_cache_is_bounded(self):
+        """Test that the least recently used dictionary is dropped once the cache is full"""
+        languages = [f"lang_{i}" for i in range(language_verification.DICTIONARY_CACHE_SIZE + 1)]
+        language_verification.warm_up_dictionaries(languages)
+        LanguageVerification(languages[0]).enchant_real_word("hola")
+        self.assertEqual(self.mock_dict.call_count, len(languages) + 1)
+
+
+
+class TestAsyncDictionaryDefinition(unittest.TestCase):
+    """Class for testing the async dictionary lookup"""
+
+    @patch.dict(os.environ, {"MARIAM_WEBSTER_KEY": "test_key"})
+    def test_get_spanish_dictionary_definition_async(self):
+        """Test the async lookup returns the definition, or the status code if the request fails"""
+        def handler(request):
+            if request.url.path.endswith("/hola"):
+                return httpx.Response(200, json=[{"meta": {"id": "hola"}, "shortdef": ["hello"]}])
+            return httpx.Response(404)
+
+        async def lookup(word):
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await LanguageVerification("es").get_spanish_dictionary_definition_async(word, client)
+
+        self.assertEqual(asyncio.run(lookup("hola"))[0]["shortdef"], ["hello"])
+        self.assertEqual(asyncio.run(lookup("blah")), {"Error getting dictionary definition": 404})
+
+    def test_get_spanish_dictionary_definition_async_wrong_language(self):
+        """Test that the async lookup only accepts Spanish"""
+        with self.assertRaises(ValueError):
+            asyncio.run(LanguageVerification("fr").get_spanish_dictionary_definition_async("bonjour"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,46 @@
+"""Module for testing importing heavy dependencies on first use"""
+
+import json
+import unittest
+from unittest.mock import MagicMock
+
+from python.benchmarks.import_time import check_budget, parse_importtime, profile_import
+from python.lazy_imports import lazy_import
+
+
+class TestLazyImports(unittest.TestCase):
+    """Class for testing the lazy imports and the cold start budget of the Lambda entry point"""
+
+    def test_lazy_import(self):
+        """Test that a lazy import forwards calls and attributes, and runs its hook once when first used"""
+        after_import = MagicMock()
+        dumps = lazy_import("json", "dumps", after_import=after_import)
+        module = lazy_import("json")
+        self.assertFalse(dumps.loaded)
+        after_import.assert_not_called()
+
+        self.assertEqual(dumps({"a": 1}), json.dumps({"a": 1}))
+        self.assertEqual(dumps({"b": 2}), json.dumps({"b": 2}))
+        self.assertTrue(dumps.loaded)
+        after_import.assert_called_once()
+        self.assertIs(module.JSONDecodeError, json.JSONDecodeError)
+
+    def test_parse_importtime(self):
+        """Test parsing the output of python -X importtime"""
+        output = ("import time: self [us] | cumulative | imported package\n"
+                  "import time:       120 |        120 |   json.decoder\n"
+                  "import time:       300 |        420 | json\n")
+        timings = parse_importtime(output)
+        self.assertEqual([timing.module for timing in timings], ["json.decoder", "json"])
+        self.assertEqual(timings[1].cumulative_us, 420)
+
+    def test_entry_point_imports(self):
+        """Test that importing the Lambda entry point doesn't import any of the heavy dependencies"""
+        profile = profile_import(repeats=1)
+        self.assertIn("python.main", profile["modules"])
+        # Only the imports are checked, as the time taken depends on the machine
+        self.assertEqual(check_budget(profile, budget_ms=float("inf")), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
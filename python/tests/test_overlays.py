@@ -0,0 +1,77 @@
+"""Module for testing drawing overlay layers onto video frames"""
+
+import unittest
+
+import numpy as np
+
+from python.overlays import LayerCompositor, OverlayLayer, rasterize_text, resolve_position
+
+
+def solid_layer(width, height, colour, alpha=255, **kwargs):
+    """Create a layer of a single colour"""
+    image = np.zeros((height, width, 4), dtype=np.uint8)
+    image[..., :3] = colour
+    image[..., 3] = alpha
+    return OverlayLayer(image=image, **kwargs)
+
+
+class TestOverlays(unittest.TestCase):
+    """Class for testing rasterising and compositing overlay layers"""
+
+    def setUp(self):
+        """Create a black 100x50 frame"""
+        self.frame = np.zeros((50, 100, 3), dtype=np.uint8)
+
+    def test_rasterize_text(self):
+        """Test that text is drawn on an opaque, padded background"""
+        image = rasterize_text("hola", font_size=20, background_colour=(0, 0, 0), padding=(10, 5))
+        self.assertEqual(image.dtype, np.uint8)
+        self.assertEqual(image.shape[2], 4)
+        self.assertTrue((image[..., 3] == 255).all())
+        self.assertTrue((image[..., :3] > 0).any())
+
+    def test_resolve_position(self):
+        """Test converting named and pixel positions to the top left corner of a layer"""
+        self.assertEqual(resolve_position(("center", "center"), (20, 10), (100, 50)), (40, 20))
+        self.assertEqual(resolve_position(("right", "bottom"), (20, 10), (100, 50)), (80, 40))
+        self.assertEqual(resolve_position((5, "top"), (20, 10), (100, 50)), (5, 0))
+        with self.assertRaises(ValueError):
+            resolve_position(("middle", "top"), (20, 10), (100, 50))
+
+    def test_blend(self):
+        """Test that a half transparent layer is blended with the frame, only between its start and end"""
+        layer = solid_layer(10, 10, (255, 0, 0), start=1, end=2, position=(0, 0), opacity=0.5)
+        compositor = LayerCompositor([layer], frame_size=(100, 50), fps=10)
+
+        frame = compositor.composite(self.frame, 1.5)
+        np.testing.assert_array_equal(frame[0, 0], [128, 0, 0])
+        np.testing.assert_array_equal(frame[10, 10], [0, 0, 0])
+        self.assertFalse(self.frame.any())
+        self.assertFalse(compositor.composite(self.frame, 2).any())
+
+    def test_clipping(self):
+        """Test that layers partly outside the frame are clipped, and layers fully outside are skipped"""
+        layers = [
+            solid_layer(10, 10, (255, 255, 255), start=0, end=1, position=(95, -5)),
+            solid_layer(10, 10, (255, 255, 255), start=0, end=1, position=(200, 0)),
+        ]
+        frame = LayerCompositor(layers, frame_size=(100, 50), fps=10).composite(self.frame, 0)
+        self.assertEqual(int((frame[..., 0] == 255).sum()), 5 * 5)
+        self.assertTrue((frame[:5, 95:] == 255).all())
+
+    def test_tracks(self):
+        """Test that the offset and opacity tracks are indexed by frame, holding their last value"""
+        layer = solid_layer(
+            10, 10, (255, 255, 255), start=0, end=10, position=(0, 0),
+            offsets=np.array([[0, 0], [20, 0]]), opacities=np.array([1.0, 0.0, 1.0]),
+        )
+        compositor = LayerCompositor([layer], frame_size=(100, 50), fps=10)
+        self.assertEqual(compositor.composite(self.frame, 0)[0, 0, 0], 255)
+        self.assertFalse(compositor.composite(self.frame, 0.1).any())
+        frame = compositor.composite(self.frame, 5)
+        self.assertEqual(frame[0, 20, 0], 255)
+        self.assertEqual(frame[0, 0, 0], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
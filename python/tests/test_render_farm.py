@@ -0,0 +1,73 @@
+"""Module for testing rendering videos on a pool of processes"""
+
+import itertools
+import json
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from python.render_farm import RenderFarm, RenderJob
+
+
+class TestRenderFarm(unittest.TestCase):
+    """Class for testing render jobs and the render farm's throughput reporting"""
+
+    def test_job_round_trip(self):
+        """Test that a job survives being serialised to JSON, e.g. to send it to another machine"""
+        job = RenderJob(
+            word="hola",
+            sentence="hola mundo",
+            translated_sentence="hello world",
+            image_paths=["images/1.jpg"],
+            audio_filepath="audio/1.wav",
+        )
+        self.assertEqual(RenderJob.from_dict(json.loads(json.dumps(job.to_dict()))), job)
+
+    def test_workers(self):
+        """Test that the number of workers is validated and defaults to at least one"""
+        self.assertGreaterEqual(RenderFarm(ffmpeg_threads=1024).workers, 1)
+        with self.assertRaises(ValueError):
+            RenderFarm(workers=0)
+        with self.assertRaises(ValueError):
+            RenderFarm(ffmpeg_threads=0)
+
+    def test_stats(self):
+        """Test that finished jobs are counted and throughput is reported in videos per minute"""
+        ticks = itertools.count(0.0, 10.0)
+        render_farm = RenderFarm(workers=1, ffmpeg_threads=2, executor=ThreadPoolExecutor(max_workers=1),
+                                 clock=lambda: next(ticks))
+        self.assertEqual(render_farm.videos_per_minute(), 0.0)
+
+        with patch("python.render_farm.render_video_job", side_effect=self.render_stub):
+            futures = [render_farm.submit(self.make_job(word)) for word in ["uno", "dos", "error"]]
+            render_farm.shutdown()
+
+        self.assertEqual(futures[0].result()["duration"], 10.0)
+        self.assertIsInstance(futures[2].exception(), RuntimeError)
+        stats = render_farm.stats()
+        self.assertEqual(stats["rendered"], 2)
+        self.assertEqual(stats["failed"], 1)
+        # Submitted at 0s and the jobs finished at 10s, 20s and 30s
+        self.assertEqual(stats["videos_per_minute"], 4.0)
+        self.assertEqual(stats["average_render_seconds"], 15.0)
+
+    @staticmethod
+    def make_job(word):
+        """Create a job for a word"""
+        return RenderJob(
+            word=word,
+            sentence=f"{word} mundo",
+            translated_sentence="hello world",
+            image_paths=["images/1.jpg"],
+            audio_filepath="audio/1.wav",
+        )
+
+    @staticmethod
+    def render_stub(job):
+        """Stand in for rendering a job, taking 10s for 'uno', 20s for 'dos' and failing for 'error'"""
+        if job["word"] == "error":
+            raise RuntimeError("ffmpeg error")
+        return {"job_id": job["job_id"], "duration": {"uno": 10.0, "dos": 20.0}[job["word"]]}
+
+if __name__ == "__main__":
+    unittest.main()
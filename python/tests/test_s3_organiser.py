@@ -0,0 +1,128 @@
+"""Module for testing the S3 transfers of BucketSort and the boto3 clients it shares"""
+
+import io
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import MagicMock
+
+import boto3
+from botocore.config import Config
+
+from python.constants import S3Settings
+from python.s3_organiser import BucketSort, ClientRegistry, client_config
+
+
+class TestBucketSortTransfers(unittest.TestCase):
+    """Class for testing multipart uploads and ranged downloads against a mock S3 client"""
+
+    def setUp(self):
+        """Create a BucketSort with a mock client serving one object"""
+        self.content = os.urandom(10 * 1024 + 7)
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        self.bucket = BucketSort(bucket="bucket", registry=ClientRegistry(boto3_session=MagicMock()))
+        self.bucket.s3_client = MagicMock()
+        self.bucket.s3_client.head_object.return_value = {"ContentLength": len(self.content)}
+        self.bucket.s3_client.get_object.side_effect = self.get_object
+
+    def get_object(self, Bucket, Key, Range):
+        """Return a byte range of the object, recording how many requests are in flight"""
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(0.001)
+        start, end = (int(offset) for offset in Range.removeprefix("bytes=").split("-"))
+        with self.lock:
+            self.in_flight -= 1
+        return {"Body": io.BytesIO(self.content[start:end + 1])}
+
+    def test_download_to_path(self):
+        """Test that the parts are written to the file in order, with no more than max_concurrency in flight"""
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "video.mp4")
+            size = self.bucket.download_to("video.mp4", path, part_size=1024, max_concurrency=3)
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), self.content)
+
+        self.assertEqual(size, len(self.content))
+        self.assertEqual(self.bucket.s3_client.get_object.call_count, 11)
+        self.assertLessEqual(self.max_in_flight, 3)
+
+    def test_download_to_stream(self):
+        """Test downloading to a file-like object, including objects smaller than one part"""
+        destination = io.BytesIO()
+        self.bucket.download_to("video.mp4", destination, part_size=S3Settings.PART_SIZE)
+        self.assertEqual(destination.getvalue(), self.content)
+        self.assertEqual(self.bucket.s3_client.get_object.call_count, 1)
+
+    def test_upload_stream(self):
+        """Test that streamed uploads use the part size and bound the parts held in memory"""
+        fileobj = io.BytesIO(self.content)
+        self.assertEqual(self.bucket.upload_stream(fileobj, "video.mp4", max_concurrency=2), "video.mp4")
+        config = self.bucket.s3_client.upload_fileobj.call_args.kwargs["Config"]
+        self.assertEqual(config.multipart_chunksize, S3Settings.PART_SIZE)
+        self.assertEqual(config.max_concurrency, 2)
+        self.assertEqual(config.max_in_memory_upload_chunks, 2)
+
+        with self.assertRaises(ValueError):
+            self.bucket.upload_stream(fileobj, "video.mp4", part_size=1024)
+
+
+class HeadObjectHandler(BaseHTTPRequestHandler):
+    """Answers every HEAD request like S3 does for an empty object, keeping the connection open"""
+    protocol_version = "HTTP/1.1"
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.send_header("ETag", '"etag"')
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestClientRegistry(unittest.TestCase):
+    """Class for testing sharing boto3 clients between BucketSort objects"""
+
+    def test_shared_client(self):
+        """Test that every BucketSort using a registry gets the same client, created once"""
+        registry = ClientRegistry(boto3_session=MagicMock())
+        buckets = [BucketSort(bucket="bucket", registry=registry) for _ in range(3)]
+
+        self.assertTrue(all(bucket.s3_client is buckets[0].s3_client for bucket in buckets))
+        registry.session.client.assert_called_once()
+        self.assertEqual(registry.stats()["clients_created"], 1)
+        self.assertEqual(registry.stats()["client_requests"], 3)
+
+    def test_connection_reuse(self):
+        """Test that requests from different BucketSort objects reuse the client's open connection"""
+        server = ThreadingHTTPServer(("127.0.0.1", 0), HeadObjectHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            registry = ClientRegistry(
+                boto3_session=boto3.Session(aws_access_key_id="key", aws_secret_access_key="secret",
+                                            region_name="eu-west-2"),
+                config=client_config().merge(Config(s3={"addressing_style": "path"})),
+                endpoint_url=f"http://127.0.0.1:{server.server_address[1]}",
+            )
+            for _ in range(3):
+                BucketSort(bucket="bucket", registry=registry).get_object_metadata("video.mp4")
+            stats = registry.stats()
+        finally:
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(stats["clients_created"], 1)
+        self.assertEqual(stats["connections_created"], 1)
+        self.assertEqual(stats["connections_reused"], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,177 @@
+"""Module for testing the task graph used to run the stages of the video pipeline concurrently"""
+
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+
+from python.checkpoint import RunCheckpoint
+from python.constants import CheckpointSettings
+from python.task_graph import TaskGraph, StageFailedError
+
+
+class TestTaskGraph(unittest.TestCase):
+    """Class for testing running stages based on their dependencies"""
+
+    def test_run_respects_dependencies(self):
+        """Test that each stage receives the results of the stages it depends on"""
+        graph = TaskGraph()
+        graph.add_stage("sentence", lambda results: "hola")
+        graph.add_stage("translation", lambda results: results["sentence"] + " -> hello", depends_on=["sentence"])
+        graph.add_stage("speech", lambda results: len(results["sentence"]), depends_on=["sentence"])
+        graph.add_stage(
+            "video", lambda results: (results["translation"], results["speech"]), depends_on=["translation", "speech"]
+        )
+
+        results = graph.run()
+        self.assertEqual(results["video"], ("hola -> hello", 4))
+        self.assertEqual([timing.name for timing in graph.timings][0], "sentence")
+        self.assertEqual(len(graph.timings), 4)
+
+    def test_independent_stages_run_in_parallel(self):
+        """Test that stages which don't depend on each other overlap"""
+        graph = TaskGraph()
+        graph.add_stage("sentence", lambda results: None)
+        for name in ("translation", "speech", "image"):
+            graph.add_stage(name, lambda results: time.sleep(0.2), depends_on=["sentence"])
+
+        start = time.perf_counter()
+        graph.run()
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+    def test_group_semaphore(self):
+        """Test that stages in a group with a semaphore don't run at the same time"""
+        graph = TaskGraph(semaphores={"video": threading.Semaphore(1)})
+        for name in ("first", "second"):
+            graph.add_stage(name, lambda results: time.sleep(0.1), group="video")
+
+        graph.run()
+        first, second = graph.timings
+        self.assertGreaterEqual(second.start, first.end)
+
+    def test_failed_stage(self):
+        """Test that a failing stage stops its dependents and is reported with the original error"""
+        def fail(results):
+            raise ValueError("no image")
+
+        ran = []
+        graph = TaskGraph()
+        graph.add_stage("image", fail)
+        graph.add_stage("video", lambda results: ran.append("video"), depends_on=["image"])
+
+        with self.assertRaises(StageFailedError) as context:
+            graph.run()
+        self.assertEqual(context.exception.stage, "image")
+        self.assertIsInstance(context.exception.__cause__, ValueError)
+        self.assertEqual(ran, [])
+
+    def test_add_stage_validation(self):
+        """Test that duplicate stages and unknown dependencies are rejected"""
+        graph = TaskGraph()
+        graph.add_stage("sentence", lambda results: None)
+        with self.assertRaises(ValueError):
+            graph.add_stage("sentence", lambda results: None)
+        with self.assertRaises(ValueError):
+            graph.add_stage("video", lambda results: None, depends_on=["image"])
+
+
+
+class TestTaskGraphCheckpoint(unittest.TestCase):
+    """Class for testing resuming a graph from a checkpoint"""
+
+    def setUp(self):
+        """Store checkpoints in a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        patch("python.checkpoint.base_config.BASE_DIR", self.directory.name).start()
+
+    def tearDown(self):
+        """Stop the mocks and remove the temporary directory"""
+        patch.stopall()
+        self.directory.cleanup()
+
+    def build_graph(self, checkpoint, upload):
+        """Build a graph where every stage but the last can be restored from the checkpoint"""
+        self.sentence = MagicMock(return_value="hola")
+        graph = TaskGraph(checkpoint=checkpoint)
+        graph.add_stage("sentence", self.sentence, from_checkpoint=lambda saved, results: saved)
+        graph.add_stage(
+            "video",
+            lambda results: (results["sentence"] + ".mp4", {"title": results["sentence"]}),
+            depends_on=["sentence"],
+            from_checkpoint=lambda saved, results: tuple(saved),
+        )
+        graph.add_stage("upload", upload, depends_on=["video"], from_checkpoint=lambda saved, results: saved)
+        graph.add_stage("write", lambda results: results["upload"]["id"], depends_on=["upload"])
+        return graph
+
+    def test_resume(self):
+        """Test that a rerun restores the completed stages from the checkpoint and only runs the failed stage onwards"""
+        failing_upload = MagicMock(side_effect=RuntimeError("YouTube error"))
+        with self.assertRaises(StageFailedError):
+            self.build_graph(RunCheckpoint("run"), failing_upload).run()
+        self.assertEqual(set(RunCheckpoint("run").completed_stages()), {"sentence", "video"})
+
+        upload = MagicMock(return_value={"id": "abc"})
+        graph = self.build_graph(RunCheckpoint("run"), upload)
+        results = graph.run()
+
+        self.sentence.assert_not_called()
+        upload.assert_called_once()
+        self.assertEqual(upload.call_args.args[0]["video"], ("hola.mp4", {"title": "hola"}))
+        self.assertEqual(results["write"], "abc")
+        self.assertEqual(graph.restored, ["sentence", "video"])
+        self.assertIn("sentence: restored from checkpoint", graph.format_timings())
+
+    def set_modified(self, run_id, seconds_ago, complete=False):
+        """Set the time the manifest of a run was last modified"""
+        modified = time.time() - seconds_ago
+        os.utime(RunCheckpoint.manifest_path(run_id, cloud_storage=False, complete=complete), (modified, modified))
+
+    def test_latest_incomplete(self):
+        """Test finding the most recent run that didn't complete, by when it was last modified rather than by its ID"""
+        for run_id, seconds_ago in [("c-run", 300), ("b-run", 200), ("a-run", 100)]:
+            RunCheckpoint(run_id).start_attempt()
+            self.set_modified(run_id, seconds_ago)
+        RunCheckpoint("a-run").mark_complete()
+        RunCheckpoint("b-run").mark_failed("upload")
+
+        checkpoint = RunCheckpoint.latest_incomplete()
+        self.assertEqual(checkpoint.run_id, "b-run")
+        self.assertEqual(checkpoint.load()["failed_stage"], "upload")
+        self.assertEqual(checkpoint.start_attempt()[0], 2)
+
+    def test_completed_manifests(self):
+        """Test that a completed run is kept for a repeated attempt, but isn't listed when finding a run to resume"""
+        checkpoint = RunCheckpoint("run")
+        checkpoint.start_attempt()
+        checkpoint.save_stage("sentence", "hola")
+        checkpoint.mark_complete()
+        self.assertFalse(os.path.exists(checkpoint.path))
+        self.assertIsNone(RunCheckpoint.latest_incomplete())
+
+        repeated = RunCheckpoint("run")
+        self.assertEqual(repeated.start_attempt(), (2, ["sentence"]))
+        repeated.mark_complete()
+
+        self.set_modified("run", CheckpointSettings.COMPLETE_RETENTION_SECONDS + 60, complete=True)
+        RunCheckpoint("other-run").mark_complete()
+        self.assertFalse(os.path.exists(repeated.complete_path))
+
+    def test_expired_manifests(self):
+        """Test that runs which didn't complete within the retention period are deleted rather than resumed"""
+        checkpoint = RunCheckpoint("run")
+        checkpoint.mark_failed("upload")
+        self.set_modified("run", CheckpointSettings.INCOMPLETE_RETENTION_SECONDS + 60)
+        self.assertIsNone(RunCheckpoint.latest_incomplete())
+        self.assertFalse(os.path.exists(checkpoint.path))
+
+    def test_checkpoint_requires_restore(self):
+        """Test that a stage can't be saved to the checkpoint without a way to restore it"""
+        with self.assertRaises(ValueError):
+            TaskGraph().add_stage("sentence", lambda results: "hola", to_checkpoint=str)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+"""Module for testing the validation of word lists ahead of video creation"""
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from python.word_list_validation import WordListValidator, validated_word_list_path
+from python.word_pool import WordPool
+
+
+class TestWordListValidator(unittest.TestCase):
+    """Class for testing building and incrementally updating a validated word list"""
+
+    def setUp(self):
+        """Write a word list to a temporary directory and mock enchant to reject 'banana'"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.word_list_path = os.path.join(self.temp_dir, "word_list.txt")
+        with open(self.word_list_path, "w", encoding="utf-8") as file:
+            file.write("apple\nbanana\n\norange\napple")
+        self.mock_enchant = patch("python.word_list_validation.LanguageVerification.check_many").start()
+        self.mock_enchant.side_effect = lambda words: [word != "banana" for word in words]
+
+    def tearDown(self):
+        """Stop the mocks and remove the temporary directory"""
+        patch.stopall()
+        shutil.rmtree(self.temp_dir)
+
+    def read_validated(self):
+        """Read the words in the validated word list"""
+        with open(validated_word_list_path(self.word_list_path, "es"), "r", encoding="utf-8") as file:
+            return file.read().split()
+
+    def test_validate(self):
+        """Test that only valid words are written to the validated list, and the manifest records every result"""
+        validator = WordListValidator(self.word_list_path, "es")
+        stats = validator.validate()
+
+        self.assertEqual(stats, {"total": 3, "valid": 2, "checked": 3, "reused": 0})
+        self.assertEqual(self.read_validated(), ["apple", "orange"])
+        self.assertEqual(validator.load_manifest()["results"], {"apple": True, "banana": False, "orange": True})
+        self.assertTrue(validator.manifest_path.endswith("word_list.es.validated.json"))
+
+    def test_validate_unchanged(self):
+        """Test that validating an unchanged word list doesn't check any words"""
+        WordListValidator(self.word_list_path, "es").validate()
+        self.mock_enchant.reset_mock()
+
+        stats = WordListValidator(self.word_list_path, "es").validate()
+        self.assertEqual(stats["checked"], 0)
+        self.mock_enchant.assert_not_called()
+
+    def test_validate_changed(self):
+        """Test that only new words are checked when the word list changes, and used words are not re-added"""
+        WordListValidator(self.word_list_path, "es").validate()
+        WordPool(validated_word_list_path(self.word_list_path, "es")).consume("apple")
+        with open(self.word_list_path, "a", encoding="utf-8") as file:
+            file.write("\npear")
+        self.mock_enchant.reset_mock()
+
+        stats = WordListValidator(self.word_list_path, "es").validate()
+        self.assertEqual(stats, {"total": 4, "valid": 2, "checked": 1, "reused": 3})
+        self.mock_enchant.assert_called_once_with(["pear"])
+        self.assertEqual(self.read_validated(), ["orange", "pear"])
+
+    def test_validate_changed_twice(self):
+        """Test that words used from an earlier version of the validated list are not re-added by later validations"""
+        WordListValidator(self.word_list_path, "es").validate()
+        WordPool(validated_word_list_path(self.word_list_path, "es")).consume("apple")
+        with open(self.word_list_path, "a", encoding="utf-8") as file:
+            file.write("\npear")
+        WordListValidator(self.word_list_path, "es").validate()
+        WordPool(validated_word_list_path(self.word_list_path, "es")).consume("pear")
+        with open(self.word_list_path, "a", encoding="utf-8") as file:
+            file.write("\nlemon")
+
+        validator = WordListValidator(self.word_list_path, "es")
+        stats = validator.validate()
+        self.assertEqual(stats, {"total": 5, "valid": 2, "checked": 1, "reused": 4})
+        self.assertEqual(self.read_validated(), ["orange", "lemon"])
+        self.assertEqual(validator.load_manifest()["used"], ["apple", "pear"])
+
+
+if __name__ == "__main__":
+    unittest.main()
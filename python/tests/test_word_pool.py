@@ -0,0 +1,116 @@
+"""Module for testing the word pool used to draw words from the word list"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from python.word_pool import WordPool
+
+
+class TestWordPool(unittest.TestCase):
+    """Class for testing drawing and consuming words from a WordPool stored on the local file system"""
+
+    def setUp(self):
+        """Copy the test word list to a temporary directory so the index files are written there"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.word_list_path = os.path.join(self.temp_dir, "word_list.txt")
+        shutil.copy(os.path.join(os.path.dirname(__file__), "test_word_list.txt"), self.word_list_path)
+
+    def tearDown(self):
+        """Remove the temporary directory"""
+        shutil.rmtree(self.temp_dir)
+
+    def test_draw(self):
+        """Test that a drawn word comes from the word list"""
+        pool = WordPool(self.word_list_path)
+        self.assertIn(pool.draw(), ["apple", "banana", "orange"])
+        self.assertEqual(pool.available_count(), 3)
+
+    def test_consume_persists(self):
+        """Test that consumed words are not drawn again, including by a new pool for the same list"""
+        pool = WordPool(self.word_list_path)
+        first = pool.draw()
+        pool.consume(first)
+        second = pool.draw()
+        pool.consume(second)
+
+        new_pool = WordPool(self.word_list_path)
+        self.assertEqual(new_pool.available_count(), 1)
+        self.assertNotIn(new_pool.draw(), [first, second])
+
+        with open(self.word_list_path, "r", encoding="utf-8") as file:
+            self.assertEqual(file.read().split(), ["apple", "banana", "orange"])
+
+    def test_consume_word_not_drawn(self):
+        """Test consuming a word which wasn't drawn from the pool, and a word which isn't in the list"""
+        pool = WordPool(self.word_list_path)
+        pool.consume("banana")
+        self.assertEqual(pool.available_count(), 2)
+        with self.assertRaises(KeyError):
+            pool.consume("grape")
+
+    def test_exhausted_pool(self):
+        """Test that a ValueError is raised once every word has been consumed, and that reset restores the words"""
+        pool = WordPool(self.word_list_path)
+        for _ in range(3):
+            pool.consume(pool.draw())
+        with self.assertRaises(ValueError):
+            pool.draw()
+        pool.reset()
+        self.assertEqual(pool.available_count(), 3)
+
+    def test_changed_word_list(self):
+        """Test that the index is rebuilt when the word list changes, keeping the words already used"""
+        pool = WordPool(self.word_list_path)
+        pool.consume("apple")
+        with open(self.word_list_path, "a", encoding="utf-8") as file:
+            file.write("\n\ngrape\n")
+
+        new_pool = WordPool(self.word_list_path)
+        self.assertEqual(new_pool.line_count, 5)
+        self.assertEqual(new_pool.available_count(), 3)
+        self.assertEqual(new_pool.consumed_words(), ["apple"])
+
+        # Words used from the old list stay used when they move to another line
+        with open(self.word_list_path, "w", encoding="utf-8") as file:
+            file.write("grape\norange\napple\n")
+        moved_pool = WordPool(self.word_list_path)
+        self.assertEqual(moved_pool.available_count(), 2)
+        self.assertEqual({moved_pool.draw() for _ in range(20)}, {"grape", "orange"})
+
+        # And when they're removed from the list and added back later
+        with open(self.word_list_path, "w", encoding="utf-8") as file:
+            file.write("grape\norange\n")
+        self.assertEqual(WordPool(self.word_list_path).available_count(), 2)
+        with open(self.word_list_path, "w", encoding="utf-8") as file:
+            file.write("grape\napple\norange\n")
+        self.assertEqual(WordPool(self.word_list_path).consumed_words(), ["apple"])
+
+    def test_consume_writes_bitmap_only(self):
+        """Test that the consumed file doesn't grow as words are used"""
+        pool = WordPool(self.word_list_path)
+        pool.consume(pool.draw())
+        size = os.path.getsize(self.word_list_path + ".consumed")
+        for _ in range(2):
+            pool.consume(pool.draw())
+        self.assertEqual(os.path.getsize(self.word_list_path + ".consumed"), size)
+
+    def test_blank_lines_never_drawn(self):
+        """Test that blank lines stay marked after a reset and when the consumed bitmap is missing"""
+        with open(self.word_list_path, "w", encoding="utf-8") as file:
+            file.write("\n\napple\n  \n")
+        pool = WordPool(self.word_list_path)
+        pool.consume(pool.draw())
+        pool.reset()
+        self.assertEqual(pool.available_count(), 1)
+        self.assertEqual({pool.draw() for _ in range(20)}, {"apple"})
+
+        os.remove(self.word_list_path + ".consumed")
+        new_pool = WordPool(self.word_list_path)
+        self.assertEqual(new_pool.available_count(), 1)
+        self.assertEqual({new_pool.draw() for _ in range(20)}, {"apple"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,207 @@
+"""Module for testing the resumable, adaptive uploads to YouTube"""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+import httplib2
+from googleapiclient.http import HttpRequest
+
+from python.constants import UploadSettings
+from python.youtube_upload import AdaptiveMediaFileUpload, ChunkSizer, ResumableUpload
+
+KB = 1024
+ALIGNMENT = UploadSettings.CHUNK_ALIGNMENT
+
+
+class FakeUploadServer:
+    """Serves the resumable upload protocol, optionally failing chosen chunk requests"""
+    start_uri = "https://upload.example.com/videos"
+    session_uri = "https://upload.example.com/session"
+
+    def __init__(self, fail_chunks=(), expire_session=False, drop_connection=False):
+        """
+        :param fail_chunks: The numbers of the chunk requests, counting from 0, to answer with a 503
+        :param expire_session: If True status queries are answered as if the session had expired
+        :param drop_connection: If True the failed chunks drop the connection after half the chunk is received, rather
+        than being answered with a 503
+        """
+        self.received = b""
+        self.chunk_requests = 0
+        self.status_queries = 0
+        self.drop_connection = drop_connection
+        self.sessions_started = 0
+        self.fail_chunks = set(fail_chunks)
+        self.expire_session = expire_session
+        self.chunk_sizes = []
+
+    def request(self, uri, method="GET", body=None, headers=None, **kwargs):
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        if uri.startswith(self.start_uri):
+            self.sessions_started += 1
+            self.received = b""
+            return httplib2.Response({"status": 200, "location": self.session_uri}), b""
+
+        content_range = headers["content-range"].removeprefix("bytes ")
+        byte_range, total = content_range.split("/")
+        if byte_range == "*":
+            self.status_queries += 1
+            if self.expire_session:
+                return httplib2.Response({"status": 404}), b""
+            return self._progress(int(total))
+
+        chunk_number = self.chunk_requests
+        self.chunk_requests += 1
+        start = int(byte_range.split("-")[0])
+        data = body.read() if hasattr(body, "read") else body
+        if chunk_number in self.fail_chunks:
+            if self.drop_connection:
+                self.received = self.received[:start] + data[:len(data) // 2]
+                raise ConnectionResetError("Connection reset by peer")
+            return httplib2.Response({"status": 503}), b"{}"
+        self.chunk_sizes.append(len(data))
+        self.received = self.received[:start] + data
+        return self._progress(int(total))
+
+    def _progress(self, total):
+        if len(self.received) == total:
+            return httplib2.Response({"status": 200}), json.dumps({"id": "video-id"}).encode()
+        headers = {"status": 308}
+        if self.received:
+            headers["range"] = f"bytes=0-{len(self.received) - 1}"
+        return httplib2.Response(headers), b""
+
+
+class TestResumableUpload(unittest.TestCase):
+    """Class for testing uploading a video in chunks against a fake server"""
+
+    def setUp(self):
+        """Write a video of a little over five chunks to a temporary directory"""
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, "video.mp4")
+        self.content = os.urandom(5 * ALIGNMENT + 100)
+        with open(self.path, "wb") as file:
+            file.write(self.content)
+        self.sessions = []
+
+    def upload(self, server, session=None, sizer=None, max_retries=3):
+        """Upload the video to the fake server"""
+        media = AdaptiveMediaFileUpload(self.path, mimetype="video/*", resumable=True, chunksize=ALIGNMENT)
+        request = HttpRequest(
+            server, lambda resp, content: json.loads(content), server.start_uri, method="POST", resumable=media
+        )
+        upload = ResumableUpload(
+            request,
+            media,
+            key="videos/video.mp4",
+            session=session,
+            on_session=self.sessions.append,
+            sizer=sizer or ChunkSizer(initial_size=ALIGNMENT, min_size=ALIGNMENT, max_size=ALIGNMENT),
+            max_retries=max_retries,
+            sleep=MagicMock(),
+        )
+        return upload, upload.run()
+
+    def test_upload(self):
+        """Test that the video is sent in chunks, reporting the session after each one"""
+        server = FakeUploadServer()
+        upload, response = self.upload(server)
+
+        self.assertEqual(response, {"id": "video-id"})
+        self.assertEqual(server.received, self.content)
+        self.assertEqual(server.chunk_sizes, [ALIGNMENT] * 5 + [100])
+        self.assertEqual([session["progress"] for session in self.sessions], [ALIGNMENT * i for i in range(1, 6)])
+        self.assertEqual(self.sessions[0]["uri"], server.session_uri)
+
+        metrics = upload.metrics.to_dict()
+        self.assertEqual(metrics["uploaded_bytes"], len(self.content))
+        self.assertEqual(metrics["chunks"], 6)
+        self.assertGreater(metrics["bytes_per_second"], 0)
+
+    def test_retry_failed_chunk(self):
+        """Test that a failed chunk is retried from the bytes the server received"""
+        server = FakeUploadServer(fail_chunks=[2, 3])
+        upload, response = self.upload(server)
+
+        self.assertEqual(response, {"id": "video-id"})
+        self.assertEqual(server.received, self.content)
+        self.assertEqual(upload.metrics.retries, 2)
+        self.assertEqual(upload.metrics.chunks[2].attempts, 3)
+
+    def test_retry_partly_received_chunk(self):
+        """Test that the server is asked for the bytes it has after a chunk fails, and the upload continues from them"""
+        server = FakeUploadServer(fail_chunks=[2], drop_connection=True)
+        query_session = ResumableUpload._query_session
+        with patch.object(ResumableUpload, "_query_session", autospec=True, side_effect=query_session) as query:
+            upload, response = self.upload(server)
+
+        self.assertEqual(response, {"id": "video-id"})
+        self.assertEqual(server.received, self.content)
+        query.assert_called_once()
+        self.assertGreaterEqual(server.status_queries, 1)
+        # The half of the chunk the server received isn't sent again
+        self.assertEqual(sum(server.chunk_sizes), len(self.content) - ALIGNMENT // 2)
+
+    def test_give_up_after_max_retries(self):
+        """Test that the error is raised once the retries are used up, after saving the session"""
+        server = FakeUploadServer(fail_chunks=range(1, 10))
+        with self.assertRaises(Exception):
+            self.upload(server, max_retries=2)
+        self.assertEqual(self.sessions[-1]["progress"], ALIGNMENT)
+
+    def test_resume_session(self):
+        """Test that a saved session continues from the bytes the server received, without starting a new one"""
+        server = FakeUploadServer(fail_chunks=range(2, 10))
+        with self.assertRaises(Exception):
+            self.upload(server, max_retries=0)
+        server.fail_chunks = set()
+
+        upload, response = self.upload(server, session=self.sessions[-1])
+        self.assertEqual(response, {"id": "video-id"})
+        self.assertEqual(server.received, self.content)
+        self.assertEqual(server.sessions_started, 1)
+        self.assertEqual(upload.metrics.resumed_from, 2 * ALIGNMENT)
+        self.assertEqual(upload.metrics.uploaded_bytes, len(self.content) - 2 * ALIGNMENT)
+
+    def test_restart_expired_session(self):
+        """Test that the upload starts again if the saved session has expired or is for another file"""
+        server = FakeUploadServer(expire_session=True)
+        session = {"uri": server.session_uri, "progress": ALIGNMENT, "key": "videos/video.mp4",
+                   "size": len(self.content)}
+        upload, _ = self.upload(server, session=session)
+        self.assertEqual(upload.metrics.restarts, 1)
+        self.assertEqual(server.received, self.content)
+
+        server = FakeUploadServer()
+        self.upload(server, session={**session, "key": "videos/other.mp4"})
+        self.assertEqual(server.sessions_started, 1)
+        self.assertEqual(server.received, self.content)
+
+
+class TestChunkSizer(unittest.TestCase):
+    """Class for testing adapting the chunk size to the throughput"""
+
+    def test_adapt_to_throughput(self):
+        """Test that the chunk size follows the throughput, within the bounds and aligned"""
+        sizer = ChunkSizer(initial_size=1024 * KB, min_size=512 * KB, max_size=8192 * KB, target_seconds=1.0)
+        # 4 MiB/s at most doubles the chunk size
+        self.assertEqual(sizer.record(1024 * KB, 0.25), 2048 * KB)
+        self.assertEqual(sizer.record(2048 * KB, 0.5), 4096 * KB)
+        # A slow chunk brings the moving average of the throughput down
+        self.assertEqual(sizer.record(1024 * KB, 4.0), 2048 * KB)
+        self.assertEqual(sizer.record(10 * KB, 100.0) % ALIGNMENT, 0)
+        self.assertGreaterEqual(sizer.size, 512 * KB)
+
+    def test_shrink(self):
+        """Test that the chunk size halves after a failure, but not below the minimum"""
+        sizer = ChunkSizer(initial_size=4096 * KB, min_size=1024 * KB, max_size=8192 * KB)
+        self.assertEqual(sizer.shrink(), 2048 * KB)
+        self.assertEqual(sizer.shrink(), 1024 * KB)
+        self.assertEqual(sizer.shrink(), 1024 * KB)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""Module for testing listing the videos uploaded to a YouTube channel"""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from python.yt_uploader import YTConnector
+
+
+def playlist_item(video_id, published_at):
+    """Create an item of an uploads playlist as returned by the YouTube API"""
+    return {
+        "snippet": {
+            "title": f"Title {video_id}",
+            "description": f"Description {video_id}",
+            "publishedAt": published_at,
+            "thumbnails": {"high": {"url": f"https://i.ytimg.com/{video_id}.jpg"}},
+        },
+        "contentDetails": {"videoId": video_id, "videoPublishedAt": published_at},
+    }
+
+
+class TestListUploads(unittest.TestCase):
+    """Class for testing walking the uploads playlist of a channel"""
+
+    def setUp(self):
+        """Create a YTConnector with a mock client serving three pages of uploads, newest first"""
+        patch.object(YTConnector, "get_yt_credentials").start()
+        patch.object(YTConnector, "build_yt_client", return_value=MagicMock()).start()
+        self.addCleanup(patch.stopall)
+        self.yt = YTConnector(credentials_env=False, credentials_path="token.json")
+
+        client = self.yt.youtube_client
+        client.channels().list().execute.return_value = {
+            "items": [{"contentDetails": {"relatedPlaylists": {"uploads": "UU-uploads"}}}]
+        }
+        deleted_video = {"snippet": {"title": "Deleted video", "publishedAt": "2024-11-03T08:00:00Z"},
+                         "contentDetails": {"videoId": "deleted"}}
+        self.pages = {
+            None: {"items": [playlist_item("e", "2024-11-05T09:00:00Z"), playlist_item("d", "2024-11-04T09:00:00Z")],
+                   "nextPageToken": "page-2"},
+            "page-2": {"items": [deleted_video, playlist_item("c", "2024-11-03T09:00:00Z"),
+                                 playlist_item("b", "2024-11-02T09:00:00Z")],
+                       "nextPageToken": "page-3"},
+            "page-3": {"items": [playlist_item("a", "2024-11-01T09:00:00Z")]},
+        }
+        client.playlistItems().list.side_effect = self.list_playlist_items
+
+    def list_playlist_items(self, part, playlistId, maxResults, pageToken):
+        """Return a request for a page of the uploads playlist"""
+        self.assertEqual(playlistId, "UU-uploads")
+        request = MagicMock()
+        request.execute.return_value = self.pages[pageToken]
+        return request
+
+    def test_list_all_uploads(self):
+        """Test that every page is fetched, skipping deleted videos"""
+        videos = self.yt.list_youtube_uploads(channel_id="channel")
+        self.assertEqual(list(videos), ["e", "d", "c", "b", "a"])
+        self.assertEqual(videos["c"]["published_at"], "2024-11-03T09:00:00Z")
+        self.assertEqual(videos["c"]["thumbnail_url"], "https://i.ytimg.com/c.jpg")
+        self.assertEqual(list(self.yt.list_youtube_uploads(channel_id="channel", max_results=3)), ["e", "d", "c"])
+
+    def test_incremental_sync(self):
+        """Test that only videos published after the high-water mark are fetched, without requesting later pages"""
+        pages = list(self.yt.iter_youtube_uploads(channel_id="channel", published_after="2024-11-02T09:00:00Z"))
+        self.assertEqual([list(page) for page in pages], [["e", "d"], ["c"]])
+        self.assertEqual(self.yt.youtube_client.playlistItems().list.call_count, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,8 @@
 """Module containing utility functions for use across the project"""
 import os
 import tempfile
+import uuid
+from datetime import datetime
 
 
 def spanish_syllable_count(word: str) -> int:
@@ -44,6 +46,16 @@ def is_running_on_aws() -> bool:
     return os.getenv("AWS_EXECUTION_ENV") is not None
 
 
+def unique_timestamp(time_format: str) -> str:
+    """
+    Get the current UTC time as a string, with a short random suffix so that files generated at the same time (e.g. by
+    concurrent runs of the pipeline) don't overwrite each other
+    :param time_format: The strftime format to use for the timestamp
+    :return: The formatted timestamp followed by an 8 character random suffix
+    """
+    return f"{datetime.utcnow().strftime(time_format)}_{uuid.uuid4().hex[:8]}"
+
+
 def write_bytes_to_local_temp_file(bytes_object: bytes, suffix: str, delete_file: bool = False) -> str:
     """
     Write a bytes object to the local file system temporarily
@@ -58,6 +70,17 @@ def write_bytes_to_local_temp_file(bytes_object: bytes, suffix: str, delete_file
     return temp_file_path
 
 
+def create_local_temp_file(suffix: str) -> str:
+    """
+    Create an empty file on the local file system to write to, e.g. with `BucketSort.download_to`
+    :param suffix: The suffix for the file name
+    :return: The path to the file, which must be removed with `remove_temp_file`
+    """
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as temp_file:
+        temp_file_path = temp_file.name
+    return temp_file_path
+
+
 def remove_temp_file(temp_file_path: str) -> bool:
     """
     Remove a temporary file from the local file system
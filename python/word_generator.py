@@ -1,8 +1,8 @@
 """Module containing the functionality for generating sentences, audio and video for language learning resources"""
+from __future__ import annotations
 
-import random
-from datetime import datetime, timedelta
-from typing import List, Optional, Tuple, Dict, Sequence
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, Callable, List, Optional, Tuple, Dict, Sequence, TypeVar
 from pathlib import Path
 from io import BytesIO
 import os
@@ -11,26 +11,68 @@ import subprocess
 import tempfile
 import time
 
-import requests
-import numpy as np
-from gtts import gTTS
-from soundfile import SoundFile
-from openai import OpenAI
-from openai.types.chat.chat_completion import ChatCompletion
-from deep_translator import GoogleTranslator
-from moviepy.editor import ColorClip, TextClip, CompositeVideoClip, AudioFileClip, ImageClip, concatenate_videoclips
-from moviepy.video.tools.subtitles import SubtitlesClip
-from PIL import Image
-
-from python.constants import Prompts, URLs, ModelTypes, VideoSettings, Paths, TWO_LETTER_MAP, BUCKET_NAME
+import asyncio
+import contextlib
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from python.constants import (
+    Prompts, URLs, ModelTypes, VideoSettings, ImageSettings, RenderSettings, Paths, TWO_LETTER_MAP, BUCKET_NAME
+)
 from python.language_verification import LanguageVerification
+from python.lazy_imports import lazy_import
+from python.artifact_cache import ArtifactCache, cache_key, through_cache
+from python.artifact_store import ArtifactStore
+from python.effects import EffectTracks, effect_tracks
+from python.encoding import EncodingProfile, get_encoding_profile
+from python.ffmpeg_renderer import media_duration, render_with_ffmpeg
+from python.overlays import OverlayLayer, LayerCompositor, rasterize_text
 from python.s3_organiser import BucketSort
+from python.word_pool import WordPool
 from python import utils
 from python import custom_logging
 import base_config
 
 
-Image.ANTIALIAS = Image.Resampling.LANCZOS  # type: ignore[attr-defined]
+def _patch_pillow() -> None:
+    """MoviePy still uses `Image.ANTIALIAS`, which was removed in Pillow 10"""
+    from PIL import Image
+    Image.ANTIALIAS = Image.Resampling.LANCZOS  # type: ignore[attr-defined]
+
+
+# The dependencies below take most of the import time of the package, so they are imported on first use
+if TYPE_CHECKING:
+    import httpx
+    import numpy as np
+    import openai
+    import requests
+    from deep_translator import GoogleTranslator
+    from gtts import gTTS
+    from moviepy.audio.io.AudioFileClip import AudioFileClip
+    from moviepy.video.VideoClip import ImageClip
+    from moviepy.video.compositing.concatenate import concatenate_videoclips
+    from openai import AsyncOpenAI, OpenAI
+    from openai.types.chat.chat_completion import ChatCompletion
+    from soundfile import SoundFile
+else:
+    httpx = lazy_import("httpx")
+    np = lazy_import("numpy")
+    openai = lazy_import("openai")
+    requests = lazy_import("requests")
+    GoogleTranslator = lazy_import("deep_translator", "GoogleTranslator")
+    gTTS = lazy_import("gtts", "gTTS")
+    AudioFileClip = lazy_import("moviepy.audio.io.AudioFileClip", "AudioFileClip", after_import=_patch_pillow)
+    ImageClip = lazy_import("moviepy.video.VideoClip", "ImageClip", after_import=_patch_pillow)
+    concatenate_videoclips = lazy_import(
+        "moviepy.video.compositing.concatenate", "concatenate_videoclips", after_import=_patch_pillow
+    )
+    AsyncOpenAI = lazy_import("openai", "AsyncOpenAI")
+    OpenAI = lazy_import("openai", "OpenAI")
+    SoundFile = lazy_import("soundfile", "SoundFile")
+
+logger = custom_logging.get_logger(__name__)
+
+T = TypeVar("T")
 
 
 @custom_logging.log_all_methods
@@ -39,7 +81,14 @@ class Audio:
                  word_list_path: str,
                  language_to_learn: str,
                  native_language: str,
-                 cloud_storage: bool = False
+                 cloud_storage: bool = False,
+                 prevalidated: bool = False,
+                 word: Optional[str] = None,
+                 openai_client: Optional[OpenAI] = None,
+                 generate_content: bool = True,
+                 async_openai_client: Optional[AsyncOpenAI] = None,
+                 cache: Optional[ArtifactCache] = None,
+                 artifacts: Optional[ArtifactStore] = None,
                  ):
         """
         Initialise an Audio object
@@ -47,21 +96,51 @@ class Audio:
         :param language_to_learn: The language the user is learning.
         :param native_language: The native language of the user.
         :param cloud_storage: Whether to store the generated files in S3
+        :param prevalidated: Whether the word list has already been validated (see python/word_list_validation.py),
+        in which case words drawn from it are not checked with enchant
+        :param word: Optional. The word to use, if None a random word is drawn from the word list
+        :param openai_client: Optional. An OpenAI client to reuse, if None a new client is created when first needed
+        :param generate_content: If True the sentence, translation and audio are generated on initialisation. If False
+        only the word is picked, and the caller is responsible for setting `sentence`, `translated_sentence`,
+        `audio_path` and `audio_cloud_path`, e.g. so the stages can be run concurrently
+        :param async_openai_client: Optional. An async OpenAI client to reuse for the `_async` methods
+        :param cache: Optional. A cache for the sentence, translation and audio, so they aren't generated again for
+        the same word
+        :param artifacts: Optional. The store for the files of the current run. If given in cloud mode the audio is
+        uploaded to S3 in the background, and later stages read the local copy
         """
         self.cloud_storage = cloud_storage
+        self.cache = cache
+        self.artifacts = artifacts
+        self.prevalidated = prevalidated
         self.word_list_path = word_list_path
         self.language_to_learn = language_to_learn
         self.native_language = native_language
-        self.text_file = self.read_text_file()
-        self.trial_word = self.get_random_word()
-        self.word, self.word_is_real = self.get_real_word()
-        self.sentence = self.generate_example_sentence()
-        self.translated_sentence = self.google_translate(
-            source_language=self.language_to_learn, target_language=self.native_language
-        )
+        self.word_pool = WordPool(word_list_path=self.word_list_path, cloud_storage=self.cloud_storage)
+        self._text_file: Optional[List[str]] = None
+        self._openai_client = openai_client
+        self._async_openai_client = async_openai_client
+        if word is None:
+            self.trial_word = self.get_random_word()
+            self.word, self.word_is_real = self.get_real_word()
+        else:
+            self.trial_word = word
+            self.word = word
+            self.word_is_real = (
+                self.prevalidated or LanguageVerification(self.language_to_learn).enchant_real_word(word)
+            )
         self.audio_duration: Optional[float] = None
-        self.audio_path, self.audio_cloud_path = self.text_to_speech(language=self.language_to_learn)
         self.sub_filepath = None
+        self.sentence: Optional[str] = None
+        self.translated_sentence: Optional[str] = None
+        self.audio_path: Optional[str] = None
+        self.audio_cloud_path: Optional[str] = None
+        if generate_content is True:
+            self.sentence = self.generate_example_sentence()
+            self.translated_sentence = self.google_translate(
+                source_language=self.language_to_learn, target_language=self.native_language
+            )
+            self.audio_path, self.audio_cloud_path = self.text_to_speech(language=self.language_to_learn)
 
     @property
     def word_list_path(self):
@@ -82,31 +161,52 @@ class Audio:
         else:
             self._word_list_path = f"{base_config.BASE_DIR}/{word_list_path}"
 
+    @property
+    def text_file(self) -> List[str]:
+        """
+        The full contents of the word list. Only read when accessed, words are drawn via `self.word_pool`.
+        :return: list of lines in the text file
+        """
+        if self._text_file is None:
+            self._text_file = self.read_text_file()
+        return self._text_file
+
     def text_to_speech(self, language: str, filepath: Optional[str] = None) -> Tuple[str | None, str | None]:
         """
         Generate an audio file and save it to S3 or a local file path based on the state of `self.cloud_storage`
         :param language: The language that the audio should be generated in
         :param filepath: Optional, the filepath to save the resulting .mp3 file to
         """
-        dt = datetime.utcnow().strftime("%m-%d-%Y %H:%M:%S")
-        if filepath is None and self.cloud_storage is False:
-            filepath = f"{base_config.BASE_DIR}/{Paths.AUDIO_DIR_PATH}/{dt}.wav"
-        elif filepath is None and self.cloud_storage is True:
-            filepath = f"/tmp/{dt}.wav"
+        dt = utils.unique_timestamp("%m-%d-%Y %H:%M:%S")
+        if filepath is None:
+            if self.cloud_storage is False:
+                filepath = f"{base_config.BASE_DIR}/{Paths.AUDIO_DIR_PATH}/{dt}.wav"
+            else:
+                filepath = f"/tmp/{dt}.wav"
         tts = gTTS(self.sentence, lang=language)
 
-        if self.cloud_storage:
+        def create() -> bytes:
             audio_buffer = BytesIO()
             tts.write_to_fp(audio_buffer)
-            audio_buffer.seek(0)
+            return audio_buffer.getvalue()
+
+        audio_bytes = through_cache(self.cache, cache_key("speech", "gtts", self.sentence, language), create)
 
+        if self.cloud_storage and self.artifacts is not None:
+            s3_key = f"{Paths.AUDIO_DIR_PATH}/{dt}.wav"
+            with open(filepath, "wb") as file:
+                file.write(audio_bytes)
+            return filepath, self.artifacts.put_file(filepath, s3_key)
+
+        if self.cloud_storage:
             s3_key = f"{Paths.AUDIO_DIR_PATH}/{dt}.wav"
             s3_bucket = BucketSort(bucket=BUCKET_NAME)
-            s3_path = s3_bucket.push_object_to_s3(audio_buffer.read(), s3_key)
+            s3_path = s3_bucket.push_object_to_s3(audio_bytes, s3_key)
         else:
             s3_path = None
 
-        tts.save(filepath)
+        with open(filepath, "wb") as file:
+            file.write(audio_bytes)
         return filepath, s3_path
 
     def get_audio_duration(self) -> float:
@@ -125,6 +225,8 @@ class Audio:
         Get the total number of syllables in a Spanish sentence
         :returns: The number of syllables in `self.sentence`
         """
+        if self.sentence is None:
+            raise TypeError("sentence must be a string")
         sentence_count = 0
         for word in self.sentence:
             word_count = utils.spanish_syllable_count(word)
@@ -137,6 +239,8 @@ class Audio:
         :param total_syllable_count: The total number of syllables in the audio
         :returns: The path to the generated .srt file. An S3Key if self.cloud_storage is True, else a local file path
         """
+        if self.sentence is None:
+            raise TypeError("sentence must be a string")
         if self.audio_duration is None:
             self.audio_duration = self.get_audio_duration()
         syllables_per_second = self.audio_duration / total_syllable_count
@@ -191,7 +295,7 @@ class Audio:
         :param sentence: The text to match to the audio file
         :return: The output_file_path that the .srt file was written to if successfully generated, else None
         """
-        dt = datetime.utcnow().strftime("%m-%d-%Y %H:%M:%S")
+        dt = utils.unique_timestamp("%m-%d-%Y %H:%M:%S")
         if self.cloud_storage is False:
             output_file_path = f"{base_config.BASE_DIR}/{Paths.SUBTITLE_DIR_PATH}/{dt}.srt"
         else:
@@ -237,34 +341,25 @@ class Audio:
 
     def remove_word_from_file(self, file_path: str, word_to_remove: str) -> None:
         """
-        Remove a given word from a text file
+        Remove a given word from the pool of words that can be drawn from a text file. The text file itself is left
+        unchanged, the word is marked as used in the pool's index instead.
         :param file_path: Path to the file
         :param word_to_remove: The word to remove from the file
         """
-        if self.cloud_storage is True:
-            s3_bucket = BucketSort(bucket=BUCKET_NAME)
-            file_content = s3_bucket.get_object_from_s3(file_path)
-            lines = file_content.decode("utf-8").splitlines()
-            updated_lines = [line.strip() for line in lines if line.strip() != word_to_remove]
-
-            s3_bucket.push_object_to_s3("\n".join(updated_lines).encode("utf-8"), file_path)
+        if file_path == self.word_list_path:
+            word_pool = self.word_pool
         else:
-            with open(file_path, "r", encoding="utf-8") as file:
-                lines = file.readlines()
-
-            updated_lines = [line.strip() for line in lines if line.strip() != word_to_remove]
-
-            with open(file_path, "w", encoding="utf-8") as file:
-                file.write("\n".join(updated_lines))
+            word_pool = WordPool(word_list_path=file_path, cloud_storage=self.cloud_storage)
+        word_pool.consume(word_to_remove)
 
     def get_random_word(self) -> str:
         """
-        Choose a random word from the text file
+        Choose a random unused word from the text file
         :return: a single word from the file
         """
-        if len(self.text_file) == 0:
+        if self.word_pool.available_count() == 0:
             raise ValueError("The text file is empty or does not exist. No content could be read from file")
-        return random.choice(self.text_file)
+        return self.word_pool.draw()
 
     def test_real_word(self, word: Optional[str] = None) -> bool:
         """
@@ -291,9 +386,15 @@ class Audio:
         """
         Generate a random word from the text file and recursively test its existence in the dictionary.
         Continues to select random words until a genuine word (i.e., found in the dictionary) is obtained.
+        If the word list has been prevalidated the first word drawn is used without testing it.
 
         :return: A tuple containing the generated word and a boolean indicating whether it is genuine.
         """
+        if self.prevalidated is True:
+            word = self.get_random_word()
+            self.remove_word_from_file(file_path=self.word_list_path, word_to_remove=word)
+            return word, True
+
         word = ""
         real_word = False
 
@@ -319,31 +420,55 @@ class Audio:
                 result["short"].append(shortdef)
         return result
 
+    def get_openai_client(self) -> OpenAI:
+        """
+        Get the OpenAI client, creating it on first use if one wasn't provided
+        :return: The OpenAI client
+        """
+        if self._openai_client is None:
+            self._openai_client = OpenAI(api_key=os.getenv("openai_key"))
+        return self._openai_client
+
+    def get_async_openai_client(self) -> AsyncOpenAI:
+        """
+        Get the async OpenAI client, creating it on first use if one wasn't provided
+        :return: The async OpenAI client
+        """
+        if self._async_openai_client is None:
+            self._async_openai_client = AsyncOpenAI(api_key=os.getenv("openai_key"))
+        return self._async_openai_client
+
     def generate_example_sentence(self) -> str:
         """
         Generate an example sentence demonstrating the context of a given word
         :returns: The sentence generated by the specified LLM
         """
-        client = OpenAI(api_key=os.getenv("openai_key"))
-        completion = client.chat.completions.create(
-            model=ModelTypes.GPT_MODEL,
-            messages=[
-                {
-                    "role": "user",
-                    "content": Prompts.SENTENCE_GENERATOR.format(word=self.word),
-                }
-            ],
-        )
+        prompt = Prompts.SENTENCE_GENERATOR.format(word=self.word)
+
+        def create() -> bytes:
+            client = self.get_openai_client()
+            completion = client.chat.completions.create(
+                model=ModelTypes.GPT_MODEL,
+                messages=[
+                    {
+                        "role": "user",
+                        "content": prompt,
+                    }
+                ],
+            )
+            return completion.choices[0].message.content.encode("utf-8")  # type: ignore[union-attr]
 
-        sentence = completion.choices[0].message.content
-        return sentence  # type: ignore
+        key = cache_key("sentence", ModelTypes.GPT_MODEL, prompt, self.language_to_learn)
+        return through_cache(self.cache, key, create).decode("utf-8")
 
     def translate_example_sentence_gpt(self) -> ChatCompletion:
         """
         Generate an example sentence demonstrating the context of a given word
         :returns ChatCompletion object
         """
-        client = OpenAI(api_key=os.getenv("openai_key"))
+        if self.sentence is None:
+            raise TypeError("sentence must be a string")
+        client = self.get_openai_client()
         completion = client.chat.completions.create(
             model="gpt-3.5-turbo",
             messages=[
@@ -367,9 +492,54 @@ class Audio:
         """
         if source_language is None:
             source_language = "auto"
-        translator = GoogleTranslator(source=source_language, target=target_language)
-        translated_sentence = translator.translate(self.sentence)
-        return translated_sentence
+
+        def create() -> bytes:
+            translator = GoogleTranslator(source=source_language, target=target_language)
+            return translator.translate(self.sentence).encode("utf-8")
+
+        key = cache_key("translation", "google", self.sentence, target_language, {"source_language": source_language})
+        return through_cache(self.cache, key, create).decode("utf-8")
+
+    async def generate_example_sentence_async(self) -> str:
+        """
+        Async version of `generate_example_sentence`, using the async OpenAI client
+        :returns: The sentence generated by the specified LLM
+        """
+        prompt = Prompts.SENTENCE_GENERATOR.format(word=self.word)
+        key = cache_key("sentence", ModelTypes.GPT_MODEL, prompt, self.language_to_learn)
+        if self.cache is not None:
+            cached = await asyncio.to_thread(self.cache.get, key)
+            if cached is not None:
+                return cached.decode("utf-8")
+
+        client = self.get_async_openai_client()
+        completion = await client.chat.completions.create(
+            model=ModelTypes.GPT_MODEL,
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt,
+                }
+            ],
+        )
+
+        sentence = completion.choices[0].message.content
+        if self.cache is not None and sentence is not None:
+            await asyncio.to_thread(self.cache.put, key, sentence.encode("utf-8"))
+        return sentence  # type: ignore
+
+    async def google_translate_async(
+        self, target_language: str, source_language: Optional[str] = None
+    ) -> str:
+        """
+        Async version of `google_translate`. deep_translator only provides a blocking client, so the translation is run
+        in a worker thread to keep the event loop free
+        :param target_language: The language you want to translate to
+        :param source_language: The current language of the sentence, if None the translator will attempt to guess the
+        source language
+        :returns: The sentence translated to the target language
+        """
+        return await asyncio.to_thread(self.google_translate, target_language, source_language)
 
 
 @custom_logging.log_all_methods
@@ -381,87 +551,253 @@ class ImageGenerator:
             self,
             prompts: str | list,
             cloud_storage: Optional[bool] = False,
+            openai_client: Optional[OpenAI] = None,
+            async_openai_client: Optional[AsyncOpenAI] = None,
+            max_in_flight: int = ImageSettings.MAX_IN_FLIGHT,
+            cache: Optional[ArtifactCache] = None,
+            artifacts: Optional[ArtifactStore] = None,
     ):
         """
         Initialise an object of the ImageGenerator class
         :param prompts: The prompts to use to create the image
         :param cloud_storage: Optional. Whether to store the image locally or remotely. Defaults to False
-        """
+        :param openai_client: Optional. An OpenAI client to reuse, if None a new client is created when first needed
+        :param async_openai_client: Optional. An async OpenAI client to reuse for the `_async` methods
+        :param max_in_flight: The max number of images to generate and download at once when given a list of prompts
+        :param cache: Optional. A cache for the generated images, so an image isn't generated again for the same prompt.
+        Must use the same storage as the images, see `ArtifactCache`
+        :param artifacts: Optional. The store for the files of the current run. If given in cloud mode each image is
+        downloaded to a local copy and uploaded to S3 in the background, and later stages read the local copy
+        """
+        if max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
         self.prompts = prompts
-        self.image_urls = self.image_generator()
+        self._openai_client = openai_client
+        self._async_openai_client = async_openai_client
+        self.max_in_flight = max_in_flight
         self.cloud_storage = cloud_storage
-        if self.cloud_storage is False:
-            self.image_paths = self.save_image()
-        else:
-            self.image_paths = self.save_image_to_s3()
+        self.cache = cache
+        self.artifacts = artifacts
+        self.image_urls, self.image_paths = self.generate_and_save_images()
+
+    def get_openai_client(self) -> OpenAI:
+        """
+        Get the OpenAI client, creating it on first use if one wasn't provided
+        :return: The OpenAI client
+        """
+        if self._openai_client is None:
+            self._openai_client = OpenAI(api_key=os.getenv("openai_key"))
+        return self._openai_client
+
+    def get_async_openai_client(self) -> AsyncOpenAI:
+        """
+        Get the async OpenAI client, creating it on first use if one wasn't provided
+        :return: The async OpenAI client
+        """
+        if self._async_openai_client is None:
+            self._async_openai_client = AsyncOpenAI(api_key=os.getenv("openai_key"))
+        return self._async_openai_client
 
     def call_dalle(self, sentence: str):
         """
         Make a call to DALL-E API
         :param sentence: The prompt for the API to base the image on
         """
-        client = OpenAI(api_key=os.getenv("openai_key"))
-        response = client.images.generate(
-            model=ModelTypes.DALLE_MODEL,
-            prompt=sentence,
-            size=VideoSettings.VERTICAL,
-            quality="standard",
-            n=1,
-        )
+        client = self.get_openai_client()
+        for attempt in range(ImageSettings.RATE_LIMIT_RETRIES + 1):
+            try:
+                response = client.images.generate(
+                    model=ModelTypes.DALLE_MODEL,
+                    prompt=sentence,
+                    size=VideoSettings.VERTICAL,
+                    quality="standard",
+                    n=1,
+                )
+                break
+            except openai.RateLimitError:
+                if attempt == ImageSettings.RATE_LIMIT_RETRIES:
+                    raise
+                delay = ImageSettings.RATE_LIMIT_BACKOFF_SECONDS * (2 ** attempt + random.random())
+                logger.warning(f"DALL-E rate limit hit, retrying in {delay:.1f}s")
+                time.sleep(delay)
         image_url = response.data[0].url
 
         return image_url
 
-    def image_generator(self) -> list:
+    def get_prompt_list(self) -> List[str]:
         """
-        Make calls to the DALL-E API
-        :returns: List of URLs for the generated images
+        Get the prompts as a list
+        :returns: The list of prompts
         """
         if isinstance(self.prompts, str):
-            image = self.call_dalle(self.prompts)
-            return [image]
+            return [self.prompts]
         elif isinstance(self.prompts, list):
-            images = [self.call_dalle(prompt) for prompt in self.prompts]
-            return images
+            return self.prompts
         else:
             raise TypeError(f"prompts argument must be either string or list, got type {type(self.prompts)}")
 
+    def generate_and_save_images(self) -> Tuple[List[Optional[str]], List[str]]:
+        """
+        Generate an image for each prompt and save it locally or to S3, based on `self.cloud_storage`. Up to
+        `self.max_in_flight` prompts are processed at once, and each image is downloaded as soon as it is generated.
+        Images found in `self.cache` are copied from the cache instead of being generated.
+        :returns: The URLs of the generated images (None for images from the cache) and the paths they have been saved
+        to, both in prompt order
+        """
+        s3_bucket = BucketSort(bucket=BUCKET_NAME) if self.cloud_storage is True else None
+        dt = utils.unique_timestamp("%Y-%m-%d_%H-%M-%S")
+
+        def generate_and_save(index: int, prompt: str) -> Tuple[Optional[str], str]:
+            settings = {"size": VideoSettings.VERTICAL, "quality": "standard"}
+            key = cache_key("image", ModelTypes.DALLE_MODEL, prompt, settings=settings)
+            path = self._image_path(index, dt, s3_bucket)
+            if self.cache is not None and self.cache.get_file(key, path) is True:
+                return None, path
+            url = self.call_dalle(prompt)
+            cache = self.cache
+            # The cache copies the image from where it is saved, so with an artifact store it is only added once the
+            # background upload has finished
+            self._save_image_from_url(url, index, dt, s3_bucket,
+                                      after_save=(lambda: cache.put_file(key, path)) if cache is not None else None)
+            return url, path
+
+        results = self._map_in_flight(generate_and_save, list(enumerate(self.get_prompt_list())))
+        return [url for url, _ in results], [path for _, path in results]
+
+    def image_generator(self) -> list:
+        """
+        Make calls to the DALL-E API, up to `self.max_in_flight` at once
+        :returns: List of URLs for the generated images, in prompt order
+        """
+        return self._map_in_flight(lambda index, prompt: self.call_dalle(prompt),
+                                   list(enumerate(self.get_prompt_list())))
+
     def save_image(self):
         """
         Save images to local directory
         :returns: list of paths to which the images have been saved
         """
-        filepaths = []
-        for url in self.image_urls:
-            dt = datetime.utcnow().strftime("%m-%d-%Y %H:%M:%S")
-            output_file_path = f"{base_config.BASE_DIR}/{Paths.IMAGE_DIR_PATH}/{dt}.jpg"
-            img_data = requests.get(url).content
-            with open(output_file_path, "wb") as handler:
-                handler.write(img_data)
-            filepaths.append(output_file_path)
-        return filepaths
+        dt = utils.unique_timestamp("%m-%d-%Y %H:%M:%S")
+        return self._map_in_flight(lambda index, url: self._save_image_from_url(url, index, dt, None),
+                                   [(index, url) for index, url in enumerate(self.image_urls) if url is not None])
 
     def save_image_to_s3(self):
         """
         Save images to S3
         :returns: list of S3 paths to which the images have been saved
         """
-        s3_paths = []
         s3_bucket = BucketSort(bucket=BUCKET_NAME)
+        dt = utils.unique_timestamp("%Y-%m-%d_%H-%M-%S")
+        return self._map_in_flight(lambda index, url: self._save_image_from_url(url, index, dt, s3_bucket),
+                                   [(index, url) for index, url in enumerate(self.image_urls) if url is not None])
 
-        count = 0
-        for url in self.image_urls:
-            dt = datetime.utcnow().strftime("%Y-%m-%d_%H-%M-%S")
-            s3_key = f"{Paths.IMAGE_DIR_PATH}/{dt}_{count}.jpg"
-
-            response = requests.get(url, stream=True)
+    def _save_image_from_url(
+            self,
+            url: str,
+            index: int,
+            dt: str,
+            s3_bucket: Optional[BucketSort],
+            after_save: Optional[Callable[[], None]] = None,
+    ) -> str:
+        """
+        Stream an image from a URL to S3, or to the local images directory if no bucket is given, without holding the
+        whole image in memory. With an artifact store in cloud mode the image is streamed to a local copy instead, and
+        uploaded to S3 in the background.
+        :param url: The URL of the image
+        :param index: The position of the image in the list of images, used in the file name
+        :param dt: The timestamp to use in the file name
+        :param s3_bucket: The bucket to save the image to, or None to save it locally
+        :param after_save: Optional. Called once the image is saved to the returned path
+        :returns: The S3 key or local path the image was saved to
+        """
+        output_file_path = self._image_path(index, dt, s3_bucket)
+        local_file_path = output_file_path
+        if s3_bucket is not None and self.artifacts is not None:
+            local_file_path = self.artifacts.path_for(output_file_path)
+        with requests.get(url, stream=True) as response:
             response.raise_for_status()
+            if s3_bucket is not None and self.artifacts is None:
+                response.raw.decode_content = True
+                s3_path = s3_bucket.upload_stream(response.raw, output_file_path)
+                if after_save is not None:
+                    after_save()
+                return s3_path
+
+            with open(local_file_path, "wb") as handler:
+                for chunk in response.iter_content(chunk_size=ImageSettings.DOWNLOAD_CHUNK_SIZE):
+                    handler.write(chunk)
+
+        if s3_bucket is not None and self.artifacts is not None:
+            return self.artifacts.put_file(local_file_path, output_file_path, after_upload=after_save)
+        if after_save is not None:
+            after_save()
+        return output_file_path
+
+    @staticmethod
+    def _image_path(index: int, dt: str, s3_bucket: Optional[BucketSort]) -> str:
+        """
+        Get the path to save an image to
+        :param index: The position of the image in the list of images
+        :param dt: The timestamp to use in the file name
+        :param s3_bucket: The bucket the image is saved to, or None if it is saved locally
+        :returns: The S3 key or local path for the image
+        """
+        if s3_bucket is not None:
+            return f"{Paths.IMAGE_DIR_PATH}/{dt}_{index}.jpg"
+        return f"{base_config.BASE_DIR}/{Paths.IMAGE_DIR_PATH}/{dt}_{index}.jpg"
+
+    def _map_in_flight(self, func: Callable[..., T], items: List[Tuple[Any, ...]]) -> List[T]:
+        """
+        Call a function for each item with up to `self.max_in_flight` calls running at once
+        :param func: The function to call, with each item unpacked as its arguments
+        :param items: The arguments for each call
+        :returns: The results, in the same order as the items
+        """
+        if len(items) <= 1 or self.max_in_flight == 1:
+            return [func(*item) for item in items]
+        with ThreadPoolExecutor(max_workers=min(self.max_in_flight, len(items))) as executor:
+            return list(executor.map(lambda item: func(*item), items))
 
-            s3_path = s3_bucket.push_object_to_s3(response.content, s3_key)
-            s3_paths.append(s3_path)
-            count += 1
+    async def call_dalle_async(self, sentence: str) -> str:
+        """
+        Async version of `call_dalle`, using the async OpenAI client
+        :param sentence: The prompt for the API to base the image on
+        :returns: The URL of the generated image
+        """
+        client = self.get_async_openai_client()
+        response = await client.images.generate(
+            model=ModelTypes.DALLE_MODEL,
+            prompt=sentence,
+            size=VideoSettings.VERTICAL,
+            quality="standard",
+            n=1,
+        )
+        return response.data[0].url  # type: ignore[return-value]
 
-        return s3_paths
+    async def save_image_to_s3_async(self, http_client: Optional[httpx.AsyncClient] = None) -> List[str]:
+        """
+        Async version of `save_image_to_s3`, downloading and uploading every image concurrently
+        :param http_client: Optional. An httpx client to reuse for the downloads, if None one is created for the call
+        :returns: list of S3 paths to which the images have been saved, in the same order as `self.image_urls`. Images
+        copied from the cache have no URL and are skipped
+        """
+        s3_bucket = BucketSort(bucket=BUCKET_NAME)
+        dt = utils.unique_timestamp("%Y-%m-%d_%H-%M-%S")
+
+        async def save(client: httpx.AsyncClient, url: str, count: int) -> str:
+            response = await client.get(url)
+            response.raise_for_status()
+            return await s3_bucket.push_object_to_s3_async(response.content, f"{Paths.IMAGE_DIR_PATH}/{dt}_{count}.jpg")
+
+        client_context: contextlib.AbstractAsyncContextManager[httpx.AsyncClient]
+        if http_client is not None:
+            client_context = contextlib.nullcontext(http_client)
+        else:
+            client_context = httpx.AsyncClient()
+        async with client_context as client:
+            return list(await asyncio.gather(
+                *(save(client, url, count) for count, url in enumerate(self.image_urls) if url is not None)
+            ))
 
     def _check_valid_image_path(self):
         """
@@ -492,6 +828,8 @@ class VideoGenerator:
                  audio_filepath: str,
                  subtitles_filepath: Optional[str] = None,
                  cloud_storage: bool = False,
+                 cache: Optional[ArtifactCache] = None,
+                 artifacts: Optional[ArtifactStore] = None,
                  ):
         """
         Initialise a VideoGenerator object
@@ -503,6 +841,11 @@ class VideoGenerator:
         :param subtitles_filepath: the path to the subtitles file if subtitles have already been generated
         :param cloud_storage: if True generated videos and related content will be stored in S3, if False the content
         will be written locally
+        :param cache: Optional. A cache for rendered videos, so the same video isn't rendered twice. Must use the same
+        storage as the video, see `ArtifactCache`
+        :param artifacts: Optional. The store for the files of the current run. If given in cloud mode the audio and
+        images are read from their local copies rather than downloaded from S3, and the video is uploaded to S3 in the
+        background
         """
         self.word = word
         self.sentence = sentence
@@ -511,86 +854,8 @@ class VideoGenerator:
         self.audio_filepath = audio_filepath
         self.subtitles_filepath = subtitles_filepath
         self.cloud_storage = cloud_storage
-
-    @staticmethod
-    def create_subtitle_clip(
-            text: str,
-            font_size: int = 50,
-            colour: str = "white",
-            background_opacity: float = 0.7,
-            text_pos: Tuple[str, str] | Tuple[int, int] | Tuple[float, float] = ("center", "center"),
-            font: str = Paths.FONT_PATH,
-            padding: int = 60
-    ) -> CompositeVideoClip:
-        """
-        Create subtitles for given text with dynamic background width.
-        :param text: the text to create a TextClip for
-        :param font_size: the size of font to use for the subtitles
-        :param colour: the colour to use for the subtitles
-        :param background_opacity: the opacity of the background of the subtitles
-        :param text_pos: where to display the subtitles
-        :param font: The font for the text
-        :param padding: padding for background width around the text
-        :return: CompositeVideoClip consisting of the subtitles
-        """
-        text_clip = TextClip(text, fontsize=font_size, color=colour, font=font)
-
-        width, height = text_clip.size
-        background = ColorClip(
-            size=(width + padding * 2, height),
-            color=(0, 0, 0)
-        ).set_opacity(background_opacity)
-
-        final_clip = CompositeVideoClip([background.set_position(text_pos), text_clip.set_position(text_pos)])
-        return final_clip.set_duration(text_clip.duration)
-
-    def create_translated_subtitle_clip(
-            self,
-            translated_sentence: str,
-            audio_duration: float,
-            font_size: int = 50,
-            colour: str = "white",
-            font: str = Paths.FONT_PATH,
-            padding: int = 60,
-            text_pos: Tuple[str, str] = ("center", "top")
-    ) -> CompositeVideoClip:
-        """
-        Creates a subtitle clip for a translated sentence with dynamically resizing background.
-        :param translated_sentence: The translated sentence to display as subtitles.
-        :param audio_duration: The total duration of the audio.
-        :param font_size: The font size for the subtitles.
-        :param colour: The colour for the subtitles.
-        :param font: The font for the text.
-        :param padding: Padding for the subtitle background
-        :param text_pos: Where to place the subtitles
-        :return: A CompositeVideoClip containing the timed translated subtitles.
-        """
-        words = translated_sentence.split()
-        word_groups = [words[i:i + 3] for i in range(0, len(words), 3)]
-
-        group_count = len(word_groups)
-        display_duration = audio_duration / group_count
-
-        subtitle_clips = []
-        current_time = 0.0
-
-        for group in word_groups:
-            text = " ".join(group)
-
-            subtitle_clip = self.create_subtitle_clip(
-                text=text,
-                font_size=font_size,
-                colour=colour,
-                text_pos=text_pos,
-                font=font,
-                padding=padding
-            ).set_start(current_time).set_duration(display_duration)
-
-            subtitle_clips.append(subtitle_clip)
-            current_time += display_duration
-
-        final_subtitle_clip = CompositeVideoClip(subtitle_clips)
-        return final_subtitle_clip
+        self.cache = cache
+        self.artifacts = artifacts
 
     def create_translated_subtitles_file(
             self,
@@ -604,174 +869,203 @@ class VideoGenerator:
         :return: Path to the created subtitles file
         """
         if words is None:
-            words_list = self.translated_sentence.split()
-        else:
-            words_list = words.split()
-        word_groups = [words_list[i:i + 3] for i in range(0, len(words_list), 3)]
-
-        group_count = len(word_groups)
-        display_duration = audio_duration / group_count
+            words = self.translated_sentence
 
         temp_srt = tempfile.NamedTemporaryFile(mode='w+', delete=False, suffix='.srt')
 
-        for idx, group in enumerate(word_groups):
-            start_time = idx * display_duration
-            end_time = (idx + 1) * display_duration
-
+        for idx, (start_time, end_time, text) in enumerate(self.subtitle_groups(words, audio_duration)):
             start_str = time.strftime('%H:%M:%S,000', time.gmtime(start_time))
             end_str = time.strftime('%H:%M:%S,000', time.gmtime(end_time))
 
             temp_srt.write(f"{idx + 1}\n")
             temp_srt.write(f"{start_str} --> {end_str}\n")
-            temp_srt.write(f"{' '.join(group)}\n\n")
+            temp_srt.write(f"{text}\n\n")
 
         temp_srt.close()
         return temp_srt.name
 
     @staticmethod
-    def create_fancy_word_clip(
+    def subtitle_groups(words: str, audio_duration: float, group_size: int = 3) -> List[Tuple[float, float, str]]:
+        """
+        Split text into groups of words shown one after another, each for an equal share of the audio
+        :param words: The text to split
+        :param audio_duration: Duration of the audio clip
+        :param group_size: The number of words in each group
+        :return: The start time, end time and text of each group
+        """
+        words_list = words.split()
+        word_groups = [words_list[i:i + group_size] for i in range(0, len(words_list), group_size)]
+        if len(word_groups) == 0:
+            return []
+        display_duration = audio_duration / len(word_groups)
+        return [
+            (idx * display_duration, (idx + 1) * display_duration, " ".join(group))
+            for idx, group in enumerate(word_groups)
+        ]
+
+    def build_overlay_layers(
+            self,
+            audio_duration: float,
+            word_font: str = Paths.FONT_PATH,
+            subtitle_font: str = Paths.FONT_PATH,
+            word_style: Optional[str] = VideoSettings.WORD_STYLE,
+            fps: int = VideoSettings.FPS,
+    ) -> List[OverlayLayer]:
+        """
+        Rasterise the overlays for the video: the word badge in the middle, the sentence at the bottom and the
+        translated sentence at the top, with the subtitles timed in groups of words like
+        `create_translated_subtitles_file`
+        :param audio_duration: Duration of the audio clip, which is the duration of the video
+        :param word_font: The font for the word
+        :param subtitle_font: The font for the subtitles
+        :param word_style: Optional. The effect to animate the word with, see `create_word_layers`
+        :param fps: The frame rate of the video
+        :return: The layers, in order from bottom to top
+        """
+        layers = self.create_word_layers(self.word, audio_duration, font=word_font, style=word_style, fps=fps)
+        for sentence, position in [(self.sentence, "bottom"), (self.translated_sentence, "top")]:
+            for start, end, text in self.subtitle_groups(sentence, audio_duration):
+                image = rasterize_text(
+                    text,
+                    font_size=50,
+                    colour="white",
+                    font=subtitle_font,
+                    background_colour=(0, 0, 0),
+                    background_opacity=0.7,
+                    padding=(60, 0),
+                )
+                layers.append(OverlayLayer(image, start, end, position=("center", position)))
+        return layers
+
+    @staticmethod
+    def create_word_layers(
             word: str,
+            duration: float,
             font_size: int = 80,
             font: str = Paths.FONT_PATH,
-            duration: float = 1.0,
             stroke_colour: str = "green",
-            style: str = "bounce"
-    ) -> CompositeVideoClip:
+            style: Optional[str] = VideoSettings.WORD_STYLE,
+            fps: int = VideoSettings.FPS,
+    ) -> List[OverlayLayer]:
         """
-        Create a centered text clip for the given word
+        Create the word badge in the middle of the video and its shadow
         :param word: The word to visualise
+        :param duration: The length of time to display the word for
         :param font_size: The font size to display the word in
-        :param font: The font to display the word in, defaults to 'Courier'
-        :param duration: The length of time to display the text clip for
+        :param font: The font to display the word in
         :param stroke_colour: The outer/lining colour of the font
-        :param style: The effect to apply to the text clip
-        :return: a CompositeVideoClip with the applied effects
-        """
-
-        effects = {
-            'bounce': lambda t: ('center', 'center' + 20 * np.sin(2 * np.pi * t)),
-            'fade': lambda t: 0.7 + 0.3 * np.sin(2 * np.pi * t)
-        }
-
-        word_text = TextClip(
-            txt=word,
-            fontsize=font_size,
+        :param style: Optional. The effect to animate the word with, one of the keys of `EFFECTS`. If None the word
+        doesn't move.
+        :param fps: The frame rate of the video, to compute the animation for each frame
+        :return: The shadow and badge layers, in order from bottom to top
+        """
+        tracks = effect_tracks(style, duration, fps) if style is not None else EffectTracks()
+        shadow_offset = np.array([[0, 10]])
+        if tracks.offsets is not None:
+            shadow_offset = tracks.offsets + shadow_offset
+
+        shadow = rasterize_text(word, font_size=font_size, colour="gray", font=font)
+        badge = rasterize_text(
+            word,
+            font_size=font_size,
+            colour="white",
             font=font,
-            color='white',
-            stroke_color=stroke_colour,
+            stroke_colour=stroke_colour,
             stroke_width=5,
-            kerning=-2
+            background_colour=(128, 128, 128),      # TODO - change background to have rounded edges
+            background_opacity=0.7,
+            padding=(50, 10),
         )
+        return [
+            OverlayLayer(shadow, 0, duration, position=("center", "center"), opacity=0.3,
+                         offsets=shadow_offset, opacities=tracks.opacities),
+            OverlayLayer(badge, 0, duration, position=("center", "center"),
+                         offsets=tracks.offsets, opacities=tracks.opacities),
+        ]
 
-        background = ColorClip(                                 # TODO - change background to have rounded edges
-            size=(word_text.w + 100, word_text.h + 20),
-            color=(128, 128, 128)
-        ).set_opacity(0.7)
-
-        if style == 'bounce':
-            word_clip = CompositeVideoClip([background.set_position('center'), word_text.set_position('center')])
-            word_clip = word_clip.set_position(effects['bounce'])
-        elif style == 'fade':
-            word_clip = CompositeVideoClip([background, word_text]).set_opacity(effects['fade'])
-        else:
-            raise ValueError(f"{style} is not a recognised style. Use either 'bounce' or 'fade")
-
-        shadow = TextClip(
-            txt=word,
-            fontsize=font_size,
-            font=font,
-            color='gray',
-            stroke_width=0,
-            kerning=-2
-        ).set_position(lambda t: ('center', int(word_text.h / 2 + 10))).set_opacity(0.3)
-
-        final_clip = CompositeVideoClip([shadow, word_clip.set_position('center')]).set_duration(duration)
-
-        return final_clip
-
-    def generate_video(self, output_filepath: Optional[str] = None, word_font: str = Paths.FONT_PATH) -> str:
+    def generate_video(
+            self,
+            output_filepath: Optional[str] = None,
+            word_font: str = Paths.FONT_PATH,
+            ffmpeg_threads: Optional[int] = None,
+            backend: str = RenderSettings.BACKEND,
+            word_style: Optional[str] = VideoSettings.WORD_STYLE,
+            encoding_profile: str | EncodingProfile = RenderSettings.ENCODING_PROFILE,
+    ) -> str:
         """
         Combine audio, images, word overlay and subtitles to generate and save a video
         :param output_filepath: the absolute path to store the generated video
         :param word_font: The font for the text
+        :param ffmpeg_threads: Optional. The number of threads ffmpeg uses to encode the video, if None the encoding
+        profile's threads are used
+        :param backend: How to render the video, 'moviepy' to composite the frames in Python or 'ffmpeg' to render it
+        in one ffmpeg process, see `render_with_ffmpeg`
+        :param word_style: Optional. The effect to animate the word with, see `create_word_layers`. Animated words can
+        only be rendered by the moviepy backend.
+        :param encoding_profile: The encoding profile, or the name of one of `ENCODING_PROFILES`
         :return: the file path to where the video is written
         """
-        dt = datetime.utcnow().strftime("%m-%d-%Y %H:%M:%S")
+        if backend not in ("moviepy", "ffmpeg"):
+            raise ValueError(f"{backend} is not a recognised backend. Use either 'moviepy' or 'ffmpeg'")
+        profile = get_encoding_profile(encoding_profile)
+        if ffmpeg_threads is None:
+            ffmpeg_threads = profile.threads
+
+        dt = utils.unique_timestamp("%m-%d-%Y %H:%M:%S")
         if output_filepath is None:
             output_filepath = f"{base_config.BASE_DIR}/{Paths.VIDEO_DIR_PATH}/{dt}.mp4"
 
-        if self.cloud_storage is True:
+        destination = f"{Paths.VIDEO_DIR_PATH}/{dt}.mp4" if self.cloud_storage is True else output_filepath
+        if self.cache is not None and self.artifacts is not None:
+            # The cache key is made from the content of the inputs in S3
+            self.artifacts.wait([self.audio_filepath, *self.image_paths])
+        key = self.video_cache_key(word_font, backend, word_style, profile) if self.cache is not None else None
+        if self.cache is not None and key is not None and self.cache.get_file(key, destination) is True:
+            return destination
+
+        if self.cloud_storage is True and self.artifacts is not None:
+            audio_file = self.artifacts.local_path(self.audio_filepath)
+            image_files = [self.artifacts.local_path(image_file) for image_file in self.image_paths]
+        elif self.cloud_storage is True:
             s3_bucket = BucketSort(bucket=BUCKET_NAME)
-            audio_bytes = s3_bucket.get_object_from_s3(self.audio_filepath)
-            audio_file = utils.write_bytes_to_local_temp_file(
-                bytes_object=audio_bytes, suffix=".wav", delete_file=False
-            )
+            audio_file = utils.create_local_temp_file(suffix=".wav")
+            s3_bucket.download_to(self.audio_filepath, audio_file)
             # subtitle_bytes = s3_bucket.get_object_from_s3(self.subtitles_filepath)
             # subtitle_file = utils.write_bytes_to_local_temp_file(
             #     bytes_object=subtitle_bytes, suffix=".srt", delete_file=False
             # )
             image_files = []
             for image_file in self.image_paths:
-                image_bytes = s3_bucket.get_object_from_s3(image_file)
-                image = utils.write_bytes_to_local_temp_file(
-                    bytes_object=image_bytes, suffix=".jpg", delete_file=False
-                )
+                image = utils.create_local_temp_file(suffix=".jpg")
+                s3_bucket.download_to(image_file, image)
                 image_files.append(image)
         else:
             audio_file = self.audio_filepath
             # subtitle_file = self.subtitles_filepath
             image_files = self.image_paths
 
-        audio_clip = AudioFileClip(audio_file)
-        image_clips = [
-            ImageClip(image).set_duration(audio_clip.duration / len(image_files)) for image in image_files
-        ]
-
-        word_clip = self.create_fancy_word_clip(
-            word=self.word,
-            font_size=80,
-            font=word_font,
-            duration=audio_clip.duration,
-            style='bounce'
-        )
-
-        native_srt = self.create_translated_subtitles_file(audio_duration=audio_clip.duration, words=self.sentence)
-        subtitles = SubtitlesClip(native_srt, self.create_subtitle_clip)
-
-        translated_srt = self.create_translated_subtitles_file(audio_clip.duration)
-        translated_subtitles = SubtitlesClip(translated_srt, lambda txt: self.create_subtitle_clip(
-            txt,
-            text_pos=("center", "top")
-        ))
-
-        video_clip = concatenate_videoclips(image_clips)
-        video_clip = video_clip.set_audio(audio_clip)
-        video_clip.duration = audio_clip.duration
-
-        final_video = CompositeVideoClip([
-            video_clip,
-            word_clip.set_pos(('center', 'center')),
-            subtitles.set_pos(('center', 'bottom')),
-            translated_subtitles.set_pos(('center', 'top')),
-        ])
-
-        final_video.duration = video_clip.duration
+        render = self._render_with_ffmpeg if backend == "ffmpeg" else self._render_with_moviepy
 
         s3_path = None
+        if self.cloud_storage is True and self.artifacts is not None:
+            s3_key = f"{Paths.VIDEO_DIR_PATH}/{dt}.mp4"
+            local_video = self.artifacts.path_for(s3_key)
+            render(image_files, audio_file, local_video, word_font, ffmpeg_threads, word_style, profile,
+                   temp_audiofile=f"/tmp/{dt}_temp_audiofile.m4a")
+            cache = self.cache
+            return self.artifacts.put_file(
+                local_video, s3_key,
+                after_upload=(lambda: cache.put_file(key, s3_key)) if cache is not None and key is not None else None,
+            )
+
         if self.cloud_storage is True:
             with tempfile.NamedTemporaryFile(suffix=".mp4", dir="/tmp", delete=True) as temp_video:
-                final_video.write_videofile(
-                    temp_video.name,
-                    fps=24,
-                    codec="libx264",
-                    audio_codec="aac",
-                    temp_audiofile=f"/tmp/temp_audiofile.m4a",
-                )
-                temp_video.seek(0)
+                render(image_files, audio_file, temp_video.name, word_font, ffmpeg_threads, word_style, profile,
+                       temp_audiofile=f"/tmp/{dt}_temp_audiofile.m4a")
 
                 s3_key = f"{Paths.VIDEO_DIR_PATH}/{dt}.mp4"
                 s3_bucket = BucketSort(bucket=BUCKET_NAME)
-                s3_path = s3_bucket.push_object_to_s3(temp_video.read(), s3_key)
+                s3_path = s3_bucket.push_file_to_s3(temp_video.name, s3_key)
 
                 utils.remove_temp_file(audio_file)
                 # utils.remove_temp_file(subtitle_file)
@@ -779,25 +1073,142 @@ class VideoGenerator:
                     utils.remove_temp_file(tmp_image_to_remove)
 
         else:
-            final_video.write_videofile(
-                output_filepath,
-                fps=24,
-                codec="libx264",
-                audio_codec="aac"
-            )
+            render(image_files, audio_file, output_filepath, word_font, ffmpeg_threads, word_style, profile)
+
+        if self.cache is not None and key is not None:
+            self.cache.put_file(key, destination)
+
+        return s3_path if s3_path is not None else output_filepath
+
+    def _render_with_moviepy(
+            self,
+            image_files: List[str],
+            audio_file: str,
+            output_filepath: str,
+            word_font: str,
+            ffmpeg_threads: Optional[int],
+            word_style: Optional[str],
+            profile: EncodingProfile,
+            temp_audiofile: Optional[str] = None,
+    ) -> None:
+        """
+        Render the video with MoviePy, drawing the overlays onto each frame with a `LayerCompositor`
+        :param image_files: The local paths to the images
+        :param audio_file: The local path to the audio
+        :param output_filepath: The local path to write the video to
+        :param word_font: The font for the text
+        :param ffmpeg_threads: The number of threads ffmpeg uses to encode the video, if None ffmpeg decides
+        :param word_style: The effect to animate the word with, see `create_word_layers`
+        :param profile: The encoding profile
+        :param temp_audiofile: Optional. The path for MoviePy's temporary audio file
+        """
+        audio_clip = AudioFileClip(audio_file)
+        image_clips = [
+            ImageClip(image).set_duration(audio_clip.duration / len(image_files)) for image in image_files
+        ]
 
-        os.unlink(translated_srt)
+        video_clip = concatenate_videoclips(image_clips)
+        video_clip = video_clip.set_audio(audio_clip)
+        video_clip.duration = audio_clip.duration
+
+        compositor = LayerCompositor(
+            self.build_overlay_layers(audio_clip.duration, word_font=word_font, word_style=word_style, fps=profile.fps),
+            frame_size=tuple(video_clip.size),
+            fps=profile.fps,
+        )
+        final_video = video_clip.fl(lambda get_frame, t: compositor.composite(get_frame(t), t))
+        final_video.duration = video_clip.duration
+
+        ffmpeg_params = profile.x264_params()
+        if profile.scale != 1:
+            width, height = profile.frame_size(tuple(video_clip.size))
+            ffmpeg_params += ["-vf", f"scale={width}:{height}"]
+        final_video.write_videofile(
+            output_filepath,
+            fps=profile.fps,
+            codec="libx264",
+            audio_codec="aac",
+            audio_bitrate=profile.audio_bitrate,
+            preset=profile.preset,
+            ffmpeg_params=ffmpeg_params,
+            temp_audiofile=temp_audiofile,
+            threads=ffmpeg_threads,
+        )
 
         # Close resources
         audio_clip.close()
-        subtitles.close()
-        translated_subtitles.close()
-        word_clip.close()
         final_video.close()
         for clip in image_clips:
             clip.close()
 
-        return s3_path if s3_path is not None else output_filepath
+    def _render_with_ffmpeg(
+            self,
+            image_files: List[str],
+            audio_file: str,
+            output_filepath: str,
+            word_font: str,
+            ffmpeg_threads: Optional[int],
+            word_style: Optional[str],
+            profile: EncodingProfile,
+            temp_audiofile: Optional[str] = None,
+    ) -> None:
+        """
+        Render the video in one ffmpeg process, see `render_with_ffmpeg`
+        :param image_files: The local paths to the images
+        :param audio_file: The local path to the audio
+        :param output_filepath: The local path to write the video to
+        :param word_font: The font for the text
+        :param ffmpeg_threads: The number of threads ffmpeg uses to encode the video, if None ffmpeg decides
+        :param word_style: The effect to animate the word with, see `create_word_layers`
+        :param profile: The encoding profile
+        :param temp_audiofile: Unused, ffmpeg encodes the audio without a temporary file
+        """
+        layers = self.build_overlay_layers(
+            media_duration(audio_file), word_font=word_font, word_style=word_style, fps=profile.fps
+        )
+        render_with_ffmpeg(
+            image_files,
+            audio_file,
+            layers,
+            output_filepath,
+            profile=profile,
+            ffmpeg_threads=ffmpeg_threads,
+        )
+
+    def video_cache_key(
+            self,
+            word_font: str,
+            backend: str = RenderSettings.BACKEND,
+            word_style: Optional[str] = VideoSettings.WORD_STYLE,
+            encoding_profile: str | EncodingProfile = RenderSettings.ENCODING_PROFILE,
+    ) -> str:
+        """
+        Get the cache key for the rendered video, based on the text, the content of the audio and images and the render
+        settings
+        :param word_font: The font for the text
+        :param backend: The backend rendering the video, see `generate_video`
+        :param word_style: The effect animating the word, see `create_word_layers`
+        :param encoding_profile: The encoding profile, or the name of one of `ENCODING_PROFILES`
+        :return: The key, see `cache_key`
+        """
+        if self.cache is None:
+            raise ValueError("video_cache_key requires a cache to fingerprint the audio and images")
+        content = {
+            "word": self.word,
+            "sentence": self.sentence,
+            "translated_sentence": self.translated_sentence,
+            "audio": self.cache.fingerprint(self.audio_filepath),
+            "images": [self.cache.fingerprint(image_path) for image_path in self.image_paths],
+        }
+        settings = {
+            "font": word_font,
+            "codec": "libx264",
+            "audio_codec": "aac",
+            "encoding": get_encoding_profile(encoding_profile).to_dict(),
+            "overlays": "layers",
+            "word_style": word_style,
+        }
+        return cache_key("video", backend, content, settings=settings)
 
     def generate_video_title(self, language: str) -> str:
         """
@@ -824,7 +1235,7 @@ class VideoGenerator:
         :param language: the language that the video is in
         :return: a list of tags which describe the video
         """
-        tags = VideoSettings.TAGS
+        tags = list(VideoSettings.TAGS)
         tags.append(language)
         tags.append(f"Easy {language}")
         return tags
@@ -0,0 +1,190 @@
+"""
+Module for validating a word list ahead of time, so that words don't need to be checked with enchant when a video is
+created. Run it whenever the word list changes:
+
+    python -m python.word_list_validation --language es [--cloud-storage] [--force]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from typing import Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from python.constants import BUCKET_NAME, LANGUAGE_TO_LEARN, Paths
+from python.language_verification import LanguageVerification
+from python.s3_organiser import BucketSort
+from python.word_pool import WordPool
+from python import custom_logging
+import base_config
+
+logger = custom_logging.get_logger(__name__)
+
+VALIDATED_SUFFIX = ".validated.txt"
+MANIFEST_SUFFIX = ".validated.json"
+
+
+def validated_word_list_path(word_list_path: str, language: str) -> str:
+    """
+    Get the path that the validated version of a word list is stored at
+    :param word_list_path: The path (or S3 key) to the source word list
+    :param language: The language the words were validated against
+    :return: The path (or S3 key) to the validated word list
+    """
+    root, _ = os.path.splitext(word_list_path)
+    return f"{root}.{language}{VALIDATED_SUFFIX}"
+
+
+@custom_logging.log_all_methods
+class WordListValidator:
+    """
+    Builds a validated copy of a word list containing only the words that enchant recognises for a language.
+
+    Alongside the validated list a manifest is stored with a checksum of the source list, the result for every word
+    that has been checked, so when the source list changes only new or changed lines need to be checked again, and the
+    words that have been used from every version of the validated list.
+    """
+
+    def __init__(
+            self,
+            word_list_path: str,
+            language: str,
+            cloud_storage: bool = False,
+            bucket: str = BUCKET_NAME,
+    ):
+        """
+        Initialise a WordListValidator object
+        :param word_list_path: The absolute path (or S3 key if `cloud_storage` is True) to the source word list
+        :param language: The language to validate the words against
+        :param cloud_storage: Whether the word lists are stored in S3
+        :param bucket: The S3 bucket the word lists are stored in, only used if `cloud_storage` is True
+        """
+        self.word_list_path = word_list_path
+        self.language = language
+        self.cloud_storage = cloud_storage
+        self.validated_path = validated_word_list_path(word_list_path, language)
+        self.manifest_path = self.validated_path[:-len(VALIDATED_SUFFIX)] + MANIFEST_SUFFIX
+        self._s3_bucket = BucketSort(bucket=bucket) if cloud_storage is True else None
+
+    def validate(self, force: bool = False) -> Dict[str, int]:
+        """
+        Validate the source word list and write the validated list and manifest. Words that were used from a previous
+        version of the validated list are left out of the new one, so they aren't drawn again.
+        :param force: If True, check every word with enchant even if a result is already stored in the manifest
+        :return: A dictionary with the number of words in the source list, the number of valid words written, the
+        number of words checked with enchant and the number of results reused from the manifest
+        """
+        source = self._read(self.word_list_path)
+        checksum = hashlib.sha256(source).hexdigest()
+        manifest = self.load_manifest()
+
+        if force is False and manifest is not None and manifest.get("source_checksum") == checksum:
+            logger.info(f"{self.word_list_path} is unchanged since it was last validated, skipping validation")
+            return {"total": manifest["total"], "valid": manifest["valid"], "checked": 0, "reused": 0}
+
+        previous_results: Dict[str, bool] = {}
+        if force is False and manifest is not None:
+            previous_results = manifest.get("results", {})
+
+        words = self._unique_words(source)
+        to_check = [word for word in words if word not in previous_results]
+        new_results = dict(zip(to_check, LanguageVerification(self.language).check_many(to_check)))
+        results = {word: previous_results.get(word, new_results.get(word, False)) for word in words}
+
+        # Words used before the last validation aren't in the current validated list, so they're kept in the manifest
+        used_words = set(manifest.get("used", [])) | set(self._used_words()) if manifest is not None else set()
+        valid_words = [word for word in words if results[word] is True and word not in used_words]
+
+        self._write(self.validated_path, "\n".join(valid_words).encode("utf-8"))
+        new_manifest = {
+            "language": self.language,
+            "source_path": self.word_list_path,
+            "source_checksum": checksum,
+            "total": len(words),
+            "valid": len(valid_words),
+            "results": results,
+            "used": sorted(used_words),
+        }
+        self._write(self.manifest_path, json.dumps(new_manifest, ensure_ascii=False).encode("utf-8"))
+
+        logger.info(f"Validated {self.word_list_path}: {len(valid_words)} of {len(words)} words are valid, "
+                    f"{len(to_check)} checked and {len(words) - len(to_check)} reused from the previous manifest")
+        return {"total": len(words), "valid": len(valid_words), "checked": len(to_check),
+                "reused": len(words) - len(to_check)}
+
+    def load_manifest(self) -> Optional[Dict]:
+        """
+        Load the manifest from the last time the word list was validated
+        :return: The manifest, or None if the word list has not been validated before
+        """
+        try:
+            return json.loads(self._read(self.manifest_path).decode("utf-8"))
+        except FileNotFoundError:
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def _used_words(self) -> List[str]:
+        """
+        Get the words that have been drawn and used from the current validated word list
+        :return: The used words, or an empty list if there is no validated word list yet
+        """
+        try:
+            return WordPool(word_list_path=self.validated_path, cloud_storage=self.cloud_storage).consumed_words()
+        except FileNotFoundError:
+            return []
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return []
+            raise
+
+    @staticmethod
+    def _unique_words(source: bytes) -> List[str]:
+        """
+        Split the source word list into words, dropping blank lines and duplicates
+        :param source: The contents of the source word list
+        :return: The words in the order they first appear
+        """
+        words = (line.strip() for line in source.decode("utf-8").splitlines())
+        return list(dict.fromkeys(word for word in words if word != ""))
+
+    def _read(self, path: str) -> bytes:
+        """
+        Read a file from local or S3 storage
+        :param path: The path or S3 key to read
+        :return: The contents of the file
+        """
+        if self._s3_bucket is not None:
+            return self._s3_bucket.get_object_from_s3(path)
+        with open(path, "rb") as file:
+            return file.read()
+
+    def _write(self, path: str, data: bytes) -> None:
+        """
+        Write a file to local or S3 storage
+        :param path: The path or S3 key to write to
+        :param data: The contents of the file
+        """
+        if self._s3_bucket is not None:
+            self._s3_bucket.push_object_to_s3(data, path)
+        else:
+            with open(path, "wb") as file:
+                file.write(data)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the validated word list used to pick the word of the day")
+    parser.add_argument("--word-list-path", default=Paths.WORD_LIST_PATH,
+                        help="The path to the word list, relative to the project root or the bucket root")
+    parser.add_argument("--language", default=LANGUAGE_TO_LEARN, help="The language to validate the words against")
+    parser.add_argument("--cloud-storage", action="store_true", help="Read and write the word lists in S3")
+    parser.add_argument("--force", action="store_true", help="Check every word, ignoring previous results")
+    args = parser.parse_args()
+
+    path = args.word_list_path if args.cloud_storage else f"{base_config.BASE_DIR}/{args.word_list_path}"
+    stats = WordListValidator(path, args.language, cloud_storage=args.cloud_storage).validate(force=args.force)
+    print(json.dumps(stats))
@@ -0,0 +1,387 @@
+"""Module for drawing words from a word list without rewriting the list every time a word is used"""
+
+import hashlib
+import os
+import random
+import struct
+from array import array
+from typing import Dict, List, Optional, Set
+
+from botocore.exceptions import ClientError
+
+from python.constants import BUCKET_NAME
+from python.s3_organiser import BucketSort
+from python import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+OFFSETS_SUFFIX = ".offsets"
+CONSUMED_SUFFIX = ".consumed"
+SNAPSHOT_SUFFIX = ".snapshot"
+
+_OFFSETS_MAGIC = b"WPO1"
+_CONSUMED_MAGIC = b"WPC1"
+_SNAPSHOT_MAGIC = b"WPS1"
+_HEADER = struct.Struct("<4sIQ")  # magic, line count, fingerprint of the version of the word list
+_SIZE = struct.Struct("<Q")
+
+
+@custom_logging.log_all_methods
+class WordPool:
+    """
+    Random access pool of words backed by a word list and three index files stored alongside it:
+        - `<word_list>.offsets`: the byte offset of every line in the word list. Written once per version of the list.
+        - `<word_list>.consumed`: a bitmap with one bit per line, set once the word on that line has been used.
+        - `<word_list>.snapshot`: a copy of the version of the list the index was built for, and the words used from
+          earlier versions which aren't in it. Written once per version of the list.
+
+    Drawing a word reads the bitmap and the single line for the word, and consuming a word rewrites the bitmap only,
+    so the cost of picking a word does not grow with the size of the word list. When the word list changes the used
+    words are read from the snapshot and the old bitmap, and marked in the new bitmap, so words used from the old
+    version of the list aren't drawn again.
+    """
+
+    def __init__(
+            self,
+            word_list_path: str,
+            cloud_storage: bool = False,
+            bucket: str = BUCKET_NAME,
+            max_random_attempts: int = 32,
+    ):
+        """
+        Initialise a WordPool object
+        :param word_list_path: The absolute path (or S3 key if `cloud_storage` is True) to the word list
+        :param cloud_storage: Whether the word list and its index files are stored in S3
+        :param bucket: The S3 bucket the word list is stored in, only used if `cloud_storage` is True
+        :param max_random_attempts: The number of random picks to try before falling back to scanning the bitmap for
+        unused words. Random picks are almost always successful until most of the list has been used.
+        """
+        self.word_list_path = word_list_path
+        self.cloud_storage = cloud_storage
+        self.bucket = bucket
+        self.max_random_attempts = max_random_attempts
+        self.offsets_path = word_list_path + OFFSETS_SUFFIX
+        self.consumed_path = word_list_path + CONSUMED_SUFFIX
+        self.snapshot_path = word_list_path + SNAPSHOT_SUFFIX
+        self._s3_bucket = BucketSort(bucket=bucket) if cloud_storage is True else None
+        self._source_version: Optional[int] = None
+        self._offsets: Optional[array] = None
+        self._consumed: Optional[bytearray] = None
+        self._drawn: Dict[str, int] = {}
+
+    @property
+    def line_count(self) -> int:
+        """The number of lines in the word list"""
+        return len(self._load_offsets()) - 1
+
+    def available_count(self) -> int:
+        """
+        Count the words in the pool that have not yet been consumed
+        :return: The number of unused words
+        """
+        consumed = self._load_consumed()
+        return self.line_count - int.from_bytes(consumed, "little").bit_count()
+
+    def draw(self) -> str:
+        """
+        Pick a random unused word from the pool. The word is not marked as used until `consume` is called.
+        :return: The word
+        :raises ValueError: If every word in the pool has been consumed
+        """
+        index = self._random_unused_index()
+        word = self._read_line(index)
+        self._drawn[word] = index
+        return word
+
+    def consume(self, word: str) -> None:
+        """
+        Mark a word as used so that it is not drawn again, and persist the updated bitmap
+        :param word: The word to mark as used
+        :raises KeyError: If the word is not in the word list
+        """
+        index = self._drawn.pop(word, None)
+        if index is None:
+            index = self._find_index(word)
+        consumed = self._load_consumed()
+        consumed[index // 8] |= 1 << (index % 8)
+        self._write(self.consumed_path, self._pack(_CONSUMED_MAGIC, self.line_count, bytes(consumed)))
+
+    def consumed_words(self) -> List[str]:
+        """
+        List the words that have been marked as used. Requires reading the full word list.
+        :return: The consumed words, in the order they appear in the word list
+        """
+        consumed = self._load_consumed()
+        return [
+            line.decode("utf-8").strip()
+            for index, line in enumerate(self._read(self.word_list_path).splitlines())
+            if consumed[index // 8] >> (index % 8) & 1 and line.strip() != b""
+        ]
+
+    def reset(self) -> None:
+        """Mark every word in the pool as unused"""
+        self._load_offsets()
+        content = self._read(self.word_list_path)
+        self._write(self.snapshot_path, self._pack_snapshot(content, set()))
+        self._consumed = self._build_consumed(content, set())
+        self._write(self.consumed_path, self._pack(_CONSUMED_MAGIC, self.line_count, bytes(self._consumed)))
+
+    def _random_unused_index(self) -> int:
+        """
+        Find the index of a random unused line
+        :return: The line index
+        """
+        consumed = self._load_consumed()
+        line_count = self.line_count
+        if line_count > 0:
+            for _ in range(self.max_random_attempts):
+                index = random.randrange(line_count)
+                if not consumed[index // 8] >> (index % 8) & 1:
+                    return index
+
+        unused = [index for index in range(line_count) if not consumed[index // 8] >> (index % 8) & 1]
+        if len(unused) == 0:
+            raise ValueError(f"There are no unused words left in {self.word_list_path}")
+        return random.choice(unused)
+
+    def _read_line(self, index: int) -> str:
+        """
+        Read a single line of the word list
+        :param index: The index of the line to read
+        :return: The stripped line
+        """
+        offsets = self._load_offsets()
+        start, end = offsets[index], offsets[index + 1]
+        return self._read_range(start, end).decode("utf-8").strip()
+
+    def _find_index(self, word: str) -> int:
+        """
+        Find the line index of a word that has not been drawn from this pool. Requires reading the full word list.
+        :param word: The word to find
+        :return: The index of the line containing the word
+        """
+        for index, line in enumerate(self._read(self.word_list_path).splitlines()):
+            if line.decode("utf-8").strip() == word:
+                return index
+        raise KeyError(f"{word} is not in {self.word_list_path}")
+
+    def _load_offsets(self) -> array:
+        """
+        Load the line offsets for the word list, building and persisting them if they don't exist or if the word list
+        has changed since they were built
+        :return: An array with the start offset of every line, followed by the size of the word list
+        """
+        if self._offsets is not None:
+            return self._offsets
+
+        stored = self._read_if_exists(self.offsets_path)
+        offsets_bytes = None
+        if stored is not None:
+            offsets_bytes = self._unpack(stored, _OFFSETS_MAGIC, self._get_source_version())
+        if offsets_bytes is None:
+            content = self._read(self.word_list_path)
+            offsets = self._build_offsets(content)
+            # Carry the used words over from the index of the previous version of the list, if there is one
+            used = self._stored_used_words()
+            self._consumed = self._build_consumed(content, used)
+            self._write(self.snapshot_path, self._pack_snapshot(content, used))
+            self._write(self.consumed_path, self._pack(_CONSUMED_MAGIC, len(offsets) - 1, bytes(self._consumed)))
+            # Written last, so the index is built again if writing the other files fails
+            self._write(self.offsets_path, self._pack(_OFFSETS_MAGIC, len(offsets) - 1, offsets.tobytes()))
+            self._offsets = offsets
+            logger.info(f"Built word pool index for {self.word_list_path} with {len(offsets) - 1} lines, "
+                        f"{len(used)} words already used")
+        else:
+            self._offsets = array("I")
+            self._offsets.frombytes(offsets_bytes)
+        return self._offsets
+
+    def _load_consumed(self) -> bytearray:
+        """
+        Load the consumed bitmap, creating an empty one if it doesn't exist or doesn't match the word list
+        :return: The bitmap, with bit `i` set if line `i` has been used
+        """
+        if self._consumed is not None:
+            return self._consumed
+
+        self._load_offsets()
+        if self._consumed is not None:
+            return self._consumed
+
+        stored = self._read_if_exists(self.consumed_path)
+        bitmap = self._unpack(stored, _CONSUMED_MAGIC, self._get_source_version()) if stored is not None else None
+        if bitmap is None:
+            # Keep the words carried over from earlier versions of the list, and the blank lines, marked
+            used = self._stored_used_words()
+            logger.warning(f"No valid consumed bitmap found for {self.word_list_path}, rebuilding it from "
+                           f"{len(used)} used words")
+            self._consumed = self._build_consumed(self._read(self.word_list_path), used)
+        else:
+            self._consumed = bytearray(bitmap)
+        return self._consumed
+
+    def _stored_used_words(self) -> Set[str]:
+        """
+        Get the words used from the version of the word list in the snapshot: the words marked in its consumed bitmap,
+        and the words carried over from earlier versions
+        :return: The used words, or an empty set if there is no snapshot
+        """
+        snapshot = self._read_if_exists(self.snapshot_path)
+        if snapshot is None or len(snapshot) < _HEADER.size + _SIZE.size:
+            return set()
+        snapshot_version = _HEADER.unpack_from(snapshot)[2]
+        body = self._unpack(snapshot, _SNAPSHOT_MAGIC, snapshot_version)
+        if body is None:
+            return set()
+        content_size = _SIZE.unpack_from(body)[0]
+        content = body[_SIZE.size:_SIZE.size + content_size]
+        carried = body[_SIZE.size + content_size:].decode("utf-8")
+        used = set(carried.split("\n")) if carried else set()
+
+        # The bitmap only applies if it was built for the same version of the list as the snapshot
+        stored = self._read_if_exists(self.consumed_path)
+        consumed = self._unpack(stored, _CONSUMED_MAGIC, snapshot_version) if stored is not None else None
+        if consumed is not None:
+            for index, line in enumerate(content.splitlines()):
+                if consumed[index // 8] >> (index % 8) & 1:
+                    used.add(line.decode("utf-8").strip())
+        used.discard("")
+        return used
+
+    @staticmethod
+    def _build_offsets(content: bytes) -> array:
+        """
+        Record the byte offset of each line of the word list
+        :param content: The contents of the word list
+        :return: The offsets array
+        """
+        offsets = array("I")
+        position = 0
+        for line in content.splitlines(keepends=True):
+            offsets.append(position)
+            position += len(line)
+        offsets.append(position)
+        return offsets
+
+    @staticmethod
+    def _build_consumed(content: bytes, used: Set[str]) -> bytearray:
+        """
+        Build the consumed bitmap for the word list, with blank lines and the lines of used words marked
+        :param content: The contents of the word list
+        :param used: The words that have been used
+        :return: The bitmap
+        """
+        lines = content.splitlines()
+        consumed = bytearray((len(lines) + 7) // 8)
+        for index, line in enumerate(lines):
+            word = line.decode("utf-8").strip()
+            if word == "" or word in used:
+                consumed[index // 8] |= 1 << (index % 8)
+        return consumed
+
+    def _pack_snapshot(self, content: bytes, used: Set[str]) -> bytes:
+        """
+        Serialise a snapshot of the word list with the used words that aren't in it, which are needed if they're added
+        back to a later version of the list
+        :param content: The contents of the word list
+        :param used: The words that have been used
+        :return: The serialised snapshot
+        """
+        words = {line.decode("utf-8").strip() for line in content.splitlines()}
+        carried = "\n".join(sorted(used - words)).encode("utf-8")
+        return self._pack(_SNAPSHOT_MAGIC, len(content.splitlines()), _SIZE.pack(len(content)) + content + carried)
+
+    def _pack(self, magic: bytes, line_count: int, body: bytes) -> bytes:
+        """
+        Prefix the body of an index file with a header
+        :param magic: The identifier for the type of index file
+        :param line_count: The number of lines in the word list
+        :param body: The index data
+        :return: The header and body as bytes
+        """
+        return _HEADER.pack(magic, line_count, self._get_source_version()) + body
+
+    @staticmethod
+    def _unpack(data: bytes, magic: bytes, source_version: int) -> Optional[bytes]:
+        """
+        Strip the header from an index file, checking that it was built for the current version of the word list
+        :param data: The contents of the index file
+        :param magic: The expected identifier for the type of index file
+        :param source_version: The fingerprint of the current version of the word list
+        :return: The index data, or None if the file is invalid or stale
+        """
+        if len(data) < _HEADER.size:
+            return None
+        file_magic, _, file_source_version = _HEADER.unpack_from(data)
+        if file_magic != magic or file_source_version != source_version:
+            return None
+        return data[_HEADER.size:]
+
+    def _get_source_version(self) -> int:
+        """
+        Get a fingerprint of the current version of the word list without reading it, used to detect when the word
+        list has changed. Based on the size and ETag of the object in S3, or the size and modified time of a local file.
+        :return: The fingerprint
+        """
+        if self._source_version is None:
+            if self._s3_bucket is not None:
+                metadata = self._s3_bucket.get_object_metadata(self.word_list_path)
+                version = f"{metadata['ContentLength']}-{metadata['ETag']}"
+            else:
+                stat = os.stat(self.word_list_path)
+                version = f"{stat.st_size}-{stat.st_mtime_ns}"
+            self._source_version = int.from_bytes(hashlib.blake2b(version.encode(), digest_size=8).digest(), "little")
+        return self._source_version
+
+    def _read_if_exists(self, path: str) -> Optional[bytes]:
+        """
+        Read a file from local or S3 storage if it exists
+        :param path: The path or S3 key to read
+        :return: The contents of the file, or None if it doesn't exist
+        """
+        try:
+            return self._read(path)
+        except FileNotFoundError:
+            return None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+                return None
+            raise
+
+    def _read(self, path: str) -> bytes:
+        """
+        Read a file from local or S3 storage
+        :param path: The path or S3 key to read
+        :return: The contents of the file
+        """
+        if self._s3_bucket is not None:
+            return self._s3_bucket.get_object_from_s3(path)
+        with open(path, "rb") as file:
+            return file.read()
+
+    def _read_range(self, start: int, end: int) -> bytes:
+        """
+        Read a byte range of the word list from local or S3 storage
+        :param start: The offset of the first byte to read
+        :param end: The offset to stop reading at (exclusive)
+        :return: The bytes in the range
+        """
+        if end <= start:
+            return b""
+        if self._s3_bucket is not None:
+            return self._s3_bucket.get_object_range_from_s3(self.word_list_path, start, end - 1)
+        with open(self.word_list_path, "rb") as file:
+            file.seek(start)
+            return file.read(end - start)
+
+    def _write(self, path: str, data: bytes) -> None:
+        """
+        Write a file to local or S3 storage
+        :param path: The path or S3 key to write to
+        :param data: The contents of the file
+        """
+        if self._s3_bucket is not None:
+            self._s3_bucket.push_object_to_s3(data, path)
+        else:
+            with open(path, "wb") as file:
+                file.write(data)
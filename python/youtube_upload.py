@@ -0,0 +1,329 @@
+"""
+Module for uploading videos to YouTube with a resumable upload session. The chunk size adapts to the throughput of the
+connection, failed chunks are retried with backoff, and the session is reported after every chunk so it can be saved,
+letting a later invocation continue the same upload if this one times out.
+"""
+import random
+import socket
+import statistics
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httplib2
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest, MediaFileUpload
+
+from python.constants import UploadSettings
+from python import custom_logging
+
+logger = custom_logging.get_logger(__name__)
+
+# Statuses the YouTube API returns for errors worth retrying
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+RETRY_EXCEPTIONS = (httplib2.HttpLib2Error, ConnectionError, TimeoutError, socket.timeout)
+# Statuses of a status query for a session that has expired, so the upload has to start again
+EXPIRED_STATUSES = (404, 410)
+
+
+class AdaptiveMediaFileUpload(MediaFileUpload):
+    """A MediaFileUpload whose chunk size can be changed between chunks"""
+
+    def set_chunksize(self, chunksize: int) -> None:
+        """
+        Set the size of the next chunks
+        :param chunksize: The chunk size in bytes. Must be a multiple of `UploadSettings.CHUNK_ALIGNMENT`.
+        """
+        if chunksize <= 0 or chunksize % UploadSettings.CHUNK_ALIGNMENT != 0:
+            raise ValueError(f"The chunk size must be a positive multiple of {UploadSettings.CHUNK_ALIGNMENT} bytes, "
+                             f"got {chunksize}")
+        self._chunksize = chunksize
+
+
+class ChunkSizer:
+    """
+    Picks the size of each chunk so it takes about `target_seconds` to send at the throughput seen so far. The
+    throughput is a moving average of the previous chunks, the size at most doubles from one chunk to the next, and
+    halves after a failed chunk.
+    """
+
+    def __init__(
+            self,
+            initial_size: int = UploadSettings.INITIAL_CHUNK_SIZE,
+            min_size: int = UploadSettings.MIN_CHUNK_SIZE,
+            max_size: int = UploadSettings.MAX_CHUNK_SIZE,
+            target_seconds: float = UploadSettings.TARGET_CHUNK_SECONDS,
+            smoothing: float = 0.5,
+    ):
+        """
+        Initialise a ChunkSizer object
+        :param initial_size: The size of the first chunk in bytes
+        :param min_size: The smallest chunk size in bytes
+        :param max_size: The largest chunk size in bytes
+        :param target_seconds: The time each chunk should take to send
+        :param smoothing: The weight of the latest chunk in the moving average of the throughput, between 0 and 1
+        """
+        if not 0 < min_size <= max_size:
+            raise ValueError(f"The chunk sizes must satisfy 0 < min_size <= max_size, got {min_size} and {max_size}")
+        self.min_size = self.align(min_size)
+        self.max_size = self.align(max_size)
+        self.target_seconds = target_seconds
+        self.smoothing = smoothing
+        self.size = self._clamp(self.align(initial_size))
+        self.throughput: Optional[float] = None
+
+    @staticmethod
+    def align(size: int) -> int:
+        """
+        Round a size down to a multiple of `UploadSettings.CHUNK_ALIGNMENT`, keeping it at least one multiple
+        :param size: The size in bytes
+        :return: The aligned size in bytes
+        """
+        return max(UploadSettings.CHUNK_ALIGNMENT, size - size % UploadSettings.CHUNK_ALIGNMENT)
+
+    def _clamp(self, size: int) -> int:
+        return min(self.max_size, max(self.min_size, size))
+
+    def record(self, num_bytes: int, seconds: float) -> int:
+        """
+        Record a chunk that was sent, and pick the size of the next one
+        :param num_bytes: The number of bytes sent
+        :param seconds: The time taken to send them
+        :return: The size of the next chunk in bytes
+        """
+        if num_bytes <= 0 or seconds <= 0:
+            return self.size
+        throughput = num_bytes / seconds
+        if self.throughput is None:
+            self.throughput = throughput
+        else:
+            self.throughput = self.smoothing * throughput + (1 - self.smoothing) * self.throughput
+        target = self.align(int(self.throughput * self.target_seconds))
+        self.size = self._clamp(min(target, self.size * 2))
+        return self.size
+
+    def shrink(self) -> int:
+        """
+        Halve the chunk size after a failed chunk
+        :return: The size of the next chunk in bytes
+        """
+        self.size = self._clamp(self.align(self.size // 2))
+        return self.size
+
+
+@dataclass
+class ChunkMetrics:
+    """The offset, size and time taken to send one chunk, and the number of attempts it took"""
+    offset: int
+    size: int
+    seconds: float
+    attempts: int
+
+
+@dataclass
+class UploadMetrics:
+    """The progress of an upload"""
+    total_bytes: int
+    resumed_from: int = 0
+    seconds: float = 0.0
+    retries: int = 0
+    restarts: int = 0
+    chunks: List[ChunkMetrics] = field(default_factory=list)
+
+    @property
+    def uploaded_bytes(self) -> int:
+        """The number of bytes sent by this upload, not counting those sent by an upload it resumed"""
+        return sum(chunk.size for chunk in self.chunks)
+
+    @property
+    def bytes_per_second(self) -> float:
+        """The average throughput of the upload"""
+        return self.uploaded_bytes / self.seconds if self.seconds > 0 else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Summarise the upload, e.g. for logging
+        :return: The sizes, throughput, retries and the median and max latency of the chunks
+        """
+        latencies = [chunk.seconds for chunk in self.chunks]
+        return {
+            "total_bytes": self.total_bytes,
+            "resumed_from": self.resumed_from,
+            "uploaded_bytes": self.uploaded_bytes,
+            "seconds": round(self.seconds, 3),
+            "bytes_per_second": round(self.bytes_per_second, 1),
+            "chunks": len(self.chunks),
+            "chunk_sizes": sorted({chunk.size for chunk in self.chunks}),
+            "median_chunk_seconds": round(statistics.median(latencies), 3) if latencies else None,
+            "max_chunk_seconds": round(max(latencies), 3) if latencies else None,
+            "retries": self.retries,
+            "restarts": self.restarts,
+        }
+
+
+@custom_logging.log_all_methods
+class ResumableUpload:
+    """
+    Sends a resumable upload request one chunk at a time. After every chunk the session is passed to `on_session` as a
+    dict with the session 'uri', the bytes confirmed by the server as 'progress', and the 'key' and 'size' of the file,
+    so it can be saved and passed back as `session` to continue the upload.
+    """
+
+    def __init__(
+            self,
+            request: HttpRequest,
+            media: AdaptiveMediaFileUpload,
+            key: str,
+            session: Optional[Dict[str, Any]] = None,
+            on_session: Optional[Callable[[Dict[str, Any]], None]] = None,
+            sizer: Optional[ChunkSizer] = None,
+            max_retries: int = UploadSettings.MAX_RETRIES,
+            backoff_seconds: float = UploadSettings.BACKOFF_SECONDS,
+            sleep: Callable[[float], None] = time.sleep,
+    ):
+        """
+        Initialise a ResumableUpload object
+        :param request: The resumable request, e.g. from `videos().insert(..., media_body=media)`
+        :param media: The file the request uploads
+        :param key: Identifies the file in the saved session, e.g. its S3 key. Only its sessions are resumed
+        :param session: Optional. A session saved from an earlier upload of the same file
+        :param on_session: Optional. Called with the session after it's started and after every chunk
+        :param sizer: Optional. Picks the chunk sizes, defaults to a ChunkSizer with the `UploadSettings`
+        :param max_retries: The max number of times to retry a chunk
+        :param backoff_seconds: The base delay before retrying, doubled with each retry
+        :param sleep: The function to wait with, for testing
+        """
+        self.request = request
+        self.media = media
+        self.key = key
+        self.session = session
+        self.on_session = on_session
+        self.sizer = sizer or ChunkSizer()
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.sleep = sleep
+        self.metrics = UploadMetrics(total_bytes=media.size())
+        # Whether a chunk failed since the server last reported the bytes it has
+        self._progress_unknown = False
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Upload the file
+        :return: The response to the request, e.g. the video resource
+        """
+        start = time.perf_counter()
+        try:
+            response = self._resume()
+            while response is None:
+                offset = self.request.resumable_progress
+                self.media.set_chunksize(self.sizer.size)
+                chunk_start = time.perf_counter()
+                response, attempts = self._with_retries(self._next_chunk)
+                seconds = time.perf_counter() - chunk_start
+                sent = (self.media.size() if response is not None else self.request.resumable_progress) - offset
+                self.metrics.chunks.append(ChunkMetrics(offset, sent, seconds, attempts))
+                self.sizer.record(sent, seconds)
+                if response is None:
+                    self._report_session()
+        finally:
+            self.metrics.seconds = time.perf_counter() - start
+        logger.info(f"Uploaded {self.key}: {self.metrics.to_dict()}")
+        return response
+
+    def _next_chunk(self) -> Optional[Dict[str, Any]]:
+        """
+        Send the next chunk. After a failed chunk the server is asked how much of the file it has first, as it may have
+        received part of the chunk.
+        :return: The response to the request if the upload has finished, else None
+        """
+        if self._progress_unknown is True and self.request.resumable_uri is not None:
+            response = self._query_session()
+            if response is not None:
+                return response
+        # The retries are handled here rather than by the client, which only retries error responses
+        _, response = self.request.next_chunk(num_retries=0)
+        return response
+
+    def _resume(self) -> Optional[Dict[str, Any]]:
+        """
+        Continue the saved session, if it's for the same file
+        :return: The response to the request if the saved session had already finished, else None
+        """
+        session = self.session
+        if session is None or not session.get("uri"):
+            return None
+        if session.get("key") != self.key or session.get("size") != self.metrics.total_bytes:
+            logger.info(f"Not resuming the upload session of {session.get('key')}, it's for a different file")
+            return None
+
+        self.request.resumable_uri = session["uri"]
+        response, _ = self._with_retries(self._query_session)
+        self.metrics.resumed_from = self.request.resumable_progress
+        logger.info(f"Resuming the upload of {self.key} from byte {self.metrics.resumed_from}")
+        return response
+
+    def _query_session(self) -> Optional[Dict[str, Any]]:
+        """
+        Ask the server how much of the file it has, and continue from there. If the session has expired the upload
+        starts again with a new session.
+        :return: The response to the request if the upload had finished, else None
+        """
+        uri = self.request.resumable_uri
+        headers = {"Content-Range": f"bytes */{self.metrics.total_bytes}", "Content-Length": "0"}
+        resp, content = self.request.http.request(uri, method="PUT", headers=headers)
+        if resp.status not in RETRY_STATUSES:
+            self._progress_unknown = False
+        if resp.status in (200, 201):
+            self.request.resumable_progress = self.metrics.total_bytes
+            return self.request.postproc(resp, content)
+        if resp.status == 308:
+            # The range of the bytes received, e.g. 'bytes=0-1023', which is missing if none have been
+            received = resp.get("range")
+            self.request.resumable_progress = int(received.split("-")[-1]) + 1 if received else 0
+            return None
+        if resp.status in EXPIRED_STATUSES:
+            logger.warning(f"The upload session for {self.key} has expired, starting the upload again")
+            self.request.resumable_uri = None
+            self.request.resumable_progress = 0
+            self.metrics.restarts += 1
+            return None
+        raise HttpError(resp, content, uri=uri)
+
+    def _with_retries(self, func: Callable[[], Any]) -> Tuple[Any, int]:
+        """
+        Call a function, retrying transient errors with exponential backoff and a smaller chunk size
+        :param func: The function to call
+        :return: The result of the function, and the number of attempts it took
+        """
+        attempt = 0
+        while True:
+            try:
+                return func(), attempt + 1
+            except HttpError as e:
+                if e.resp.status not in RETRY_STATUSES or attempt == self.max_retries:
+                    raise
+                error: Exception = e
+            except RETRY_EXCEPTIONS as e:
+                if attempt == self.max_retries:
+                    raise
+                error = e
+            self.metrics.retries += 1
+            self._progress_unknown = True
+            self._report_session()
+            self.sizer.shrink()
+            self.media.set_chunksize(self.sizer.size)
+            delay = self.backoff_seconds * (2 ** attempt + random.random())
+            logger.warning(f"Upload of {self.key} failed ({error!r}), retrying in {delay:.1f}s")
+            self.sleep(delay)
+            attempt += 1
+
+    def _report_session(self) -> None:
+        """Pass the session to `on_session`, if the session has started"""
+        if self.on_session is None or self.request.resumable_uri is None:
+            return
+        self.on_session({
+            "uri": self.request.resumable_uri,
+            "progress": self.request.resumable_progress,
+            "key": self.key,
+            "size": self.metrics.total_bytes,
+        })
@@ -1,18 +1,28 @@
 """Module for connecting to YouTube and uploading videos"""
+from __future__ import annotations
+
 import os
 import json
-from typing import Optional, Sequence, Dict, Any, List
+from typing import TYPE_CHECKING, Callable, Iterator, Optional, Sequence, Dict, Any, List
 from dotenv import load_dotenv
 
-from googleapiclient.discovery import build
-from google.oauth2.credentials import Credentials
-from googleapiclient.http import MediaFileUpload
-from google.auth.transport.requests import Request
-
-from python.constants import EnvVariables, BUCKET_NAME
+from python.constants import EnvVariables, BUCKET_NAME, UploadSettings
+from python.artifact_store import ArtifactStore
+from python.lazy_imports import lazy_import
 from python.s3_organiser import BucketSort
 from python import utils
 
+if TYPE_CHECKING:
+    from googleapiclient.discovery import build
+    from google.oauth2.credentials import Credentials
+    from google.auth.transport.requests import Request
+    from python import youtube_upload
+else:
+    build = lazy_import("googleapiclient.discovery", "build")
+    Credentials = lazy_import("google.oauth2.credentials", "Credentials")
+    Request = lazy_import("google.auth.transport.requests", "Request")
+    youtube_upload = lazy_import("python.youtube_upload")
+
 
 load_dotenv()
 
@@ -37,6 +47,7 @@ class YTConnector:
         self.cloud_storage = cloud_storage
         self.credentials = self.get_yt_credentials()
         self.youtube_client = self.build_yt_client()
+        self.last_upload_metrics: Optional[youtube_upload.UploadMetrics] = None
 
     @property
     def credentials_env(self) -> None | Dict[str, str]:
@@ -113,6 +124,9 @@ class YTConnector:
             category_id: int = 27,
             private_video: bool = False,
             made_for_kids: bool = False,
+            artifacts: Optional[ArtifactStore] = None,
+            upload_session: Optional[Dict[str, Any]] = None,
+            on_upload_session: Optional[Callable[[Dict[str, Any]], None]] = None,
     ) -> Dict:
         """
         Upload a video to youtube shorts
@@ -123,12 +137,20 @@ class YTConnector:
         :param category_id: the content category that the video belongs to
         :param private_video: if the video should be private, defaults to False
         :param made_for_kids: if the video is target at kids, defaults to False,
+        :param artifacts: Optional. The store for the files of the current run, to upload the local copy of the video
+        rather than downloading it from S3
+        :param upload_session: Optional. The resumable upload session of an earlier attempt to upload this video, to
+        continue that upload rather than starting again
+        :param on_upload_session: Optional. Called with the upload session after every chunk, so it can be saved and
+        passed back as `upload_session` if this attempt doesn't finish, see `youtube_upload.ResumableUpload`
         :return: a dictionary with the response from the API
         """
-        if self.cloud_storage is True:
+        if self.cloud_storage is True and artifacts is not None:
+            video = artifacts.local_path(video_path)
+        elif self.cloud_storage is True:
             s3_bucket = BucketSort(bucket=BUCKET_NAME)
-            video_bytes = s3_bucket.get_object_from_s3(s3_key=video_path)
-            video = utils.write_bytes_to_local_temp_file(bytes_object=video_bytes, suffix="mp4", delete_file=False)
+            video = utils.create_local_temp_file(suffix=".mp4")
+            s3_bucket.download_to(video_path, video)
         else:
             video = video_path
             if not os.path.exists(video_path):
@@ -148,11 +170,11 @@ class YTConnector:
             }
         }
 
-        media = MediaFileUpload(
+        media = youtube_upload.AdaptiveMediaFileUpload(
             video,
             mimetype='video/*',
             resumable=True,
-            chunksize=1024 * 1024  # 1MB chunks
+            chunksize=UploadSettings.INITIAL_CHUNK_SIZE,
         )
 
         insert_request = self.youtube_client.videos().insert(
@@ -161,14 +183,22 @@ class YTConnector:
             media_body=media
         )
 
-        response = None
-        while response is None:
-            status, response = insert_request.next_chunk()
+        upload = youtube_upload.ResumableUpload(
+            insert_request,
+            media,
+            key=video_path,
+            session=upload_session,
+            on_session=on_upload_session,
+        )
+        try:
+            response = upload.run()
+        finally:
+            self.last_upload_metrics = upload.metrics
 
         video_id = response['id']
         video_url = f"https://youtube.com/shorts/{video_id}"
 
-        if self.cloud_storage is True:
+        if self.cloud_storage is True and artifacts is None:
             utils.remove_temp_file(video)
 
         print(f"Upload Complete! Short URL: {video_url}")
@@ -224,35 +254,83 @@ class YTConnector:
 
         return channels
 
-    def list_youtube_uploads(self, channel_id: str, max_results: int = 50) -> Dict[str, Dict[str, str]]:
+    def get_uploads_playlist_id(self, channel_id: str) -> str:
+        """
+        Get the ID of the playlist with every video uploaded to a channel
+        :param channel_id: the ID of the channel
+        :return: the ID of the channel's uploads playlist
+        """
+        response = self.youtube_client.channels().list(part="contentDetails", id=channel_id).execute()
+        items = response.get("items", [])
+        if not items:
+            raise ValueError(f"YouTube channel not found: {channel_id}")
+        return items[0]["contentDetails"]["relatedPlaylists"]["uploads"]
+
+    def iter_youtube_uploads(
+            self,
+            channel_id: str,
+            published_after: Optional[str] = None,
+            page_size: int = 50,
+    ) -> Iterator[Dict[str, Dict[str, str]]]:
+        """
+        Walk the uploads playlist of a channel a page at a time, newest video first. Listing a playlist costs 1 unit of
+        quota per page, where a search costs 100.
+        :param channel_id: the ID of the channel to get the uploads for
+        :param published_after: Optional. An RFC 3339 timestamp, e.g. '2024-11-02T09:00:00Z'. Stop at the first video
+        published at or before it, for fetching only the videos uploaded since the last sync.
+        :param page_size: the number of videos to request per page, at most 50
+        :return: an iterator of the pages, each a dictionary in the format returned by `list_youtube_uploads`
+        """
+        playlist_id = self.get_uploads_playlist_id(channel_id)
+        page_token = None
+        while True:
+            response = self.youtube_client.playlistItems().list(
+                part="snippet,contentDetails",
+                playlistId=playlist_id,
+                maxResults=page_size,
+                pageToken=page_token,
+            ).execute()
+
+            page = {}
+            reached_synced_videos = False
+            for item in response.get("items", []):
+                snippet = item["snippet"]
+                published_at = item["contentDetails"].get("videoPublishedAt")
+                if published_at is None:
+                    # Deleted videos stay in the playlist, with a placeholder title and no publish time
+                    continue
+                # Timestamps from the API are all UTC in the same format, so they compare as strings
+                if published_after is not None and published_at <= published_after:
+                    reached_synced_videos = True
+                    break
+                thumbnails = snippet.get("thumbnails", {})
+                thumbnail = thumbnails.get("high") or thumbnails.get("default") or {}
+                page[item["contentDetails"]["videoId"]] = {
+                    "title": snippet["title"],
+                    "description": snippet["description"],
+                    "thumbnail_url": thumbnail.get("url", ""),
+                    "published_at": published_at,
+                }
+
+            if page:
+                yield page
+            page_token = response.get("nextPageToken")
+            if reached_synced_videos is True or page_token is None:
+                return
+
+    def list_youtube_uploads(self, channel_id: str, max_results: Optional[int] = None) -> Dict[str, Dict[str, str]]:
         """
         Get the details of the videos uploaded to a youtube channel
         :param channel_id: the ID for the channel to get the uploads for
-        :param max_results: the number of video uploads to get the data for
+        :param max_results: Optional. The number of video uploads to get the data for, newest first. If None the data
+        for every upload is returned.
         :return: A dictionary with the video_id as the key and a nested dictionary with the video title, description
         and thumbnail url as the value
         """
-        response = self.youtube_client.search().list(
-            part="id,snippet",
-            channelId=channel_id,
-            maxResults=max_results,
-            type="video"
-        ).execute()
-
-        video_dict = {}
-        for item in response.get("items", []):
-
-            video_id = item['id']['videoId']
-            title = item['snippet']['title']
-            description = item['snippet']['description']
-            thumbnail_url = item['snippet']['thumbnails']['high']['url']
-            published_at = item['snippet']['publishedAt']
-
-            video_dict[video_id] = {
-                "title": title,
-                "description": description,
-                "thumbnail_url": thumbnail_url,
-                "published_at": published_at,
-            }
-
+        video_dict: Dict[str, Dict[str, str]] = {}
+        for page in self.iter_youtube_uploads(channel_id):
+            for video_id, details in page.items():
+                if max_results is not None and len(video_dict) >= max_results:
+                    return video_dict
+                video_dict[video_id] = details
         return video_dict